@@ -1,60 +1,44 @@
-import requests
+import argparse
 import pyotp
 import logging
 import pandas as pd
-from datetime import datetime, date
+from datetime import date
 from SmartApi import SmartConnect
-import math
-from scipy.stats import norm
+import numpy as np
 
 # Import all credentials from your credentials.py file
 from credentials import API_KEY, CLIENT_CODE, PIN, TOTP_SECRET, SECRET_KEY
+from instrument_index import InstrumentIndex, parse_expiry
+from scrip_master_cache import load_instrument_table
+from option_ltp_and_greeks_calculator import black_scholes_vectorized, implied_volatility_vectorized, IV_STATUS_NAMES
 
 # --- Configuration & Utility Functions ---
-RISK_FREE_RATE = 0.07
-
-def calculate_implied_volatility(price, S, K, t, r, flag):
-    if t == 0: return None
-    MAX_ITERATIONS, PRECISION, sigma = 100, 1.0e-5, 0.5
-    for _ in range(MAX_ITERATIONS):
-        try:
-            d1 = (math.log(S / K) + (r + 0.5 * sigma ** 2) * t) / (sigma * math.sqrt(t))
-            d2 = d1 - sigma * math.sqrt(t)
-            price_implied = S * norm.cdf(d1) - K * math.exp(-r * t) * norm.cdf(d2) if flag == 'c' else K * math.exp(-r * t) * norm.cdf(-d2) - S * norm.cdf(-d1)
-            vega = S * norm.pdf(d1) * math.sqrt(t)
-            diff = price - price_implied
-        except (ValueError, OverflowError): return None
-        if abs(diff) < PRECISION or vega == 0: return sigma
-        sigma += diff / vega
-        if not (0.001 < sigma < 10.0): return None
-    return sigma
-
-def calculate_greeks(option_type, spot_price, strike_price, time_to_expiry, ltp):
-    flag = 'c' if option_type == 'CE' else 'p'
-    iv = calculate_implied_volatility(ltp, spot_price, strike_price, time_to_expiry, RISK_FREE_RATE, flag)
-    if iv is None: return {'Delta': 0, 'Theta': 0, 'Vega': 0, 'Gamma': 0, 'IV': 0}
-    try:
-        d1 = (math.log(spot_price / strike_price) + (RISK_FREE_RATE + 0.5 * iv ** 2) * time_to_expiry) / (iv * math.sqrt(time_to_expiry))
-        d2 = d1 - iv * math.sqrt(time_to_expiry)
-    except (ValueError, ZeroDivisionError): return {'Delta': 0, 'Theta': 0, 'Vega': 0, 'Gamma': 0, 'IV': 0}
-    
-    if flag == 'c':
-        delta = norm.cdf(d1)
-        theta = -(spot_price * norm.pdf(d1) * iv) / (2 * math.sqrt(time_to_expiry)) - RISK_FREE_RATE * strike_price * math.exp(-RISK_FREE_RATE * time_to_expiry) * norm.cdf(d2)
-    else:
-        delta = norm.cdf(d1) - 1
-        theta = -(spot_price * norm.pdf(d1) * iv) / (2 * math.sqrt(time_to_expiry)) + RISK_FREE_RATE * strike_price * math.exp(-RISK_FREE_RATE * time_to_expiry) * norm.cdf(-d2)
-        
-    gamma = norm.pdf(d1) / (spot_price * iv * math.sqrt(time_to_expiry))
-    vega = spot_price * norm.pdf(d1) * math.sqrt(time_to_expiry)
-    return {'Delta': round(delta, 3), 'Theta': round(theta / 365, 3), 'Vega': round(vega / 100, 3), 'Gamma': round(gamma, 3), 'IV': round(iv, 3)}
+from options_config import RISK_FREE_RATE, LOGOUT_ON_EXIT, SCRIP_MASTER_CACHE_DIR, SCAN_EXPIRIES
+from session_store import restore_or_login, clear_session
+from rate_limiter import RateLimitedSmartApi
+from cassette import Cassette
+from chain_analytics import ChainAnalytics, fetch_chain_greeks
+from export import save_to_excel
+from quote_cache import QuoteCache
+from utils import safe_ltp
+
+FULL_CHAIN_FILE = "option_chains_greeks.xlsx"
+
+def calculate_greeks(option_types, spot_price, strike_prices, time_to_expiry, ltps):
+    """Solves IV and Greeks for a batch of contracts in one vectorized pass; unsolved IVs stay NaN."""
+    iv, status = implied_volatility_vectorized(ltps, spot_price, strike_prices, time_to_expiry, RISK_FREE_RATE, option_types)
+    greeks = black_scholes_vectorized(spot_price, strike_prices, time_to_expiry, RISK_FREE_RATE, iv, option_types)
+    return pd.DataFrame({
+        'Delta': np.round(greeks['delta'], 3), 'Theta': np.round(greeks['theta'] / 365, 3),
+        'Vega': np.round(greeks['vega'] / 100, 3), 'Gamma': np.round(greeks['gamma'], 3), 'IV': np.round(iv, 3),
+        'IV Status': [IV_STATUS_NAMES[code] for code in status],
+    })
 
 # --- Main Logic ---
-def get_option_chain_with_greeks(smartApi, symbol_name):
+def get_option_chain_with_greeks(smartApi, symbol_name, instrument_index, quote_cache=None):
     print(f"\nFetching data for {symbol_name}...")
-    instrument_list = requests.get("https://margincalculator.angelbroking.com/OpenAPI_File/files/OpenAPIScripMaster.json").json()
-    
-    spot_price = next((smartApi.ltpData('NSE', f"{inst['symbol']}", inst['token']).get('data', {}).get('ltp', 0) for inst in instrument_list if inst.get('symbol') == f"{symbol_name}-EQ" and inst.get('exch_seg') == 'NSE'), 0)
+    spot_rec = instrument_index.get_equity(f"{symbol_name}-EQ", 'NSE')
+    spot_price = safe_ltp(smartApi, 'NSE', spot_rec['symbol'], spot_rec['token'], cache=quote_cache) if spot_rec else 0
     if spot_price == 0:
         print(f"❌ Could not fetch spot price for {symbol_name}.")
         return
@@ -62,73 +46,128 @@ def get_option_chain_with_greeks(smartApi, symbol_name):
     new_spot_price = round(spot_price * 1.02, 2)
     print(f"✅ New Spot Price (2% increase): ₹{new_spot_price}")
 
-    # Simplified expiry logic
-    nearest_expiry_str = '30SEP2025'
-    try:
-        nearest_expiry = datetime.strptime(nearest_expiry_str, '%d%b%Y').date()
-        time_to_expiry = (nearest_expiry - date.today()).days / 365.0
-        if time_to_expiry < 0:
-            print(f"❌ The specified expiry date ({nearest_expiry_str}) is in the past.")
-            return
-        print(f"✅ Using Expiry: {nearest_expiry_str}")
-    except ValueError:
-        print("❌ Invalid hard-coded expiry date format.")
+    expiries = []
+    for spec in SCAN_EXPIRIES:
+        expiry_str = instrument_index.resolve_expiry(symbol_name, spec)
+        if expiry_str and expiry_str not in expiries:
+            expiries.append(expiry_str)
+    if not expiries:
+        print(f"❌ No unexpired option expiry found for {symbol_name} ({', '.join(SCAN_EXPIRIES)}).")
         return
+    for expiry_str in expiries:
+        print_option_chain(smartApi, symbol_name, instrument_index, spot_price, new_spot_price, expiry_str, quote_cache)
+
+def print_option_chain(smartApi, symbol_name, instrument_index, spot_price, new_spot_price, nearest_expiry_str, quote_cache=None):
+    """Prints the nearest/new OTM strikes of one expiry with IV and Greeks."""
+    time_to_expiry = (parse_expiry(nearest_expiry_str) - date.today()).days / 365.0
+    print(f"✅ Using Expiry: {nearest_expiry_str}")
 
-    strike_prices = sorted({float(i['strike'])/100.0 for i in instrument_list if i.get('name') == symbol_name and i.get('expiry') == nearest_expiry_str and i.get('instrumenttype') == 'OPTSTK'})
-    if not strike_prices:
+    if not instrument_index.get_strikes(symbol_name, nearest_expiry_str):
         print(f"❌ No strike prices found for the selected expiry.")
         return
 
     # Find nearest OTM strikes and combine into a single list
     selected_strikes = []
-    otm_current = next((s for s in strike_prices if s > spot_price), None)
+    otm_current = instrument_index.next_strike_above(symbol_name, nearest_expiry_str, spot_price)
     if otm_current: selected_strikes.append(otm_current)
-    otm_new = next((s for s in strike_prices if s > new_spot_price), None)
+    otm_new = instrument_index.next_strike_above(symbol_name, nearest_expiry_str, new_spot_price)
     if otm_new and otm_new not in selected_strikes: selected_strikes.append(otm_new)
 
     if not selected_strikes:
         print("❌ No relevant OTM strikes found. Cannot proceed.")
         return
 
-    # Combine data fetching and printing into one loop
+    # Fetch every selected contract first, then solve IV and Greeks for all of them at once
+    option_chain_data = []
+    for strike_input in selected_strikes:
+        for option_type, inst in instrument_index.get_options_at_strike(symbol_name, nearest_expiry_str, strike_input).items():
+            ltp = safe_ltp(smartApi, inst['exch_seg'], inst['symbol'], inst['token'], cache=quote_cache)
+            if ltp > 0 and time_to_expiry > 0:
+                option_chain_data.append({'Type': option_type, 'Strike Price': strike_input, 'LTP': ltp})
+    chain_df = pd.DataFrame(option_chain_data, columns=['Type', 'Strike Price', 'LTP'])
+    if not chain_df.empty:
+        chain_df = chain_df.join(calculate_greeks(chain_df['Type'].to_numpy(), spot_price, chain_df['Strike Price'].to_numpy(), time_to_expiry, chain_df['LTP'].to_numpy()))
+
     for strike_input in selected_strikes:
         print(f"\nBuilding option chain for strike {strike_input}...")
-        option_chain_data = []
-        for inst in instrument_list:
-            if inst.get('name') == symbol_name and inst.get('expiry') == nearest_expiry_str and float(inst.get('strike', '0'))/100.0 == strike_input and inst.get('instrumenttype') == 'OPTSTK':
-                option_type = 'CE' if inst.get('symbol', '').endswith('CE') else 'PE'
-                ltp = smartApi.ltpData(inst['exch_seg'], inst['symbol'], inst['token']).get('data', {}).get('ltp', 0)
-                if ltp > 0 and time_to_expiry > 0:
-                    greeks_dict = calculate_greeks(option_type, spot_price, strike_input, time_to_expiry, ltp)
-                    option_chain_data.append({'Type': option_type, 'Strike Price': strike_input, 'LTP': ltp, **greeks_dict})
-        
-        if option_chain_data:
-            df = pd.DataFrame(option_chain_data)
-            calls = df[df['Type'] == 'CE'].rename(columns={'LTP': 'Call LTP', 'IV': 'Call IV', 'Delta': 'Call Delta', 'Theta': 'Call Theta', 'Vega': 'Call Vega', 'Gamma': 'Call Gamma'})
-            puts = df[df['Type'] == 'PE'].rename(columns={'LTP': 'Put LTP', 'IV': 'Put IV', 'Delta': 'Put Delta', 'Theta': 'Put Theta', 'Vega': 'Put Vega', 'Gamma': 'Put Gamma'})
-            final_table = pd.merge(calls, puts, on='Strike Price', how='outer').fillna(0).set_index('Strike Price')
+        df = chain_df[chain_df['Strike Price'] == strike_input]
+        if not df.empty:
+            calls = df[df['Type'] == 'CE'].rename(columns={'LTP': 'Call LTP', 'IV': 'Call IV', 'IV Status': 'Call IV Status', 'Delta': 'Call Delta', 'Theta': 'Call Theta', 'Vega': 'Call Vega', 'Gamma': 'Call Gamma'})
+            puts = df[df['Type'] == 'PE'].rename(columns={'LTP': 'Put LTP', 'IV': 'Put IV', 'IV Status': 'Put IV Status', 'Delta': 'Put Delta', 'Theta': 'Put Theta', 'Vega': 'Put Vega', 'Gamma': 'Put Gamma'})
+            final_table = pd.merge(calls, puts, on='Strike Price', how='outer').set_index('Strike Price')
             print(f"\n--- Data for {symbol_name} (Expiry: {nearest_expiry_str}, Strike: {strike_input}) ---")
             print(final_table)
             print("--------------------------------------------------------------------------")
         else:
             print(f"❌ Could not find option chain data for strike price {strike_input} on {nearest_expiry_str}.")
 
+def print_full_chains(smartApi, symbols, instrument_index):
+    """Solves IV and Greeks for every strike of `symbols` on the process pool and saves them."""
+    with ChainAnalytics() as analytics:
+        chain_df = fetch_chain_greeks(smartApi, instrument_index, symbols, SCAN_EXPIRIES, analytics=analytics)
+    if chain_df.empty:
+        print("❌ No option chain data found.")
+        return
+    print(f"✅ IV and Greeks for {len(chain_df)} contracts across {chain_df['Symbol'].nunique()} underlyings.")
+    print(chain_df.groupby(['Symbol', 'Expiry'], sort=False)['IV'].median().rename('Median IV').to_string())
+    save_to_excel(chain_df, FULL_CHAIN_FILE)
+
 # --- Main Script Execution ---
-smartApi = SmartConnect(api_key=API_KEY)
-try:
+def full_login(smartApi):
     totp = pyotp.TOTP(TOTP_SECRET).now()
     data = smartApi.generateSession(CLIENT_CODE, PIN, totp)
-    if not data.get('status'):
-        logging.error(f"Login Failed: {data}")
-    else:
+    if data.get('status'):
         print("✅ Login successful!")
-        symbol_input = input("Enter the stock symbols (e.g., ADANIENT,TCS): ").upper()
-        for symbol in [s.strip() for s in symbol_input.split(',')]:
-            get_option_chain_with_greeks(smartApi, symbol)
-finally:
+    return data
+
+def run(cassette=None, full_chain=False):
+    """
+    Logs in, loads the scrip master and prints the chains; `cassette` records or replays the run.
+    With `full_chain`, every strike of the entered symbols (or of every F&O stock for "ALL") is solved.
+    """
+    replaying = bool(cassette and cassette.mode == 'replay')
+    if replaying:
+        smartApi = RateLimitedSmartApi(cassette.wrap())
+    else:
+        connect = SmartConnect(api_key=API_KEY)
+        smartApi = RateLimitedSmartApi(cassette.wrap(connect) if cassette else connect)
     try:
-        smartApi.terminateSession(CLIENT_CODE)
-        print("🔒 Logout successful.")
-    except Exception as e:
-        print(f"❌ Logout failed: {e}")
\ No newline at end of file
+        data = cassette.recorded_session() if replaying else restore_or_login(smartApi, CLIENT_CODE, lambda: full_login(smartApi))
+        if not data.get('status'):
+            logging.error(f"Login Failed: {data}")
+        else:
+            cache_dir = cassette.scrip_master_cache_dir if cassette else SCRIP_MASTER_CACHE_DIR
+            instrument_index = InstrumentIndex(load_instrument_table("https://margincalculator.angelbroking.com/OpenAPI_File/files/OpenAPIScripMaster.json", cache_dir))
+            symbol_input = input("Enter the stock symbols (e.g., ADANIENT,TCS" + (", or ALL" if full_chain else "") + "): ").upper()
+            symbols = [s.strip() for s in symbol_input.split(',') if s.strip()]
+            if full_chain:
+                print_full_chains(smartApi, instrument_index.option_underlyings() if symbols == ['ALL'] else symbols, instrument_index)
+                return
+            # One cache for the session, so a symbol entered twice is not quoted twice
+            quote_cache = QuoteCache()
+            for symbol in symbols:
+                get_option_chain_with_greeks(smartApi, symbol, instrument_index, quote_cache)
+    finally:
+        if LOGOUT_ON_EXIT and not replaying:
+            clear_session()
+            try:
+                smartApi.terminateSession(CLIENT_CODE)
+                print("🔒 Logout successful.")
+            except Exception as e:
+                print(f"❌ Logout failed: {e}")
+
+# Guarded: the full-chain worker processes re-import this module on Windows
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Option chain with IV and Greeks for the entered symbols.")
+    parser.add_argument("--record-session", metavar="FILE", help="Record every SmartAPI and scrip master response to a cassette FILE.")
+    parser.add_argument("--replay-session", metavar="FILE", help="Re-run offline from a cassette recorded with --record-session.")
+    parser.add_argument("--realtime", action="store_true", help="With --replay-session, answer each call after its recorded latency.")
+    parser.add_argument("--full-chain", action="store_true",
+                        help=f"Solve IV/Greeks for every strike on all cores and save them to {FULL_CHAIN_FILE}; enter ALL for every F&O stock.")
+    args = parser.parse_args()
+    if args.record_session or args.replay_session:
+        mode, path = ('record', args.record_session) if args.record_session else ('replay', args.replay_session)
+        with Cassette(path, mode, realtime=args.realtime) as cassette:
+            run(cassette, full_chain=args.full_chain)
+    else:
+        run(full_chain=args.full_chain)
@@ -0,0 +1,604 @@
+"""
+benchmarks.py
+-----------------
+Purpose:
+    Offline performance benchmarks. Runs the scan's hot paths against a simulated
+    SmartConnect, a local Chartink stand-in and a frozen scrip master fixture, so
+    regressions show up before market open without a broker session.
+
+Usage:
+    python benchmarks.py                          # all benchmarks, default sizes
+    python benchmarks.py --only build_otm_dataframe --latency 0.05 --error-rate 0.02
+    python benchmarks.py --save-fixture scrip.json   # freeze the generated scrip master
+    python benchmarks.py --fixture scrip.json --json results.json
+    python benchmarks.py --only chain_greeks --analytics-workers 1   # full chains without the process pool
+    pytest benchmarks.py                          # same benchmarks under pytest-benchmark
+
+Classes:
+    - FakeSmartConnect(instruments, latency=0.0, error_rate=0.0, rate_limit=None, seed=0): SmartConnect
+      stand-in with per-call latency, random failures, per-endpoint rate limiting and call counts.
+    - ChartinkStubSession(symbols, latency=0.0, seed=0): `requests.Session` stand-in for `ChartinkClient`.
+    - BenchEnv(...): Fixture, index, fake APIs and inputs shared by the benchmarks.
+
+Functions:
+    - build_scrip_master_fixture(underlyings=200, expiry=None, seed=7): Deterministic scrip master rows.
+    - run_benchmarks(env, names=None, repeat=5): Runs benchmarks; returns one result dict per benchmark.
+
+Notes:
+    - Each result reports best/mean wall time, SmartAPI/Chartink calls per run and peak
+      Python memory (tracemalloc, measured on one extra run).
+    - Option prices come from Black-Scholes at FAKE_VOLATILITY, so IV benchmarks solve real inputs.
+    - Without --fixture the expiry is set 30 days ahead, so the fixture never goes stale.
+    - chain_greeks calls the fake API without the client-side RateLimiter: a full-chain
+      scan of the default fixture makes ~380 getMarketData calls, which at the 10/s limit
+      would time the limiter rather than the fetch/solve overlap.
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import Counter, defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+import numpy as np
+from rich.console import Console
+from rich.table import Table
+
+from chain_analytics import ChainAnalytics, fetch_chain_greeks
+from chartink_screener import ChartinkClient
+from instrument_index import InstrumentIndex, option_type_of
+from instrument_table import SCRIP_MASTER_FIELDS, InstrumentTable
+from option_data import build_otm_dataframe
+from option_ltp_and_greeks_calculator import black_scholes_vectorized, implied_volatility_vectorized
+from options_config import (API_RATE_LIMITS, MAX_THREAD_WORKERS, MIN_THREAD_WORKERS, RISK_FREE_RATE,
+                            SPOT_PRICE_INCREASE_PERCENTAGE, TARGET_API_LATENCY, THREAD_WORKERS, ANALYTICS_WORKERS)
+from rate_limiter import AdaptiveConcurrency, RateLimitedSmartApi, RateLimiter
+from scan_history import ScanHistoryStore
+from screener_conditions import GAINER_CONDITION
+from utils import iter_json_array
+
+FAKE_VOLATILITY = 0.30
+RATE_LIMIT_RESPONSE = {"status": False, "message": "Access denied because of exceeding access rate",
+                       "errorcode": "AB1004", "data": None}
+STRIKE_STEPS = (1, 2.5, 5, 10, 20, 50, 100)
+
+
+def _expiry_str(d):
+    return d.strftime("%d%b%Y").upper()
+
+
+def build_scrip_master_fixture(underlyings=200, expiry=None, seed=7):
+    """
+    Generates scrip master rows (NSE equities plus NFO OPTSTK chains) in the Angel One format.
+
+    Args:
+        underlyings (int): Number of stocks.
+        expiry (str, optional): Option expiry like "30SEP2025"; defaults to 30 days from today.
+        seed (int): Random seed; the same seed always gives the same rows.
+
+    Returns:
+        list[dict]: Scrip master rows.
+    """
+    rng = random.Random(seed)
+    expiry = expiry or _expiry_str(date.today() + timedelta(days=30))
+    code = datetime.strptime(expiry, "%d%b%Y").strftime("%d%b%y").upper()
+    rows = []
+    for i in range(underlyings):
+        name = f"STK{i:04d}"
+        spot = round(rng.uniform(100, 5000), 2)
+        rows.append({"token": str(10000 + i), "symbol": f"{name}-EQ", "name": name, "expiry": "",
+                     "strike": "-1.000000", "lotsize": "1", "instrumenttype": "", "exch_seg": "NSE",
+                     "tick_size": "5.000000"})
+        step = min(STRIKE_STEPS, key=lambda s: abs(s - spot * 0.01))
+        lot_size = str(rng.choice((250, 500, 750, 1000, 1500)))
+        first = np.floor(spot * 0.8 / step) * step
+        for k, strike in enumerate(np.arange(first, spot * 1.2 + step, step)):
+            strike = round(float(strike), 2)
+            for option_type in ("CE", "PE"):
+                rows.append({"token": str(100000 + i * 1000 + k * 2 + (option_type == "PE")),
+                             "symbol": f"{name}{code}{strike:g}{option_type}", "name": name,
+                             "expiry": expiry, "strike": f"{strike * 100:.6f}", "lotsize": lot_size,
+                             "instrumenttype": "OPTSTK", "exch_seg": "NFO", "tick_size": "5.000000"})
+    return rows
+
+
+def _nearest_expiry(instruments):
+    """Earliest OPTSTK expiry that has not passed yet."""
+    expiries = {inst["expiry"] for inst in instruments if inst.get("instrumenttype") == "OPTSTK"}
+    upcoming = sorted(d for d in (datetime.strptime(e, "%d%b%Y").date() for e in expiries) if d >= date.today())
+    if not upcoming:
+        raise ValueError("The scrip master fixture has no unexpired OPTSTK contracts.")
+    return _expiry_str(upcoming[0])
+
+
+def _price_book(instruments, seed=0):
+    """
+    LTPs for every fixture row. A stock trades within 2% of the middle of its option
+    strikes (so real, frozen scrip masters work too); options are priced with Black-Scholes.
+    """
+    rng = random.Random(seed)
+    strikes = defaultdict(list)
+    for inst in instruments:
+        if inst.get("instrumenttype") == "OPTSTK":
+            strikes[inst["name"]].append(float(inst["strike"]) / 100.0)
+    prices, spots = {}, {}
+    for inst in instruments:
+        if not inst.get("expiry") and inst.get("name") in strikes:
+            spot = round(float(np.median(strikes[inst["name"]])) * rng.uniform(0.98, 1.02), 2)
+            prices[(inst["exch_seg"], str(inst["token"]))] = spot
+            spots[inst["name"]] = spot
+    options = [inst for inst in instruments
+               if inst.get("instrumenttype") == "OPTSTK" and inst.get("name") in spots]
+    if options:
+        S = np.array([spots[inst["name"]] for inst in options])
+        K = np.array([float(inst["strike"]) / 100.0 for inst in options])
+        T = np.array([max((datetime.strptime(inst["expiry"], "%d%b%Y").date() - date.today()).days, 1) / 365.0
+                      for inst in options])
+        types = np.array([option_type_of(inst) for inst in options])
+        ltp = black_scholes_vectorized(S, K, T, RISK_FREE_RATE, FAKE_VOLATILITY, types)["price"]
+        for inst, price in zip(options, np.maximum(np.round(ltp, 2), 0.05)):
+            prices[(inst["exch_seg"], str(inst["token"]))] = float(price)
+    return prices
+
+
+class FakeSmartConnect:
+    """
+    Offline SmartConnect with configurable latency, failures and rate limiting.
+
+    Args:
+        instruments (list[dict]): Scrip master rows; their tokens are the only ones quoted.
+        latency (float): Seconds each API call sleeps.
+        error_rate (float): Probability (0-1) that a call raises a connection error.
+        rate_limit (float, optional): Calls per second per endpoint before the fake answers
+            with SmartAPI's "exceeding access rate" error. None disables it.
+        seed (int): Random seed for failures and prices.
+    """
+    def __init__(self, instruments, latency=0.0, error_rate=0.0, rate_limit=None, seed=0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.calls = Counter()
+        self._prices = _price_book(instruments, seed)
+        self._rng = random.Random(seed)
+        self._recent = defaultdict(deque)
+        self._lock = threading.Lock()
+
+    def _call(self, endpoint):
+        """Counts the call and applies latency, rate limiting and random failures."""
+        with self._lock:
+            self.calls[endpoint] += 1
+            now = time.monotonic()
+            recent = self._recent[endpoint]
+            while recent and now - recent[0] > 1.0:
+                recent.popleft()
+            throttled = self.rate_limit is not None and len(recent) >= self.rate_limit
+            if throttled:
+                self.calls["throttled"] += 1
+            else:
+                recent.append(now)
+            fail = self._rng.random() < self.error_rate and not throttled
+            if fail:
+                self.calls["failed"] += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if throttled:
+            return dict(RATE_LIMIT_RESPONSE)
+        if fail:
+            raise ConnectionError(f"Simulated {endpoint} failure")
+        return None
+
+    def generateSession(self, client_code, password, totp):
+        return self._call("generateSession") or {
+            "status": True, "data": {"jwtToken": "jwt", "refreshToken": "refresh", "feedToken": "feed"}}
+
+    def generateToken(self, refresh_token):
+        return self._call("generateToken") or {
+            "status": True, "data": {"jwtToken": "jwt", "refreshToken": refresh_token, "feedToken": "feed"}}
+
+    def getProfile(self, refresh_token):
+        return self._call("getProfile") or {"status": True, "data": {"clientcode": "BENCH"}}
+
+    def getfeedToken(self):
+        return "feed"
+
+    def terminateSession(self, client_code):
+        return self._call("terminateSession") or {"status": True, "data": "Logout Successfully"}
+
+    def setAccessToken(self, token):
+        pass
+
+    def setRefreshToken(self, token):
+        pass
+
+    def setFeedToken(self, token):
+        pass
+
+    def setUserId(self, user_id):
+        pass
+
+    def ltpData(self, exchange, tradingsymbol, symboltoken):
+        error = self._call("ltpData")
+        if error:
+            return error
+        ltp = self._prices.get((exchange, str(symboltoken)))
+        if ltp is None:
+            return {"status": False, "message": "Invalid Token", "data": None}
+        return {"status": True, "data": {"exchange": exchange, "tradingsymbol": tradingsymbol,
+                                         "symboltoken": symboltoken, "ltp": ltp}}
+
+    def getMarketData(self, mode, exchangeTokens):
+        error = self._call("getMarketData")
+        if error:
+            return error
+        fetched, unfetched = [], []
+        for exchange, tokens in exchangeTokens.items():
+            for token in tokens:
+                ltp = self._prices.get((exchange, str(token)))
+                if ltp is None:
+                    unfetched.append({"exchange": exchange, "symbolToken": token})
+                else:
+                    fetched.append({"exchange": exchange, "symbolToken": str(token), "ltp": ltp})
+        return {"status": True, "data": {"fetched": fetched, "unfetched": unfetched}}
+
+
+class _StubResponse:
+    def __init__(self, status_code=200, content=b"", payload=None):
+        self.status_code = status_code
+        self.content = content
+        self._payload = payload
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            import requests
+            raise requests.HTTPError(f"{self.status_code} Error")
+
+    def json(self):
+        return self._payload
+
+
+class ChartinkStubSession:
+    """
+    Stands in for the `requests.Session` used by `ChartinkClient`.
+
+    Args:
+        symbols (list[tuple]): (symbol, stock name) pairs the screener "returns".
+        latency (float): Seconds each request sleeps.
+        seed (int): Random seed for the % change column.
+    """
+    CSRF_TOKEN = "bench-csrf-token"
+
+    def __init__(self, symbols, latency=0.0, seed=0):
+        rng = random.Random(seed)
+        self.latency = latency
+        self.calls = Counter()
+        self._rows = [{"nsecode": symbol, "name": name, "per_chg": round(rng.uniform(-8, 8), 2)}
+                      for symbol, name in symbols]
+
+    def get(self, url, timeout=None):
+        self.calls["chartink_get"] += 1
+        time.sleep(self.latency)
+        html = f'<html><head><meta name="csrf-token" content="{self.CSRF_TOKEN}"></head></html>'
+        return _StubResponse(content=html.encode())
+
+    def post(self, url, data=None, headers=None, timeout=None):
+        self.calls["chartink_post"] += 1
+        time.sleep(self.latency)
+        if (headers or {}).get("X-CSRF-TOKEN") != self.CSRF_TOKEN:
+            return _StubResponse(status_code=419)
+        return _StubResponse(payload={"data": list(self._rows)})
+
+    def close(self):
+        pass
+
+
+class BenchEnv:
+    """
+    Everything the benchmarks share: fixture, index, fake APIs and precomputed inputs.
+
+    Args:
+        underlyings (int): Stocks in the generated fixture (ignored with `fixture`).
+        stocks (int): Stocks the Chartink stub returns, i.e. rows per OTM table.
+        latency (float): Simulated SmartAPI/Chartink latency per call (seconds).
+        error_rate (float): Simulated SmartAPI failure probability.
+        rate_limit (float, optional): Simulated broker-side calls per second per endpoint.
+        use_limiter (bool): Route SmartAPI calls through a fresh `RateLimiter` (API_RATE_LIMITS).
+        fixture (str, optional): JSON file with a frozen scrip master to use instead of generating one.
+        expiry (str, optional): Expiry to scan; defaults to the fixture's nearest one.
+        seed (int): Random seed.
+        analytics_workers (int, optional): Worker processes for the full-chain benchmark.
+    """
+    def __init__(self, underlyings=200, stocks=50, latency=0.0, error_rate=0.0, rate_limit=None,
+                 use_limiter=True, fixture=None, expiry=None, seed=7, analytics_workers=ANALYTICS_WORKERS):
+        if fixture:
+            with open(fixture, encoding="utf-8") as f:
+                self.instruments = json.load(f)
+        else:
+            self.instruments = build_scrip_master_fixture(underlyings, expiry, seed)
+        self.expiry = expiry or _nearest_expiry(self.instruments)
+        # String columns as the scrip master cache memory-maps them
+        self.scrip_columns = {col: np.array([str(inst.get(col, "")) for inst in self.instruments], dtype=np.str_)
+                              for col in SCRIP_MASTER_FIELDS}
+        self.scrip_json = json.dumps(self.instruments).encode("utf-8")
+        self.index = InstrumentIndex(self.instruments)
+        self.api = FakeSmartConnect(self.instruments, latency, error_rate, rate_limit, seed)
+        if use_limiter:
+            limiter = RateLimiter(API_RATE_LIMITS, AdaptiveConcurrency(
+                THREAD_WORKERS, MIN_THREAD_WORKERS, MAX_THREAD_WORKERS, TARGET_API_LATENCY))
+            self.smartApi = RateLimitedSmartApi(self.api, limiter)
+        else:
+            self.smartApi = self.api
+        self.io_pool = ThreadPoolExecutor(max_workers=MAX_THREAD_WORKERS)
+
+        names = sorted({inst["name"] for inst in self.instruments
+                        if inst.get("instrumenttype") == "OPTSTK" and inst.get("expiry") == self.expiry})
+        names = [n for n in names if self.index.get_equity(f"{n}-EQ", "NSE")][:stocks]
+        self.chartink_session = ChartinkStubSession([(n, f"{n} Ltd") for n in names], latency, seed)
+        self.stock_df = ChartinkClient(session=self.chartink_session, cache_ttl=0).fetch(GAINER_CONDITION)
+        self.chartink_session.calls.clear()
+
+        # Greeks/IV inputs: every option of the scanned expiry at its fake market price
+        options = [inst for name in names for inst in self.index.get_derivatives(name, self.expiry)]
+        prices = self.api._prices
+        self.greeks_inputs = {
+            "price": np.array([prices[(o["exch_seg"], str(o["token"]))] for o in options]),
+            "S": np.array([prices[("NSE", str(self.index.get_equity(f"{o['name']}-EQ")["token"]))] for o in options]),
+            "K": np.array([float(o["strike"]) / 100.0 for o in options]),
+            "T": max((datetime.strptime(self.expiry, "%d%b%Y").date() - date.today()).days, 1) / 365.0,
+            "type": np.array([option_type_of(o) for o in options]),
+        }
+        self.otm_df = None
+        self.tmp_dir = tempfile.mkdtemp(prefix="myscan-bench-")
+        # Full chains of every underlying in the fixture, solved on one long-lived process pool
+        self.chain_symbols = self.index.option_underlyings()
+        self.analytics = ChainAnalytics(analytics_workers)
+
+    def call_counts(self):
+        return self.api.calls + self.chartink_session.calls
+
+    def close(self):
+        self.io_pool.shutdown()
+        self.analytics.close()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+
+# --- Benchmarks: each takes the env and runs the measured operation once ---
+
+def bench_instrument_index_build(env):
+    InstrumentIndex(env.instruments)
+
+
+def bench_instrument_table_build(env):
+    InstrumentIndex(env.scrip_columns)
+
+
+def bench_scrip_master_stream(env):
+    body, size = env.scrip_json, 1 << 16
+    InstrumentTable.from_records(iter_json_array(body[i:i + size] for i in range(0, len(body), size)))
+
+
+def bench_instrument_lookup(env):
+    for symbol in env.stock_df["Symbol"]:
+        spot_rec = env.index.get_equity(f"{symbol}-EQ", "NSE")
+        spot = env.api._prices[("NSE", str(spot_rec["token"]))]
+        for price in (spot, spot * (1 + SPOT_PRICE_INCREASE_PERCENTAGE)):
+            strike = env.index.next_strike_above(symbol, env.expiry, price)
+            env.index.get_options_at_strike(symbol, env.expiry, strike)
+
+
+def bench_chartink_fetch(env):
+    ChartinkClient(session=env.chartink_session, cache_ttl=0).fetch(GAINER_CONDITION)
+
+
+def bench_build_otm_dataframe(env):
+    env.otm_df = build_otm_dataframe(env.smartApi, env.stock_df, env.index, env.expiry, executor=env.io_pool)
+
+
+def bench_greeks_iv(env):
+    g = env.greeks_inputs
+    iv, _ = implied_volatility_vectorized(g["price"], g["S"], g["K"], g["T"], RISK_FREE_RATE, g["type"])
+    black_scholes_vectorized(g["S"], g["K"], g["T"], RISK_FREE_RATE, iv, g["type"])
+
+
+def bench_chain_greeks(env):
+    fetch_chain_greeks(env.api, env.index, env.chain_symbols, env.expiry, io_pool=env.io_pool,
+                       analytics=env.analytics)
+
+
+def bench_history_append(env):
+    store = ScanHistoryStore(os.path.join(env.tmp_dir, "history.sqlite"))
+    try:
+        store.append(_otm_table(env), "gainers", "bench")
+    finally:
+        store.close()
+
+
+def bench_excel_export(env):
+    _otm_table(env).to_excel(os.path.join(env.tmp_dir, "gainers_scan.xlsx"), index=False)
+
+
+def _otm_table(env):
+    if env.otm_df is None:
+        env.otm_df = build_otm_dataframe(env.api, env.stock_df, env.index, env.expiry)
+    return env.otm_df
+
+
+def _excel_engine_available():
+    for module in ("xlsxwriter", "openpyxl"):
+        try:
+            __import__(module)
+            return True
+        except ImportError:
+            continue
+    return False
+
+
+BENCHMARKS = {
+    "instrument_index_build": bench_instrument_index_build,
+    "instrument_table_build": bench_instrument_table_build,
+    "scrip_master_stream": bench_scrip_master_stream,
+    "instrument_lookup": bench_instrument_lookup,
+    "chartink_fetch": bench_chartink_fetch,
+    "build_otm_dataframe": bench_build_otm_dataframe,
+    "greeks_iv": bench_greeks_iv,
+    "chain_greeks": bench_chain_greeks,
+    "history_append": bench_history_append,
+    "excel_export": bench_excel_export,
+}
+
+
+def _measure(env, fn, repeat):
+    """Times `fn(env)` `repeat` times, then runs it once more under tracemalloc for peak memory."""
+    times = []
+    before = env.call_counts()
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(env)
+        times.append(time.perf_counter() - start)
+    calls = env.call_counts()
+    calls.subtract(before)
+
+    tracemalloc.start()
+    try:
+        fn(env)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "runs": repeat,
+        "best_ms": min(times) * 1000,
+        "mean_ms": sum(times) / len(times) * 1000,
+        "api_calls": {k: v / repeat for k, v in sorted(calls.items()) if v},
+        "peak_mib": peak / 2 ** 20,
+    }
+
+
+def run_benchmarks(env, names=None, repeat=5):
+    """
+    Runs the selected benchmarks against `env`.
+
+    Args:
+        env (BenchEnv): Shared benchmark environment.
+        names (list[str], optional): Benchmarks to run; all of BENCHMARKS by default.
+        repeat (int): Timed runs per benchmark.
+
+    Returns:
+        list[dict]: One result per benchmark ("name", "best_ms", "mean_ms", "api_calls",
+        "peak_mib", or "skipped" with a reason).
+    """
+    results = []
+    for name in names or BENCHMARKS:
+        if name == "excel_export" and not _excel_engine_available():
+            results.append({"name": name, "skipped": "no Excel engine (xlsxwriter/openpyxl) installed"})
+            continue
+        results.append({"name": name, **_measure(env, BENCHMARKS[name], repeat)})
+    return results
+
+
+def print_results(results, env):
+    table = Table(title=f"Benchmarks ({len(env.instruments):,} scrip rows, {len(env.stock_df)} stocks, "
+                        f"expiry {env.expiry})")
+    for column in ("Benchmark", "Best (ms)", "Mean (ms)", "Calls / run", "Peak MiB"):
+        table.add_column(column, justify="left" if column in ("Benchmark", "Calls / run") else "right")
+    for r in results:
+        if "skipped" in r:
+            table.add_row(r["name"], "-", "-", f"skipped: {r['skipped']}", "-")
+            continue
+        calls = ", ".join(f"{k}={v:g}" for k, v in r["api_calls"].items()) or "-"
+        table.add_row(r["name"], f"{r['best_ms']:.2f}", f"{r['mean_ms']:.2f}", calls, f"{r['peak_mib']:.2f}")
+    Console().print(table)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the scan's hot paths.")
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), help="Run only these benchmarks.")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per benchmark.")
+    parser.add_argument("--underlyings", type=int, default=200, help="Stocks in the generated scrip master.")
+    parser.add_argument("--stocks", type=int, default=50, help="Stocks returned by the Chartink stub.")
+    parser.add_argument("--latency", type=float, default=0.0, help="Simulated seconds per API call.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Simulated SmartAPI failure probability.")
+    parser.add_argument("--rate-limit", type=float, help="Simulated broker limit (calls/second per endpoint).")
+    parser.add_argument("--no-limiter", action="store_true",
+                        help="Call the fake API without the client-side RateLimiter (chain_greeks never uses it).")
+    parser.add_argument("--fixture", metavar="FILE", help="Frozen scrip master JSON to use instead of a generated one.")
+    parser.add_argument("--save-fixture", metavar="FILE", help="Write the generated scrip master to FILE and exit.")
+    parser.add_argument("--expiry", help="Expiry to scan, e.g. 30SEP2025 (default: nearest in the fixture).")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--analytics-workers", type=int, default=ANALYTICS_WORKERS,
+                        help="Worker processes for chain_greeks (1 solves in-process; default: one per core).")
+    parser.add_argument("--json", metavar="FILE", help="Also write the results to FILE as JSON.")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.save_fixture:
+        with open(args.save_fixture, "w", encoding="utf-8") as f:
+            json.dump(build_scrip_master_fixture(args.underlyings, args.expiry, args.seed), f)
+        print(f"✅ Scrip master fixture saved to {args.save_fixture}")
+        return
+    env = BenchEnv(args.underlyings, args.stocks, args.latency, args.error_rate, args.rate_limit,
+                   not args.no_limiter, args.fixture, args.expiry, args.seed, args.analytics_workers)
+    try:
+        results = run_benchmarks(env, args.only, args.repeat)
+    finally:
+        env.close()
+    print_results(results, env)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"expiry": env.expiry, "scrip_rows": len(env.instruments), "stocks": len(env.stock_df),
+                       "results": results}, f, indent=2)
+        print(f"✅ Results saved to {args.json}")
+
+
+# --- pytest-benchmark entry points (pytest benchmarks.py) ---
+
+_pytest_env = None
+
+
+def _env():
+    global _pytest_env
+    if _pytest_env is None:
+        _pytest_env = BenchEnv()
+    return _pytest_env
+
+
+def test_instrument_index_build(benchmark):
+    benchmark(bench_instrument_index_build, _env())
+
+
+def test_instrument_table_build(benchmark):
+    benchmark(bench_instrument_table_build, _env())
+
+
+def test_scrip_master_stream(benchmark):
+    benchmark(bench_scrip_master_stream, _env())
+
+
+def test_instrument_lookup(benchmark):
+    benchmark(bench_instrument_lookup, _env())
+
+
+def test_build_otm_dataframe(benchmark):
+    benchmark(bench_build_otm_dataframe, _env())
+
+
+def test_greeks_iv(benchmark):
+    benchmark(bench_greeks_iv, _env())
+
+
+def test_chain_greeks(benchmark):
+    benchmark(bench_chain_greeks, _env())
+
+
+def test_history_append(benchmark):
+    benchmark(bench_history_append, _env())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+"""
+candle_store.py
+-------------------
+Purpose:
+    Keeps 15-minute OHLCV candles per symbol on disk and fetches only the bars that are
+    missing, so local screening, volatility estimates and backtests do not pull the full
+    lookback from SmartAPI `getCandleData` on every run.
+
+Classes:
+    CandleStore(root=CANDLE_STORE_DIR, interval="FIFTEEN_MINUTE")
+        -> last_timestamp(symbol): Start time of the newest stored candle, or None.
+        -> append(symbol, df): Appends the candles newer than the stored ones.
+        -> view(symbol, start=None): Read-only, zero-copy NumPy views of the stored columns.
+        -> frame(symbol, start=None, minutes=None): The candles as a DataFrame, optionally
+           resampled to `minutes` (e.g. 60 for 1 hour candles).
+    StoreCandleSource(store, fetcher, lookback_days=LOCAL_SCREENER_LOOKBACK_DAYS, executor=None)
+        -> load(symbols): Fetches each symbol's missing closed candles into the store and returns
+           the lookback window; a drop-in candle source for `local_screener.LocalScreener`.
+
+Notes:
+    - Layout: <root>/<interval>/<SYMBOL>/ holds one raw little-endian file per column
+      ("timestamp.i8" as UTC epoch nanoseconds, "open.f8", ... "volume.f8") plus "meta.json"
+      with the row count and last timestamp. Appending only writes to the end of each file.
+    - meta.json is written last and marks the rows as committed; rows past its count (from an
+      interrupted append) are truncated before the next append and never read.
+    - Only closed candles are stored, so a candle still forming at fetch time is fetched again
+      (complete) on the next run.
+    - Views are `np.memmap` slices: no copy until the caller asks for one. They stay valid
+      while the files exist, so take a copy before keeping them across appends.
+"""
+import json
+import os
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, time, timedelta, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from local_screener import CANDLE_COLUMNS, resample_candles
+from options_config import CANDLE_STORE_DIR, LOCAL_SCREENER_LOOKBACK_DAYS, MAX_THREAD_WORKERS
+
+EXCHANGE_TZ = timezone(timedelta(hours=5, minutes=30))  # IST, no DST
+MARKET_OPEN, MARKET_CLOSE = time(9, 15), time(15, 30)
+INTERVAL_MINUTES = {"ONE_MINUTE": 1, "FIVE_MINUTE": 5, "FIFTEEN_MINUTE": 15, "ONE_HOUR": 60}
+# getCandleData's maximum range per request, in days
+MAX_DAYS_PER_REQUEST = {"ONE_MINUTE": 30, "FIVE_MINUTE": 100, "FIFTEEN_MINUTE": 200, "ONE_HOUR": 400}
+COLUMN_FILES = {"timestamp": ("timestamp.i8", np.dtype("<i8")),
+                **{col: (f"{col}.f8", np.dtype("<f8")) for col in CANDLE_COLUMNS}}
+META_FILE = "meta.json"
+
+
+def _to_utc_ns(index):
+    """Epoch nanoseconds (UTC) of a DatetimeIndex; naive timestamps are taken as exchange time."""
+    if index.tz is None:
+        index = index.tz_localize(EXCHANGE_TZ)
+    return index.tz_convert("UTC").as_unit("ns").asi8
+
+
+def _from_utc_ns(values):
+    return pd.DatetimeIndex(pd.to_datetime(np.asarray(values), unit="ns", utc=True), name="timestamp").tz_convert(EXCHANGE_TZ)
+
+
+class CandleStore:
+    """
+    Append-only columnar candle files, one folder per symbol.
+
+    Args:
+        root (str or Path): Store folder.
+        interval (str): SmartAPI interval of the stored candles.
+    """
+    def __init__(self, root=CANDLE_STORE_DIR, interval="FIFTEEN_MINUTE"):
+        self.root = Path(root) / interval
+        self.interval = interval
+        self.minutes = INTERVAL_MINUTES[interval]
+        self._locks = defaultdict(threading.Lock)
+        self._locks_guard = threading.Lock()
+
+    def _dir(self, symbol):
+        return self.root / symbol.upper()
+
+    def _lock(self, symbol):
+        with self._locks_guard:
+            return self._locks[symbol.upper()]
+
+    def _meta(self, symbol):
+        try:
+            with open(self._dir(symbol) / META_FILE, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"rows": 0, "last": None}
+
+    def last_timestamp(self, symbol):
+        """Start time (exchange time zone) of the newest stored candle, or None."""
+        last = self._meta(symbol)["last"]
+        return None if last is None else _from_utc_ns([last])[0].to_pydatetime()
+
+    def append(self, symbol, df):
+        """
+        Appends candles newer than the newest stored one.
+
+        Args:
+            symbol (str): Stock symbol.
+            df (pd.DataFrame): CANDLE_COLUMNS indexed by candle start time.
+
+        Returns:
+            int: Number of candles written.
+        """
+        if df is None or df.empty:
+            return 0
+        with self._lock(symbol):
+            meta = self._meta(symbol)
+            stamps = _to_utc_ns(df.index)
+            order = np.argsort(stamps, kind="stable")
+            stamps = stamps[order]
+            keep = np.r_[True, stamps[1:] != stamps[:-1]]  # drop duplicate bars
+            if meta["last"] is not None:
+                keep &= stamps > meta["last"]
+            if not keep.any():
+                return 0
+            rows = order[keep]
+            folder = self._dir(symbol)
+            folder.mkdir(parents=True, exist_ok=True)
+            columns = {"timestamp": stamps[keep], **{col: df[col].to_numpy(dtype=np.float64)[rows] for col in CANDLE_COLUMNS}}
+            for col, (name, dtype) in COLUMN_FILES.items():
+                with open(folder / name, "ab") as f:
+                    f.truncate(meta["rows"] * dtype.itemsize)  # drop rows of an interrupted append
+                    f.seek(0, os.SEEK_END)
+                    f.write(np.ascontiguousarray(columns[col], dtype=dtype).tobytes())
+            new_meta = {"rows": meta["rows"] + len(rows), "last": int(columns["timestamp"][-1]), "interval": self.interval}
+            tmp = folder / (META_FILE + ".tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(new_meta, f)
+            tmp.replace(folder / META_FILE)
+            return len(rows)
+
+    def view(self, symbol, start=None):
+        """
+        Zero-copy views of the stored columns.
+
+        Args:
+            symbol (str): Stock symbol.
+            start (datetime, optional): First candle start time to include.
+
+        Returns:
+            dict: "timestamp" (int64 UTC epoch ns) and CANDLE_COLUMNS -> read-only arrays.
+        """
+        rows = self._meta(symbol)["rows"]
+        folder = self._dir(symbol)
+        if not rows:
+            return {col: np.empty(0, dtype=dtype) for col, (_, dtype) in COLUMN_FILES.items()}
+        views = {col: np.memmap(folder / name, dtype=dtype, mode="r", shape=(rows,))
+                 for col, (name, dtype) in COLUMN_FILES.items()}
+        if start is not None:
+            first = int(np.searchsorted(views["timestamp"], _to_utc_ns(pd.DatetimeIndex([start]))[0]))
+            views = {col: values[first:] for col, values in views.items()}
+        return views
+
+    def frame(self, symbol, start=None, minutes=None):
+        """
+        The stored candles as a DataFrame (a copy), optionally resampled.
+
+        Args:
+            symbol (str): Stock symbol.
+            start (datetime, optional): First candle start time to include.
+            minutes (int, optional): Resample to this candle length, aligned to 09:15.
+
+        Returns:
+            pd.DataFrame: CANDLE_COLUMNS indexed by candle start time (exchange time zone).
+        """
+        views = self.view(symbol, start)
+        df = pd.DataFrame({col: np.array(views[col]) for col in CANDLE_COLUMNS},
+                          index=_from_utc_ns(views["timestamp"]))
+        return resample_candles(df, minutes) if minutes and minutes != self.minutes else df
+
+    def next_candle(self, after):
+        """Start of the first trading-session candle after `after` (weekends skipped, holidays not)."""
+        nxt = after + timedelta(minutes=self.minutes)
+        close = datetime.combine(nxt.date(), MARKET_CLOSE, nxt.tzinfo)
+        if nxt >= close:
+            day = nxt.date() + timedelta(days=1)
+            while day.weekday() >= 5:
+                day += timedelta(days=1)
+            nxt = datetime.combine(day, MARKET_OPEN, nxt.tzinfo)
+        return nxt
+
+
+class StoreCandleSource:
+    """
+    Candle source that keeps a `CandleStore` up to date with delta-only fetches.
+
+    Args:
+        store (CandleStore): Where candles are kept.
+        fetcher: Object with `fetch(symbol, from_date, to_date)` returning candles or None
+            (e.g. `local_screener.SmartApiCandleSource`).
+        lookback_days (int): Calendar days of history to backfill and to return.
+        executor (ThreadPoolExecutor, optional): Shared I/O pool.
+    """
+    def __init__(self, store, fetcher, lookback_days=LOCAL_SCREENER_LOOKBACK_DAYS, executor=None):
+        self.store = store
+        self.fetcher = fetcher
+        self.lookback_days = lookback_days
+        self.executor = executor
+
+    def update(self, symbol, now=None):
+        """Fetches and stores the closed candles missing for `symbol`; returns how many were added."""
+        now = now or datetime.now(EXCHANGE_TZ)
+        step = timedelta(minutes=self.store.minutes)
+        last = self.store.last_timestamp(symbol)
+        start = (self.store.next_candle(last) if last
+                 else datetime.combine((now - timedelta(days=self.lookback_days)).date(), MARKET_OPEN, EXCHANGE_TZ))
+        if start + step > now:
+            return 0  # the next candle has not closed yet
+        added, max_days = 0, timedelta(days=MAX_DAYS_PER_REQUEST.get(self.store.interval, 30))
+        while start + step <= now:
+            end = min(start + max_days, now)
+            df = self.fetcher.fetch(symbol, f"{start:%Y-%m-%d %H:%M}", f"{end:%Y-%m-%d %H:%M}")
+            if df is None:
+                break
+            if not df.empty:
+                closed = _to_utc_ns(df.index) + step.total_seconds() * 1e9 <= _to_utc_ns(pd.DatetimeIndex([now]))[0]
+                added += self.store.append(symbol, df[closed])
+            start = end
+        return added
+
+    def load(self, symbols):
+        """Brings every symbol up to date, then returns {symbol: candles of the lookback window}."""
+        now = datetime.now(EXCHANGE_TZ)
+        since = datetime.combine((now - timedelta(days=self.lookback_days)).date(), MARKET_OPEN, EXCHANGE_TZ)
+
+        def load_one(symbol):
+            self.update(symbol, now)
+            return symbol, self.store.frame(symbol, start=since)
+
+        if self.executor is not None:
+            results = list(self.executor.map(load_one, symbols))
+        else:
+            with ThreadPoolExecutor(max_workers=MAX_THREAD_WORKERS) as executor:
+                results = list(executor.map(load_one, symbols))
+        return {symbol: df for symbol, df in results if not df.empty}
@@ -0,0 +1,332 @@
+"""
+cassette.py
+---------------
+Purpose:
+    Records a full scan's external traffic (SmartAPI calls, the scrip master download
+    and Chartink requests) to a compact cassette file, and replays it later without
+    network access, either as fast as possible or with each call's recorded latency.
+
+Classes:
+    Cassette(path, mode, realtime=False)
+        -> Context manager. While active, every `requests` call is recorded (mode "record")
+           or answered from the cassette (mode "replay").
+        -> wrap(smartApi): SmartConnect to use inside the context (a recording proxy, or a
+           replaying stand-in that needs no SmartConnect at all).
+        -> recorded_session(): The `generateSession`-style response to use when replaying.
+        -> scrip_master_cache_dir: Empty, private cache folder, so the scrip master is always
+           downloaded (and therefore recorded/replayed) instead of read from today's cache.
+
+    CassetteMiss: Raised in replay when a request has no recorded response.
+
+Notes:
+    - The file is gzip-compressed JSON lines: a header, then one entry per call with its
+      offset "t" from the start of the recording, latency and response (or error). Realtime
+      replay waits each call's latency (quotes: the method's median latency); it does not
+      re-create the "t" timeline, which is kept for inspecting a recording.
+    - Credentials are never written: login arguments and session tokens are redacted, and
+      SmartConnect's own HTTP requests (to SMARTAPI_HOSTS, carrying the password, TOTP and
+      tokens) are not recorded as raw HTTP; the redacted method-level entries replay them.
+    - SmartAPI quotes are replayed per token, so batching changes (getMarketData chunk sizes,
+      ltpData vs getMarketData) can be compared against identical prices.
+    - Other calls are matched by method/URL and arguments (positional and keyword) and
+      replayed in recorded order; once the recorded responses for a key run out, the last
+      one is repeated.
+    - Time to expiry still uses today's date, so replay on the recording day (or disable
+      expiry-sensitive comparisons) for identical Greeks.
+"""
+import base64
+import gzip
+import json
+import shutil
+import tempfile
+import threading
+import time
+from collections import defaultdict, deque
+from datetime import datetime
+from urllib.parse import urlsplit
+
+import requests
+
+CASSETTE_VERSION = 1
+REDACTED = "<redacted>"
+# SmartAPI methods whose arguments carry credentials or tokens
+SESSION_METHODS = ("generateSession", "generateToken", "getProfile", "terminateSession", "getfeedToken")
+TOKEN_FIELDS = ("jwtToken", "refreshToken", "feedToken")
+# Hosts SmartConnect talks to; its calls are recorded (redacted) by _RecordingSmartApi instead
+SMARTAPI_HOSTS = ("apiconnect.angelbroking.com", "apiconnect.angelone.in",
+                  "smartapi.angelbroking.com", "smartapi.angelone.in")
+# Response headers the code reads (scrip master fingerprint, JSON decoding)
+KEPT_HEADERS = ("ETag", "Content-Length", "Content-Type")
+# SmartConnect parameter names of the quote methods, to index keyword calls like positional ones
+QUOTE_PARAMS = {"ltpData": ("exchange", "tradingsymbol", "symboltoken"), "getMarketData": ("mode", "exchangeTokens")}
+
+
+class CassetteMiss(Exception):
+    """A request had no recorded response in the cassette."""
+
+
+def _redact(method, args, kwargs, response):
+    if method not in SESSION_METHODS:
+        return args, kwargs, response
+    if isinstance(response, dict) and isinstance(response.get("data"), dict):
+        data = {k: (REDACTED if k in TOKEN_FIELDS else v) for k, v in response["data"].items()}
+        response = {**response, "data": data}
+    return [REDACTED] * len(args), {k: REDACTED for k in kwargs}, response
+
+
+def _smartapi_key(method, args, kwargs=None):
+    if method in SESSION_METHODS:
+        return method
+    key = f"{method} {json.dumps(args, sort_keys=True, default=str)}"
+    return f"{key} {json.dumps(kwargs, sort_keys=True, default=str)}" if kwargs else key
+
+
+def _quote_args(method, args, kwargs):
+    """Positional arguments of an ltpData/getMarketData call, whichever way they were passed."""
+    return list(args) + [kwargs[name] for name in QUOTE_PARAMS[method][len(args):] if name in kwargs]
+
+
+def _http_key(method, url, kwargs):
+    data = kwargs.get("data")
+    body = json.dumps(data, sort_keys=True, default=str) if data else ""
+    return f"{method.upper()} {url} {body}"
+
+
+def _encode_body(content):
+    try:
+        return {"text": content.decode("utf-8")}
+    except UnicodeDecodeError:
+        return {"base64": base64.b64encode(content).decode("ascii")}
+
+
+def _decode_body(body):
+    if "text" in body:
+        return body["text"].encode("utf-8")
+    return base64.b64decode(body["base64"])
+
+
+class _RecordingSmartApi:
+    """Passes calls through to SmartConnect and records each response."""
+    def __init__(self, smartApi, cassette):
+        self._smartApi = smartApi
+        self._cassette = cassette
+
+    def __getattr__(self, name):
+        attr = getattr(self._smartApi, name)
+        if name.startswith(("_", "set")) or not callable(attr):
+            return attr
+
+        def recorded(*args, **kwargs):
+            start = time.monotonic()
+            try:
+                response = attr(*args, **kwargs)
+            except Exception as e:
+                self._cassette._write_smartapi(name, args, kwargs, None, str(e), time.monotonic() - start)
+                raise
+            self._cassette._write_smartapi(name, args, kwargs, response, None, time.monotonic() - start)
+            return response
+        return recorded
+
+
+class _ReplaySmartApi:
+    """Answers SmartConnect calls from the cassette."""
+    def __init__(self, cassette):
+        self._cassette = cassette
+
+    def __getattr__(self, name):
+        if name.startswith("set"):
+            return lambda *args, **kwargs: None
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return lambda *args, **kwargs: self._cassette._replay_smartapi(name, args, kwargs)
+
+
+class Cassette:
+    """
+    Records or replays the external traffic of a run.
+
+    Args:
+        path (str): Cassette file (".jsonl.gz" by convention).
+        mode (str): "record" or "replay".
+        realtime (bool): In replay, wait each call's recorded latency instead of answering at once.
+    """
+    def __init__(self, path, mode, realtime=False):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"mode must be 'record' or 'replay', got {mode!r}")
+        self.path = path
+        self.mode = mode
+        self.realtime = realtime
+        self.scrip_master_cache_dir = None
+        self._lock = threading.Lock()
+        self._file = None
+        self._start = None
+        self._original_request = None
+        self._responses = defaultdict(deque)  # key -> recorded entries, in order
+        self._quotes = defaultdict(deque)     # (exch_seg, token) -> recorded LTPs, in order
+        self._latencies = defaultdict(list)   # SmartAPI method -> recorded latencies
+        self._session = None
+
+    # --- context management ---
+
+    def __enter__(self):
+        self.scrip_master_cache_dir = tempfile.mkdtemp(prefix="myscan-cassette-")
+        self._start = time.monotonic()
+        if self.mode == "record":
+            self._file = gzip.open(self.path, "wt", encoding="utf-8")
+            self._write({"version": CASSETTE_VERSION, "recorded_at": datetime.now().isoformat(timespec="seconds")})
+        else:
+            self._load()
+        self._original_request = requests.Session.request
+        cassette = self
+
+        def request(session, method, url, **kwargs):
+            if cassette.mode == "record":
+                return cassette._record_http(session, method, url, **kwargs)
+            return cassette._replay_http(method, url, **kwargs)
+        requests.Session.request = request
+        return self
+
+    def __exit__(self, *exc):
+        requests.Session.request = self._original_request
+        if self._file:
+            self._file.close()
+            self._file = None
+        shutil.rmtree(self.scrip_master_cache_dir, ignore_errors=True)
+
+    def wrap(self, smartApi=None):
+        """Returns the SmartConnect to use while the cassette is active."""
+        if self.mode == "record":
+            return _RecordingSmartApi(smartApi, self)
+        return _ReplaySmartApi(self)
+
+    def recorded_session(self):
+        """Returns the first recorded login response, or a placeholder session."""
+        return self._session or {"status": True, "data": {field: REDACTED for field in TOKEN_FIELDS}}
+
+    # --- recording ---
+
+    def _write(self, entry):
+        with self._lock:
+            self._file.write(json.dumps(entry, separators=(",", ":"), default=str) + "\n")
+
+    def _offset(self):
+        return round(time.monotonic() - self._start, 4)
+
+    def _write_smartapi(self, method, args, kwargs, response, error, latency):
+        args, kwargs, response = _redact(method, list(args), kwargs, response)
+        entry = {"t": self._offset(), "kind": "smartapi", "method": method, "args": args}
+        if kwargs:
+            entry["kwargs"] = kwargs
+        self._write({**entry, "response": response, "error": error, "latency": round(latency, 4)})
+
+    def _record_http(self, session, method, url, **kwargs):
+        if urlsplit(url).hostname in SMARTAPI_HOSTS:
+            return self._original_request(session, method, url, **kwargs)
+        start = time.monotonic()
+        entry = {"kind": "http", "method": method.upper(), "url": url, "data": kwargs.get("data")}
+        try:
+            response = self._original_request(session, method, url, **kwargs)
+        except requests.RequestException as e:
+            self._write({"t": self._offset(), **entry, "error": str(e), "latency": round(time.monotonic() - start, 4)})
+            raise
+        self._write({"t": self._offset(), **entry, "status": response.status_code,
+                     "headers": {h: response.headers[h] for h in KEPT_HEADERS if h in response.headers},
+                     "body": _encode_body(response.content), "latency": round(time.monotonic() - start, 4)})
+        return response
+
+    # --- replay ---
+
+    def _load(self):
+        with gzip.open(self.path, "rt", encoding="utf-8") as f:
+            header = json.loads(f.readline())
+            if header.get("version") != CASSETTE_VERSION:
+                raise ValueError(f"Unsupported cassette version: {header.get('version')}")
+            for line in f:
+                entry = json.loads(line)
+                if entry["kind"] == "http":
+                    self._responses[_http_key(entry["method"], entry["url"], entry)].append(entry)
+                    continue
+                method = entry["method"]
+                self._latencies[method].append(entry.get("latency", 0.0))
+                response = entry.get("response")
+                if method == "generateSession" and self._session is None and (response or {}).get("status"):
+                    self._session = response
+                kwargs = entry.get("kwargs") or {}
+                if method in QUOTE_PARAMS and not entry.get("error"):
+                    self._index_quotes(method, _quote_args(method, entry["args"], kwargs), response)
+                else:
+                    self._responses[_smartapi_key(method, entry["args"], kwargs)].append(entry)
+
+    def _index_quotes(self, method, args, response):
+        data = (response or {}).get("data") or {}
+        if method == "ltpData" and data.get("ltp") is not None:
+            self._quotes[(args[0], str(args[2]))].append(data["ltp"])
+        elif method == "getMarketData":
+            for row in data.get("fetched") or []:
+                self._quotes[(row.get("exchange"), str(row.get("symbolToken")))].append(row.get("ltp"))
+
+    def _next(self, store, key):
+        """Pops the next recorded item for `key`, repeating the last one once they run out."""
+        with self._lock:
+            items = store.get(key)
+            if not items:
+                return None
+            return items.popleft() if len(items) > 1 else items[0]
+
+    def _wait(self, latency):
+        if self.realtime and latency:
+            time.sleep(latency)
+
+    def _quote(self, exch_seg, token):
+        return self._next(self._quotes, (exch_seg, str(token)))
+
+    def _replay_smartapi(self, method, args, kwargs=None):
+        kwargs = kwargs or {}
+        if method in QUOTE_PARAMS:
+            latencies = self._latencies.get(method)
+            self._wait(sorted(latencies)[len(latencies) // 2] if latencies else 0.0)
+            return self._replay_quotes(method, _quote_args(method, args, kwargs))
+        entry = self._next(self._responses, _smartapi_key(method, list(args), kwargs))
+        if entry is None:
+            if method in SESSION_METHODS:
+                return self.recorded_session()
+            raise CassetteMiss(f"No recorded response for {method}{tuple(args)} {kwargs or ''}".rstrip())
+        self._wait(entry.get("latency"))
+        if entry.get("error"):
+            raise Exception(entry["error"])
+        return entry["response"]
+
+    def _replay_quotes(self, method, args):
+        if method == "ltpData":
+            exch_seg, symbol, token = args
+            ltp = self._quote(exch_seg, token)
+            if ltp is None:
+                return {"status": False, "message": "No recorded quote", "data": None}
+            return {"status": True, "data": {"exchange": exch_seg, "tradingsymbol": symbol,
+                                             "symboltoken": token, "ltp": ltp}}
+        _, exchange_tokens = args
+        fetched, unfetched = [], []
+        for exch_seg, tokens in exchange_tokens.items():
+            for token in tokens:
+                ltp = self._quote(exch_seg, token)
+                if ltp is None:
+                    unfetched.append({"exchange": exch_seg, "symbolToken": token})
+                else:
+                    fetched.append({"exchange": exch_seg, "symbolToken": str(token), "ltp": ltp})
+        return {"status": True, "data": {"fetched": fetched, "unfetched": unfetched}}
+
+    def _replay_http(self, method, url, **kwargs):
+        entry = self._next(self._responses, _http_key(method, url, kwargs))
+        if entry is None:
+            raise CassetteMiss(f"No recorded response for {method.upper()} {url}")
+        self._wait(entry.get("latency"))
+        if entry.get("error"):
+            raise requests.ConnectionError(entry["error"])
+        response = requests.Response()
+        response.status_code = entry["status"]
+        response.headers.update(entry.get("headers") or {})
+        response._content = _decode_body(entry["body"])
+        response._content_consumed = True  # full body in memory: iter_content() and close() work without a socket
+        response.url = url
+        response.encoding = "utf-8"
+        return response
@@ -0,0 +1,262 @@
+"""
+chain_analytics.py
+----------------------
+Purpose:
+    Computes IV and Greeks for whole option chains (every strike, CE and PE) across many
+    underlyings on a process pool, while the remaining quotes are still being fetched on
+    threads, so the number crunching neither waits for the I/O nor contends with it for the GIL.
+
+Classes:
+    ChainAnalytics(max_workers=ANALYTICS_WORKERS, min_chunk_rows=ANALYTICS_MIN_CHUNK_ROWS, r=RISK_FREE_RATE)
+        -> submit(inputs): Solves one block of INPUT_FIELDS rows; returns a Future of OUTPUT_FIELDS rows.
+        -> solve(blocks): Solves several blocks, coalescing small ones and splitting large ones.
+        -> close(): Shuts the worker processes down (also done on `with` exit).
+
+Functions:
+    pack_chain_inputs(ltp, spot, strike, years, is_call) -> np.ndarray
+        -> Packs per-contract inputs into one contiguous float64 block.
+    solve_chain_block(inputs, r=RISK_FREE_RATE) -> np.ndarray
+        -> IV, Greeks and solver status for a block; this is what runs in the worker processes.
+    fetch_chain_greeks(smartApi, instrument_index, symbols, expiries="nearest", io_pool=None,
+                       analytics=None, group_size=CHAIN_FETCH_GROUP_SIZE)
+        -> Fetches the full chains of `symbols` and returns one DataFrame with IV and Greeks.
+
+Notes:
+    - Blocks cross the process boundary as a single float64 array each way (pickled as one
+      buffer), never as per-contract dicts or DataFrames.
+    - Blocks smaller than `min_chunk_rows`, or every block when `max_workers` is 1, are solved
+      in the calling thread: process start-up and IPC cost more than a few hundred rows.
+    - Quotes are fetched in groups of `group_size` underlyings on the I/O pool; each group is
+      handed to the process pool as soon as its quotes arrive, so fetching and solving overlap.
+    - Worker processes re-import this module (the spawn start method on Windows), so scripts
+      using it must keep their entry point under `if __name__ == "__main__":`.
+"""
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from instrument_index import option_type_of, parse_expiry
+from option_ltp_and_greeks_calculator import black_scholes_vectorized, implied_volatility_vectorized, IV_STATUS_NAMES
+from options_config import (RISK_FREE_RATE, MAX_THREAD_WORKERS, ANALYTICS_WORKERS, ANALYTICS_MIN_CHUNK_ROWS,
+                            CHAIN_FETCH_GROUP_SIZE)
+from quote_batcher import QuoteBatcher
+from scan_metrics import metrics
+
+INPUT_FIELDS = ("ltp", "spot", "strike", "years", "is_call")
+OUTPUT_FIELDS = ("iv", "delta", "gamma", "theta", "vega", "status")
+# Quote groups fetched at the same time; each one fans out over the shared I/O pool
+GROUPS_IN_FLIGHT = 2
+CHAIN_COLUMNS = ["Symbol", "Expiry", "Strike Price", "Type", "LTP", "Spot Price",
+                 "IV", "IV Status", "Delta", "Gamma", "Theta", "Vega"]
+
+
+def pack_chain_inputs(ltp, spot, strike, years, is_call):
+    """
+    Packs per-contract inputs into one (n, len(INPUT_FIELDS)) float64 array.
+
+    Args:
+        ltp, spot, strike, years (array-like or float): Option price, underlying price,
+            strike and time to expiry in years; scalars are broadcast.
+        is_call (array-like of bool): True for calls, False for puts.
+
+    Returns:
+        np.ndarray: C-contiguous block in INPUT_FIELDS column order.
+    """
+    columns = np.broadcast_arrays(*(np.asarray(a, dtype=np.float64) for a in (ltp, spot, strike, years, is_call)))
+    return np.ascontiguousarray(np.column_stack(columns))
+
+
+def solve_chain_block(inputs, r=RISK_FREE_RATE):
+    """
+    Solves IV and Greeks for one block of contracts.
+
+    Args:
+        inputs (np.ndarray): (n, len(INPUT_FIELDS)) float64 block from `pack_chain_inputs`.
+        r (float): Annualized risk-free rate.
+
+    Returns:
+        np.ndarray: (n, len(OUTPUT_FIELDS)) float64 block. Theta is per year and vega per
+        1.00 of volatility, as returned by `black_scholes_vectorized`; unsolved IVs are NaN.
+    """
+    if len(inputs) == 0:
+        return np.empty((0, len(OUTPUT_FIELDS)), dtype=np.float64)
+    ltp, spot, strike, years, is_call = inputs.T
+    is_call = is_call.astype(bool)
+    iv, status = implied_volatility_vectorized(ltp, spot, strike, years, r, is_call)
+    greeks = black_scholes_vectorized(spot, strike, years, r, iv, is_call)
+    return np.column_stack([iv, greeks["delta"], greeks["gamma"], greeks["theta"], greeks["vega"],
+                            status.astype(np.float64)])
+
+
+class ChainAnalytics:
+    """
+    Process pool for the CPU-bound IV/Greeks solves.
+
+    Args:
+        max_workers (int, optional): Worker processes; None uses every core.
+        min_chunk_rows (int): Smallest block worth sending to a worker process.
+        r (float): Annualized risk-free rate.
+    """
+    def __init__(self, max_workers=ANALYTICS_WORKERS, min_chunk_rows=ANALYTICS_MIN_CHUNK_ROWS, r=RISK_FREE_RATE):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.min_chunk_rows = min_chunk_rows
+        self.r = r
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+
+    def _executor(self):
+        # Started on first use, so small runs never pay for process start-up
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+            return self._pool
+
+    def submit(self, inputs):
+        """Solves one block in a worker process (or inline if it is small); returns a Future."""
+        inputs = np.ascontiguousarray(inputs, dtype=np.float64).reshape(-1, len(INPUT_FIELDS))
+        if self.max_workers > 1 and len(inputs) >= self.min_chunk_rows:
+            return self._executor().submit(solve_chain_block, inputs, self.r)
+        future = Future()
+        try:
+            future.set_result(solve_chain_block(inputs, self.r))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def solve(self, blocks):
+        """
+        Solves several blocks at once, using up to `max_workers` chunks of at least `min_chunk_rows`.
+
+        Returns:
+            list[np.ndarray]: One output block per input block, in the same order.
+        """
+        blocks = [np.asarray(b, dtype=np.float64).reshape(-1, len(INPUT_FIELDS)) for b in blocks]
+        if not blocks:
+            return []
+        stacked = np.concatenate(blocks)
+        pieces = max(1, min(self.max_workers, len(stacked) // max(self.min_chunk_rows, 1)))
+        futures = [self.submit(chunk) for chunk in np.array_split(stacked, pieces)]
+        solved = np.concatenate([future.result() for future in futures])
+        return np.split(solved, np.cumsum([len(b) for b in blocks])[:-1])
+
+
+def _chain_contracts(instrument_index, symbol, specs, today):
+    """Returns [(expiry, years, option record), ...] for every option of the resolved expiries."""
+    contracts = []
+    for expiry in dict.fromkeys(instrument_index.resolve_expiry(symbol, spec, today) for spec in specs):
+        if not expiry:
+            continue
+        years = (parse_expiry(expiry) - today).days / 365.0
+        contracts.extend((expiry, years, inst) for inst in instrument_index.get_derivatives(symbol, expiry))
+    return contracts
+
+
+def _chain_frame(rows, ltps, solved):
+    """Builds the chain DataFrame for one group from its contract rows, LTPs and solved block."""
+    symbols, expiries, spots, strikes, is_call = zip(*rows)
+    status = solved[:, 5].astype(np.int8)
+    return pd.DataFrame({
+        "Symbol": symbols, "Expiry": expiries, "Strike Price": strikes,
+        "Type": np.where(is_call, "CE", "PE"), "LTP": ltps, "Spot Price": spots,
+        "IV": np.round(solved[:, 0], 3), "IV Status": [IV_STATUS_NAMES[code] for code in status],
+        "Delta": np.round(solved[:, 1], 3), "Gamma": np.round(solved[:, 2], 3),
+        "Theta": np.round(solved[:, 3] / 365, 3), "Vega": np.round(solved[:, 4] / 100, 3),
+    })
+
+
+def fetch_chain_greeks(smartApi, instrument_index, symbols, expiries="nearest", io_pool=None, analytics=None,
+                       group_size=CHAIN_FETCH_GROUP_SIZE):
+    """
+    Fetches every strike (CE and PE) of the given underlyings and solves their IV and Greeks.
+
+    Args:
+        smartApi: SmartConnect (or `RateLimitedSmartApi`) used for market data.
+        instrument_index (InstrumentIndex): Index over the scrip master.
+        symbols (list[str]): Underlyings (e.g. `instrument_index.option_underlyings()`).
+        expiries (str or list[str]): Expiry choices, as in `build_otm_dataframe`.
+        io_pool (ThreadPoolExecutor, optional): Shared I/O threads for quote requests.
+        analytics (ChainAnalytics, optional): Process pool for the solves.
+        group_size (int): Underlyings per quote group handed to the process pool.
+
+    Returns:
+        pd.DataFrame: CHAIN_COLUMNS, sorted by symbol, expiry, strike and type. Theta is per
+        day and vega per 1% of volatility. Contracts without an LTP are left out.
+    """
+    specs = [expiries] if isinstance(expiries, str) else list(expiries)
+    own_io, own_analytics = io_pool is None, analytics is None
+    io_pool = io_pool or ThreadPoolExecutor(max_workers=MAX_THREAD_WORKERS)
+    analytics = analytics or ChainAnalytics()
+    try:
+        spot_quotes = QuoteBatcher(smartApi, executor=io_pool)
+        spot_recs = {}
+        for symbol in symbols:
+            rec = instrument_index.get_equity(f"{symbol}-EQ", "NSE")
+            if rec:
+                spot_recs[symbol] = rec
+                spot_quotes.add(rec["exch_seg"], rec["token"])
+        with metrics.stage("spot_fetch"):
+            spot_quotes.fetch(desc="Fetching Spot LTPs")
+
+        today = date.today()
+        groups, group = [], []
+        for i, (symbol, rec) in enumerate(spot_recs.items(), 1):
+            spot = spot_quotes.get_ltp(rec["exch_seg"], rec["token"])
+            if spot > 0:
+                group.extend((symbol, spot, contract) for contract in _chain_contracts(instrument_index, symbol, specs, today))
+            if group and (i % group_size == 0 or i == len(spot_recs)):
+                groups.append(group)
+                group = []
+
+        def fetch_group(group):
+            quotes = QuoteBatcher(smartApi, executor=io_pool)
+            for _, _, (_, _, inst) in group:
+                quotes.add(inst["exch_seg"], inst["token"])
+            with metrics.stage("option_fetch"):
+                quotes.fetch()
+            rows, ltps, years = [], [], []
+            for symbol, spot, (expiry, t, inst) in group:
+                ltp = quotes.get_ltp(inst["exch_seg"], inst["token"])
+                if ltp > 0:
+                    rows.append((symbol, expiry, spot, float(inst["strike"]) / 100.0, option_type_of(inst) == "CE"))
+                    ltps.append(ltp)
+                    years.append(t)
+            return rows, np.array(ltps), np.array(years)
+
+        pending = []
+        with ThreadPoolExecutor(max_workers=GROUPS_IN_FLIGHT) as group_pool:
+            for done in as_completed([group_pool.submit(fetch_group, g) for g in groups]):
+                rows, ltps, years = done.result()
+                if rows:
+                    _, _, spots, strikes, is_call = zip(*rows)
+                    pending.append((rows, ltps, analytics.submit(pack_chain_inputs(ltps, spots, strikes, years, is_call))))
+
+        with metrics.stage("analytics"):
+            frames = [_chain_frame(rows, ltps, future.result()) for rows, ltps, future in pending]
+    finally:
+        if own_analytics:
+            analytics.close()
+        if own_io:
+            io_pool.shutdown()
+
+    if not frames:
+        return pd.DataFrame(columns=CHAIN_COLUMNS)
+    chain = pd.concat(frames, ignore_index=True)
+    chain["Expiry Date"] = chain["Expiry"].map(parse_expiry)
+    chain = chain.sort_values(["Symbol", "Expiry Date", "Strike Price", "Type"], ignore_index=True)
+    return chain[CHAIN_COLUMNS]
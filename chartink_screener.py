@@ -2,7 +2,12 @@
 chartink_screener.py
 ---------------------
 Purpose:
-    Provides a function to fetch stock data from Chartink based on custom conditions.
+    Provides a client and a function to fetch stock data from Chartink based on custom conditions.
+
+Classes:
+    ChartinkClient(session=None, timeout=20, cache_ttl=CHARTINK_CACHE_TTL, cache_dir=CHARTINK_CACHE_DIR)
+        -> fetch(scan_condition): One screener query.
+        -> fetch_many(scan_conditions): Several queries run concurrently, results in the same order.
 
 Functions:
     get_chartink_screener_data(session, scan_condition, timeout=20)
@@ -11,16 +16,215 @@ Functions:
 
 Notes:
     - Requires a requests.Session object for persistent connection.
-    - Parses CSRF token before posting the screener request.
+    - The CSRF token is read once per session and refreshed only when Chartink answers
+      419 or 403. Dashboard (CSRF) and process requests are both counted in the metrics and
+      Chartink's circuit breaker.
+    - Results are cached per scan clause (in memory and on disk) for `cache_ttl` seconds,
+      so re-runs within the same candle do not hit Chartink again.
+    - Retries draw on the scan's retry budget and stop at its deadline; requests are skipped
+      while Chartink's circuit is open (see `resilience.py`).
 """
 
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
 import requests
 import pandas as pd
 from bs4 import BeautifulSoup as bs
-from tenacity import retry, stop_after_attempt, wait_exponential
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, stop_any, wait_exponential
+
+from options_config import CHARTINK_CACHE_TTL, CHARTINK_CACHE_DIR
+from scan_metrics import metrics
+from resilience import resilience
+
+DASHBOARD_URL = "https://chartink.com/screener/dashboard"
+PROCESS_URL = "https://chartink.com/screener/process"
+CSRF_META_RE = re.compile(rb'<meta\s+name=["\']csrf-token["\']\s+content=["\']([^"\']+)["\']', re.IGNORECASE)
+CSRF_EXPIRED_STATUSES = (419, 403)
+
+
+def _parse_csrf_token(content):
+    """Extracts the CSRF token from the dashboard HTML, falling back to a full parse."""
+    match = CSRF_META_RE.search(content)
+    if match:
+        return match.group(1).decode()
+    soup = bs(content, "html.parser")
+    return soup.find("meta", {"name": "csrf-token"})["content"]
+
+
+def _to_dataframe(data):
+    """Converts Chartink result rows to the ['Symbol', 'Stock Name', '% Change'] frame."""
+    if not data:
+        return pd.DataFrame()
+    df = pd.DataFrame(data)
+    df = df[["nsecode", "name", "per_chg"]]
+    df.rename(columns={"nsecode": "Symbol", "name": "Stock Name", "per_chg": "% Change"}, inplace=True)
+    df["% Change"] = pd.to_numeric(df["% Change"], errors="coerce").fillna(0.0)
+    return df
+
+
+def scan_clause_key(scan_condition):
+    """Stable cache key for a scan clause (whitespace-insensitive)."""
+    normalized = " ".join(scan_condition.split())
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+class ChartinkClient:
+    """
+    Chartink screener client that reuses one session and CSRF token, and caches results.
+
+    Args:
+        session (requests.Session, optional): Session to use; one is created if omitted.
+        timeout (int): Request timeout (seconds).
+        cache_ttl (float): Seconds a cached result stays valid. 0 disables caching.
+        cache_dir (str or Path, optional): Folder for the on-disk result cache; None keeps it in memory only.
+    """
+    def __init__(self, session=None, timeout=20, cache_ttl=CHARTINK_CACHE_TTL, cache_dir=CHARTINK_CACHE_DIR):
+        self._owns_session = session is None
+        self.session = session or requests.Session()
+        self.timeout = timeout
+        self.cache_ttl = cache_ttl
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self._csrf_token = None
+        self._token_lock = threading.Lock()
+        self._cache = {}    # clause key -> (fetched_at, data rows)
+        self._cache_lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._owns_session:
+            self.session.close()
+
+    def _request(self, method, url, **kwargs):
+        """
+        Sends one Chartink request, recording it in the metrics and Chartink's circuit breaker.
+
+        Raises ResilienceError instead of sending when the deadline has passed or the circuit
+        is open; the timeout never runs past the scan's deadline.
+        """
+        resilience.check("chartink")
+        remaining = resilience.remaining()
+        timeout = self.timeout if remaining is None else min(self.timeout, remaining)
+        start = time.monotonic()
+        try:
+            response = getattr(self.session, method)(url, timeout=timeout, **kwargs)
+        except requests.RequestException:
+            metrics.record_call("chartink", time.monotonic() - start, ok=False)
+            resilience.record("chartink", False)
+            raise
+        metrics.record_call("chartink", time.monotonic() - start, ok=response.status_code < 400)
+        resilience.record("chartink", response.status_code < 500)
+        return response
+
+    def _get_csrf_token(self, stale_token=None):
+        """Returns the session's CSRF token, fetching it if missing or if `stale_token` was rejected."""
+        with self._token_lock:
+            if self._csrf_token is None or self._csrf_token == stale_token:
+                response = self._request("get", DASHBOARD_URL)
+                response.raise_for_status()
+                self._csrf_token = _parse_csrf_token(response.content)
+            return self._csrf_token
+
+    @retry(retry=retry_if_exception_type(requests.RequestException),
+           stop=stop_any(stop_after_attempt(3),
+                         lambda retry_state: not resilience.allow_retry("chartink", retry_state.upcoming_sleep)),
+           wait=wait_exponential(multiplier=0.5, min=0.5, max=4), reraise=True,
+           before_sleep=lambda retry_state: metrics.record_retry("chartink"))
+    def _process(self, scan_condition):
+        """Posts a scan clause, refreshing the CSRF token once if Chartink rejects it."""
+        token = self._get_csrf_token()
+        for _ in range(2):
+            response = self._request("post", PROCESS_URL, data={"scan_clause": scan_condition},
+                                     headers={"X-CSRF-TOKEN": token})
+            if response.status_code not in CSRF_EXPIRED_STATUSES:
+                break
+            token = self._get_csrf_token(stale_token=token)
+        response.raise_for_status()
+        return response.json().get("data", [])
+
+    def _cache_path(self, key):
+        return self.cache_dir / f"{key}.json"
+
+    def _cached(self, key):
+        if self.cache_ttl <= 0:
+            return None
+        now = time.time()
+        with self._cache_lock:
+            entry = self._cache.get(key)
+        if entry is None and self.cache_dir:
+            try:
+                with open(self._cache_path(key), encoding="utf-8") as f:
+                    stored = json.load(f)
+                entry = (stored["fetched_at"], stored["data"])
+            except (OSError, ValueError, KeyError):
+                entry = None
+        if entry and now - entry[0] <= self.cache_ttl:
+            return entry[1]
+        return None
+
+    def _store(self, key, data):
+        if self.cache_ttl <= 0:
+            return
+        entry = (time.time(), data)
+        with self._cache_lock:
+            self._cache[key] = entry
+        if self.cache_dir:
+            try:
+                self.cache_dir.mkdir(parents=True, exist_ok=True)
+                with open(self._cache_path(key), "w", encoding="utf-8") as f:
+                    json.dump({"fetched_at": entry[0], "data": data}, f)
+            except OSError as e:
+                logging.error(f"[ChartinkClient] Could not write cache: {e}")
+
+    def fetch(self, scan_condition):
+        """
+        Fetches stock symbols and their % change for one scan clause.
+
+        Args:
+            scan_condition (str): Chartink screener query string.
+
+        Returns:
+            pd.DataFrame: Columns ['Symbol', 'Stock Name', '% Change']
+        """
+        key = scan_clause_key(scan_condition)
+        data = self._cached(key)
+        if data is None:
+            try:
+                data = self._process(scan_condition)
+            except Exception as e:
+                print(f"An error occurred while fetching from Chartink: {e}")
+                return pd.DataFrame()
+            self._store(key, data)
+        return _to_dataframe(data)
+
+    def fetch_many(self, scan_conditions):
+        """
+        Fetches several scan clauses concurrently over the shared session.
+
+        Args:
+            scan_conditions (list[str]): Chartink screener query strings.
+
+        Returns:
+            list[pd.DataFrame]: One frame per clause, in the same order.
+        """
+        scan_conditions = list(scan_conditions)
+        if not scan_conditions:
+            return []
+        with ThreadPoolExecutor(max_workers=len(scan_conditions)) as executor:
+            return list(executor.map(self.fetch, scan_conditions))
 
 
-@retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
 def get_chartink_screener_data(session, scan_condition, timeout=20):
     """
     Fetches stock symbols and their % change from Chartink.
@@ -33,33 +237,4 @@ def get_chartink_screener_data(session, scan_condition, timeout=20):
     Returns:
         pd.DataFrame: Columns ['Symbol', 'Stock Name', '% Change']
     """
-    try:
-        # Get the CSRF token from the dashboard page
-        response = session.get("https://chartink.com/screener/dashboard", timeout=timeout)
-        response.raise_for_status()
-        soup = bs(response.content, "html.parser")
-        csrf_token = soup.find("meta", {"name": "csrf-token"})["content"]
-
-        # Post the screener condition to the processing endpoint
-        payload = {"scan_clause": scan_condition}
-        post_response = session.post(
-            "https://chartink.com/screener/process",
-            data=payload,
-            headers={"X-CSRF-TOKEN": csrf_token},
-            timeout=timeout,
-        )
-        post_response.raise_for_status()
-
-        # Extract data and create DataFrame
-        data = post_response.json().get("data", [])
-        if not data:
-            return pd.DataFrame()
-
-        df = pd.DataFrame(data)
-        df = df[["nsecode", "name", "per_chg"]]
-        df.rename(columns={"nsecode": "Symbol", "name": "Stock Name", "per_chg": "% Change"}, inplace=True)
-        df["% Change"] = pd.to_numeric(df["% Change"], errors="coerce").fillna(0.0)
-        return df
-    except Exception as e:
-        print(f"An error occurred while fetching from Chartink: {e}")
-        return pd.DataFrame()
\ No newline at end of file
+    return ChartinkClient(session, timeout=timeout, cache_ttl=0).fetch(scan_condition)
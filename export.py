@@ -1,15 +1,80 @@
 import os
+import time
+import atexit
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
+from scan_metrics import metrics
 
 # Absolute export folder
 EXPORT_DIR = r"C:\Users\91931\OneDrive\New folder\OneDrive\Desktop\angelone"
 
+# One background writer, so Excel files are written in order and never block the scan
+_export_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="excel-export")
+_pending = []
+
+
+def _write_xlsx_streaming(xlsxwriter, df, filepath):
+    """
+    Writes `df` with xlsxwriter in constant_memory mode, which flushes each row to disk.
+
+    That mode only keeps cells written in row order, so the rows are written one by one
+    here rather than through `to_excel` (which writes column by column). Missing values
+    are left as empty cells, as `to_excel` does.
+    """
+    workbook = xlsxwriter.Workbook(filepath, {"constant_memory": True, "default_date_format": "yyyy-mm-dd hh:mm:ss"})
+    try:
+        worksheet = workbook.add_worksheet()
+        worksheet.write_row(0, 0, [str(c) for c in df.columns], workbook.add_format({"bold": True}))
+        values = df.astype(object).where(df.notna(), None)
+        for i, row in enumerate(values.itertuples(index=False, name=None), start=1):
+            worksheet.write_row(i, 0, row)
+    finally:
+        workbook.close()
+
 
 def save_to_excel(df: pd.DataFrame, filename="scan_output.xlsx"):
     if df is None:
         print(f"⚠️ No data (None) for {filename}")
         return
     filepath = os.path.join(EXPORT_DIR, filename)
-    df.to_excel(filepath, index=False)
+    try:
+        import xlsxwriter
+    except ImportError:
+        # pandas' default engine (openpyxl) holds the whole workbook in memory
+        with pd.ExcelWriter(filepath) as writer:
+            df.to_excel(writer, index=False)
+    else:
+        _write_xlsx_streaming(xlsxwriter, df, filepath)
     print(f"✅ Data saved to {filepath} (rows={len(df)})")
 
+
+def _timed_save(scan, df, filename):
+    """Runs `save_to_excel` and records it as the "export" stage of the scan that queued it."""
+    start = time.perf_counter()
+    try:
+        save_to_excel(df, filename)
+    finally:
+        metrics.record_stage("export", time.perf_counter() - start, scan=scan)
+
+
+def save_to_excel_async(df: pd.DataFrame, filename="scan_output.xlsx"):
+    """Queues `save_to_excel` on the background writer and returns its future."""
+    if df is None:
+        print(f"⚠️ No data (None) for {filename}")
+        return None
+    future = _export_pool.submit(_timed_save, metrics.started_at, df.copy(), filename)
+    _pending.append(future)
+    return future
+
+
+def wait_for_exports():
+    """Blocks until every queued Excel export has finished; reports failures."""
+    while _pending:
+        future = _pending.pop(0)
+        try:
+            future.result()
+        except Exception as e:
+            print(f"❌ Excel export failed: {e}")
+
+
+atexit.register(wait_for_exports)
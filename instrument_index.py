@@ -0,0 +1,194 @@
+"""
+instrument_index.py
+-----------------------
+Purpose:
+    Builds a lookup index over the Angel One scrip master once per run so that
+    per-symbol lookups no longer scan the full instrument list.
+
+Classes:
+    InstrumentIndex(instruments)
+        -> Built from an `InstrumentTable`, scrip master columns or scrip master dicts.
+        -> get_equity(symbol, exch_seg="NSE"): The instrument record for an equity symbol (e.g. "RELIANCE-EQ").
+        -> get_derivatives(name, expiry_str, instrumenttype="OPTSTK"): All contracts for an underlying and expiry.
+        -> get_strikes(name, expiry_str): Sorted strike prices (in rupees) for an underlying and expiry.
+        -> next_strike_above(name, expiry_str, price, exclude=None): First strike strictly above a price.
+        -> get_options_at_strike(name, expiry_str, strike): {"CE": record, "PE": record} at a strike.
+        -> get_expiries(name, today=None): Unexpired option expiries of an underlying, soonest first.
+        -> option_underlyings(): Every underlying with stock options (OPTSTK), sorted.
+        -> resolve_expiry(name, spec="nearest", today=None): Turns "nearest", "next", "monthly" or
+           an explicit date into the expiry string to scan.
+
+Functions:
+    parse_expiry(expiry_str) -> date or None, cached per distinct expiry string.
+
+Notes:
+    - The scrip master stores strikes multiplied by 100; the index works in rupees.
+    - Only NSE equities and NFO stock options/futures are kept (see `instrument_table.py`).
+      Records are `InstrumentRecord` views with the scrip master's fields and string formats,
+      created per lookup; no per-row dicts are held.
+    - Strikes are sorted inside each (name, expiry) row range, so OTM strikes and the options at
+      a strike are found with `bisect`.
+"""
+from bisect import bisect_left, bisect_right
+from datetime import datetime, date
+from functools import lru_cache
+
+import numpy as np
+
+from instrument_table import InstrumentTable, OPTION_TYPE_NAMES
+
+EXPIRY_ALIASES = ("nearest", "next", "monthly")
+
+
+@lru_cache(maxsize=None)
+def parse_expiry(expiry_str):
+    """Parses a scrip master expiry like "30SEP2025"; returns None if it is not a date."""
+    try:
+        return datetime.strptime(expiry_str, "%d%b%Y").date()
+    except (TypeError, ValueError):
+        return None
+
+
+def option_type_of(inst):
+    """Returns "CE" or "PE" for an option record, based on its trading symbol."""
+    return "CE" if inst.get("symbol", "").endswith("CE") else "PE"
+
+
+class InstrumentIndex:
+    """
+    Lookups over an `InstrumentTable`.
+
+    Equities are found by binary search over their sorted symbols; derivatives of one
+    (name, expiry, instrumenttype) are a contiguous row range of the table, and option
+    strikes are searched inside that range.
+
+    Args:
+        instruments: An `InstrumentTable`, scrip master string columns (dict of arrays, see
+            `scrip_master_cache.load_scrip_master_columns`) or an iterable of scrip master dicts.
+    """
+    def __init__(self, instruments):
+        if isinstance(instruments, InstrumentTable):
+            table = instruments
+        elif isinstance(instruments, dict):
+            table = InstrumentTable.from_columns(instruments)
+        else:
+            table = InstrumentTable.from_records(instruments)
+        self.table = table
+        self._groups = {}     # (name, expiry, instrumenttype) -> (start, stop) rows of the table
+        self._expiries = {}   # name -> option expiry strings, soonest first
+        self._strikes = {}    # (name, expiry) -> sorted unique option strikes
+
+        equity_rows = np.flatnonzero(table.expiry < 0)
+        self._equity_rows = equity_rows[np.argsort(table.symbol[equity_rows], kind="stable")]
+        self._equity_symbols = table.symbol[self._equity_rows]
+
+        if len(table):
+            changed = np.flatnonzero((np.diff(table.name_code) != 0) | (np.diff(table.expiry) != 0)
+                                     | (np.diff(table.type_code) != 0)) + 1
+            for start, stop in zip(np.r_[0, changed], np.r_[changed, len(table)]):
+                if table.expiry[start] < 0:
+                    continue
+                record = table.record(start)
+                name, expiry, instrumenttype = record["name"], record["expiry"], record["instrumenttype"]
+                self._groups[(name, expiry, instrumenttype)] = (int(start), int(stop))
+                if instrumenttype == "OPTSTK":
+                    self._expiries.setdefault(name, []).append(expiry)  # rows are in expiry order
+                    self._strikes[(name, expiry)] = np.unique(table.strike[start:stop]).tolist()
+
+    def __len__(self):
+        return len(self.table)
+
+    def _rows(self, name, expiry_str, instrumenttype):
+        return self._groups.get((name, expiry_str, instrumenttype), (0, 0))
+
+    def get_equity(self, symbol, exch_seg="NSE"):
+        """Returns the instrument record for an equity symbol, or None."""
+        try:
+            key = symbol.encode("ascii")
+        except (AttributeError, UnicodeEncodeError):
+            return None
+        i = int(np.searchsorted(self._equity_symbols, key))
+        if i == len(self._equity_symbols) or self._equity_symbols[i] != key:
+            return None
+        record = self.table.record(self._equity_rows[i])
+        return record if record["exch_seg"] == exch_seg else None
+
+    def get_derivatives(self, name, expiry_str, instrumenttype="OPTSTK"):
+        """Returns all contracts for an underlying, expiry and instrument type."""
+        start, stop = self._rows(name, expiry_str, instrumenttype)
+        return [self.table.record(row) for row in range(start, stop)]
+
+    def get_strikes(self, name, expiry_str):
+        """Returns the sorted option strikes (in rupees) for an underlying and expiry."""
+        return list(self._strikes.get((name, expiry_str), ()))
+
+    def next_strike_above(self, name, expiry_str, price, exclude=None):
+        """
+        Finds the first strike strictly above `price`.
+
+        Args:
+            name (str): Underlying name (e.g., "RELIANCE").
+            expiry_str (str): Expiry date string (e.g., "30SEP2025").
+            price (float): Reference price.
+            exclude (float, optional): A strike to skip over if it is the first match.
+
+        Returns:
+            float or None: The strike, or None if no strike lies above `price`.
+        """
+        strikes = self._strikes.get((name, expiry_str), ())
+        i = bisect_right(strikes, price)
+        if i < len(strikes) and exclude is not None and strikes[i] == exclude:
+            i += 1
+        return strikes[i] if i < len(strikes) else None
+
+    def get_options_at_strike(self, name, expiry_str, strike):
+        """Returns a {"CE": record, "PE": record} mapping for the given strike."""
+        try:
+            strike = float(strike)
+        except (TypeError, ValueError):
+            return {}
+        start, stop = self._rows(name, expiry_str, "OPTSTK")
+        table = self.table
+        row = bisect_left(table.strike, strike, start, stop)
+        options = {}
+        while row < stop and table.strike[row] == strike:
+            if table.option_type[row]:
+                options[OPTION_TYPE_NAMES[table.option_type[row]]] = table.record(row)
+            row += 1
+        return options
+
+    def get_expiries(self, name, today=None):
+        """Returns the option expiries of an underlying that have not passed, soonest first."""
+        today = today or date.today()
+        return [e for e in self._expiries.get(name, []) if parse_expiry(e) >= today]
+
+    def option_underlyings(self):
+        """Returns the names of all underlyings that have stock options, sorted."""
+        return sorted(self._expiries)
+
+    def resolve_expiry(self, name, spec="nearest", today=None):
+        """
+        Resolves an expiry choice for one underlying.
+
+        Args:
+            name (str): Underlying name (e.g., "RELIANCE").
+            spec (str): "nearest", "next" (the one after nearest), "monthly" (the last expiry
+                in the nearest expiry's month) or an explicit date like "30SEP2025".
+            today (date, optional): Reference date; defaults to today.
+
+        Returns:
+            str or None: The expiry string, or None if the underlying has no such unexpired expiry.
+        """
+        upcoming = self.get_expiries(name, today)
+        if not upcoming:
+            return None
+        choice = spec.strip().lower()
+        if choice == "nearest":
+            return upcoming[0]
+        if choice == "next":
+            return upcoming[1] if len(upcoming) > 1 else None
+        if choice == "monthly":
+            first = parse_expiry(upcoming[0])
+            return [e for e in upcoming if parse_expiry(e).replace(day=1) == first.replace(day=1)][-1]
+        expiry = spec.strip().upper()
+        return expiry if expiry in upcoming else None
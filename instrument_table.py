@@ -0,0 +1,185 @@
+"""
+instrument_table.py
+-----------------------
+Purpose:
+    Holds the part of the scrip master the scanner uses (NSE equities and NFO stock options
+    and futures) as typed NumPy columns, instead of one Python dict per row for every segment.
+
+Classes:
+    InstrumentTable(columns)
+        -> from_records(records, keep=keep_instrument): Builds the table from scrip master dicts
+           (a list or any iterable, e.g. a streaming parser), keeping only the rows `keep` accepts.
+        -> from_columns(columns): Builds it from string columns such as the memory-mapped ones
+           of `scrip_master_cache.load_scrip_master_columns`, filtered without creating any dicts.
+        -> record(row): Read-only scrip master style view of one row (`InstrumentRecord`).
+        -> Columns: token and symbol (ASCII bytes), name_code (int32 into `names`), exch_code /
+           type_code (int8 into `exchanges` / `instrument_types`), expiry (int32 ordinal day,
+           -1 if none), strike (float64, rupees), lotsize (int32), tick_size (float64),
+           option_type (int8: 0 none, 1 CE, 2 PE).
+    InstrumentRecord(table, row)
+        -> Mapping with the scrip master fields and formats ("token", "symbol", "strike" in
+           paise as "250000.000000", ...), so code written against the raw dicts keeps working.
+
+Functions:
+    keep_instrument(inst) -> bool: The row predicate (NSE "-EQ" or NFO OPTSTK/FUTSTK).
+
+Notes:
+    - Rows are sorted by (name, expiry, instrument type, strike, option type), so every
+      underlying/expiry/type is one contiguous slice and strikes are found by binary search.
+    - Tokens and symbols are stored as ASCII bytes and names/segments/types as categorical
+      codes, which is what keeps the table small; records decode them only when read.
+    - Tokens stay strings: Angel One tokens are numeric today, but nothing here relies on it.
+"""
+from collections.abc import Mapping
+from datetime import date, datetime
+from functools import lru_cache
+
+import numpy as np
+
+SCRIP_MASTER_FIELDS = ("token", "symbol", "name", "expiry", "strike", "lotsize",
+                       "instrumenttype", "exch_seg", "tick_size")
+KEPT_DERIVATIVES = ("OPTSTK", "FUTSTK")
+OPTION_TYPE_NAMES = ("", "CE", "PE")
+
+
+def keep_instrument(inst):
+    """Returns True for the rows the scanner uses: NSE "-EQ" equities and NFO stock F&O."""
+    exch_seg = inst.get("exch_seg")
+    if exch_seg == "NSE":
+        return not inst.get("expiry") and str(inst.get("symbol", "")).endswith("-EQ")
+    return exch_seg == "NFO" and inst.get("instrumenttype") in KEPT_DERIVATIVES
+
+
+@lru_cache(maxsize=None)
+def _expiry_day(expiry_str):
+    try:
+        return datetime.strptime(expiry_str, "%d%b%Y").date().toordinal()
+    except (TypeError, ValueError):
+        return -1
+
+
+@lru_cache(maxsize=None)
+def _expiry_str(day):
+    return date.fromordinal(day).strftime("%d%b%Y").upper() if day > 0 else ""
+
+
+def _strings(values):
+    values = np.asarray(values)
+    return values if values.dtype.kind == "U" else values.astype(np.str_)
+
+
+def _numbers(values, parse, dtype):
+    """Parses a string column; faster than `astype` on NumPy string arrays."""
+    return np.fromiter(map(parse, np.asarray(values).tolist()), dtype, len(values))
+
+
+def _categorical(values):
+    """(sorted categories as a list of str, int codes) for a string array."""
+    categories, codes = np.unique(_strings(values), return_inverse=True)
+    return [str(c) for c in categories], codes.reshape(-1)
+
+
+class InstrumentTable:
+    """
+    Typed, filtered scrip master columns.
+
+    Args:
+        columns (dict): SCRIP_MASTER_FIELDS -> NumPy string arrays of the rows to keep.
+    """
+    def __init__(self, columns):
+        symbol = _strings(columns["symbol"])
+        names, name_code = _categorical(columns["name"])
+        exchanges, exch_code = _categorical(columns["exch_seg"])
+        types, type_code = _categorical(columns["instrumenttype"])
+        expiry_strs, expiry_code = _categorical(columns["expiry"])
+        expiry = np.array([_expiry_day(e) for e in expiry_strs], dtype=np.int32)[expiry_code]
+        strike = _numbers(columns["strike"], float, np.float64) / 100.0
+        is_option = (type_code == types.index("OPTSTK")) if "OPTSTK" in types else np.zeros(len(symbol), dtype=bool)
+        option_type = np.select([is_option & np.char.endswith(symbol, "CE"), is_option & np.char.endswith(symbol, "PE")],
+                                [1, 2], 0)
+
+        order = np.lexsort((option_type, strike, type_code, expiry, name_code))
+        self.names, self.exchanges, self.instrument_types = names, exchanges, types
+        self.token = _strings(columns["token"])[order].astype(np.bytes_)
+        self.symbol = symbol[order].astype(np.bytes_)
+        self.name_code = name_code.astype(np.int32)[order]
+        self.exch_code = exch_code.astype(np.int8)[order]
+        self.type_code = type_code.astype(np.int8)[order]
+        self.expiry = expiry[order]
+        self.strike = strike[order]
+        self.lotsize = _numbers(columns["lotsize"], float, np.float64).astype(np.int32)[order]
+        self.tick_size = _numbers(columns["tick_size"], float, np.float64)[order]
+        self.option_type = option_type.astype(np.int8)[order]
+
+    @classmethod
+    def from_columns(cls, columns):
+        """Builds the table from full scrip master string columns, keeping only the used rows."""
+        exch_seg = _strings(columns["exch_seg"])
+        nse = exch_seg == "NSE"
+        nse[nse] = (_strings(columns["expiry"])[nse] == "") & np.char.endswith(_strings(columns["symbol"])[nse], "-EQ")
+        derivative = (exch_seg == "NFO") & np.isin(_strings(columns["instrumenttype"]), KEPT_DERIVATIVES)
+        rows = np.flatnonzero(nse | derivative)
+        return cls({field: np.asarray(columns[field])[rows] for field in SCRIP_MASTER_FIELDS})
+
+    @classmethod
+    def from_records(cls, records, keep=keep_instrument):
+        """Builds the table from scrip master dicts, keeping only the rows `keep` accepts."""
+        kept = {field: [] for field in SCRIP_MASTER_FIELDS}
+        for inst in records or ():
+            if keep(inst):
+                for field, values in kept.items():
+                    values.append(str(inst.get(field, "")))
+        return cls({field: np.array(values, dtype=np.str_) for field, values in kept.items()})
+
+    def __len__(self):
+        return len(self.token)
+
+    @property
+    def nbytes(self):
+        """Bytes held by the table's columns."""
+        return sum(getattr(self, col).nbytes for col in ("token", "symbol", "name_code", "exch_code", "type_code",
+                                                           "expiry", "strike", "lotsize", "tick_size", "option_type"))
+
+    def record(self, row):
+        """Returns a read-only scrip master style view of one row."""
+        return InstrumentRecord(self, int(row))
+
+
+class InstrumentRecord(Mapping):
+    """Scrip master fields of one `InstrumentTable` row, decoded on access."""
+    __slots__ = ("_table", "_row")
+
+    def __init__(self, table, row):
+        self._table = table
+        self._row = row
+
+    def __getitem__(self, field):
+        t, i = self._table, self._row
+        if field == "token":
+            return t.token[i].decode("ascii")
+        if field == "symbol":
+            return t.symbol[i].decode("ascii")
+        if field == "name":
+            return t.names[t.name_code[i]]
+        if field == "expiry":
+            return _expiry_str(int(t.expiry[i]))
+        if field == "strike":
+            return f"{t.strike[i] * 100.0:.6f}"
+        if field == "lotsize":
+            return str(t.lotsize[i])
+        if field == "instrumenttype":
+            return t.instrument_types[t.type_code[i]]
+        if field == "exch_seg":
+            return t.exchanges[t.exch_code[i]]
+        if field == "tick_size":
+            return f"{t.tick_size[i]:.6f}"
+        raise KeyError(field)
+
+    def __iter__(self):
+        return iter(SCRIP_MASTER_FIELDS)
+
+    def __len__(self):
+        return len(SCRIP_MASTER_FIELDS)
+
+    def __repr__(self):
+        return f"InstrumentRecord({dict(self)!r})"
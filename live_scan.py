@@ -0,0 +1,237 @@
+"""
+live_scan.py
+----------------
+Purpose:
+    Live streaming mode: subscribes the spot and selected option tokens of a finished
+    scan to a tick feed, updates only the rows a tick touches and re-renders a rich
+    `Live` table at a capped frame rate.
+
+Classes:
+    - LiveOtmTable(otm_df, instrument_index): Row state for one table (gainers or losers)
+      plus the token -> row mapping.
+    - SmartWebSocketTickSource(auth_token, api_key, client_code, feed_token, keys): Ticks from
+      the SmartAPI WebSocket (SmartWebSocketV2) LTP feed.
+    - ReplayTickSource(path, speed=None): Ticks from a JSON-lines replay file, for offline runs
+      and tests.
+
+Functions:
+    - run_live(tables, source, max_fps=LIVE_MAX_FPS): Pumps ticks into the tables and renders them.
+
+Notes:
+    - Strikes stay fixed at the ones chosen by the snapshot scan; ticks update LTPs, CE P/L,
+      Gap and the nearest CE's IV/Delta.
+    - A tick source calls `on_tick(exch_seg, token, ltp)` from its own thread; `run_live`
+      hands ticks to the render loop through a queue.
+    - Replay file lines look like {"t": 0.25, "exch_seg": "NFO", "token": "12345", "ltp": 10.5},
+      where "t" is seconds since the start of the recording.
+"""
+import json
+import queue
+import threading
+import time
+from datetime import date
+
+import pandas as pd
+from rich.console import Group
+from rich.live import Live
+
+from options_config import LIVE_MAX_FPS, RISK_FREE_RATE
+from option_ltp_and_greeks_calculator import black_scholes_vectorized, implied_volatility_vectorized
+from table_theme import build_rich_table, get_live_table_headers
+from instrument_index import parse_expiry
+
+# SmartWebSocketV2 exchange types and subscription modes
+EXCHANGE_TYPES = {"NSE": 1, "NFO": 2}
+EXCHANGE_NAMES = {v: k for k, v in EXCHANGE_TYPES.items()}
+LTP_MODE = 1
+
+# (row column prefix, OTM strike column) for the two strikes held per row
+LEGS = (("Nearest OTM", "Nearest OTM Strike"), ("New OTM", "New OTM Strike"))
+
+
+class LiveOtmTable:
+    """
+    Live state of one OTM table.
+
+    Args:
+        otm_df (pd.DataFrame): Snapshot table from `build_otm_dataframe` (one row per stock and expiry).
+        instrument_index (InstrumentIndex): Used to resolve spot and option tokens.
+    """
+    def __init__(self, otm_df, instrument_index):
+        self.rows = {}            # (symbol, expiry) -> row dict
+        self.time_to_expiry = {}  # (symbol, expiry) -> years
+        self.subscribers = {}     # (exch_seg, token) -> list of ((symbol, expiry), column)
+
+        for row in otm_df.to_dict("records"):
+            symbol, expiry = row["Symbol"], row["Expiry"]
+            key = (symbol, expiry)
+            # The snapshot table carries Gap rather than the spot price itself
+            row.setdefault("Spot Price", row["Nearest OTM Strike"] - row["Gap"])
+            self.rows[key] = row
+            self.time_to_expiry[key] = (parse_expiry(expiry) - date.today()).days / 365.0
+            spot_rec = instrument_index.get_equity(f"{symbol}-EQ", "NSE")
+            if spot_rec:
+                self._subscribe(("NSE", str(spot_rec["token"])), key, "Spot Price")
+            for prefix, strike_col in LEGS:
+                options = instrument_index.get_options_at_strike(symbol, expiry, row.get(strike_col))
+                for option_type, inst in options.items():
+                    self._subscribe((inst["exch_seg"], str(inst["token"])), key, f"{prefix} {option_type}")
+            self._recompute(key)
+
+    def _subscribe(self, token_key, row_key, column):
+        self.subscribers.setdefault(token_key, []).append((row_key, column))
+
+    def tokens(self):
+        """Returns every (exch_seg, token) pair this table listens to."""
+        return list(self.subscribers)
+
+    def apply_tick(self, exch_seg, token, ltp):
+        """
+        Applies one tick and recomputes the rows it affects.
+
+        Returns:
+            set: (symbol, expiry) keys of the rows that changed.
+        """
+        changed = set()
+        for key, column in self.subscribers.get((exch_seg, str(token)), ()):
+            row = self.rows[key]
+            if row.get(column) != ltp:
+                row[column] = ltp
+                changed.add(key)
+        for key in changed:
+            self._recompute(key)
+        return changed
+
+    def _recompute(self, key):
+        row = self.rows[key]
+        time_to_expiry = self.time_to_expiry[key]
+        row["CE P/L"] = row["Lot Size"] * (row["Nearest OTM CE"] - row["New OTM CE"])
+        spot = row.get("Spot Price")
+        if spot is None or pd.isna(spot):
+            return
+        row["Gap"] = row["Nearest OTM Strike"] - spot
+        iv, _ = implied_volatility_vectorized(row["Nearest OTM CE"], spot, row["Nearest OTM Strike"],
+                                              time_to_expiry, RISK_FREE_RATE, "CE")
+        greeks = black_scholes_vectorized(spot, row["Nearest OTM Strike"], time_to_expiry,
+                                          RISK_FREE_RATE, iv, "CE")
+        row["CE IV"] = float(iv)
+        row["CE Delta"] = float(greeks["delta"])
+
+    def to_dataframe(self):
+        return pd.DataFrame(list(self.rows.values()))
+
+
+class ReplayTickSource:
+    """
+    Replays recorded ticks from a JSON-lines file.
+
+    Args:
+        path (str): Replay file.
+        speed (float, optional): 1.0 replays at recorded speed, 2.0 twice as fast;
+            None replays as fast as possible.
+    """
+    def __init__(self, path, speed=None):
+        self.path = path
+        self.speed = speed
+        self._stop = threading.Event()
+
+    def run(self, on_tick):
+        start = time.monotonic()
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                if self._stop.is_set():
+                    break
+                if not line.strip():
+                    continue
+                tick = json.loads(line)
+                if self.speed:
+                    delay = tick.get("t", 0) / self.speed - (time.monotonic() - start)
+                    if delay > 0 and self._stop.wait(delay):
+                        break
+                on_tick(tick["exch_seg"], str(tick["token"]), float(tick["ltp"]))
+
+    def stop(self):
+        self._stop.set()
+
+
+class SmartWebSocketTickSource:
+    """
+    LTP ticks from the SmartAPI WebSocket feed.
+
+    Args:
+        auth_token (str): JWT from `generateSession`.
+        api_key (str): SmartAPI key.
+        client_code (str): Client code.
+        feed_token (str): Feed token from `getfeedToken()`.
+        keys (list): (exch_seg, token) pairs to subscribe.
+    """
+    def __init__(self, auth_token, api_key, client_code, feed_token, keys):
+        from SmartApi.smartWebSocketV2 import SmartWebSocketV2
+        self.sws = SmartWebSocketV2(auth_token, api_key, client_code, feed_token)
+        by_exchange = {}
+        for exch_seg, token in keys:
+            by_exchange.setdefault(EXCHANGE_TYPES[exch_seg], []).append(token)
+        self.token_list = [{"exchangeType": ex, "tokens": toks} for ex, toks in by_exchange.items()]
+
+    def run(self, on_tick):
+        def on_data(wsapp, message):
+            ltp = message.get("last_traded_price")
+            exch_seg = EXCHANGE_NAMES.get(message.get("exchange_type"))
+            if ltp and exch_seg:
+                # The feed sends prices in paise
+                on_tick(exch_seg, str(message.get("token")), ltp / 100.0)
+
+        self.sws.on_open = lambda wsapp: self.sws.subscribe("myscan-live", LTP_MODE, self.token_list)
+        self.sws.on_data = on_data
+        self.sws.on_error = lambda *args: None
+        self.sws.connect()
+
+    def stop(self):
+        self.sws.close_connection()
+
+
+def run_live(tables, source, max_fps=LIVE_MAX_FPS):
+    """
+    Streams ticks into the tables and re-renders them, at most `max_fps` times per second.
+
+    Args:
+        tables (list): (title, LiveOtmTable) pairs.
+        source: Tick source with `run(on_tick)` and `stop()`.
+        max_fps (float): Frame-rate cap.
+    """
+    ticks = queue.Queue()
+    done = threading.Event()
+
+    def pump():
+        try:
+            source.run(lambda exch_seg, token, ltp: ticks.put((exch_seg, token, ltp)))
+        finally:
+            done.set()
+
+    def render():
+        return Group(*(build_rich_table(table.to_dataframe(), title, get_live_table_headers())
+                       for title, table in tables))
+
+    feeder = threading.Thread(target=pump, daemon=True)
+    feeder.start()
+    frame_interval = 1.0 / max_fps
+    with Live(render(), auto_refresh=False) as live:
+        try:
+            last_frame, dirty = 0.0, False
+            while not (done.is_set() and ticks.empty()):
+                try:
+                    tick = ticks.get(timeout=frame_interval)
+                    for _, table in tables:
+                        dirty |= bool(table.apply_tick(*tick))
+                except queue.Empty:
+                    pass
+                now = time.monotonic()
+                if dirty and now - last_frame >= frame_interval:
+                    live.update(render(), refresh=True)
+                    last_frame, dirty = now, False
+            if dirty:
+                live.update(render(), refresh=True)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            source.stop()
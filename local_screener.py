@@ -0,0 +1,398 @@
+"""
+local_screener.py
+---------------------
+Purpose:
+    Evaluates the gainer/loser screener conditions locally from OHLCV candles, so a scan
+    does not depend on chartink.com (no remote round trip, CSRF scrape or third-party outage).
+
+Classes:
+    CandleFrame(candles, symbols)
+        -> One timeframe for the whole universe as time x symbol matrices, with vectorized
+           indicators (rsi, ema, sma, wma, obv, cci, supertrend, pct_change) and `at(series, n)`
+           to read Chartink-numbered candles ([=1] first candle of today, [=-1] last of yesterday).
+    LocalScreener(source, instrument_index, symbols=None)
+        -> load(): Loads the 15-minute candles once and builds the 15m, 1h and 3h frames.
+        -> fetch(scan_condition): Same ['Symbol', 'Stock Name', '% Change'] columns as
+           `ChartinkClient.fetch`, for a condition listed in `screener_conditions.LOCAL_CONDITIONS`
+           ("Stock Name" is the scrip master name, i.e. the trading symbol, not the company name).
+    SmartApiCandleSource(smartApi, instrument_index, lookback_days=LOCAL_SCREENER_LOOKBACK_DAYS, executor=None)
+        -> load(symbols): 15-minute candles from SmartAPI `getCandleData`, one request per symbol.
+        -> fetch(symbol, from_date, to_date): One `getCandleData` request (used by
+           `candle_store.StoreCandleSource` for delta fetches).
+    FileCandleSource(path)
+        -> load(symbols): 15-minute candles from a CSV file (columns symbol, timestamp, open,
+           high, low, close, volume; ".csv.gz" works too).
+
+Functions:
+    resample_candles(df, minutes) -> pd.DataFrame
+        -> Aggregates 15-minute candles into `minutes`-long candles aligned to the 09:15 open.
+
+Notes:
+    - Each symbol's candles are right-aligned (latest bar in the last row) and padded with
+      NaN, so every indicator runs once over the whole universe; recursive ones (EMA, RSI,
+      supertrend) step through time with all symbols at once.
+    - RSI and ATR use Wilder's smoothing; EMA/RMA are seeded with the first value rather
+      than an SMA, which only differs during the first few bars of the lookback.
+    - 1 hour and 3 hour candles are built from the 15-minute ones, aligned to 09:15 like the
+      exchange's (the last candle of the day is the short 15:15 one).
+    - The Chartink strings stay the source of truth: their local translations live next to
+      them in `screener_conditions.py` and must be kept in sync.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from options_config import LOCAL_SCREENER_LOOKBACK_DAYS, MAX_THREAD_WORKERS
+from screener_conditions import LOCAL_CONDITIONS
+
+CANDLE_COLUMNS = ["open", "high", "low", "close", "volume"]
+CANDLE_AGG = {"open": "first", "high": "max", "low": "min", "close": "last", "volume": "sum"}
+SESSION_OFFSET = "9h15min"  # candles are aligned to the 09:15 market open
+CANDLE_INTERVAL = "FIFTEEN_MINUTE"
+
+
+def resample_candles(df, minutes):
+    """
+    Aggregates 15-minute candles into `minutes`-long candles.
+
+    Args:
+        df (pd.DataFrame): CANDLE_COLUMNS indexed by candle start time.
+        minutes (int): Target candle length (a multiple of 15 that divides a day, e.g. 60 or 180).
+
+    Returns:
+        pd.DataFrame: Resampled candles, labelled by their start time; empty periods dropped.
+    """
+    if df.empty:
+        return df
+    out = df.resample(f"{minutes}min", origin="start_day", offset=SESSION_OFFSET,
+                      label="left", closed="left").agg(CANDLE_AGG)
+    return out.dropna(subset=["close"])
+
+
+def _local_dates(index):
+    """Calendar dates of a DatetimeIndex in its own (exchange) time zone."""
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    return index.values.astype("datetime64[D]")
+
+
+def _rma(df, period):
+    """Wilder's moving average (alpha = 1/period) down each column."""
+    return df.ewm(alpha=1.0 / period, adjust=False, min_periods=period).mean()
+
+
+def _windows(df, period):
+    """Rolling windows as a (T - period + 1, S, period) view, or None if there are too few rows."""
+    values = df.to_numpy(dtype=np.float64)
+    if len(values) < period:
+        return values, None
+    return values, sliding_window_view(values, period, axis=0)
+
+
+class CandleFrame:
+    """
+    One timeframe for many symbols as time x symbol matrices.
+
+    Args:
+        candles (dict): Symbol -> CANDLE_COLUMNS DataFrame indexed by candle start time.
+        symbols (list[str]): Column order; symbols missing from `candles` stay all-NaN.
+    """
+    def __init__(self, candles, symbols):
+        self.symbols = list(symbols)
+        n_symbols = len(self.symbols)
+        n_bars = max((len(candles.get(s, ())) for s in self.symbols), default=0)
+        data = {col: np.full((n_bars, n_symbols), np.nan) for col in CANDLE_COLUMNS}
+        dates = np.full((n_bars, n_symbols), np.datetime64("NaT"), dtype="datetime64[D]")
+        for j, symbol in enumerate(self.symbols):
+            df = candles.get(symbol)
+            if df is None or df.empty:
+                continue
+            start = n_bars - len(df)
+            for col in CANDLE_COLUMNS:
+                data[col][start:, j] = df[col].to_numpy(dtype=np.float64)
+            dates[start:, j] = _local_dates(df.index)
+
+        self.open, self.high, self.low, self.close, self.volume = (pd.DataFrame(data[col]) for col in CANDLE_COLUMNS)
+        self._cache = {}
+
+        # Where today's and the previous trading day's candles sit in each column
+        valid = ~np.isnat(dates)
+        self.session_date = dates[valid].max() if valid.any() else None
+        cols = np.arange(n_symbols)
+        self._today_len = (dates == self.session_date).sum(axis=0) if valid.any() else np.zeros(n_symbols, int)
+        self._today_start = n_bars - self._today_len
+        if n_bars:
+            prev_dates = dates[np.clip(self._today_start - 1, 0, n_bars - 1), cols]
+            prev_dates[self._today_start < 1] = np.datetime64("NaT")
+            self._prev_len = (dates == prev_dates).sum(axis=0)
+        else:
+            self._prev_len = np.zeros(n_symbols, int)
+
+    def at(self, series, n):
+        """
+        Values of `series` at Chartink candle number `n` for every symbol.
+
+        Args:
+            series (pd.DataFrame or np.ndarray): Time x symbol values of this frame.
+            n (int): 1, 2, ... for today's first, second, ... candle; -1, -2, ... for the
+                previous trading day's last, second-last, ... candle.
+
+        Returns:
+            np.ndarray: One value per symbol; NaN where that candle does not exist.
+        """
+        values = np.asarray(series, dtype=np.float64)
+        if not len(values):
+            return np.full(len(self.symbols), np.nan)
+        if n > 0:
+            rows, ok = self._today_start + n - 1, n <= self._today_len
+        else:
+            rows, ok = self._today_start + n, -n <= self._prev_len
+        out = values[np.clip(rows, 0, len(values) - 1), np.arange(len(self.symbols))]
+        return np.where(ok, out, np.nan)
+
+    def latest(self, series):
+        """Values of `series` at each symbol's most recent candle."""
+        values = np.asarray(series, dtype=np.float64)
+        return values[-1] if len(values) else np.full(len(self.symbols), np.nan)
+
+    # --- indicators (time x symbol DataFrames) ---
+
+    def _cached(self, key, compute):
+        if key not in self._cache:
+            self._cache[key] = compute()
+        return self._cache[key]
+
+    def pct_change(self):
+        """Close-to-close change in percent ("close - 1 candle ago close / 1 candle ago close * 100")."""
+        return self._cached(("pct_change",), lambda: self.close.pct_change(fill_method=None) * 100)
+
+    @staticmethod
+    def ema(series, period):
+        return series.ewm(span=period, adjust=False, min_periods=period).mean()
+
+    @staticmethod
+    def sma(series, period):
+        return series.rolling(period).mean()
+
+    @staticmethod
+    def wma(series, period):
+        """Linearly weighted moving average (weight `period` on the latest value)."""
+        values, windows = _windows(series, period)
+        out = np.full(values.shape, np.nan)
+        if windows is not None:
+            weights = np.arange(1, period + 1, dtype=np.float64)
+            out[period - 1:] = windows @ weights / weights.sum()
+        return pd.DataFrame(out)
+
+    def rsi(self, period):
+        def compute():
+            delta = self.close.diff()
+            avg_gain = _rma(delta.clip(lower=0), period)
+            avg_loss = _rma((-delta).clip(lower=0), period)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                return 100 - 100 / (1 + avg_gain / avg_loss)
+        return self._cached(("rsi", period), compute)
+
+    def obv(self):
+        def compute():
+            flow = (np.sign(self.close.diff()) * self.volume).fillna(0.0)
+            return flow.cumsum().where(self.close.notna())
+        return self._cached(("obv",), compute)
+
+    def cci(self, period):
+        def compute():
+            typical = (self.high + self.low + self.close) / 3
+            values, windows = _windows(typical, period)
+            out = np.full(values.shape, np.nan)
+            if windows is not None:
+                mean = windows.mean(axis=-1)
+                mean_dev = np.abs(windows - mean[..., None]).mean(axis=-1)
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    out[period - 1:] = (values[period - 1:] - mean) / (0.015 * mean_dev)
+            return pd.DataFrame(out)
+        return self._cached(("cci", period), compute)
+
+    def supertrend(self, period, multiplier):
+        def compute():
+            high, low, close = (df.to_numpy(dtype=np.float64) for df in (self.high, self.low, self.close))
+            prev_close = np.vstack([np.full((1, close.shape[1]), np.nan), close[:-1]])
+            with np.errstate(invalid="ignore"):
+                true_range = np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+            atr = _rma(pd.DataFrame(true_range), period).to_numpy()
+            mid = (high + low) / 2
+            basic_upper, basic_lower = mid + multiplier * atr, mid - multiplier * atr
+
+            upper, lower, trend = basic_upper.copy(), basic_lower.copy(), np.full(close.shape, np.nan)
+            in_downtrend = np.ones(close.shape[1], dtype=bool)
+            with np.errstate(invalid="ignore"):
+                for t in range(1, len(close)):
+                    keep_upper = (basic_upper[t] > upper[t - 1]) & (close[t - 1] <= upper[t - 1])
+                    upper[t] = np.where(keep_upper, upper[t - 1], basic_upper[t])
+                    keep_lower = (basic_lower[t] < lower[t - 1]) & (close[t - 1] >= lower[t - 1])
+                    lower[t] = np.where(keep_lower, lower[t - 1], basic_lower[t])
+                    in_downtrend = np.where(in_downtrend, close[t] <= upper[t], close[t] < lower[t])
+                    trend[t] = np.where(in_downtrend, upper[t], lower[t])
+            return pd.DataFrame(trend)
+        return self._cached(("supertrend", period, multiplier), compute)
+
+
+def candles_from_rows(rows):
+    """Builds a CANDLE_COLUMNS DataFrame from `getCandleData` rows [timestamp, o, h, l, c, v]."""
+    if not rows:
+        return pd.DataFrame(columns=CANDLE_COLUMNS, index=pd.DatetimeIndex([], name="timestamp"))
+    df = pd.DataFrame(rows, columns=["timestamp"] + CANDLE_COLUMNS)
+    df.index = pd.DatetimeIndex(pd.to_datetime(df.pop("timestamp")), name="timestamp")
+    return df.astype(np.float64).sort_index()
+
+
+class SmartApiCandleSource:
+    """
+    Fetches 15-minute candles through SmartAPI `getCandleData`.
+
+    Args:
+        smartApi: SmartConnect (or `RateLimitedSmartApi`; `getCandleData` has its own rate limit).
+        instrument_index (InstrumentIndex): For the equity tokens.
+        lookback_days (int): Calendar days of history to request.
+        executor (ThreadPoolExecutor, optional): Shared I/O pool.
+    """
+    def __init__(self, smartApi, instrument_index, lookback_days=LOCAL_SCREENER_LOOKBACK_DAYS, executor=None):
+        self.smartApi = smartApi
+        self.instrument_index = instrument_index
+        self.lookback_days = lookback_days
+        self.executor = executor
+
+    def fetch(self, symbol, from_date, to_date):
+        """
+        One `getCandleData` request.
+
+        Args:
+            symbol (str): Stock symbol.
+            from_date (str): "YYYY-MM-DD HH:MM", first candle start.
+            to_date (str): "YYYY-MM-DD HH:MM", last candle start.
+
+        Returns:
+            pd.DataFrame or None: The candles, or None if the request failed.
+        """
+        rec = self.instrument_index.get_equity(f"{symbol}-EQ", "NSE")
+        if not rec:
+            return None
+        params = {"exchange": "NSE", "symboltoken": rec["token"], "interval": CANDLE_INTERVAL,
+                  "fromdate": from_date, "todate": to_date}
+        try:
+            resp = self.smartApi.getCandleData(params)
+        except Exception as e:
+            logging.error(f"[local_screener] Candles for {symbol} failed: {e}")
+            return None
+        if not resp or not resp.get("status"):
+            logging.error(f"[local_screener] Candles for {symbol} failed: {(resp or {}).get('message')}")
+            return None
+        return candles_from_rows(resp.get("data"))
+
+    def load(self, symbols):
+        """Returns {symbol: 15-minute candles} for the symbols whose candles could be fetched."""
+        # Whole-day bounds keep the request (and a recorded cassette) stable through the day
+        today = date.today()
+        from_date = f"{today - timedelta(days=self.lookback_days):%Y-%m-%d} 09:15"
+        to_date = f"{today:%Y-%m-%d} 15:30"
+        fetch = lambda symbol: (symbol, self.fetch(symbol, from_date, to_date))
+        if self.executor is not None:
+            results = list(self.executor.map(fetch, symbols))
+        else:
+            with ThreadPoolExecutor(max_workers=MAX_THREAD_WORKERS) as executor:
+                results = list(executor.map(fetch, symbols))
+        return {symbol: df for symbol, df in results if df is not None and not df.empty}
+
+
+class FileCandleSource:
+    """
+    Reads 15-minute candles for many symbols from one CSV file.
+
+    Args:
+        path (str): CSV (optionally gzip-compressed) with columns symbol, timestamp, open,
+            high, low, close, volume.
+    """
+    def __init__(self, path):
+        self.path = path
+
+    def load(self, symbols):
+        df = pd.read_csv(self.path)
+        df["symbol"] = df["symbol"].astype(str).str.upper()
+        df = df[df["symbol"].isin(set(symbols))]
+        df.index = pd.DatetimeIndex(pd.to_datetime(df.pop("timestamp")), name="timestamp")
+        return {symbol: rows[CANDLE_COLUMNS].astype(np.float64).sort_index()
+                for symbol, rows in df.groupby("symbol", sort=False)}
+
+
+class LocalScreener:
+    """
+    Runs the screener conditions on local candles for the F&O universe.
+
+    Args:
+        source: Candle source with `load(symbols)` (SmartApiCandleSource or FileCandleSource).
+        instrument_index (InstrumentIndex): For the universe, stock names and lot sizes.
+        symbols (list[str], optional): Universe; defaults to every stock with options.
+    """
+    def __init__(self, source, instrument_index, symbols=None):
+        self.source = source
+        self.instrument_index = instrument_index
+        self.symbols = [s for s in (symbols or instrument_index.option_underlyings())
+                        if instrument_index.get_equity(f"{s}-EQ", "NSE")]
+        self.frames = None
+
+    def load(self):
+        """Loads candles and builds the 15 minute, 1 hour and 3 hour frames; returns self."""
+        candles = self.source.load(self.symbols)
+        self.symbols = [s for s in self.symbols if s in candles]
+        self.frames = {
+            "m15": CandleFrame(candles, self.symbols),
+            "h1": CandleFrame({s: resample_candles(df, 60) for s, df in candles.items()}, self.symbols),
+            "h3": CandleFrame({s: resample_candles(df, 180) for s, df in candles.items()}, self.symbols),
+        }
+        self.lot_size = np.array([self._lot_size(s) for s in self.symbols], dtype=np.float64)
+        return self
+
+    def _lot_size(self, symbol):
+        expiry = self.instrument_index.resolve_expiry(symbol)
+        contracts = self.instrument_index.get_derivatives(symbol, expiry) if expiry else []
+        try:
+            return float(contracts[0]["lotsize"])
+        except (IndexError, KeyError, TypeError, ValueError):
+            return np.nan
+
+    def fetch(self, scan_condition):
+        """
+        Evaluates one condition across the universe.
+
+        Args:
+            scan_condition (str or callable): A Chartink string with a local translation in
+                `screener_conditions.LOCAL_CONDITIONS`, or the translation itself.
+
+        Returns:
+            pd.DataFrame: ['Symbol', 'Stock Name', '% Change'] of the matching stocks
+            (empty if none match), like `ChartinkClient.fetch`. The scrip master has no
+            company names, so "Stock Name" holds its `name` field, which is the symbol.
+        """
+        rule = scan_condition if callable(scan_condition) else LOCAL_CONDITIONS.get(scan_condition)
+        if rule is None:
+            raise ValueError("No local rule for this scan condition; add one to screener_conditions.LOCAL_CONDITIONS")
+        if self.frames is None:
+            self.load()
+        m15, h1, h3 = self.frames["m15"], self.frames["h1"], self.frames["h3"]
+        if not self.symbols:
+            return pd.DataFrame()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            matched = np.asarray(rule(m15, h1, h3, self.lot_size), dtype=bool)
+            prev_close = m15.at(m15.close, -1)
+            change = (m15.latest(m15.close) - prev_close) / prev_close * 100
+        if not matched.any():
+            return pd.DataFrame()
+        symbols = np.array(self.symbols, dtype=object)[matched]
+        return pd.DataFrame({
+            "Symbol": symbols,
+            "Stock Name": [self.instrument_index.get_equity(f"{s}-EQ", "NSE").get("name", s) for s in symbols],
+            "% Change": np.nan_to_num(np.round(change[matched], 2)),
+        })
@@ -1,47 +1,48 @@
 # main.py
 import os
-import requests
+import argparse
 import pyotp
 import pandas as pd
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 from rich.console import Console
-from rich.table import Table
 from SmartApi import SmartConnect
 
 from credentials import API_KEY, CLIENT_CODE, PIN, TOTP_SECRET, SCRIP_MASTER_URL
 from screener_conditions import GAINER_CONDITION, LOSER_CONDITION
-from chartink_screener import get_chartink_screener_data
-from option_data import build_otm_dataframe
-from utils import fetch_json_with_retry
-from table_theme import get_table_headers
-from options_config import NEAREST_EXPIRY_STR
-from export import save_to_excel
+from chartink_screener import ChartinkClient
+from local_screener import LocalScreener, SmartApiCandleSource, FileCandleSource
+from candle_store import CandleStore, StoreCandleSource
+from option_data import build_otm_dataframe, QUOTE_OK, QUOTE_UNFETCHED
+from quote_cache import QuoteCache
+from instrument_index import InstrumentIndex
+from scrip_master_cache import load_instrument_table
+from table_theme import get_table_headers, build_rich_table
+from options_config import (SCAN_EXPIRIES, MAX_THREAD_WORKERS, SCAN_SCHEDULE, LOGOUT_ON_EXIT, EXPORT_EXCEL,
+                            SHOW_SCAN_SUMMARY, METRICS_FILE, SCRIP_MASTER_CACHE_DIR, CHARTINK_CACHE_TTL,
+                            SHOW_SECTOR_BREADTH, SCREENER_SOURCE, CANDLE_FILE, SCAN_DEADLINE_SECONDS)
+from session_store import restore_or_login, clear_session
+from scan_pipeline import ScanPipeline, ScanStep, StepFailed
+from export import save_to_excel_async, wait_for_exports
+from scan_history import ScanHistoryStore, new_scan_id
+from scan_metrics import metrics
+from resilience import resilience
+from rate_limiter import RateLimitedSmartApi
 from sectors import sector_finder  # optimized bulk lookup
+from sector_analytics import sector_rollup, build_breadth_table
+from live_scan import LiveOtmTable, ReplayTickSource, SmartWebSocketTickSource, run_live
+from scan_daemon import ScanDaemon
+from cassette import Cassette
 
 SAVE_PATH = r"C:\Users\91931\OneDrive\New folder\OneDrive\Desktop\angelone"
 
+# Pipeline step -> metrics stage
+STEP_STAGES = {"session": "login", "instrument_index": "scrip_master", "gainer_df": "chartink", "loser_df": "chartink"}
+LOCAL_STEP_STAGES = {**STEP_STAGES, "candles": "candles", "gainer_df": "local_screener", "loser_df": "local_screener"}
+
 def display_rich_table(df, title):
     console = Console()
-
-    def fmt(x):
-        if pd.isna(x):
-            return "-"
-        try:
-            return f"{float(x):.2f}"
-        except:
-            return str(x)
-
-    headers_styles = get_table_headers()
-    table = Table(title=title, show_lines=True)
-    for col, style in headers_styles:
-        table.add_column(col, style=style, justify="right")
-
-    headers = [h[0] for h in headers_styles]
-    for _, r in df.iterrows():
-        row_vals = [fmt(r[c]) if c in df.columns else "-" for c in headers]
-        table.add_row(*row_vals)
-
-    console.print(table)
+    console.print(build_rich_table(df, title, get_table_headers()))
 
 def get_dynamic_filename(base_name):
     now = datetime.now()
@@ -54,58 +55,323 @@ def get_dynamic_filename(base_name):
         suffix = "0330"
     return f"{base_name}{suffix}.xlsx"
 
-def main():
-    smartApi = SmartConnect(api_key=API_KEY)
-    try:
-        totp = pyotp.TOTP(TOTP_SECRET).now()
-        data = smartApi.generateSession(CLIENT_CODE, PIN, totp)
-        if not data.get("status"):
-            print("❌ Login failed.")
-            return
-        print("✅ Login successful!")
-
-        instrument_list = fetch_json_with_retry(SCRIP_MASTER_URL)
-        if not instrument_list:
-            print("❌ Failed to download Scrip Master.")
-            return
-
-        with requests.Session() as session:
-            gainer_df = get_chartink_screener_data(session, GAINER_CONDITION)
-            loser_df = get_chartink_screener_data(session, LOSER_CONDITION)
-
-        # --- Gainers ---
-        if not gainer_df.empty:
-            gainers_otm = build_otm_dataframe(smartApi, gainer_df, instrument_list, NEAREST_EXPIRY_STR)
-            if not gainers_otm.empty:
-                # Bulk sector lookup (vectorized)
-                gainers_otm["Sector"] = sector_finder.get_sector_bulk(gainers_otm["Symbol"])
-                gainers_otm.sort_values("% Change", ascending=False, inplace=True)
-                display_rich_table(gainers_otm, "Top Gainers Option Data")
-                save_to_excel(gainers_otm, os.path.join(SAVE_PATH, get_dynamic_filename("gainers_scan")))
-            else:
-                print("❌ No option data found for gainers.")
+def full_login(smartApi):
+    totp = pyotp.TOTP(TOTP_SECRET).now()
+    data = smartApi.generateSession(CLIENT_CODE, PIN, totp)
+    if not data.get("status"):
+        raise StepFailed("❌ Login failed.")
+    print("✅ Login successful!")
+    return data
+
+def login(smartApi):
+    """Reuses the saved session when possible; falls back to a full TOTP login."""
+    return restore_or_login(smartApi, CLIENT_CODE, lambda: full_login(smartApi))
+
+def load_instrument_index(cache_dir=SCRIP_MASTER_CACHE_DIR):
+    table = load_instrument_table(SCRIP_MASTER_URL, cache_dir)
+    if not table:
+        raise StepFailed("❌ Failed to download Scrip Master.")
+    return InstrumentIndex(table)
+
+def build_scan_steps(smartApi, io_pool, chartink, session=None, instrument_index=None, load_index_fn=load_instrument_index,
+                     screener=SCREENER_SOURCE, candle_file=CANDLE_FILE, candle_store=None, quote_cache=None):
+    """
+    Builds the steps of the gainers/losers scan.
+
+    Login, the scrip master download and both Chartink queries have no dependencies
+    and run concurrently (both Chartink queries share one `chartink` session and CSRF
+    token); each option leg starts as soon as its own inputs are ready and both legs
+    share `io_pool` and `quote_cache` for quote fetching. A `session` or `instrument_index` kept warm by
+    the caller (see `scan_daemon.py`) is used as-is instead of logging in or reloading.
+
+    With `screener="local"` the gainers/losers come from `local_screener.py` instead:
+    a "candles" step loads 15-minute candles for the F&O universe (from `candle_file`,
+    or SmartAPI once logged in) and both conditions are evaluated on them. With a
+    `candle_store`, SmartAPI candles are kept in it and only missing ones are fetched.
+    """
+    def option_leg(stock_df, instrument_index):
+        if stock_df.empty:
+            return stock_df
+        return build_otm_dataframe(smartApi, stock_df, instrument_index, SCAN_EXPIRIES, executor=io_pool,
+                                   quote_cache=quote_cache)
+
+    def load_candles(session, instrument_index):
+        if candle_file:
+            source = FileCandleSource(candle_file)
         else:
-            print("❌ No gainers found.")
-
-        # --- Losers ---
-        if not loser_df.empty:
-            losers_otm = build_otm_dataframe(smartApi, loser_df, instrument_list, NEAREST_EXPIRY_STR)
-            if not losers_otm.empty:
-                losers_otm["Sector"] = sector_finder.get_sector_bulk(losers_otm["Symbol"])
-                losers_otm.sort_values("% Change", ascending=True, inplace=True)
-                display_rich_table(losers_otm, "Top Losers Option Data")
-                save_to_excel(losers_otm, os.path.join(SAVE_PATH, get_dynamic_filename("losers_scan")))
-            else:
-                print("❌ No option data found for losers.")
+            source = SmartApiCandleSource(smartApi, instrument_index, executor=io_pool)
+            if candle_store is not None:
+                source = StoreCandleSource(candle_store, source, executor=io_pool)
+        return LocalScreener(source, instrument_index).load()
+
+    if screener == "local":
+        screen_steps = [
+            ScanStep("candles", load_candles, requires=("session", "instrument_index")),
+            ScanStep("gainer_df", lambda candles: candles.fetch(GAINER_CONDITION), requires=("candles",)),
+            ScanStep("loser_df", lambda candles: candles.fetch(LOSER_CONDITION), requires=("candles",)),
+        ]
+    else:
+        screen_steps = [
+            ScanStep("gainer_df", lambda: chartink.fetch(GAINER_CONDITION)),
+            ScanStep("loser_df", lambda: chartink.fetch(LOSER_CONDITION)),
+        ]
+
+    return [
+        ScanStep("session", (lambda: session) if session else (lambda: login(smartApi))),
+        ScanStep("instrument_index", (lambda: instrument_index) if instrument_index else load_index_fn),
+        *screen_steps,
+        ScanStep("gainers_otm",
+                 lambda session, gainer_df, instrument_index: option_leg(gainer_df, instrument_index),
+                 requires=("session", "gainer_df", "instrument_index")),
+        ScanStep("losers_otm",
+                 lambda session, loser_df, instrument_index: option_leg(loser_df, instrument_index),
+                 requires=("session", "loser_df", "instrument_index")),
+    ]
+
+def report_leg(screen_df, otm_df, label, title, base_name, ascending, history=None, scan_id=None, scanned_at=None):
+    if screen_df is None or screen_df.empty:
+        print(f"❌ No {label} found.")
+        return False
+    if otm_df is None or otm_df.empty:
+        print(f"❌ No option data found for {label}.")
+        return False
+    # Bulk sector lookup (vectorized)
+    otm_df["Sector"] = sector_finder.get_sector_bulk(otm_df["Symbol"])
+    otm_df.sort_values("% Change", ascending=ascending, inplace=True)
+    with metrics.stage("render"):
+        display_rich_table(otm_df, title)
+    incomplete = int((otm_df["Quote Status"] != QUOTE_OK).sum())
+    if incomplete:
+        print(f"⚠️ {incomplete} {label} row(s) are missing quotes (see Quote Status).")
+    with metrics.stage("history"):
+        if history is not None:
+            try:
+                history.append(otm_df, label, scan_id, scanned_at)
+            except Exception as e:
+                print(f"⚠️ Could not record {label} in scan history: {e}")
+    if EXPORT_EXCEL:
+        save_to_excel_async(otm_df, os.path.join(SAVE_PATH, get_dynamic_filename(base_name)))
+    return True
+
+def report_sector_breadth(tables):
+    """Prints the per-sector breadth of the reported gainers/losers tables."""
+    if not SHOW_SECTOR_BREADTH or not tables:
+        return
+    with metrics.stage("render"):
+        rollup = sector_rollup(tables)
+        if not rollup.empty:
+            Console().print(build_breadth_table(rollup))
+
+def report_metrics(metrics_file=None):
+    """Waits for pending exports, then prints the scan summary and writes it to `metrics_file`."""
+    wait_for_exports()
+    if SHOW_SCAN_SUMMARY:
+        console = Console()
+        for table in metrics.summary_tables():
+            console.print(table)
+    if metrics_file:
+        try:
+            metrics.write(metrics_file)
+            print(f"✅ Scan metrics saved to {metrics_file}")
+        except OSError as e:
+            print(f"⚠️ Could not write scan metrics: {e}")
+
+def start_live(smartApi, session, instrument_index, legs, replay=None):
+    """Streams the scanned rows live until interrupted (or until the replay file ends)."""
+    tables = [(title, LiveOtmTable(df, instrument_index)) for title, df in legs]
+    if replay:
+        source = ReplayTickSource(replay, speed=1.0)
+    else:
+        keys = sorted({key for _, table in tables for key in table.tokens()})
+        source = SmartWebSocketTickSource(session["data"]["jwtToken"], API_KEY, CLIENT_CODE,
+                                          smartApi.getfeedToken(), keys)
+    print("📡 Live mode: press Ctrl+C to stop.")
+    run_live(tables, source)
+
+def live_rows(otm_df):
+    """Rows that can be streamed live (placeholders for unfetched stocks have no strikes)."""
+    return otm_df[otm_df["Quote Status"] != QUOTE_UNFETCHED]
+
+def run_scan(smartApi, io_pool, chartink, session=None, instrument_index=None, live=False, replay=None, history=None,
+             metrics_file=METRICS_FILE, load_index_fn=load_instrument_index, screener=SCREENER_SOURCE,
+             candle_file=CANDLE_FILE, candle_store=None, deadline=SCAN_DEADLINE_SECONDS):
+    """
+    Runs one scan, prints, records and saves both tables, and optionally switches to live mode.
+
+    `deadline` (seconds from now, a datetime, or None) bounds the scan's API calls and retries;
+    when it passes, the scan reports what it fetched and marks the rest (see resilience.py).
+    """
+    metrics.reset()
+    scanned_at = datetime.now()
+    scan_id = new_scan_id(scanned_at)
+    pipeline = ScanPipeline(build_scan_steps(smartApi, io_pool, chartink, session, instrument_index, load_index_fn,
+                                             screener, candle_file, candle_store, QuoteCache()))
+    with resilience.scan(deadline):
+        results = pipeline.run()
+        state = resilience.summary()
+    if state["expired"]:
+        print("⏱️ Scan deadline reached: showing what was fetched in time.")
+    if state["circuits"]:
+        print(f"⚡ Failing fast on: {', '.join(sorted(state['circuits']))}")
+    step_stages = LOCAL_STEP_STAGES if screener == "local" else STEP_STAGES
+    for step, seconds in pipeline.timings.items():
+        if step in step_stages:
+            metrics.record_stage(step_stages[step], seconds)
+
+    for step in ("session", "instrument_index", "candles"):
+        if step in pipeline.errors:
+            error = pipeline.errors[step]
+            print(error if isinstance(error, StepFailed) else f"❌ {step} failed: {error}")
+            report_metrics(metrics_file)
+            return results
+
+    legs, reported = [], {}
+    # --- Gainers ---
+    if report_leg(results.get("gainer_df"), results.get("gainers_otm"), "gainers",
+                  "Top Gainers Option Data", "gainers_scan", ascending=False,
+                  history=history, scan_id=scan_id, scanned_at=scanned_at):
+        legs.append(("Top Gainers Option Data (Live)", live_rows(results["gainers_otm"])))
+        reported["gainers"] = results["gainers_otm"]
+    # --- Losers ---
+    if report_leg(results.get("loser_df"), results.get("losers_otm"), "losers",
+                  "Top Losers Option Data", "losers_scan", ascending=True,
+                  history=history, scan_id=scan_id, scanned_at=scanned_at):
+        legs.append(("Top Losers Option Data (Live)", live_rows(results["losers_otm"])))
+        reported["losers"] = results["losers_otm"]
+    # --- Sector breadth ---
+    report_sector_breadth(reported)
+
+    report_metrics(metrics_file)
+    if live and legs:
+        start_live(smartApi, results["session"], results["instrument_index"], legs, replay=replay)
+    return results
+
+def logout(smartApi):
+    clear_session()
+    try:
+        smartApi.terminateSession(CLIENT_CODE)
+        print("🔒 Logout successful.")
+    except:
+        pass
+
+def main(live=False, replay=None, logout_on_exit=LOGOUT_ON_EXIT, metrics_file=METRICS_FILE, cassette=None,
+         screener=SCREENER_SOURCE, candle_file=CANDLE_FILE, deadline=SCAN_DEADLINE_SECONDS):
+    """
+    Runs one scan. With an active `Cassette` (see cassette.py) the run's SmartAPI, scrip
+    master and Chartink traffic is recorded to it, or replayed from it without network
+    access; replayed runs skip login, are not added to the scan history and do not use
+    the candle store.
+    """
+    session, load_index_fn, chartink_ttl = None, load_instrument_index, CHARTINK_CACHE_TTL
+    if cassette is None:
+        smartApi = RateLimitedSmartApi(SmartConnect(api_key=API_KEY))
+    else:
+        # Bypass the local caches so everything goes through (and into) the cassette
+        load_index_fn = lambda: load_instrument_index(cassette.scrip_master_cache_dir)
+        chartink_ttl = 0
+        if cassette.mode == "replay":
+            smartApi = RateLimitedSmartApi(cassette.wrap())
+            session, logout_on_exit = cassette.recorded_session(), False
         else:
-            print("❌ No losers found.")
+            smartApi = RateLimitedSmartApi(cassette.wrap(SmartConnect(api_key=API_KEY)))
+    history = None if cassette and cassette.mode == "replay" else ScanHistoryStore()
+    # Delta fetches depend on what is already stored, which a cassette cannot replay
+    candle_store = None if cassette else CandleStore()
+    try:
+        with ThreadPoolExecutor(max_workers=MAX_THREAD_WORKERS) as io_pool, ChartinkClient(cache_ttl=chartink_ttl) as chartink:
+            run_scan(smartApi, io_pool, chartink, session=session, live=live, replay=replay, history=history,
+                     metrics_file=metrics_file, load_index_fn=load_index_fn, screener=screener, candle_file=candle_file,
+                     candle_store=candle_store, deadline=deadline)
+    finally:
+        wait_for_exports()
+        if logout_on_exit:
+            logout(smartApi)
 
+def run_daemon(schedule=None, interval_minutes=None, logout_on_exit=LOGOUT_ON_EXIT, metrics_file=METRICS_FILE,
+               screener=SCREENER_SOURCE, candle_file=CANDLE_FILE, deadline=SCAN_DEADLINE_SECONDS):
+    """Keeps one process (session, scrip master index, Chartink session) warm and scans on a schedule."""
+    smartApi = RateLimitedSmartApi(SmartConnect(api_key=API_KEY))
+    history = ScanHistoryStore()
+    candle_store = CandleStore()
+    daemon = ScanDaemon(
+        smartApi,
+        CLIENT_CODE,
+        scan_fn=lambda *args, **kwargs: run_scan(*args, history=history, metrics_file=metrics_file, screener=screener,
+                                                 candle_file=candle_file, candle_store=candle_store, deadline=deadline,
+                                                 **kwargs),
+        login_fn=lambda: login(smartApi),
+        load_index_fn=load_instrument_index,
+        schedule=schedule or SCAN_SCHEDULE,
+        interval_minutes=interval_minutes,
+    )
+    try:
+        daemon.run_forever()
     finally:
-        try:
-            smartApi.terminateSession(CLIENT_CODE)
-            print("🔒 Logout successful.")
-        except:
-            pass
+        wait_for_exports()
+        if logout_on_exit:
+            logout(smartApi)
+
+def parse_deadline(value):
+    """--deadline value: "HH:MM[:SS]" (today, local time) or a number of seconds."""
+    if ":" in value:
+        for fmt in ("%H:%M:%S", "%H:%M"):
+            try:
+                return datetime.combine(datetime.now().date(), datetime.strptime(value, fmt).time())
+            except ValueError:
+                pass
+        raise argparse.ArgumentTypeError(f"expected HH:MM[:SS] or seconds, got {value!r}")
+    try:
+        return float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected HH:MM[:SS] or seconds, got {value!r}")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Scan top gainers/losers and their OTM options.")
+    parser.add_argument("--live", action="store_true",
+                        help="After the scan, stream LTPs over the SmartAPI WebSocket and update the tables live.")
+    parser.add_argument("--replay", metavar="FILE",
+                        help="With --live, replay ticks from a JSON-lines file instead of the WebSocket.")
+    parser.add_argument("--daemon", action="store_true",
+                        help="Stay running and scan at the SCAN_SCHEDULE times, keeping session and caches warm.")
+    parser.add_argument("--at", metavar="HH:MM", nargs="+",
+                        help="With --daemon, scan at these times instead of SCAN_SCHEDULE.")
+    parser.add_argument("--interval", metavar="MINUTES", type=float,
+                        help="With --daemon, scan every MINUTES instead of at fixed times.")
+    parser.add_argument("--logout", action="store_true", default=LOGOUT_ON_EXIT,
+                        help="End the SmartAPI session on exit instead of keeping it for the next run.")
+    parser.add_argument("--metrics", metavar="FILE", default=METRICS_FILE,
+                        help="Write per-scan timing and API metrics to FILE (.prom for Prometheus text, else JSON).")
+    parser.add_argument("--screener", choices=("chartink", "local"), default=SCREENER_SOURCE,
+                        help="Where gainers/losers come from: chartink.com, or the same conditions evaluated locally on candles.")
+    parser.add_argument("--candles", metavar="FILE", default=CANDLE_FILE,
+                        help="With --screener local, read 15-minute candles from this CSV instead of SmartAPI getCandleData.")
+    parser.add_argument("--deadline", metavar="HH:MM:SS|SECONDS", type=parse_deadline, default=SCAN_DEADLINE_SECONDS,
+                        help="Stop calling APIs at this time (or this many seconds into each scan) and show partial results.")
+    parser.add_argument("--record-session", metavar="FILE",
+                        help="Record every SmartAPI, scrip master and Chartink response of this run to a cassette FILE.")
+    parser.add_argument("--replay-session", metavar="FILE",
+                        help="Re-run a scan offline from a cassette recorded with --record-session.")
+    parser.add_argument("--realtime", action="store_true",
+                        help="With --replay-session, answer each call after its recorded latency instead of at once.")
+    args = parser.parse_args()
+    if args.daemon and (args.record_session or args.replay_session):
+        parser.error("--record-session/--replay-session cannot be combined with --daemon")
+    if args.record_session and args.replay_session:
+        parser.error("use either --record-session or --replay-session")
+    if args.daemon and isinstance(args.deadline, datetime):
+        parser.error("with --daemon, give --deadline in seconds (it applies to every scan)")
+    return args
 
 if __name__ == "__main__":
-    main()
+    args = parse_args()
+    if args.daemon:
+        run_daemon(schedule=args.at, interval_minutes=args.interval, logout_on_exit=args.logout,
+                   metrics_file=args.metrics, screener=args.screener, candle_file=args.candles, deadline=args.deadline)
+    elif args.record_session or args.replay_session:
+        mode, path = ("record", args.record_session) if args.record_session else ("replay", args.replay_session)
+        with Cassette(path, mode, realtime=args.realtime) as cassette:
+            main(live=args.live, replay=args.replay, logout_on_exit=args.logout, metrics_file=args.metrics,
+                 cassette=cassette, screener=args.screener, candle_file=args.candles, deadline=args.deadline)
+    else:
+        main(live=args.live, replay=args.replay, logout_on_exit=args.logout, metrics_file=args.metrics,
+             screener=args.screener, candle_file=args.candles, deadline=args.deadline)
@@ -5,151 +5,307 @@ Purpose:
     Contains the core logic for fetching and structuring option chain data.
 
 Functions:
-    get_option_data_for_single_stock(smartApi, symbol_name, instrument_list, nearest_expiry_str)
+    select_otm_contracts(instrument_index, symbol_name, nearest_expiry_str, spot_price)
+        -> Picks the nearest and "new" OTM strikes and their CE/PE contracts for a stock.
+    get_option_data_for_single_stock(smartApi, symbol_name, instrument_index, expiry="nearest", quote_cache=None)
         -> Fetches option data for a single stock.
-    build_otm_dataframe(smartApi, stock_df, instrument_list, nearest_expiry_str)
-        -> Orchestrates the parallel fetching and processing of data for multiple stocks.
+    build_otm_dataframe(smartApi, stock_df, instrument_index, expiries="nearest", executor=None, quote_cache=None)
+        -> Orchestrates the batched fetching and processing of data for multiple stocks,
+           for one or several expiries.
+    reshape_otm_table(df, selections, stock_df)
+        -> Vectorized long-to-wide reshape of fetched option rows into the OTM table.
+    mark_unfetched(out, unfetched, stock_df)
+        -> Adds the "Quote Status" column and a placeholder row per stock/expiry without quotes.
 
 Notes:
-    - This file relies on utility functions like `safe_ltp` from `utils.py`
-      to interact with the trading API.
+    - `build_otm_dataframe` fetches quotes through `QuoteBatcher` (see `quote_batcher.py`):
+      all spot tokens in one pass, then all selected CE/PE tokens in a second pass.
+    - `get_option_data_for_single_stock` still uses `safe_ltp` from `utils.py` for one-off lookups.
+    - Both accept a `quote_cache.QuoteCache` shared by concurrent or repeated calls, so a token
+      quoted recently (or being fetched by another leg right now) is not requested again.
+    - Instrument lookups go through `InstrumentIndex` (see `instrument_index.py`)
+      instead of scanning the scrip master for every symbol.
+    - Expiries may be "nearest", "next", "monthly" or explicit dates; each is resolved per
+      underlying from the index's expiry calendar, so expired dates simply select nothing.
+    - Quotes the broker never returned (scan deadline passed, circuit open; see `resilience.py`)
+      do not drop their stock: it stays in the table with "Quote Status" "unfetched" (no row
+      could be built) or "partial" (some prices missing). Fully quoted rows are "ok".
 """
-import time
+import numpy as np
 import pandas as pd
-from datetime import datetime, date
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from utils import safe_ltp, retry_sleep # Import the utility function from the utils file
-from options_config import SPOT_PRICE_INCREASE_PERCENTAGE, THREAD_WORKERS
-from tqdm import tqdm # New import for the progress bar
+from datetime import date
+from utils import safe_ltp # Import the utility function from the utils file
+from options_config import SPOT_PRICE_INCREASE_PERCENTAGE, RISK_FREE_RATE
+from instrument_index import InstrumentIndex, parse_expiry
+from option_ltp_and_greeks_calculator import implied_volatility_vectorized
+from quote_batcher import QuoteBatcher
+from scan_metrics import metrics
 
-def get_option_data_for_single_stock(smartApi, symbol_name, instrument_list, nearest_expiry_str):
+OPTION_TYPES = ["CE", "PE"]
+QUOTE_OK, QUOTE_PARTIAL, QUOTE_UNFETCHED = "ok", "partial", "unfetched"
+# Columns of `reshape_otm_table`'s output
+OTM_COLUMNS = ["Symbol", "Expiry", "Stock Name", "% Change", "Lot Size", "Nearest OTM Strike", "Nearest OTM CE",
+               "Nearest OTM PE", "New OTM Strike", "New OTM CE", "New OTM PE", "Gap", "CE IV", "CE P/L"]
+
+def select_otm_contracts(instrument_index, symbol_name, nearest_expiry_str, spot_price):
+    """
+    Selects the nearest OTM strike and the first OTM strike above the "new" spot price.
+
+    Args:
+        instrument_index (InstrumentIndex): Index built once from the scrip master.
+        symbol_name (str): The symbol of the stock (e.g., "RELIANCE").
+        nearest_expiry_str (str): The expiry date string (e.g., "30SEP2025").
+        spot_price (float): Current spot price of the stock.
+
+    Returns:
+        tuple (int, list): The lot size and a list of (strike, option_type, instrument) tuples.
+        The list is empty if no option contracts or OTM strikes are found.
+    """
+    # Find lot size from a relevant F&O instrument record
+    opt_rows = instrument_index.get_derivatives(symbol_name, nearest_expiry_str, "OPTSTK")
+    if not opt_rows:
+        return 0, []
+
+    # Take the lot size from the first valid option record found
+    lot_size = int(opt_rows[0].get("lotsize", 1))
+
+    # Calculate a hypothetical future price using the config variable
+    new_spot_price = round(spot_price * (1 + SPOT_PRICE_INCREASE_PERCENTAGE), 2)
+
+    selected_strikes = []
+    otm_current = instrument_index.next_strike_above(symbol_name, nearest_expiry_str, spot_price)
+    if otm_current:
+        selected_strikes.append(otm_current)
+    otm_new = instrument_index.next_strike_above(symbol_name, nearest_expiry_str, new_spot_price, exclude=otm_current)
+    if otm_new:
+        selected_strikes.append(otm_new)
+
+    contracts = []
+    for strike in selected_strikes:
+        for option_type, inst in instrument_index.get_options_at_strike(symbol_name, nearest_expiry_str, strike).items():
+            contracts.append((strike, option_type, inst))
+    return lot_size, contracts
+
+def _option_row(symbol_name, strike, option_type, ltp, lot_size):
+    return {
+        "Symbol": symbol_name,
+        "Strike Price": float(f"{strike:.2f}"),
+        "Option Type": option_type,
+        "LTP": float(f"{ltp:.2f}"),
+        "Lot Size": lot_size
+    }
+
+def get_option_data_for_single_stock(smartApi, symbol_name, instrument_index, expiry="nearest", quote_cache=None):
     """
     Fetches spot price and specific OTM call/put options data for a single stock.
 
     Args:
         smartApi: The SmartConnect API object.
         symbol_name (str): The symbol of the stock (e.g., "RELIANCE").
-        instrument_list (list): The list of all instruments.
-        nearest_expiry_str (str): The expiry date string (e.g., "30SEP2025").
+        instrument_index (InstrumentIndex): Index built once from the scrip master.
+        expiry (str): "nearest", "next", "monthly" or an expiry date string (e.g., "30SEP2025").
+        quote_cache (QuoteCache, optional): Shared LTP cache.
 
     Returns:
         tuple (list or None, float): A tuple containing a list of dictionaries with option data and the spot price, or (None, 0.0) if data is not found.
     """
     try:
         # Find spot price from the equity segment
-        spot_rec = next((inst for inst in instrument_list if inst.get("symbol") == f"{symbol_name}-EQ" and inst.get("exch_seg") == "NSE"), None)
+        spot_rec = instrument_index.get_equity(f"{symbol_name}-EQ", "NSE")
         if not spot_rec:
             return None, 0.0
-        spot_price = safe_ltp(smartApi, "NSE", spot_rec["symbol"], spot_rec["token"])
+        spot_price = safe_ltp(smartApi, "NSE", spot_rec["symbol"], spot_rec["token"], cache=quote_cache)
         if not spot_price:
             return None, 0.0
-
-        # Calculate a hypothetical future price using the config variable
-        new_spot_price = round(spot_price * (1 + SPOT_PRICE_INCREASE_PERCENTAGE), 2)
-        nearest_expiry = datetime.strptime(nearest_expiry_str, "%d%b%Y").date()
-        if (nearest_expiry - date.today()).days < 0:
+        expiry_str = instrument_index.resolve_expiry(symbol_name, expiry)
+        if not expiry_str:
             return None, 0.0
 
-        # Find lot size from a relevant F&O instrument record
-        opt_rows = [i for i in instrument_list if i.get("name") == symbol_name and i.get("expiry") == nearest_expiry_str and i.get("instrumenttype") == "OPTSTK"]
-        if not opt_rows:
-            return None, spot_price
-        
-        # Take the lot size from the first valid option record found
-        lot_size = int(opt_rows[0].get("lotsize", 1))
-
-        strike_prices = sorted({float(i["strike"]) / 100.0 for i in opt_rows})
-        selected_strikes = []
-        otm_current = next((s for s in strike_prices if s > spot_price), None)
-        if otm_current:
-            selected_strikes.append(otm_current)
-        otm_new = next((s for s in strike_prices if s > new_spot_price and s != otm_current), None)
-        if otm_new:
-            selected_strikes.append(otm_new)
-
-        if not selected_strikes:
+        lot_size, contracts = select_otm_contracts(instrument_index, symbol_name, expiry_str, spot_price)
+        if not contracts:
             return None, spot_price
 
         data_for_strikes = []
-        for strike_input in selected_strikes:
-            for inst in opt_rows:
-                if float(inst.get("strike", "0")) / 100.0 == strike_input:
-                    option_type = "CE" if inst.get("symbol", "").endswith("CE") else "PE"
-                    ltp = safe_ltp(smartApi, inst["exch_seg"], inst["symbol"], inst["token"])
-                    if ltp > 0:
-                        data_for_strikes.append({
-                            "Symbol": symbol_name,
-                            "Strike Price": float(f"{strike_input:.2f}"),
-                            "Option Type": option_type,
-                            "LTP": float(f"{ltp:.2f}"),
-                            "Lot Size": lot_size
-                        })
+        for strike, option_type, inst in contracts:
+            ltp = safe_ltp(smartApi, inst["exch_seg"], inst["symbol"], inst["token"], cache=quote_cache)
+            if ltp > 0:
+                data_for_strikes.append(_option_row(symbol_name, strike, option_type, ltp, lot_size))
         return data_for_strikes or None, spot_price
     except Exception as e:
         print(f"Error fetching data for {symbol_name}: {e}")
         return None, 0.0
 
-def build_otm_dataframe(smartApi, stock_df, instrument_list, nearest_expiry_str):
+def build_otm_dataframe(smartApi, stock_df, instrument_index, expiries="nearest", executor=None, quote_cache=None):
     """
-    Builds a DataFrame of OTM option data for a list of stocks using parallel processing.
+    Builds a DataFrame of OTM option data for a list of stocks using batched quote requests.
 
     Args:
         smartApi: The SmartConnect API object.
         stock_df (pd.DataFrame): DataFrame of stocks from the screener.
-        instrument_list (list): The list of all instruments.
-        nearest_expiry_str (str): The expiry date string.
+        instrument_index (InstrumentIndex or list): Index built from the scrip master.
+            A raw instrument list is also accepted and indexed once here.
+        expiries (str or list[str]): Expiry choice(s): "nearest", "next", "monthly" or expiry
+            date strings. Several expiries are scanned in one pass and share the spot quotes.
+        executor (Executor, optional): Worker pool shared with other concurrent scans.
+        quote_cache (QuoteCache, optional): LTP cache shared with other concurrent scans.
 
     Returns:
-        pd.DataFrame: A DataFrame with combined stock and option data.
+        pd.DataFrame: A DataFrame with combined stock and option data, one row per stock and expiry.
     """
-    symbols = stock_df["Symbol"].tolist()
-    final_data = []
-    # Use the THREAD_WORKERS variable from the config file
-    with ThreadPoolExecutor(max_workers=THREAD_WORKERS) as executor:
-        future_to_symbol = {
-            executor.submit(get_option_data_for_single_stock, smartApi, symbol, instrument_list, nearest_expiry_str): symbol
-            for symbol in symbols
-        }
-        # Wrap the iterator with tqdm to show a progress bar
-        for future in tqdm(as_completed(future_to_symbol), total=len(symbols), desc="Fetching OTM Data"):
-            option_data, spot_price = future.result()
-            if option_data:
-                # Add spot_price to each dictionary in the list
-                for item in option_data:
-                    item['Spot Price'] = spot_price
-                final_data.extend(option_data)
-            retry_sleep(0.02) # Add a small delay between processing each stock
-
-    if not final_data:
+    if not isinstance(instrument_index, InstrumentIndex):
+        instrument_index = InstrumentIndex(instrument_index)
+    if isinstance(expiries, str):
+        expiries = [expiries]
+
+    batcher = QuoteBatcher(smartApi, executor=executor, cache=quote_cache)
+
+    # Pass 1: spot prices for every symbol
+    spot_recs = {}
+    for symbol in stock_df["Symbol"].tolist():
+        spot_rec = instrument_index.get_equity(f"{symbol}-EQ", "NSE")
+        if spot_rec:
+            spot_recs[symbol] = spot_rec
+            batcher.add("NSE", spot_rec["token"])
+    with metrics.stage("spot_fetch"):
+        batcher.fetch(desc="Fetching Spot LTPs")
+
+    # Pass 2: pick OTM strikes for every expiry from the same spot prices, then fetch every
+    # selected CE/PE together
+    selections = {}
+    for symbol, spot_rec in spot_recs.items():
+        spot_price = batcher.get_ltp("NSE", spot_rec["token"])
+        if not spot_price:
+            continue
+        for spec in expiries:
+            expiry_str = instrument_index.resolve_expiry(symbol, spec)
+            if not expiry_str or (symbol, expiry_str) in selections:
+                continue
+            lot_size, contracts = select_otm_contracts(instrument_index, symbol, expiry_str, spot_price)
+            if contracts:
+                selections[(symbol, expiry_str)] = (spot_price, lot_size, contracts)
+                for _, _, inst in contracts:
+                    batcher.add(inst["exch_seg"], inst["token"])
+    with metrics.stage("option_fetch"):
+        batcher.fetch(desc="Fetching OTM Data")
+
+    # Collect results straight into typed columns
+    symbols, expiry_strs, strikes, option_types, ltps = [], [], [], [], []
+    for (symbol, expiry_str), (spot_price, lot_size, contracts) in selections.items():
+        for strike, option_type, inst in contracts:
+            ltp = batcher.get_ltp(inst["exch_seg"], inst["token"])
+            if ltp > 0:
+                symbols.append(symbol)
+                expiry_strs.append(expiry_str)
+                strikes.append(strike)
+                option_types.append(option_type)
+                ltps.append(ltp)
+
+    # Stocks whose quotes never came back are kept and marked rather than silently dropped
+    unfetched = [(symbol, None, np.nan) for symbol, spot_rec in spot_recs.items()
+                 if batcher.missing("NSE", spot_rec["token"])]
+    unfetched += [(symbol, expiry_str, lot_size) for (symbol, expiry_str), (_, lot_size, contracts) in selections.items()
+                  if any(batcher.missing(inst["exch_seg"], inst["token"]) for _, _, inst in contracts)]
+
+    if not symbols:
+        return mark_unfetched(pd.DataFrame(), unfetched, stock_df) if unfetched else pd.DataFrame()
+
+    df = pd.DataFrame({
+        "Symbol": symbols,
+        "Expiry": expiry_strs,
+        "Strike Price": np.asarray(strikes, dtype=np.float64),
+        "Option Type": pd.Categorical(option_types, categories=OPTION_TYPES),
+        "LTP": np.asarray(ltps, dtype=np.float64),
+    })
+    with metrics.stage("reshape"):
+        return mark_unfetched(reshape_otm_table(df, selections, stock_df), unfetched, stock_df)
+
+def reshape_otm_table(df, selections, stock_df):
+    """
+    Turns long (Symbol, Expiry, Strike Price, Option Type, LTP) rows into one wide row per
+    stock and expiry.
+
+    The lowest strike with data becomes the nearest OTM strike and the next one the new OTM
+    strike; stock/expiry pairs with fewer than two such strikes are dropped.
+
+    Args:
+        df (pd.DataFrame): Long option rows.
+        selections (dict): (symbol, expiry) -> (spot_price, lot_size, contracts) from strike selection.
+        stock_df (pd.DataFrame): Screener rows with "Symbol", "Stock Name" and "% Change".
+
+    Returns:
+        pd.DataFrame: Columns as expected by `table_theme.get_table_headers` (minus "Sector").
+    """
+    keys = ["Symbol", "Expiry"]
+    # 0 = nearest OTM strike, 1 = new OTM strike
+    df["Rank"] = df.groupby(keys)["Strike Price"].rank(method="dense").astype(np.int64) - 1
+    df = df[df.groupby(keys)["Rank"].transform("max") >= 1]
+    df = df[df["Rank"] < 2]
+    if df.empty:
         return pd.DataFrame()
 
-    df = pd.DataFrame(final_data)
-    df = pd.merge(df, stock_df, on="Symbol", how="left")
-    df = df[["Symbol", "Stock Name", "% Change", "Strike Price", "Option Type", "LTP", "Lot Size", "Spot Price"]]
-
-    pivot_df = df.pivot_table(index=["Symbol", "Stock Name", "% Change", "Strike Price", "Lot Size", "Spot Price"],
-                              columns="Option Type", values="LTP", aggfunc="first").reset_index()
-    if "CE" not in pivot_df.columns: pivot_df["CE"] = None
-    if "PE" not in pivot_df.columns: pivot_df["PE"] = None
-
-    merged_rows = []
-    for (sym, name, pct, sp), group in pivot_df.groupby(["Symbol", "Stock Name", "% Change", "Spot Price"]):
-        group = group.sort_values("Strike Price").reset_index(drop=True)
-        if len(group) >= 2:
-            row = {
-                "Symbol": sym,
-                "Stock Name": name,
-                "% Change": float(f"{pct:.2f}"),
-                "Lot Size": int(group.loc[0, "Lot Size"]),
-                "Nearest OTM Strike": float(f"{group.loc[0, 'Strike Price']:.2f}"),
-                "Nearest OTM CE": float(f"{(group.loc[0, 'CE'] or 0):.2f}"),
-                "Nearest OTM PE": float(f"{(group.loc[0, 'PE'] or 0):.2f}"),
-                "New OTM Strike": float(f"{group.loc[1, 'Strike Price']:.2f}"),
-                "New OTM CE": float(f"{(group.loc[1, 'CE'] or 0):.2f}"),
-                "New OTM PE": float(f"{(group.loc[1, 'PE'] or 0):.2f}"),
-                "Gap": float(f"{group.loc[0, 'Strike Price'] - sp:.2f}")
-            }
-            row["CE P/L"] = float(f"{row['Lot Size'] * (row['Nearest OTM CE'] - row['New OTM CE']):.2f}")
-            merged_rows.append(row)
-
-    return pd.DataFrame(merged_rows)
\ No newline at end of file
+    wide = (df.set_index(keys + ["Rank", "Option Type"])[["Strike Price", "LTP"]]
+              .unstack(["Rank", "Option Type"])
+              .reindex(columns=pd.MultiIndex.from_product([["Strike Price", "LTP"], [0, 1], OPTION_TYPES])))
+
+    meta = pd.DataFrame(
+        [(spot, lot) for spot, lot, _ in selections.values()],
+        index=pd.MultiIndex.from_tuples(list(selections), names=keys),
+        columns=["Spot Price", "Lot Size"]).reindex(wide.index)
+    info = (stock_df.drop_duplicates("Symbol").set_index("Symbol")[["Stock Name", "% Change"]]
+                    .reindex(wide.index.get_level_values("Symbol")).set_index(wide.index))
+
+    out = pd.DataFrame(index=wide.index)
+    out["Stock Name"] = info["Stock Name"]
+    out["% Change"] = info["% Change"].astype(np.float64).round(2)
+    out["Lot Size"] = meta["Lot Size"].astype(np.int64)
+    for rank, prefix in ((0, "Nearest OTM"), (1, "New OTM")):
+        out[f"{prefix} Strike"] = wide[("Strike Price", rank, "CE")].fillna(wide[("Strike Price", rank, "PE")]).round(2)
+        out[f"{prefix} CE"] = wide[("LTP", rank, "CE")].round(2)
+        out[f"{prefix} PE"] = wide[("LTP", rank, "PE")].round(2)
+    out["Gap"] = (out["Nearest OTM Strike"] - meta["Spot Price"]).round(2)
+    today = date.today()
+    years = np.array([(parse_expiry(e) - today).days / 365.0 for e in wide.index.get_level_values("Expiry")])
+    iv, _ = implied_volatility_vectorized(out["Nearest OTM CE"].to_numpy(np.float64), meta["Spot Price"].to_numpy(np.float64),
+                                          out["Nearest OTM Strike"].to_numpy(np.float64), years, RISK_FREE_RATE, "CE")
+    out["CE IV"] = np.round(iv, 4)
+    out["CE P/L"] = (out["Lot Size"] * (out["Nearest OTM CE"] - out["New OTM CE"])).round(2)
+
+    # Drop stocks the screener frame does not know about, as the old left-merge + groupby did
+    out = out[info["Stock Name"].notna()]
+    return out.reset_index()
+
+def mark_unfetched(out, unfetched, stock_df):
+    """
+    Adds "Quote Status" to the OTM table and a placeholder row for every stock/expiry whose
+    quotes never arrived.
+
+    Args:
+        out (pd.DataFrame): Table from `reshape_otm_table` (may be empty).
+        unfetched (list[tuple]): (symbol, expiry or None, lot size or NaN) with missing quotes.
+        stock_df (pd.DataFrame): Screener rows with "Symbol", "Stock Name" and "% Change".
+
+    Returns:
+        pd.DataFrame: `out` with its rows marked, plus placeholder rows (prices left empty).
+    """
+    flagged = {(symbol, expiry) for symbol, expiry, _ in unfetched}
+    if not out.empty:
+        out["Quote Status"] = [QUOTE_PARTIAL if key in flagged else QUOTE_OK
+                               for key in zip(out["Symbol"], out["Expiry"])]
+        built = set(zip(out["Symbol"], out["Expiry"]))
+    else:
+        built = set()
+    built_symbols = {symbol for symbol, _ in built}
+    # A stock without a spot quote has no expiry; one whose options failed gets a row per expiry
+    rows = [(symbol, expiry, lot_size) for symbol, expiry, lot_size in unfetched
+            if (symbol, expiry) not in built and (expiry is not None or symbol not in built_symbols)]
+    if not rows:
+        return out
+
+    info = stock_df.drop_duplicates("Symbol").set_index("Symbol")
+    missing = pd.DataFrame(rows, columns=["Symbol", "Expiry", "Lot Size"])
+    missing = missing[missing["Symbol"].isin(info.index)].reset_index(drop=True)
+    missing["Stock Name"] = missing["Symbol"].map(info["Stock Name"])
+    missing["% Change"] = pd.to_numeric(missing["Symbol"].map(info["% Change"])).round(2)
+    missing["Quote Status"] = QUOTE_UNFETCHED
+    missing = missing.reindex(columns=OTM_COLUMNS + ["Quote Status"])
+    return pd.concat([out, missing], ignore_index=True) if not out.empty else missing
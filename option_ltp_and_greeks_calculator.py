@@ -12,7 +12,13 @@ Functions:
       - r: Risk-free interest rate.
       - sigma: Volatility (standard deviation).
       - option_type: 'call' or 'put'.
-      -> Returns a dictionary of calculated Greeks.
+      -> Returns a dictionary of calculated Greeks (a scalar view of `black_scholes_vectorized`).
+    - black_scholes_vectorized(S, K, T, r, sigma, option_type):
+      - Same inputs as arrays (scalars broadcast); option_type may be "call"/"put", "CE"/"PE" or booleans (True = call).
+      -> Returns a dictionary of NumPy arrays: price, delta, gamma, vega, theta, rho and a `valid` mask.
+    - implied_volatility_vectorized(price, S, K, T, r, option_type):
+      - Solves implied volatility for whole option chains at once.
+      -> Returns (iv, status) arrays; status is one of the IV_* codes below.
 
 Notes:
     - This model assumes European options, no dividends, and constant volatility/risk-free rate.
@@ -20,7 +26,19 @@ Notes:
     - The formulas provided are for a non-dividend-paying stock, a common simplification of the Black-Scholes model.
 """
 import math
-from scipy.stats import norm
+import numpy as np
+from scipy.special import ndtr
+
+CALL_FLAGS = ("call", "c", "ce")
+
+# Implied volatility solver status codes
+IV_CONVERGED = 0
+IV_NOT_CONVERGED = 1
+IV_OUT_OF_BOUNDS = 2    # price outside the no-arbitrage range, no volatility reproduces it
+IV_INVALID_INPUT = 3
+IV_STATUS_NAMES = {IV_CONVERGED: "ok", IV_NOT_CONVERGED: "not converged",
+                   IV_OUT_OF_BOUNDS: "out of bounds", IV_INVALID_INPUT: "invalid"}
+SQRT_2PI = math.sqrt(2 * math.pi)
 
 # Standard Normal Probability Density Function
 def normal_pdf(x):
@@ -40,48 +58,158 @@ def calculate_greeks(S, K, T, r, sigma, option_type):
         option_type (str): "call" or "put".
 
     Returns:
-        dict: A dictionary containing the calculated Greeks.
+        dict: A dictionary containing the calculated Greeks, all None if the inputs are invalid
+        (e.g. T <= 0).
     """
-    if T <= 0:
+    result = black_scholes_vectorized(S, K, T, r, sigma, option_type)
+    if not result["valid"]:
         return {"delta": None, "gamma": None, "vega": None, "theta": None}
-    
-    # Calculate d1 and d2, the core components of the Black-Scholes model
-    d1 = (math.log(S / K) + (r + sigma**2 / 2) * T) / (sigma * math.sqrt(T))
-    d2 = d1 - sigma * math.sqrt(T)
-
-    # N(d1) and N(d2) are the cumulative probability functions for a standard normal distribution
-    # N'(d1) is the standard normal probability density function
-    Nd1 = norm.cdf(d1)
-    Nd2 = norm.cdf(d2)
-    N_prime_d1 = normal_pdf(d1)
-
-    # Initialize Greeks dictionary
-    greeks = {}
-
-    if option_type == 'call':
-        # Delta: Measures the rate of change of the option price with respect to a change in the underlying asset's price.
-        # Formula: N(d1)
-        greeks["delta"] = Nd1
-        
-        # Theta: Measures the rate of decline in the value of an option over time (time decay).
-        # Formula: -((S * N'(d1) * sigma) / (2 * sqrt(T))) - (r * K * exp(-r * T) * N(d2))
-        greeks["theta"] = -((S * N_prime_d1 * sigma) / (2 * math.sqrt(T))) - (r * K * math.exp(-r * T) * Nd2)
-        
-    elif option_type == 'put':
-        # Delta: Measures the rate of change of the option price with respect to a change in the underlying asset's price.
-        # Formula: N(d1) - 1
-        greeks["delta"] = Nd1 - 1
-        
-        # Theta: Measures the rate of decline in the value of an option over time (time decay).
-        # Formula: -((S * N'(d1) * sigma) / (2 * sqrt(T))) + (r * K * exp(-r * T) * (1 - N(d2)))
-        greeks["theta"] = -((S * N_prime_d1 * sigma) / (2 * math.sqrt(T))) + (r * K * math.exp(-r * T) * (1 - Nd2))
-    
-    # Gamma: Measures the rate of change of Delta. Gamma is the same for both calls and puts.
-    # Formula: N'(d1) / (S * sigma * sqrt(T))
-    greeks["gamma"] = N_prime_d1 / (S * sigma * math.sqrt(T))
-    
-    # Vega: Measures the sensitivity to volatility. Vega is the same for both calls and puts.
-    # Formula: S * N'(d1) * sqrt(T)
-    greeks["vega"] = S * N_prime_d1 * math.sqrt(T)
-
-    return greeks
\ No newline at end of file
+    return {greek: float(result[greek]) for greek in ("delta", "gamma", "vega", "theta")}
+
+def _is_call(option_type):
+    option_type = np.asarray(option_type)
+    if option_type.dtype == bool:
+        return option_type
+    return np.isin(np.char.lower(option_type.astype(str)), CALL_FLAGS)
+
+def black_scholes_vectorized(S, K, T, r, sigma, option_type):
+    """
+    Prices European options and computes their Greeks for whole arrays in one pass.
+
+    Args:
+        S (array-like): Spot prices of the underlying.
+        K (array-like): Strike prices.
+        T (array-like): Times to expiry in years.
+        r (array-like): Annualized risk-free rates.
+        sigma (array-like): Annualized volatilities.
+        option_type (array-like): "call"/"put", "CE"/"PE", or booleans (True = call).
+
+    Returns:
+        dict: NumPy arrays keyed "price", "delta", "gamma", "vega", "theta", "rho" and "valid".
+        Units match `calculate_greeks`: theta per year, vega and rho per 1.00 change.
+        Elements with T <= 0, non-positive S/K/sigma or non-finite inputs are NaN and
+        have `valid` set to False.
+    """
+    S, K, T, r, sigma, is_call = np.broadcast_arrays(
+        np.asarray(S, dtype=float), np.asarray(K, dtype=float), np.asarray(T, dtype=float),
+        np.asarray(r, dtype=float), np.asarray(sigma, dtype=float), _is_call(option_type))
+
+    valid = (np.isfinite(S) & np.isfinite(K) & np.isfinite(T) & np.isfinite(r) & np.isfinite(sigma)
+             & (S > 0) & (K > 0) & (T > 0) & (sigma > 0))
+
+    with np.errstate(all="ignore"):
+        sqrt_T = np.sqrt(T)
+        sig_sqrt_T = sigma * sqrt_T
+        d1 = (np.log(S / K) + (r + 0.5 * sigma ** 2) * T) / sig_sqrt_T
+        d2 = d1 - sig_sqrt_T
+        discounted_K = K * np.exp(-r * T)
+        pdf_d1 = np.exp(-0.5 * d1 * d1) / SQRT_2PI
+        # Signed terms: +1 for calls, -1 for puts
+        sign = np.where(is_call, 1.0, -1.0)
+        Nd1 = ndtr(sign * d1)
+        Nd2 = ndtr(sign * d2)
+
+        price = sign * (S * Nd1 - discounted_K * Nd2)
+        delta = sign * Nd1
+        gamma = pdf_d1 / (S * sig_sqrt_T)
+        vega = S * pdf_d1 * sqrt_T
+        theta = -(S * pdf_d1 * sigma) / (2 * sqrt_T) - sign * r * discounted_K * Nd2
+        rho = sign * discounted_K * T * Nd2
+
+    nan = np.nan
+    return {
+        "price": np.where(valid, price, nan),
+        "delta": np.where(valid, delta, nan),
+        "gamma": np.where(valid, gamma, nan),
+        "vega": np.where(valid, vega, nan),
+        "theta": np.where(valid, theta, nan),
+        "rho": np.where(valid, rho, nan),
+        "valid": valid,
+    }
+
+def _initial_iv_guess(price, S, discounted_K, T, is_call):
+    """
+    Corrado-Miller approximation, which extends Brenner-Subrahmanyam (exact at the money)
+    to strikes away from the money. Puts are converted to calls via put-call parity.
+    """
+    call_price = np.where(is_call, price, price + S - discounted_K)
+    half_moneyness = (S - discounted_K) / 2
+    radicand = np.maximum((call_price - half_moneyness) ** 2 - (S - discounted_K) ** 2 / math.pi, 0.0)
+    sig_sqrt_T = SQRT_2PI / (S + discounted_K) * (call_price - half_moneyness + np.sqrt(radicand))
+    return sig_sqrt_T / np.sqrt(T)
+
+def implied_volatility_vectorized(price, S, K, T, r, option_type, tol=1.0e-5, max_iter=50,
+                                  sigma_bounds=(1.0e-4, 10.0)):
+    """
+    Solves Black-Scholes implied volatility for arrays of contracts together.
+
+    Starts from a Corrado-Miller guess and takes Newton steps, falling back to bisection
+    of a per-element bracket whenever a Newton step is undefined or leaves the bracket.
+    Each element stops iterating as soon as it converges.
+
+    Args:
+        price (array-like): Observed option prices (LTP); scalars broadcast like the other inputs.
+        S (array-like): Spot prices of the underlying.
+        K (array-like): Strike prices.
+        T (array-like): Times to expiry in years.
+        r (array-like): Annualized risk-free rates.
+        option_type (array-like): "call"/"put", "CE"/"PE", or booleans (True = call).
+        tol (float): Absolute price tolerance.
+        max_iter (int): Maximum solver iterations.
+        sigma_bounds (tuple): Lower and upper volatility bounds of the search bracket.
+
+    Returns:
+        tuple (np.ndarray, np.ndarray): Implied volatilities (NaN unless converged) and
+        per-element status codes (IV_CONVERGED, IV_NOT_CONVERGED, IV_OUT_OF_BOUNDS, IV_INVALID_INPUT),
+        both in the broadcast shape of the inputs (0-d for all-scalar inputs).
+    """
+    broadcast = np.broadcast_arrays(
+        np.asarray(price, dtype=float), np.asarray(S, dtype=float), np.asarray(K, dtype=float),
+        np.asarray(T, dtype=float), np.asarray(r, dtype=float), _is_call(option_type))
+    shape = broadcast[0].shape
+    # The solver works on flat element indices; scalars and N-d inputs are flattened and reshaped back
+    price, S, K, T, r, is_call = (np.ravel(a) for a in broadcast)
+
+    status = np.full(price.shape, IV_NOT_CONVERGED, dtype=np.int8)
+    valid = (np.isfinite(price) & np.isfinite(S) & np.isfinite(K) & np.isfinite(T) & np.isfinite(r)
+             & (price > 0) & (S > 0) & (K > 0) & (T > 0))
+    status[~valid] = IV_INVALID_INPUT
+
+    with np.errstate(all="ignore"):
+        discounted_K = K * np.exp(-r * T)
+        lower = np.where(is_call, np.maximum(S - discounted_K, 0.0), np.maximum(discounted_K - S, 0.0))
+        upper = np.where(is_call, S, discounted_K)
+    in_bounds = (price > lower) & (price < upper)
+    status[valid & ~in_bounds] = IV_OUT_OF_BOUNDS
+
+    sigma_min, sigma_max = sigma_bounds
+    lo = np.full(price.shape, sigma_min)
+    hi = np.full(price.shape, sigma_max)
+    with np.errstate(all="ignore"):
+        sigma = np.clip(_initial_iv_guess(price, S, discounted_K, T, is_call), sigma_min, sigma_max)
+    sigma = np.where(np.isfinite(sigma), sigma, 0.5 * (sigma_min + sigma_max))
+
+    active = np.flatnonzero(valid & in_bounds)
+    for _ in range(max_iter):
+        if active.size == 0:
+            break
+        bs = black_scholes_vectorized(S[active], K[active], T[active], r[active], sigma[active], is_call[active])
+        diff = bs["price"] - price[active]
+
+        done = np.abs(diff) < tol
+        status[active[done]] = IV_CONVERGED
+
+        # Price is increasing in sigma, so the sign of diff tells which side of the root we are on
+        too_high = diff > 0
+        hi[active] = np.where(too_high, sigma[active], hi[active])
+        lo[active] = np.where(too_high, lo[active], sigma[active])
+
+        with np.errstate(all="ignore"):
+            newton = sigma[active] - diff / bs["vega"]
+        use_newton = np.isfinite(newton) & (newton > lo[active]) & (newton < hi[active])
+        step = np.where(use_newton, newton, 0.5 * (lo[active] + hi[active]))
+        sigma[active] = np.where(done, sigma[active], step)
+        active = active[~done]
+
+    iv = np.where(status == IV_CONVERGED, sigma, np.nan)
+    return iv.reshape(shape), status.reshape(shape)
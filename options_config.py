@@ -7,18 +7,146 @@ Purpose:
     management and updates.
 
 Editable:
-    - NEAREST_EXPIRY_STR: The target options expiry date.
+    - SCAN_EXPIRIES: Option expiries to scan ("nearest", "next", "monthly" or dates).
     - SPOT_PRICE_INCREASE_PERCENTAGE: The percentage to calculate the "new" spot price.
-    - THREAD_WORKERS: Number of threads for parallel data fetching.
+    - RISK_FREE_RATE: Annualized risk-free rate for IV/Greeks.
+    - LIVE_MAX_FPS: Maximum re-renders per second in `--live` mode.
+    - SCAN_SCHEDULE / JWT_REFRESH_AFTER_HOURS: Scan times and session refresh for `--daemon` mode.
+    - SESSION_FILE / SESSION_MAX_AGE_HOURS / LOGOUT_ON_EXIT: Saved-session reuse between runs.
+    - THREAD_WORKERS: Starting number of concurrent SmartAPI calls.
+    - MIN_THREAD_WORKERS / MAX_THREAD_WORKERS: Bounds for the adaptive concurrency.
+    - TARGET_API_LATENCY: Latency above which concurrency backs off.
+    - API_RATE_LIMITS: Per-endpoint SmartAPI requests-per-second and burst.
+    - MARKET_DATA_BATCH_SIZE: Tokens per SmartAPI market-data request.
+    - QUOTE_CACHE_TTL: Seconds a fetched LTP is reused within a scan or session.
+    - SCAN_DEADLINE_SECONDS / SCAN_RETRY_BUDGET: Time and retries one scan may spend before returning partial results.
+    - CIRCUIT_WINDOW / CIRCUIT_MIN_CALLS / CIRCUIT_FAILURE_RATE / CIRCUIT_COOLDOWN: Per-endpoint circuit breakers.
+    - ANALYTICS_WORKERS / ANALYTICS_MIN_CHUNK_ROWS / CHAIN_FETCH_GROUP_SIZE: Process pool for full-chain Greeks.
+    - SCRIP_MASTER_CACHE_DIR: Folder for the per-day scrip master cache.
+    - SCRIP_MASTER_SEGMENTS: Exchange segments kept from the scrip master while it downloads.
+    - CHARTINK_CACHE_TTL / CHARTINK_CACHE_DIR: Lifetime and folder of cached Chartink results.
+    - SCREENER_SOURCE / CANDLE_FILE / LOCAL_SCREENER_LOOKBACK_DAYS: Chartink or the local screener, and its candles.
+    - CANDLE_STORE_DIR: Folder where fetched candles are kept, so later runs only fetch new ones.
+    - SCAN_HISTORY_DB / EXPORT_EXCEL: Scan history database and whether Excel files are also written.
+    - SHOW_SCAN_SUMMARY / METRICS_FILE: End-of-scan timing/API summary and where to write it.
+    - SHOW_SECTOR_BREADTH / SECTOR_CACHE_DIR: Per-sector breadth table and the sector map cache.
 """
+import os
 
 # --- Options Data Configuration ---
-NEAREST_EXPIRY_STR = "30SEP2025"
+# Expiries to scan, resolved per stock from the scrip master: "nearest", "next",
+# "monthly" (last expiry in the nearest expiry's month) or a date like "30SEP2025".
+# Listing several scans them all in one pass, reusing the same spot quotes.
+SCAN_EXPIRIES = ["nearest"]
 
 # --- Analysis & Performance Configuration ---
 # Percentage increase to calculate the hypothetical "new" spot price for OTM analysis.
 SPOT_PRICE_INCREASE_PERCENTAGE = 0.02
 
-# Number of parallel workers for fetching option data.
-# Adjust based on your system's capabilities and API rate limits.
-THREAD_WORKERS = 4
\ No newline at end of file
+# Annualized risk-free rate used for implied volatility and Greeks.
+RISK_FREE_RATE = 0.07
+
+# Frame-rate cap for the live table (re-renders per second).
+LIVE_MAX_FPS = 4
+
+# --- Daemon Configuration ---
+# Daily scan windows (HH:MM, local time) for `main.py --daemon`.
+SCAN_SCHEDULE = ["10:15", "12:17", "15:30"]
+# Refresh the SmartAPI JWT with the refresh token once the session is this old.
+JWT_REFRESH_AFTER_HOURS = 6
+
+# Starting number of concurrent SmartAPI calls. At runtime the limit adapts between
+# MIN_THREAD_WORKERS and MAX_THREAD_WORKERS (see rate_limiter.py): it grows while calls
+# stay under TARGET_API_LATENCY seconds and halves when the broker reports rate limiting.
+THREAD_WORKERS = 4
+MIN_THREAD_WORKERS = 1
+MAX_THREAD_WORKERS = 16
+TARGET_API_LATENCY = 0.5
+
+# SmartAPI limits per endpoint: method name -> (requests per second, burst).
+# "default" applies to any SmartConnect method not listed here.
+API_RATE_LIMITS = {
+    "default": (10, 10),
+    "ltpData": (10, 10),
+    "getMarketData": (10, 10),
+    "getCandleData": (3, 3),
+    "generateSession": (1, 1),
+    "generateToken": (1, 1),
+}
+
+# A scan stops issuing calls SCAN_DEADLINE_SECONDS after it starts (None: no deadline) and
+# reports what it has, marking rows whose quotes did not arrive as "unfetched". Retries of
+# all endpoints together are capped at SCAN_RETRY_BUDGET per scan (see resilience.py).
+SCAN_DEADLINE_SECONDS = None
+SCAN_RETRY_BUDGET = 50
+# An endpoint fails fast for CIRCUIT_COOLDOWN seconds once at least CIRCUIT_FAILURE_RATE of
+# its last CIRCUIT_WINDOW calls failed (counted after CIRCUIT_MIN_CALLS calls).
+CIRCUIT_WINDOW = 20
+CIRCUIT_MIN_CALLS = 10
+CIRCUIT_FAILURE_RATE = 0.5
+CIRCUIT_COOLDOWN = 15.0
+
+# Maximum tokens per SmartAPI market-data (LTP) request. SmartAPI allows up to 50.
+MARKET_DATA_BATCH_SIZE = 50
+
+# Seconds a fetched LTP is reused (see quote_cache.py), so a token needed by both scan legs
+# or asked again in the same session is fetched once. Use ~1 for live use, 0 to disable.
+QUOTE_CACHE_TTL = 60.0
+
+# Full-chain IV/Greeks (see chain_analytics.py) run on worker processes while quotes are
+# still being fetched on threads. None uses one process per core. Blocks smaller than
+# ANALYTICS_MIN_CHUNK_ROWS contracts are solved in-process, and quotes are fetched for
+# CHAIN_FETCH_GROUP_SIZE underlyings at a time before their chains are handed over.
+ANALYTICS_WORKERS = None
+ANALYTICS_MIN_CHUNK_ROWS = 500
+CHAIN_FETCH_GROUP_SIZE = 10
+
+# --- Cache Configuration ---
+# Folder where the scrip master is cached once per trading day (see scrip_master_cache.py).
+SCRIP_MASTER_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "scrip_master")
+# Exchange segments kept from the scrip master; other rows are dropped while it is parsed.
+# The scanner needs NSE (spot) and NFO (stock F&O). None keeps every segment.
+SCRIP_MASTER_SEGMENTS = ("NSE", "NFO")
+
+# Seconds a Chartink result is reused for the same scan clause, so re-runs inside the
+# same candle do not query Chartink again. Set to 0 to disable.
+CHARTINK_CACHE_TTL = 60
+CHARTINK_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "chartink")
+# Folder for the symbol -> sector map built from ind_nifty500list.csv (rebuilt when the CSV changes).
+SECTOR_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "sectors")
+
+# --- Screener Configuration ---
+# "chartink" queries chartink.com; "local" evaluates the same conditions on 15-minute
+# candles (see local_screener.py), from SmartAPI getCandleData or from CANDLE_FILE if set.
+SCREENER_SOURCE = "chartink"
+CANDLE_FILE = None
+# Calendar days of candles the local screener requests (enough to warm up the indicators).
+LOCAL_SCREENER_LOOKBACK_DAYS = 20
+# Folder of the local candle store (see candle_store.py); only missing candles are fetched.
+CANDLE_STORE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "candles")
+
+# --- Session Configuration ---
+# Saved SmartAPI tokens (owner-only file) so runs can skip the TOTP login; see session_store.py.
+SESSION_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "session.json")
+# Never reuse a saved session older than this; a full login is done instead.
+SESSION_MAX_AGE_HOURS = 20
+# End the SmartAPI session when a run finishes. Keep False to let the next run reuse it.
+LOGOUT_ON_EXIT = False
+
+# --- History & Export Configuration ---
+# SQLite database that keeps every scan's rows (see scan_history.py).
+SCAN_HISTORY_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "history", "scan_history.sqlite")
+# Also write the per-window Excel files (in a background thread).
+EXPORT_EXCEL = True
+
+# --- Metrics Configuration ---
+# Print the stage timing and API call summary at the end of each scan.
+SHOW_SCAN_SUMMARY = True
+# Write the scan metrics here after each scan: ".prom" for Prometheus text format
+# (e.g. for node_exporter's textfile collector), anything else for JSON. None disables it.
+METRICS_FILE = None
+
+# --- Sector Configuration ---
+# Print a per-sector breadth table (gainer/loser counts, mean % change, CE P/L, CE IV)
+# after the gainers and losers tables.
+SHOW_SECTOR_BREADTH = True
@@ -0,0 +1,154 @@
+"""
+quote_batcher.py
+--------------------
+Purpose:
+    Collects every instrument token needed for a scan and fetches their LTPs through
+    the SmartAPI market-data endpoint in a few batched requests, instead of one
+    `ltpData` round trip per instrument.
+
+Classes:
+    QuoteBatcher(smartApi, chunk_size=MARKET_DATA_BATCH_SIZE, ..., executor=None, cache=None)
+        -> add(exch_seg, token): Queues a token for the next fetch.
+        -> fetch(desc=None): Fetches all queued tokens and returns the {(exch_seg, token): ltp} map.
+        -> get_ltp(exch_seg, token): LTP from the last fetches, or 0.0 if it was not returned.
+        -> missing(exch_seg, token): True if the broker never returned the token (not even with
+           a zero LTP), e.g. because the scan deadline passed or the endpoint's circuit opened.
+
+Notes:
+    - SmartAPI accepts up to 50 tokens per market-data request, grouped by exchange.
+    - When a batch comes back partially, only the missing tokens are retried; retries draw on the
+      scan's retry budget and stop at its deadline (see `resilience.py`).
+    - Pass a `RateLimitedSmartApi` (see `rate_limiter.py`); the pool is sized to
+      MAX_THREAD_WORKERS and the shared limiter decides how many calls run at once.
+    - Pass `executor` to share one worker pool between several batchers (e.g. the
+      gainer and loser legs of a scan running concurrently).
+    - Pass `cache` (a `quote_cache.QuoteCache`) to share quotes between batchers: cached
+      tokens are not requested again, and a token another batcher is fetching right now
+      is waited on instead of requested twice.
+"""
+import logging
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from tqdm import tqdm
+
+from options_config import MARKET_DATA_BATCH_SIZE, MAX_THREAD_WORKERS
+from utils import retry_sleep
+from scan_metrics import metrics
+from resilience import resilience, ResilienceError
+
+
+class QuoteBatcher:
+    """
+    Batches LTP requests for many instruments into chunked `getMarketData` calls.
+
+    `max_retries` is the number of fetch attempts per token and must be at least 1.
+    """
+    def __init__(self, smartApi, chunk_size=MARKET_DATA_BATCH_SIZE, max_retries=3, base_backoff=0.25,
+                 max_workers=MAX_THREAD_WORKERS, executor=None, cache=None):
+        if max_retries < 1:
+            raise ValueError(f"max_retries must be at least 1, got {max_retries!r}")
+        self.smartApi = smartApi
+        self.chunk_size = chunk_size
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_workers = max_workers
+        self.executor = executor
+        self.cache = cache
+        self.ltp_map = {}
+        self._pending = set()
+        self._returned = set()  # keys the broker answered, even with a zero LTP
+
+    def add(self, exch_seg, token):
+        """Queues an instrument token for the next `fetch`."""
+        key = (exch_seg, str(token))
+        if key not in self.ltp_map:
+            self._pending.add(key)
+
+    def get_ltp(self, exch_seg, token):
+        """Returns the fetched LTP for a token, or 0.0 if it is unknown."""
+        return self.ltp_map.get((exch_seg, str(token)), 0.0)
+
+    def missing(self, exch_seg, token):
+        """Returns True if a token was fetched for but never came back from the broker."""
+        key = (exch_seg, str(token))
+        return key not in self.ltp_map and key not in self._returned
+
+    def _chunks(self, keys):
+        by_exchange = defaultdict(list)
+        for exch_seg, token in sorted(keys):
+            by_exchange[exch_seg].append(token)
+        for exch_seg, tokens in by_exchange.items():
+            for i in range(0, len(tokens), self.chunk_size):
+                yield exch_seg, tokens[i:i + self.chunk_size]
+
+    def _fetch_chunk(self, exch_seg, tokens):
+        """Fetches one chunk of tokens; returns whatever LTPs came back."""
+        try:
+            resp = self.smartApi.getMarketData("LTP", {exch_seg: tokens})
+        except ResilienceError:
+            return {}
+        except Exception as e:
+            logging.error(f"[QuoteBatcher] {exch_seg} batch of {len(tokens)} failed: {e}")
+            return {}
+        data = (resp or {}).get("data") or {}
+        result = {}
+        for row in data.get("fetched") or []:
+            key = (row.get("exchange", exch_seg), str(row.get("symbolToken")))
+            self._returned.add(key)
+            ltp = row.get("ltp")
+            if ltp:
+                result[key] = float(ltp)
+        return result
+
+    def _fetch_chunks(self, executor, chunks, desc):
+        results = executor.map(lambda chunk: self._fetch_chunk(*chunk), chunks)
+        if desc:
+            results = tqdm(results, total=len(chunks), desc=desc)
+        for fetched in results:
+            self.ltp_map.update(fetched)
+
+    def fetch(self, desc=None):
+        """
+        Fetches LTPs for all queued tokens, retrying only the tokens still missing.
+
+        Args:
+            desc (str, optional): If given, shows a progress bar with this description.
+
+        Returns:
+            dict: Mapping of (exch_seg, token) -> LTP for every token fetched so far.
+        """
+        pending = set(self._pending)
+        self._pending.clear()
+        if self.cache is not None:
+            cached = self.cache.get_many(pending, lambda keys: self._fetch_pending(set(keys), desc))
+            self.ltp_map.update(cached)
+            self._returned.update(cached)
+        else:
+            self._fetch_pending(pending, desc)
+        return self.ltp_map
+
+    def _fetch_pending(self, pending, desc):
+        """Fetches `pending` keys with retries; returns {key: ltp} for those that came back."""
+        keys = set(pending)
+        for attempt in range(1, self.max_retries + 1):
+            if not pending:
+                break
+            chunks = list(self._chunks(pending))
+            if attempt > 1:
+                backoff = self.base_backoff * (attempt - 1)
+                if not resilience.allow_retry("getMarketData", backoff):
+                    break
+                retry_sleep(backoff)
+                metrics.record_retry("getMarketData", len(chunks))
+            if self.executor is not None:
+                self._fetch_chunks(self.executor, chunks, desc)
+            else:
+                with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                    self._fetch_chunks(executor, chunks, desc)
+            # A token that came back with LTP 0 was answered; asking again returns the same
+            pending = {key for key in pending if key not in self.ltp_map and key not in self._returned}
+
+        if pending:
+            logging.error(f"[QuoteBatcher] No LTP for {len(pending)} token(s) after {attempt} attempt(s)")
+        return {key: self.ltp_map[key] for key in keys if key in self.ltp_map}
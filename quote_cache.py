@@ -0,0 +1,125 @@
+"""
+quote_cache.py
+------------------
+Purpose:
+    Shares fetched LTPs between everything that runs in one session (the gainer and loser
+    legs of a scan, repeated symbols in Option_Greeks_main), so a token quoted a moment ago
+    is not requested again.
+
+Classes:
+    QuoteCache(ttl=QUOTE_CACHE_TTL, name="quotes")
+        -> get_many(keys, fetch): LTPs for (exch_seg, token) keys; only the stale or missing
+           keys are passed to `fetch`, and keys already being fetched by another thread are
+           waited on instead of requested twice.
+        -> get(key, fetch): Same for one key; `fetch()` returns its LTP.
+        -> stats(): {"hits", "misses", "coalesced", "size"} since creation.
+        -> clear(): Drops every cached quote.
+
+Notes:
+    - Keys are (exch_seg, str(token)), the same as `QuoteBatcher.ltp_map`.
+    - Only positive LTPs are cached; a token that came back empty is fetched again next time.
+    - Single flight: the thread that misses a key owns its fetch; threads asking for the same
+      key meanwhile wait for that fetch (counted as "coalesced") and get its result. If that
+      fetch fails or leaves the key out, the waiters get nothing for it (never the expired
+      quote); the owner's fetch already did the retrying.
+    - Hit/miss counts also go to `scan_metrics.metrics` so they show in the scan summary.
+"""
+import threading
+import time
+
+from options_config import QUOTE_CACHE_TTL
+from scan_metrics import metrics
+
+
+class QuoteCache:
+    """
+    Thread-safe LTP cache with a time to live and single-flight fetches.
+
+    Args:
+        ttl (float): Seconds a quote stays valid (e.g. 1 for live use, 60 for snapshots).
+        name (str): Name in the scan metrics.
+    """
+    def __init__(self, ttl=QUOTE_CACHE_TTL, name="quotes"):
+        self.ttl = ttl
+        self.name = name
+        self._lock = threading.Lock()
+        self._quotes = {}    # key -> (ltp, fetched_at)
+        self._inflight = {}  # key -> threading.Event set when its fetch finishes
+        self._stats = {"hits": 0, "misses": 0, "coalesced": 0}
+
+    def _count(self, hits, misses, coalesced):
+        self._stats["hits"] += hits
+        self._stats["misses"] += misses
+        self._stats["coalesced"] += coalesced
+        metrics.record_cache(self.name, hits=hits, misses=misses, coalesced=coalesced)
+
+    def get_many(self, keys, fetch):
+        """
+        Returns cached LTPs and fetches the rest once.
+
+        Args:
+            keys (iterable): (exch_seg, token) pairs.
+            fetch (callable): Called with the list of keys to fetch; returns {key: ltp}.
+
+        Returns:
+            dict: (exch_seg, str(token)) -> LTP for every key with a fresh, positive LTP; keys
+            whose fetch failed are left out.
+        """
+        result, owned, waits = {}, [], {}
+        now = time.monotonic()
+        with self._lock:
+            for key in dict.fromkeys((exch_seg, str(token)) for exch_seg, token in keys):
+                cached = self._quotes.get(key)
+                if cached and now - cached[1] < self.ttl:
+                    result[key] = cached[0]
+                elif key in self._inflight:
+                    waits[key] = self._inflight[key]
+                else:
+                    self._inflight[key] = threading.Event()
+                    owned.append(key)
+            self._count(len(result), len(owned), len(waits))
+
+        if owned:
+            fetched = {}
+            try:
+                fetched = fetch(owned) or {}
+            finally:
+                fetched_at = time.monotonic()
+                with self._lock:
+                    for key in owned:
+                        ltp = fetched.get(key)
+                        if ltp and ltp > 0:
+                            self._quotes[key] = (float(ltp), fetched_at)
+                            result[key] = float(ltp)
+                        self._inflight.pop(key).set()
+
+        for key, done in waits.items():
+            done.wait()
+            with self._lock:
+                cached = self._quotes.get(key)
+            if cached and time.monotonic() - cached[1] < self.ttl:
+                result[key] = cached[0]
+        return result
+
+    def get(self, key, fetch):
+        """
+        Returns one LTP, fetching it with `fetch()` only if it is not cached.
+
+        Args:
+            key (tuple): (exch_seg, token).
+            fetch (callable): Returns the LTP (0.0 if unavailable).
+
+        Returns:
+            float: The LTP, or 0.0 if it could not be fetched.
+        """
+        exch_seg, token = key
+        return self.get_many([key], lambda owned: {owned[0]: fetch()}).get((exch_seg, str(token)), 0.0)
+
+    def stats(self):
+        """Hit/miss/coalesced counts since creation and the number of cached quotes."""
+        with self._lock:
+            return {**self._stats, "size": len(self._quotes)}
+
+    def clear(self):
+        with self._lock:
+            self._quotes.clear()
@@ -0,0 +1,200 @@
+"""
+rate_limiter.py
+-------------------
+Purpose:
+    A single, process-wide throttle for every SmartAPI call: a token bucket per
+    endpoint plus an adaptive cap on the number of calls in flight.
+
+Classes:
+    - TokenBucket(rate, burst): Thread-safe token bucket (requests per second + burst).
+    - AdaptiveConcurrency(initial, min_limit, max_limit, target_latency): AIMD concurrency cap.
+      Grows by one while latency is healthy and halves on rate-limit errors.
+    - RateLimiter(limits, concurrency): Routes a call through its endpoint's bucket and the
+      shared concurrency cap.
+    - RateLimitedSmartApi(smartApi, limiter=rate_limiter): Proxy around `SmartConnect` that sends
+      every method call through the limiter.
+
+Functions:
+    - is_rate_limit_error(result_or_exc): True if an API response or exception signals throttling.
+
+Notes:
+    - `rate_limiter` is the shared instance configured from `options_config.API_RATE_LIMITS`.
+    - Thread pools can be sized to `MAX_THREAD_WORKERS`; the adaptive cap decides how many
+      of those threads actually talk to the broker at once.
+    - Every call's latency and outcome is recorded in `scan_metrics.metrics`.
+    - Every call is also checked against `resilience.resilience` first: past the scan deadline
+      or with the endpoint's circuit open it raises a `ResilienceError` without calling out.
+"""
+import functools
+import threading
+import time
+
+from options_config import (API_RATE_LIMITS, THREAD_WORKERS, MIN_THREAD_WORKERS,
+                            MAX_THREAD_WORKERS, TARGET_API_LATENCY)
+from scan_metrics import metrics
+from resilience import resilience
+
+RATE_LIMIT_MARKERS = ("access rate", "rate limit", "too many requests", "429")
+
+
+def is_rate_limit_error(result_or_exc):
+    """Returns True if an API response dict or exception indicates the broker throttled us."""
+    if isinstance(result_or_exc, dict):
+        if result_or_exc.get("status", True):
+            return False
+        text = f"{result_or_exc.get('message', '')} {result_or_exc.get('errorcode', '')}"
+    else:
+        text = str(result_or_exc)
+    text = text.lower()
+    return any(marker in text for marker in RATE_LIMIT_MARKERS)
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket. `acquire` blocks until a token is available.
+    """
+    def __init__(self, rate, burst):
+        self.rate = float(rate)
+        self.capacity = float(burst)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, tokens=1):
+        """Blocks until `tokens` tokens can be taken from the bucket."""
+        while True:
+            with self._lock:
+                self._refill(time.monotonic())
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def drain(self):
+        """Empties the bucket, e.g. after the broker reports a rate-limit error."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self._tokens, 0.0)
+
+
+class AdaptiveConcurrency:
+    """
+    Additive-increase / multiplicative-decrease cap on concurrent API calls.
+
+    After `limit` consecutive calls faster than `target_latency` the limit grows by one.
+    A slow call shrinks it by one and a rate-limit error halves it.
+    """
+    def __init__(self, initial, min_limit, max_limit, target_latency):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.target_latency = target_latency
+        self.limit = max(min_limit, min(initial, max_limit))
+        self._in_flight = 0
+        self._healthy = 0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        """Blocks until a concurrency slot is free."""
+        with self._cond:
+            while self._in_flight >= self.limit:
+                self._cond.wait()
+            self._in_flight += 1
+
+    def release(self, latency, throttled=False):
+        """Frees a slot and adapts the limit from the call's outcome."""
+        with self._cond:
+            self._in_flight -= 1
+            if throttled:
+                self.limit = max(self.min_limit, self.limit // 2)
+                self._healthy = 0
+            elif latency > self.target_latency:
+                self.limit = max(self.min_limit, self.limit - 1)
+                self._healthy = 0
+            else:
+                self._healthy += 1
+                if self._healthy >= self.limit:
+                    self.limit = min(self.max_limit, self.limit + 1)
+                    self._healthy = 0
+            self._cond.notify_all()
+
+
+class RateLimiter:
+    """
+    Per-endpoint token buckets sharing one adaptive concurrency cap.
+
+    Args:
+        limits (dict): endpoint -> (requests_per_second, burst). The "default" entry is used
+            for endpoints without their own limit.
+        concurrency (AdaptiveConcurrency): Shared concurrency cap.
+    """
+    def __init__(self, limits, concurrency):
+        self.concurrency = concurrency
+        self._limits = dict(limits)
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, endpoint):
+        """Returns (creating on first use) the token bucket for an endpoint."""
+        with self._lock:
+            if endpoint not in self._buckets:
+                rate, burst = self._limits.get(endpoint, self._limits["default"])
+                self._buckets[endpoint] = TokenBucket(rate, burst)
+            return self._buckets[endpoint]
+
+    def call(self, endpoint, fn, *args, **kwargs):
+        """Runs `fn(*args, **kwargs)` once the endpoint's bucket and the concurrency cap allow it."""
+        resilience.check(endpoint)
+        bucket = self.bucket(endpoint)
+        self.concurrency.acquire()
+        throttled, ok = False, False
+        start = time.monotonic()
+        try:
+            bucket.acquire()
+            start = time.monotonic()
+            result = fn(*args, **kwargs)
+            throttled = is_rate_limit_error(result)
+            ok = not (isinstance(result, dict) and result.get("status") is False)
+            return result
+        except Exception as e:
+            throttled = is_rate_limit_error(e)
+            raise
+        finally:
+            latency = time.monotonic() - start
+            if throttled:
+                bucket.drain()
+            self.concurrency.release(latency, throttled)
+            metrics.record_call(endpoint, latency, ok, throttled)
+            resilience.record(endpoint, ok or throttled)
+
+
+class RateLimitedSmartApi:
+    """
+    Wraps a `SmartConnect` object so every public method call goes through a `RateLimiter`.
+    Attribute access other than method calls, and the local `set*` token setters, are
+    passed straight through.
+    """
+    def __init__(self, smartApi, limiter=None):
+        self._smartApi = smartApi
+        self._limiter = limiter or rate_limiter
+
+    def __getattr__(self, name):
+        attr = getattr(self._smartApi, name)
+        if name.startswith(("_", "set")) or not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        def limited(*args, **kwargs):
+            return self._limiter.call(name, attr, *args, **kwargs)
+        return limited
+
+
+# Shared, process-wide limiter
+rate_limiter = RateLimiter(
+    API_RATE_LIMITS,
+    AdaptiveConcurrency(THREAD_WORKERS, MIN_THREAD_WORKERS, MAX_THREAD_WORKERS, TARGET_API_LATENCY),
+)
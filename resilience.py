@@ -0,0 +1,212 @@
+"""
+resilience.py
+-----------------
+Purpose:
+    Keeps a scan from stalling on retries: an overall deadline and a retry budget per scan,
+    and a circuit breaker per endpoint that fails fast once its error rate spikes, so a scan
+    returns partial results (unfetched rows marked) instead of retrying into the next candle.
+
+Classes:
+    CircuitBreaker(window=CIRCUIT_WINDOW, min_calls=CIRCUIT_MIN_CALLS,
+                   failure_rate=CIRCUIT_FAILURE_RATE, cooldown=CIRCUIT_COOLDOWN)
+        -> allow(): False while open; after `cooldown` lets one probe call through (half-open).
+        -> record(ok): Outcome of a call; opens the circuit when the recent failure rate is too high.
+    ScanResilience()
+        -> scan(deadline=SCAN_DEADLINE_SECONDS, retry_budget=SCAN_RETRY_BUDGET): Context manager
+           for one scan; `deadline` is seconds from now, a datetime, or None for no deadline.
+        -> check(endpoint): Raises DeadlineExceeded or CircuitOpenError instead of calling.
+        -> record(endpoint, ok): Feeds a call's outcome to the endpoint's breaker.
+        -> allow_retry(endpoint, wait=0.0): Takes one retry from the budget if the retry (after
+           sleeping `wait`) still fits the deadline and the endpoint's circuit is not open.
+        -> remaining(), expired(), summary()
+
+    ResilienceError, DeadlineExceeded, CircuitOpenError: Raised by `check`.
+
+Notes:
+    - `resilience` is the process-wide instance. `rate_limiter.RateLimiter.call` checks and
+      records every SmartAPI call through it; Chartink and the scrip master download do the same.
+    - Breakers outlive scans (the daemon keeps them warm); deadline and budget only apply
+      inside `scan()`, so calls between scans (session refresh, live mode) are never cut short.
+    - Rate-limit responses are not failures here: the limiter already slows down for them.
+"""
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+from options_config import (SCAN_DEADLINE_SECONDS, SCAN_RETRY_BUDGET, CIRCUIT_WINDOW, CIRCUIT_MIN_CALLS,
+                            CIRCUIT_FAILURE_RATE, CIRCUIT_COOLDOWN)
+
+
+class ResilienceError(Exception):
+    """A call was skipped because the scan ran out of time or its endpoint is failing."""
+
+
+class DeadlineExceeded(ResilienceError):
+    """The scan's deadline has passed."""
+
+
+class CircuitOpenError(ResilienceError):
+    """The endpoint's circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Error-rate circuit breaker over the last `window` calls.
+
+    Args:
+        window (int): Number of recent calls the failure rate is computed over.
+        min_calls (int): Calls needed in the window before the circuit can open.
+        failure_rate (float): Failure fraction (0-1) that opens the circuit.
+        cooldown (float): Seconds the circuit stays open before a probe call is allowed.
+    """
+    def __init__(self, window=CIRCUIT_WINDOW, min_calls=CIRCUIT_MIN_CALLS, failure_rate=CIRCUIT_FAILURE_RATE,
+                 cooldown=CIRCUIT_COOLDOWN):
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.cooldown = cooldown
+        self._outcomes = deque(maxlen=window)
+        self._opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            return "half-open" if self._probing else "open"
+
+    def allow(self):
+        """Returns True if a call may go out now."""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._probing or time.monotonic() - self._opened_at < self.cooldown:
+                return False
+            self._probing = True
+            return True
+
+    def record(self, ok):
+        """
+        Records a call's outcome.
+
+        Returns:
+            bool: True if this outcome opened the circuit.
+        """
+        with self._lock:
+            if self._probing:
+                self._probing = False
+                if ok:
+                    self._opened_at = None
+                    self._outcomes.clear()
+                else:
+                    self._opened_at = time.monotonic()
+                return False
+            if self._opened_at is not None:
+                return False  # a call that started before the circuit opened
+            self._outcomes.append(bool(ok))
+            failures = self._outcomes.count(False)
+            if len(self._outcomes) >= self.min_calls and failures >= self.failure_rate * len(self._outcomes):
+                self._opened_at = time.monotonic()
+                return True
+            return False
+
+
+class ScanResilience:
+    """Per-scan deadline and retry budget plus process-wide per-endpoint circuit breakers."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._breakers = {}
+        self._deadline = None   # time.monotonic() value, or None
+        self._retries_left = None
+        self._retries_used = 0
+
+    @contextmanager
+    def scan(self, deadline=SCAN_DEADLINE_SECONDS, retry_budget=SCAN_RETRY_BUDGET):
+        """
+        Applies a deadline and retry budget to everything called inside the block.
+
+        Args:
+            deadline (float, datetime or None): Seconds from now, a wall-clock time, or None.
+            retry_budget (int or None): Retries allowed across all endpoints; None is unlimited.
+        """
+        if isinstance(deadline, datetime):
+            deadline = (deadline - datetime.now()).total_seconds()
+        with self._lock:
+            self._deadline = None if deadline is None else time.monotonic() + deadline
+            self._retries_left = retry_budget
+            self._retries_used = 0
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._deadline = None
+                self._retries_left = None
+
+    def breaker(self, endpoint):
+        """Returns (creating on first use) the circuit breaker of an endpoint."""
+        with self._lock:
+            if endpoint not in self._breakers:
+                self._breakers[endpoint] = CircuitBreaker()
+            return self._breakers[endpoint]
+
+    def remaining(self):
+        """Seconds left before the deadline (never negative), or None without a deadline."""
+        deadline = self._deadline
+        return None if deadline is None else max(0.0, deadline - time.monotonic())
+
+    def expired(self):
+        remaining = self.remaining()
+        return remaining is not None and remaining <= 0
+
+    def check(self, endpoint):
+        """Raises instead of letting a call to `endpoint` go out when it cannot succeed in time."""
+        if self.expired():
+            raise DeadlineExceeded(f"Scan deadline passed; skipped {endpoint}")
+        if not self.breaker(endpoint).allow():
+            raise CircuitOpenError(f"Circuit open for {endpoint}; skipped call")
+
+    def record(self, endpoint, ok):
+        if self.breaker(endpoint).record(ok):
+            logging.error(f"[resilience] Too many {endpoint} failures; failing fast for {CIRCUIT_COOLDOWN:g}s")
+
+    def allow_retry(self, endpoint, wait=0.0):
+        """
+        Takes one retry from the scan's budget.
+
+        Args:
+            endpoint (str): Endpoint about to be retried.
+            wait (float): Backoff the caller will sleep before retrying.
+
+        Returns:
+            bool: False if the budget is spent, the retry would end past the deadline, or the
+            endpoint's circuit is open; the caller should give up and keep what it has.
+        """
+        remaining = self.remaining()
+        if remaining is not None and remaining <= wait:
+            return False
+        if self.breaker(endpoint).state == "open":
+            return False
+        with self._lock:
+            if self._retries_left is not None:
+                if self._retries_left <= 0:
+                    return False
+                self._retries_left -= 1
+            self._retries_used += 1
+        return True
+
+    def summary(self):
+        """Deadline/budget state and every endpoint whose circuit is not closed."""
+        with self._lock:
+            breakers = dict(self._breakers)
+            retries_left, retries_used = self._retries_left, self._retries_used
+        return {"remaining_s": self.remaining(), "expired": self.expired(), "retries_used": retries_used,
+                "retries_left": retries_left,
+                "circuits": {name: b.state for name, b in breakers.items() if b.state != "closed"}}
+
+
+# Shared, process-wide instance
+resilience = ScanResilience()
@@ -0,0 +1,158 @@
+"""
+scan_daemon.py
+------------------
+Purpose:
+    Long-running scan mode. One process keeps the SmartAPI session, the instrument
+    index, the Chartink session and the quote worker pool warm, and runs the scan at
+    the configured times (or every N minutes), so each window only pays for the
+    market-data fetch.
+
+Classes:
+    ScanDaemon(smartApi, client_code, scan_fn, login_fn, load_index_fn, schedule=SCAN_SCHEDULE, interval_minutes=None)
+        -> ensure_session(): Logs in, or refreshes the JWT once it is older than JWT_REFRESH_AFTER_HOURS
+           (counted from the login/refresh that issued it, also for a session restored from disk).
+        -> ensure_instrument_index(): Reloads the instrument index once per trading day.
+        -> run_once(): Runs one scan with the warm state.
+        -> run_forever(): Sleeps until each scheduled time and scans; stops on Ctrl+C.
+
+Functions:
+    next_run_time(schedule, now, interval_minutes=None) -> datetime of the next scan.
+
+Notes:
+    - `scan_fn` is called as scan_fn(smartApi, io_pool, chartink, session=..., instrument_index=...),
+      matching `main.run_scan`.
+    - While idle the daemon wakes up every minute to keep the session and index fresh.
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, date
+
+from chartink_screener import ChartinkClient
+from options_config import SCAN_SCHEDULE, JWT_REFRESH_AFTER_HOURS, MAX_THREAD_WORKERS
+from session_store import refresh_session
+
+IDLE_WAKEUP_SECONDS = 60
+
+
+def _issued_at(session):
+    """When the session's tokens were issued: its stored "saved_at", or now for a session without one."""
+    saved_at = (session or {}).get("saved_at")
+    return datetime.fromtimestamp(saved_at) if saved_at else datetime.now()
+
+
+def next_run_time(schedule, now, interval_minutes=None):
+    """
+    Returns the next scan time strictly after `now`.
+
+    Args:
+        schedule (list[str]): Daily "HH:MM" times.
+        now (datetime): Current time.
+        interval_minutes (float, optional): If given, scan every this many minutes instead.
+
+    Returns:
+        datetime: When the next scan should start.
+    """
+    if interval_minutes:
+        return now + timedelta(minutes=interval_minutes)
+    times = sorted(datetime.strptime(t, "%H:%M").time() for t in schedule)
+    for t in times:
+        candidate = datetime.combine(now.date(), t)
+        if candidate > now:
+            return candidate
+    return datetime.combine(now.date() + timedelta(days=1), times[0])
+
+
+class ScanDaemon:
+    """
+    Runs scans on a schedule while keeping session and caches warm between runs.
+
+    Args:
+        smartApi: The (rate-limited) SmartConnect object, shared across runs.
+        client_code (str): Angel One client code, used to store refreshed tokens.
+        scan_fn (callable): Runs one scan (see Notes above).
+        login_fn (callable): Performs a full login and returns the `generateSession` response.
+        load_index_fn (callable): Returns a fresh `InstrumentIndex`.
+        schedule (list[str]): Daily "HH:MM" scan times.
+        interval_minutes (float, optional): Scan every N minutes instead of on `schedule`.
+    """
+    def __init__(self, smartApi, client_code, scan_fn, login_fn, load_index_fn, schedule=SCAN_SCHEDULE, interval_minutes=None):
+        self.smartApi = smartApi
+        self.client_code = client_code
+        self.scan_fn = scan_fn
+        self.login_fn = login_fn
+        self.load_index_fn = load_index_fn
+        self.schedule = schedule
+        self.interval_minutes = interval_minutes
+        self.refresh_after = timedelta(hours=JWT_REFRESH_AFTER_HOURS)
+
+        self.session = None
+        self.session_started = None
+        self.instrument_index = None
+        self.index_date = None
+        self.io_pool = None
+        self.chartink = None
+
+    def _refresh_session(self):
+        """Exchanges the refresh token for a new JWT; returns False if that is not possible."""
+        refreshed = refresh_session(self.smartApi, self.client_code, self.session)
+        if not refreshed:
+            return False
+        self.session = refreshed
+        self.session_started = _issued_at(refreshed)
+        print("🔄 Session token refreshed.")
+        return True
+
+    def ensure_session(self):
+        """Makes sure a fresh session exists, refreshing the JWT before it gets old."""
+        if not self.session:
+            self._login()
+        if not self.session or datetime.now() - self.session_started < self.refresh_after:
+            return
+        # A restored session can already be old when it is handed back
+        if not self._refresh_session():
+            self._login()
+
+    def _login(self):
+        self.session = self.login_fn()
+        self.session_started = _issued_at(self.session)
+
+    def ensure_instrument_index(self):
+        """Reloads the instrument index when the trading day changes."""
+        if self.instrument_index is None or self.index_date != date.today():
+            self.instrument_index = self.load_index_fn()
+            self.index_date = date.today()
+
+    def run_once(self):
+        """Runs one scan with the warm session, index, Chartink client and worker pool."""
+        self.ensure_session()
+        self.ensure_instrument_index()
+        return self.scan_fn(self.smartApi, self.io_pool, self.chartink,
+                            session=self.session, instrument_index=self.instrument_index)
+
+    def _keep_warm(self):
+        try:
+            self.ensure_session()
+            self.ensure_instrument_index()
+        except Exception as e:
+            print(f"⚠️ Could not refresh session/index: {e}")
+
+    def run_forever(self):
+        """Scans at every scheduled time until interrupted with Ctrl+C."""
+        with ThreadPoolExecutor(max_workers=MAX_THREAD_WORKERS) as io_pool, ChartinkClient() as chartink:
+            self.io_pool, self.chartink = io_pool, chartink
+            try:
+                self._keep_warm()
+                while True:
+                    run_at = next_run_time(self.schedule, datetime.now(), self.interval_minutes)
+                    print(f"⏰ Next scan at {run_at:%Y-%m-%d %H:%M}")
+                    remaining = (run_at - datetime.now()).total_seconds()
+                    while remaining > 0:
+                        time.sleep(min(remaining, IDLE_WAKEUP_SECONDS))
+                        self._keep_warm()
+                        remaining = (run_at - datetime.now()).total_seconds()
+                    try:
+                        self.run_once()
+                    except Exception as e:
+                        print(f"❌ Scan failed: {e}")
+            except KeyboardInterrupt:
+                print("👋 Daemon stopped.")
@@ -0,0 +1,155 @@
+"""
+scan_history.py
+-------------------
+Purpose:
+    Keeps every scan's gainers/losers OTM rows in an indexed SQLite database, stamped
+    with the scan time and a scan id, so history is not lost when the per-window Excel
+    files are overwritten.
+
+Classes:
+    ScanHistoryStore(path=SCAN_HISTORY_DB)
+        -> append(df, side, scan_id, scanned_at=None): Appends one table's rows.
+        -> query(symbol=None, start=None, end=None, side=None): Rows filtered by symbol,
+           date range (inclusive, "YYYY-MM-DD" or date) and side ("gainers"/"losers").
+
+Functions:
+    new_scan_id(now=None) -> str: Unique id for one scan run.
+
+Notes:
+    - SQLite ships with Python, so this adds no dependency. Rows are indexed by
+      (symbol, scanned_at) and (scan_date, side).
+    - Column names are the OTM table's headers; any extra columns are ignored. Columns
+      added to HISTORY_COLUMNS later are added to existing databases on open.
+"""
+import sqlite3
+import threading
+import uuid
+from datetime import datetime, date
+from pathlib import Path
+
+import pandas as pd
+
+from options_config import SCAN_HISTORY_DB
+
+# OTM table column -> (SQLite column, type)
+HISTORY_COLUMNS = {
+    "Symbol": ("symbol", "TEXT"),
+    "Stock Name": ("stock_name", "TEXT"),
+    "Expiry": ("expiry", "TEXT"),
+    "Sector": ("sector", "TEXT"),
+    "% Change": ("pct_change", "REAL"),
+    "Lot Size": ("lot_size", "INTEGER"),
+    "Nearest OTM Strike": ("nearest_otm_strike", "REAL"),
+    "Nearest OTM CE": ("nearest_otm_ce", "REAL"),
+    "Nearest OTM PE": ("nearest_otm_pe", "REAL"),
+    "New OTM Strike": ("new_otm_strike", "REAL"),
+    "New OTM CE": ("new_otm_ce", "REAL"),
+    "New OTM PE": ("new_otm_pe", "REAL"),
+    "Gap": ("gap", "REAL"),
+    "CE P/L": ("ce_pl", "REAL"),
+    "CE IV": ("ce_iv", "REAL"),
+    "Quote Status": ("quote_status", "TEXT"),
+}
+SIDES = ("gainers", "losers")
+
+
+def new_scan_id(now=None):
+    """Returns an id like "20250930-1015-3f2a9c" for one scan run."""
+    now = now or datetime.now()
+    return f"{now:%Y%m%d-%H%M}-{uuid.uuid4().hex[:6]}"
+
+
+class ScanHistoryStore:
+    """
+    Append-only scan history in SQLite.
+
+    Args:
+        path (str or Path): Database file; created on first use.
+    """
+    def __init__(self, path=SCAN_HISTORY_DB):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._lock = threading.Lock()
+        columns = ", ".join(f"{name} {sql_type}" for name, sql_type in HISTORY_COLUMNS.values())
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS scan_rows ("
+                f"scan_id TEXT NOT NULL, scanned_at TEXT NOT NULL, scan_date TEXT NOT NULL, "
+                f"side TEXT NOT NULL, {columns})")
+            # Databases created before a column was added get it appended
+            existing = {row[1] for row in self._conn.execute("PRAGMA table_info(scan_rows)")}
+            for name, sql_type in HISTORY_COLUMNS.values():
+                if name not in existing:
+                    self._conn.execute(f"ALTER TABLE scan_rows ADD COLUMN {name} {sql_type}")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_scan_rows_symbol ON scan_rows (symbol, scanned_at)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_scan_rows_date ON scan_rows (scan_date, side)")
+
+    def close(self):
+        self._conn.close()
+
+    def append(self, df, side, scan_id, scanned_at=None):
+        """
+        Appends the rows of one OTM table.
+
+        Args:
+            df (pd.DataFrame): Table from `build_otm_dataframe` (optionally with "Sector").
+            side (str): "gainers" or "losers".
+            scan_id (str): Id shared by all tables of one scan run.
+            scanned_at (datetime, optional): Scan time; defaults to now.
+
+        Returns:
+            int: Number of rows written.
+        """
+        if side not in SIDES:
+            raise ValueError(f"side must be one of {SIDES}, got {side!r}")
+        if df is None or df.empty:
+            return 0
+        scanned_at = scanned_at or datetime.now()
+        rows = df.reindex(columns=list(HISTORY_COLUMNS)).rename(
+            columns={col: name for col, (name, _) in HISTORY_COLUMNS.items()})
+        rows.insert(0, "side", side)
+        rows.insert(0, "scan_date", scanned_at.date().isoformat())
+        rows.insert(0, "scanned_at", scanned_at.isoformat(timespec="seconds"))
+        rows.insert(0, "scan_id", scan_id)
+        rows = rows.astype(object).where(rows.notna(), None)
+
+        placeholders = ", ".join("?" * len(rows.columns))
+        with self._lock, self._conn:
+            self._conn.executemany(
+                f"INSERT INTO scan_rows ({', '.join(rows.columns)}) VALUES ({placeholders})",
+                rows.itertuples(index=False, name=None))
+        return len(rows)
+
+    def query(self, symbol=None, start=None, end=None, side=None):
+        """
+        Returns stored rows as a DataFrame with the OTM table's column names.
+
+        Args:
+            symbol (str, optional): Only this symbol.
+            start (str or date, optional): First scan date to include.
+            end (str or date, optional): Last scan date to include.
+            side (str, optional): "gainers" or "losers".
+
+        Returns:
+            pd.DataFrame: Columns scan_id, scanned_at, side plus the OTM table columns,
+            ordered by scan time.
+        """
+        clauses, params = [], []
+        if symbol:
+            clauses.append("symbol = ?")
+            params.append(symbol.upper())
+        if start:
+            clauses.append("scan_date >= ?")
+            params.append(start.isoformat() if isinstance(start, date) else str(start))
+        if end:
+            clauses.append("scan_date <= ?")
+            params.append(end.isoformat() if isinstance(end, date) else str(end))
+        if side:
+            clauses.append("side = ?")
+            params.append(side)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            df = pd.read_sql_query(f"SELECT * FROM scan_rows{where} ORDER BY scanned_at, rowid",
+                                   self._conn, params=params)
+        df = df.drop(columns=["scan_date"])
+        return df.rename(columns={name: col for col, (name, _) in HISTORY_COLUMNS.items()})
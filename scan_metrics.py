@@ -0,0 +1,179 @@
+"""
+scan_metrics.py
+-------------------
+Purpose:
+    Built-in instrumentation for a scan: wall time per stage, call/retry/failure counts
+    per endpoint and latency percentiles, so a slow scan can be traced to the broker,
+    Chartink or local CPU.
+
+Classes:
+    ScanMetrics()
+        -> stage(name): Context manager that times one stage (stages may overlap across threads).
+        -> record_stage(name, seconds, scan=None): Adds an already measured stage time; with
+           `scan` (the `started_at` of the scan it belongs to) it is dropped if a new scan has started.
+        -> record_call(endpoint, latency, ok=True, throttled=False): One API/HTTP call.
+        -> record_retry(endpoint, count=1): Retried calls (or batches) for an endpoint.
+        -> record_cache(name, hits=0, misses=0, coalesced=0): Lookups of a cache (e.g. quote_cache.py).
+        -> to_dict() / to_prometheus() / write(path): JSON or Prometheus text output.
+        -> summary_tables(): rich tables for the end-of-scan summary (caches only if any were used).
+
+Notes:
+    - `metrics` is the process-wide instance; `rate_limiter.RateLimiter.call` records every
+      SmartAPI call into it, and `main.run_scan` resets it at the start of each scan.
+    - Stage times add up across concurrent legs (e.g. gainers and losers both fetching
+      spot prices), so their sum can exceed the scan's wall time.
+    - `write` picks the format from the extension: ".prom" for Prometheus text, JSON otherwise.
+"""
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+import numpy as np
+from rich.table import Table
+
+PERCENTILES = (50, 95, 99)
+PROMETHEUS_PREFIX = "myscan"
+
+
+class ScanMetrics:
+    """Thread-safe stage timers, per-endpoint counters and latency samples for one scan."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Clears everything and restarts the scan clock."""
+        with self._lock:
+            self.started_at = time.time()
+            self._start = time.perf_counter()
+            self.stages = defaultdict(list)     # stage -> [seconds, ...]
+            self.counters = defaultdict(lambda: {"calls": 0, "retries": 0, "failures": 0, "throttled": 0})
+            self.latencies = defaultdict(list)  # endpoint -> [seconds, ...]
+            self.caches = defaultdict(lambda: {"hits": 0, "misses": 0, "coalesced": 0})
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_stage(name, time.perf_counter() - start)
+
+    def record_stage(self, name, seconds, scan=None):
+        with self._lock:
+            if scan is None or scan == self.started_at:
+                self.stages[name].append(seconds)
+
+    def record_call(self, endpoint, latency, ok=True, throttled=False):
+        with self._lock:
+            counter = self.counters[endpoint]
+            counter["calls"] += 1
+            counter["failures"] += not ok
+            counter["throttled"] += bool(throttled)
+            self.latencies[endpoint].append(latency)
+
+    def record_retry(self, endpoint, count=1):
+        with self._lock:
+            self.counters[endpoint]["retries"] += count
+
+    def record_cache(self, name, hits=0, misses=0, coalesced=0):
+        with self._lock:
+            counter = self.caches[name]
+            counter["hits"] += hits
+            counter["misses"] += misses
+            counter["coalesced"] += coalesced
+
+    def elapsed(self):
+        return time.perf_counter() - self._start
+
+    def to_dict(self):
+        """Snapshot of all metrics as plain JSON-serializable data."""
+        with self._lock:
+            stages = {name: {"count": len(times), "total_s": sum(times), "max_s": max(times)}
+                      for name, times in self.stages.items()}
+            endpoints = {}
+            for endpoint, counter in self.counters.items():
+                samples = np.asarray(self.latencies.get(endpoint, ()), dtype=np.float64)
+                latency = {"count": int(samples.size), "sum_s": float(samples.sum())}
+                values = np.percentile(samples, PERCENTILES) if samples.size else [None] * len(PERCENTILES)
+                for p, value in zip(PERCENTILES, values):
+                    latency[f"p{p}_s"] = None if value is None else float(value)
+                endpoints[endpoint] = {**counter, "latency": latency}
+            caches = {name: dict(counter) for name, counter in self.caches.items()}
+        return {"started_at": self.started_at, "elapsed_s": self.elapsed(), "stages": stages, "endpoints": endpoints,
+                "caches": caches}
+
+    def to_prometheus(self):
+        """Renders the metrics in the Prometheus text exposition format."""
+        data = self.to_dict()
+        p = PROMETHEUS_PREFIX
+        lines = [f"# TYPE {p}_scan_duration_seconds gauge", f"{p}_scan_duration_seconds {data['elapsed_s']:.6f}",
+                 f"# TYPE {p}_scan_started_timestamp_seconds gauge",
+                 f"{p}_scan_started_timestamp_seconds {data['started_at']:.3f}",
+                 f"# TYPE {p}_stage_seconds gauge"]
+        lines += [f'{p}_stage_seconds{{stage="{name}"}} {stage["total_s"]:.6f}' for name, stage in data["stages"].items()]
+        for field in ("calls", "retries", "failures", "throttled"):
+            lines.append(f"# TYPE {p}_api_{field}_total counter")
+            lines += [f'{p}_api_{field}_total{{endpoint="{endpoint}"}} {stats[field]}'
+                      for endpoint, stats in data["endpoints"].items()]
+        lines.append(f"# TYPE {p}_api_latency_seconds summary")
+        for endpoint, stats in data["endpoints"].items():
+            latency = stats["latency"]
+            for pct in PERCENTILES:
+                if latency[f"p{pct}_s"] is not None:
+                    lines.append(f'{p}_api_latency_seconds{{endpoint="{endpoint}",quantile="{pct / 100:g}"}} '
+                                 f'{latency[f"p{pct}_s"]:.6f}')
+            lines.append(f'{p}_api_latency_seconds_sum{{endpoint="{endpoint}"}} {latency["sum_s"]:.6f}')
+            lines.append(f'{p}_api_latency_seconds_count{{endpoint="{endpoint}"}} {latency["count"]}')
+        for field in ("hits", "misses", "coalesced"):
+            lines.append(f"# TYPE {p}_cache_{field}_total counter")
+            lines += [f'{p}_cache_{field}_total{{cache="{name}"}} {stats[field]}' for name, stats in data["caches"].items()]
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """Writes the metrics to `path` (Prometheus text for ".prom", JSON otherwise), atomically."""
+        content = self.to_prometheus() if path.endswith(".prom") else json.dumps(self.to_dict(), indent=2)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(tmp, path)
+
+    def summary_tables(self):
+        """Returns [stage table, endpoint table, cache table if any cache was used] for printing with rich."""
+        data = self.to_dict()
+        stages = Table(title=f"Scan Timing (total {data['elapsed_s']:.2f}s)")
+        for column in ("Stage", "Runs", "Total (s)", "Max (s)"):
+            stages.add_column(column, justify="left" if column == "Stage" else "right")
+        for name, stage in data["stages"].items():
+            stages.add_row(name, str(stage["count"]), f"{stage['total_s']:.3f}", f"{stage['max_s']:.3f}")
+
+        endpoints = Table(title="API Calls")
+        for column in ("Endpoint", "Calls", "Retries", "Failures", "Throttled", "p50 (ms)", "p95 (ms)", "p99 (ms)"):
+            endpoints.add_column(column, justify="left" if column == "Endpoint" else "right")
+        for endpoint, stats in sorted(data["endpoints"].items()):
+            latency = stats["latency"]
+            endpoints.add_row(endpoint, str(stats["calls"]), str(stats["retries"]), str(stats["failures"]),
+                              str(stats["throttled"]),
+                              *("-" if latency[f"p{p}_s"] is None else f"{latency[f'p{p}_s'] * 1000:.0f}"
+                                for p in PERCENTILES))
+        if not data["caches"]:
+            return [stages, endpoints]
+
+        caches = Table(title="Caches")
+        for column in ("Cache", "Hits", "Misses", "Coalesced", "Hit Rate"):
+            caches.add_column(column, justify="left" if column == "Cache" else "right")
+        for name, stats in sorted(data["caches"].items()):
+            lookups = stats["hits"] + stats["misses"] + stats["coalesced"]
+            caches.add_row(name, str(stats["hits"]), str(stats["misses"]), str(stats["coalesced"]),
+                           f"{(stats['hits'] + stats['coalesced']) / lookups:.0%}" if lookups else "-")
+        return [stages, endpoints, caches]
+
+
+# Shared, process-wide metrics for the current scan
+metrics = ScanMetrics()
@@ -0,0 +1,119 @@
+"""
+scan_pipeline.py
+--------------------
+Purpose:
+    Runs a scan as a set of composable steps on a thread pool. Each step starts as
+    soon as the steps it depends on have finished, so independent network waits
+    (login, scrip master download, Chartink queries) overlap instead of running serially.
+
+Classes:
+    - ScanStep(name, fn, requires=()): One unit of work. `fn` is called with the results
+      of the steps in `requires` as keyword arguments.
+    - StepFailed: Raise from a step to stop it (and everything depending on it) with a message.
+    - ScanPipeline(steps, max_workers=None): Executes the steps and collects results and errors.
+
+Example:
+    pipeline = ScanPipeline([
+        ScanStep("login", do_login),
+        ScanStep("screen", run_screener),
+        ScanStep("otm", build_table, requires=("login", "screen")),  # build_table(login=..., screen=...)
+    ])
+    results = pipeline.run()
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+class StepFailed(Exception):
+    """Raised by a step to abort itself and skip the steps that depend on it."""
+
+
+class StepSkipped(Exception):
+    """Recorded for a step that did not run because one of its requirements failed."""
+
+
+class ScanStep:
+    """
+    A named pipeline step.
+
+    Args:
+        name (str): Step name; also the keyword under which dependents receive its result.
+        fn (callable): Function to run. Receives one keyword argument per required step.
+        requires (tuple[str]): Names of the steps that must finish first.
+    """
+    def __init__(self, name, fn, requires=()):
+        self.name = name
+        self.fn = fn
+        self.requires = tuple(requires)
+
+    def __repr__(self):
+        return f"ScanStep({self.name!r}, requires={self.requires!r})"
+
+
+class ScanPipeline:
+    """
+    Dependency-ordered, concurrent executor for `ScanStep`s.
+
+    After `run()`, `results` holds each successful step's return value, `errors` holds the
+    exception of each failed or skipped step, and `timings` the wall time of each step run.
+    """
+    def __init__(self, steps, max_workers=None):
+        self.steps = {step.name: step for step in steps}
+        self.max_workers = max_workers or max(1, len(self.steps))
+        for step in self.steps.values():
+            missing = [r for r in step.requires if r not in self.steps]
+            if missing:
+                raise ValueError(f"Step '{step.name}' requires unknown step(s): {missing}")
+        self.results = {}
+        self.errors = {}
+        self.timings = {}
+
+    def _timed(self, step, kwargs):
+        start = time.perf_counter()
+        try:
+            return step.fn(**kwargs)
+        finally:
+            self.timings[step.name] = time.perf_counter() - start
+
+    def _schedule(self, executor, pending, running):
+        """Submits every pending step whose requirements are met; skips those with failed requirements."""
+        progressed = True
+        while progressed:
+            progressed = False
+            for name in list(pending):
+                step = self.steps[name]
+                failed = [r for r in step.requires if r in self.errors]
+                if failed:
+                    self.errors[name] = StepSkipped(f"requirement(s) failed: {', '.join(failed)}")
+                    pending.remove(name)
+                    progressed = True
+                elif all(r in self.results for r in step.requires):
+                    kwargs = {r: self.results[r] for r in step.requires}
+                    running[executor.submit(self._timed, step, kwargs)] = name
+                    pending.remove(name)
+                    progressed = True
+
+    def run(self):
+        """
+        Runs all steps, overlapping those that do not depend on each other.
+
+        Returns:
+            dict: Mapping of step name -> result for every step that succeeded.
+        """
+        self.results, self.errors, self.timings = {}, {}, {}
+        pending = list(self.steps)
+        running = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            self._schedule(executor, pending, running)
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        self.results[name] = future.result()
+                    except Exception as e:
+                        self.errors[name] = e
+                self._schedule(executor, pending, running)
+        for name in pending:
+            self.errors[name] = StepSkipped("dependency cycle")
+        return self.results
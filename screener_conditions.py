@@ -7,10 +7,14 @@ Purpose:
 Contains:
     - GAINER_CONDITION : String defining rules to identify gainers.
     - LOSER_CONDITION  : String defining rules to identify losers.
+    - local_gainer_condition / local_loser_condition : The same rules on local candles
+      (see local_screener.py), looked up through LOCAL_CONDITIONS.
 
 Editable:
     - Update the conditions here if you want to change your stock scanning logic.
+    - When a Chartink string changes, update its local translation below as well.
 """
+import numpy as np
 
 
 GAINER_CONDITION = """
@@ -137,3 +141,81 @@ LOSER_CONDITION = """
     )
 )
 """
+
+
+# --- Local translations (used by `main.py --screener local`) ---
+# Each takes the 15 minute, 1 hour and 3 hour CandleFrames and the lot sizes of the
+# universe and returns one boolean per symbol. `f.at(series, n)` reads Chartink's
+# "[=n]" candle: n > 0 counts today's candles, n < 0 the previous day's from the end.
+
+def local_gainer_condition(m15, h1, h3, lot_size):
+    """GAINER_CONDITION, block by block."""
+    at, at15 = h1.at, m15.at
+    close1, open1, high1, low1 = at(h1.close, 1), at(h1.open, 1), at(h1.high, 1), at(h1.low, 1)
+    range1 = high1 - low1
+    rsi15, rsi1h = m15.rsi(8), h1.rsi(8)
+    rsi15_ema, rsi1h_ema = m15.ema(rsi15, 8), h1.ema(rsi1h, 8)
+    obv, obv_wma = h1.obv(), h1.wma(h1.obv(), 8)
+    cci = h1.cci(17)
+    wma_close = h1.wma(h1.close, 17)
+    st15, st1h = m15.supertrend(17, 1.7), h1.supertrend(17, 1.7)
+    r = {n: at(rsi1h, n) for n in (1, -1, -2, -3)}
+
+    price_volume = (close1 > open1) & (close1 > h3.at(h3.high, -1)) & (lot_size <= 8000) & (at(h1.volume, 1) >= 50000)
+    small_moves = np.logical_and.reduce([at15(m15.pct_change(), n) <= 1.7 for n in (1, 2, 3, 4)])
+    rsi_momentum = ((at15(rsi15, 3) > at15(rsi15_ema, 3)) & (at15(rsi15, 4) > at15(rsi15_ema, 4))
+                    & (r[1] > at(rsi1h_ema, 1)))
+    strong_candle = (((close1 - low1) / range1 > 0.62) & (range1 > at(h1.sma(h1.high - h1.low, 17), 1) * 1.7)
+                     & (np.abs(close1 - open1) / range1 < 1))
+    obv_cross = np.logical_or.reduce([(at(obv, a) > at(obv_wma, a)) & (at(obv, b) <= at(obv_wma, b))
+                                      for a, b in ((1, -1), (-1, -2), (-2, -3))])
+    cci_cross = np.logical_or.reduce([(at(cci, 1) > level) & (at(cci, -1) <= level) for level in (-86, 86, -100, 100)])
+    rsi_cross = (((r[1] > 68) & (r[-1] <= 68)) | ((r[1] > 30) & (r[-1] <= 30)) | ((r[-1] > 68) & (r[-2] <= 68))
+                 | ((r[-2] > 68) & (r[-3] <= 68)) | ((r[1] > 78.2) & (r[-1] >= 70)))
+    wma1 = at(wma_close, 1)
+    wma_support = (((wma1 > low1) & (wma1 < close1))
+                   | ((wma1 < close1) & (at(wma_close, -1) >= at(h1.close, -1))))
+    above_supertrend = ((at15(m15.close, 3) > at15(st15, 3)) & (at15(m15.close, 4) > at15(st15, 4))
+                        & (close1 > at(st1h, 1)))
+    return (price_volume & small_moves & rsi_momentum & strong_candle & obv_cross & cci_cross & rsi_cross
+            & wma_support & above_supertrend)
+
+
+def local_loser_condition(m15, h1, h3, lot_size):
+    """LOSER_CONDITION, block by block."""
+    at, at15 = h1.at, m15.at
+    close1, open1, high1, low1 = at(h1.close, 1), at(h1.open, 1), at(h1.high, 1), at(h1.low, 1)
+    range1 = high1 - low1
+    rsi15, rsi1h = m15.rsi(8), h1.rsi(8)
+    rsi15_ema, rsi1h_ema = m15.ema(rsi15, 8), h1.ema(rsi1h, 8)
+    obv, obv_wma = h1.obv(), h1.wma(h1.obv(), 8)
+    cci = h1.cci(17)
+    wma_close = h1.wma(h1.close, 17)
+    st15, st1h = m15.supertrend(17, 1.7), h1.supertrend(17, 1.7)
+    r = {n: at(rsi1h, n) for n in (1, -1, -2, -3)}
+
+    price_volume = (close1 < open1) & (close1 < h3.at(h3.low, -1)) & (lot_size <= 8000) & (at(h1.volume, 1) >= 50000)
+    small_moves = np.logical_and.reduce([at15(m15.pct_change(), n) >= -1.7 for n in (1, 2, 3, 4)])
+    rsi_momentum = ((at15(rsi15, 3) <= at15(rsi15_ema, 3)) & (at15(rsi15, 4) <= at15(rsi15_ema, 4))
+                    & (r[1] <= at(rsi1h_ema, 1)))
+    strong_candle = ((np.abs(close1 - high1) / range1 > 0.62) & (range1 > at(h1.sma(h1.high - h1.low, 17), 1) * 1.7)
+                     & (np.abs(open1 - close1) / range1 < 1))
+    obv_cross = np.logical_or.reduce([(at(obv, a) < at(obv_wma, a)) & (at(obv, b) >= at(obv_wma, b))
+                                      for a, b in ((1, -1), (-1, -2), (-2, -3))])
+    cci_cross = np.logical_or.reduce([(at(cci, 1) < level) & (at(cci, -1) >= level) for level in (-86, 86, -100, 100)])
+    rsi_cross = (((r[1] < 32) & (r[-1] >= 32)) | ((r[-1] < 32) & (r[-2] >= 32)) | ((r[-2] < 32) & (r[-3] >= 32))
+                 | ((r[1] < 70) & (r[-1] >= 70)) | ((r[1] < 20) & (r[-1] <= 30)))
+    wma1 = at(wma_close, 1)
+    wma_resistance = (((wma1 < high1) & (wma1 > close1))
+                      | ((wma1 > close1) & (at(wma_close, -1) <= at(h1.close, -1))))
+    below_supertrend = ((at15(m15.close, 3) < at15(st15, 3)) & (at15(m15.close, 4) < at15(st15, 4))
+                        & (close1 < at(st1h, 1)))
+    return (price_volume & small_moves & rsi_momentum & strong_candle & obv_cross & cci_cross & rsi_cross
+            & wma_resistance & below_supertrend)
+
+
+# Chartink string -> local translation
+LOCAL_CONDITIONS = {
+    GAINER_CONDITION: local_gainer_condition,
+    LOSER_CONDITION: local_loser_condition,
+}
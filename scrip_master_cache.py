@@ -0,0 +1,202 @@
+"""
+scrip_master_cache.py
+-------------------------
+Purpose:
+    Keeps a local, per-trading-day copy of the Angel One scrip master so that runs
+    after the first one skip the network download and the large JSON parse.
+
+Functions:
+    - load_scrip_master(url, cache_dir=SCRIP_MASTER_CACHE_DIR): Returns the scrip master rows of
+      SCRIP_MASTER_SEGMENTS as instrument dicts, served from the cache when it is still valid.
+    - load_scrip_master_columns(url, cache_dir=SCRIP_MASTER_CACHE_DIR): Same, but returns the
+      memory-mapped NumPy columns instead of building per-row dicts.
+    - load_instrument_table(url, cache_dir=SCRIP_MASTER_CACHE_DIR): The rows the scanner uses as a
+      typed `InstrumentTable`, filtered straight from the columns.
+
+Notes:
+    - Each column is stored as its own uncompressed `.npy` file so it can be opened
+      with `np.load(..., mmap_mode="r")`. A `meta.json` file is written last and marks
+      the cache as complete.
+    - The cache is valid for the trading day it was written on. On a new day a HEAD
+      request compares the server's ETag / Content-Length with the cached ones and only
+      re-downloads when they differ.
+    - Downloads are parsed while they stream in (`utils.stream_json_array_with_retry`) and only
+      rows of SCRIP_MASTER_SEGMENTS are kept, straight into column batches; the raw body and a
+      dict for every row are never held at once. The cache records the segments it holds.
+"""
+import json
+import logging
+from datetime import date
+from pathlib import Path
+
+import numpy as np
+import requests
+
+from instrument_table import InstrumentTable
+from options_config import SCRIP_MASTER_CACHE_DIR, SCRIP_MASTER_SEGMENTS
+from utils import stream_json_array_with_retry
+
+SCRIP_MASTER_COLUMNS = ("token", "symbol", "name", "expiry", "strike", "lotsize",
+                        "instrumenttype", "exch_seg", "tick_size")
+META_FILE = "meta.json"
+COLUMN_BATCH_ROWS = 20000  # rows buffered as Python strings before they are packed into arrays
+
+
+def _read_meta(cache_dir):
+    try:
+        with open(cache_dir / META_FILE, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_meta(cache_dir, meta):
+    tmp = cache_dir / (META_FILE + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    tmp.replace(cache_dir / META_FILE)
+
+
+def _remote_fingerprint(url):
+    """Returns the server's ETag / Content-Length for the scrip master, or None if unavailable."""
+    try:
+        resp = requests.head(url, timeout=10, allow_redirects=True)
+        resp.raise_for_status()
+    except Exception as e:
+        logging.error(f"[scrip_master_cache] HEAD request failed: {e}")
+        return None
+    fingerprint = {"etag": resp.headers.get("ETag"), "content_length": resp.headers.get("Content-Length")}
+    return fingerprint if any(fingerprint.values()) else None
+
+
+def _segment_filter(segments):
+    """Row predicate keeping the given exchange segments, or None to keep every row."""
+    if segments is None:
+        return None
+    segments = frozenset(segments)
+    return lambda inst: inst.get("exch_seg") in segments
+
+
+def _collect_columns(rows):
+    """Packs instrument dicts into NumPy string columns, `COLUMN_BATCH_ROWS` at a time."""
+    batches = {col: [] for col in SCRIP_MASTER_COLUMNS}
+    pending = {col: [] for col in SCRIP_MASTER_COLUMNS}
+
+    def flush():
+        for col, values in pending.items():
+            batches[col].append(np.array(values, dtype=np.str_))
+            values.clear()
+
+    for inst in rows:
+        for col, values in pending.items():
+            values.append(str(inst.get(col, "")))
+        if len(pending["token"]) >= COLUMN_BATCH_ROWS:
+            flush()
+    flush()
+    return {col: np.concatenate(arrays) for col, arrays in batches.items()}
+
+
+def _write_columns(cache_dir, columns):
+    """Writes the scrip master as one `.npy` file per column."""
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    for col in SCRIP_MASTER_COLUMNS:
+        np.save(cache_dir / f"{col}.npy", columns[col], allow_pickle=False)
+
+
+def _read_columns(cache_dir):
+    """Opens the cached columns as read-only memory maps."""
+    return {col: np.load(cache_dir / f"{col}.npy", mmap_mode="r", allow_pickle=False)
+            for col in SCRIP_MASTER_COLUMNS}
+
+
+def _columns_to_records(columns):
+    names = list(columns)
+    return [dict(zip(names, row)) for row in zip(*(columns[c].tolist() for c in names))]
+
+
+def _refresh_cache(url, cache_dir, segments=SCRIP_MASTER_SEGMENTS):
+    """
+    Makes sure the on-disk cache holds today's scrip master.
+
+    Returns:
+        dict or None: The cached columns (memory-mapped), the freshly downloaded ones if the
+        cache could not be written, or None if the scrip master could not be loaded.
+    """
+    cache_dir = Path(cache_dir)
+    today = date.today().isoformat()
+    meta = _read_meta(cache_dir)
+    segments = sorted(segments) if segments is not None else None
+    if meta and (meta.get("url") != url or meta.get("segments", "unknown") != segments):
+        meta = None
+
+    if meta and meta.get("trading_date") == today:
+        try:
+            return _read_columns(cache_dir)
+        except (OSError, ValueError) as e:
+            logging.error(f"[scrip_master_cache] Cache unreadable, re-downloading: {e}")
+            meta = None
+
+    fingerprint = _remote_fingerprint(url)
+    if meta and fingerprint and meta.get("fingerprint") == fingerprint:
+        try:
+            columns = _read_columns(cache_dir)
+            _write_meta(cache_dir, {**meta, "trading_date": today})
+            return columns
+        except (OSError, ValueError) as e:
+            logging.error(f"[scrip_master_cache] Cache unreadable, re-downloading: {e}")
+
+    columns = stream_json_array_with_retry(url, _collect_columns, keep=_segment_filter(segments))
+    if columns is None or not len(columns["token"]):
+        return None
+    try:
+        _write_columns(cache_dir, columns)
+        _write_meta(cache_dir, {"url": url, "trading_date": today, "fingerprint": fingerprint,
+                                "segments": segments, "rows": len(columns["token"])})
+        return _read_columns(cache_dir)
+    except OSError as e:
+        logging.error(f"[scrip_master_cache] Could not write cache: {e}")
+        return columns
+
+
+def load_scrip_master(url, cache_dir=SCRIP_MASTER_CACHE_DIR):
+    """
+    Loads the scrip master, using the local cache when it is valid for today.
+
+    Args:
+        url (str): Scrip master URL.
+        cache_dir (str or Path): Directory holding the cached columns.
+
+    Returns:
+        list or None: The instrument dicts of SCRIP_MASTER_SEGMENTS, or None if it could not be loaded.
+    """
+    columns = _refresh_cache(url, cache_dir)
+    return None if columns is None else _columns_to_records(columns)
+
+
+def load_scrip_master_columns(url, cache_dir=SCRIP_MASTER_CACHE_DIR):
+    """
+    Loads the scrip master as memory-mapped NumPy string columns.
+
+    Args:
+        url (str): Scrip master URL.
+        cache_dir (str or Path): Directory holding the cached columns.
+
+    Returns:
+        dict or None: Mapping of column name -> read-only NumPy array, or None on failure.
+    """
+    return _refresh_cache(url, cache_dir)
+
+
+def load_instrument_table(url, cache_dir=SCRIP_MASTER_CACHE_DIR):
+    """
+    Loads the NSE equity and NFO stock F&O rows of the scrip master as an `InstrumentTable`.
+
+    Args:
+        url (str): Scrip master URL.
+        cache_dir (str or Path): Directory holding the cached columns.
+
+    Returns:
+        InstrumentTable or None: The table, or None if the scrip master could not be loaded.
+    """
+    columns = _refresh_cache(url, cache_dir)
+    return None if columns is None else InstrumentTable.from_columns(columns)
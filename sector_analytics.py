@@ -0,0 +1,86 @@
+"""
+sector_analytics.py
+-----------------------
+Purpose:
+    Rolls one scan's gainers/losers OTM tables up by sector: how many gainers and
+    losers each sector has, its breadth, mean % change, total CE P/L and median CE IV.
+
+Functions:
+    sector_rollup(tables)
+        -> One row per sector from {"gainers": df, "losers": df}.
+    build_breadth_table(rollup, title="Sector Breadth")
+        -> rich Table of the rollup, printed after the stock tables.
+
+Notes:
+    - Sectors come from `sectors.sector_finder` as a categorical column, so the group-by
+      works on integer codes; sectors with no scanned stock are left out.
+    - Counts and mean % change use each symbol once per side, so scanning several
+      expiries does not inflate them; CE P/L and CE IV use every row (every expiry).
+    - Breadth is (gainers - losers) / (gainers + losers), from -1 (all losers) to +1.
+"""
+import numpy as np
+import pandas as pd
+from rich.table import Table
+
+from sectors import sector_finder
+
+SIDES = ("gainers", "losers")
+ROLLUP_COLUMNS = ["Sector", "Gainers", "Losers", "Breadth", "Mean % Change", "Total CE P/L", "Median CE IV"]
+
+
+def sector_rollup(tables):
+    """
+    Aggregates the scanned rows per sector.
+
+    Args:
+        tables (dict): Side ("gainers"/"losers") -> OTM table from `build_otm_dataframe`
+            (with or without a "Sector" column). Missing or empty tables are skipped.
+
+    Returns:
+        pd.DataFrame: ROLLUP_COLUMNS, sorted by breadth and then by the number of stocks.
+    """
+    frames = [df.assign(Side=side) for side, df in tables.items() if df is not None and not df.empty]
+    if not frames:
+        return pd.DataFrame(columns=ROLLUP_COLUMNS)
+    rows = pd.concat(frames, ignore_index=True)
+    rows["Sector"] = sector_finder.get_sector_bulk(rows["Symbol"])
+    for col in ("% Change", "CE P/L", "CE IV"):
+        rows[col] = pd.to_numeric(rows[col], errors="coerce") if col in rows.columns else np.nan
+
+    stocks = rows.drop_duplicates(["Side", "Symbol"])
+    counts = (stocks.groupby(["Sector", "Side"], observed=True).size()
+              .unstack(fill_value=0).reindex(columns=list(SIDES), fill_value=0))
+    per_sector = rows.groupby("Sector", observed=True).agg(total_pl=("CE P/L", "sum"), median_iv=("CE IV", "median"))
+    mean_change = stocks.groupby("Sector", observed=True)["% Change"].mean()
+
+    out = pd.DataFrame({"Gainers": counts["gainers"], "Losers": counts["losers"]})
+    out["Breadth"] = (out["Gainers"] - out["Losers"]) / (out["Gainers"] + out["Losers"])
+    out["Mean % Change"] = mean_change
+    out["Total CE P/L"] = per_sector["total_pl"]
+    out["Median CE IV"] = per_sector["median_iv"]
+    out["Stocks"] = out["Gainers"] + out["Losers"]
+    out = out.sort_values(["Breadth", "Stocks"], ascending=[False, False]).drop(columns="Stocks")
+    out.index = out.index.astype(str)
+    return out.rename_axis("Sector").reset_index()[ROLLUP_COLUMNS]
+
+
+def build_breadth_table(rollup, title="Sector Breadth"):
+    """
+    Builds a rich Table from `sector_rollup`'s result.
+
+    Returns:
+        rich.table.Table: Positive breadth in green, negative in red.
+    """
+    table = Table(title=title, show_lines=False)
+    for col in ROLLUP_COLUMNS:
+        table.add_column(f"{col} (%)" if col == "Median CE IV" else col, style="bold magenta" if col == "Sector" else None,
+                         justify="left" if col == "Sector" else "right")
+
+    def number(x, fmt):
+        return "-" if pd.isna(x) else format(x, fmt)
+
+    for sector, gainers, losers, breadth, mean_change, total_pl, median_iv in rollup.itertuples(index=False):
+        colour = "green" if breadth > 0 else "red" if breadth < 0 else "white"
+        table.add_row(sector, str(gainers), str(losers), f"[{colour}]{breadth:+.2f}[/{colour}]",
+                      number(mean_change, ".2f"), number(total_pl, ".2f"), number(median_iv * 100, ".1f"))
+    return table
@@ -1,36 +1,98 @@
 # sectors.py
-# Optimized for bulk lookups
+# Optimized for bulk lookups: the symbol -> sector map is held as a pandas categorical
+# and cached as .npy columns (see SECTOR_CACHE_DIR), rebuilt only when the CSV changes.
 
 import csv
+import json
 import logging
 from pathlib import Path
+import numpy as np
 import pandas as pd
 
+from options_config import SECTOR_CACHE_DIR
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+UNKNOWN_SECTOR = "Unknown"
+META_FILE = "meta.json"
+
 class SectorFetcher:
     """
     Fetches sector/industry for stock symbols using a preloaded dict from CSV.
     Supports ultra-fast bulk lookups for pandas Series.
+
+    The map is also kept as `symbols` (upper-case Index) and `sectors` (categorical codes
+    into `categories`, with UNKNOWN_SECTOR always present), so bulk lookups return a
+    categorical Series that groups without hashing sector strings again.
     """
-    def __init__(self, csv_path: str):
+    def __init__(self, csv_path: str, cache_dir=SECTOR_CACHE_DIR):
         self.sector_cache = {}  # cache for repeated lookups
         self.symbol_to_sector = {}
+        self.symbols = pd.Index([], dtype=object)
+        self.categories = pd.Index([UNKNOWN_SECTOR])
+        self.codes = np.zeros(0, dtype=np.int16)
 
         csv_file = Path(csv_path)
         if not csv_file.exists():
             logging.error(f"CSV file not found at {csv_file}")
             return
 
+        stat = csv_file.stat()
+        source = {"csv": str(csv_file.resolve()), "mtime": stat.st_mtime, "size": stat.st_size}
+        cache_dir = Path(cache_dir) if cache_dir else None
+        if not (cache_dir and self._load_cache(cache_dir, source)):
+            self._load_csv(csv_file)
+            if cache_dir:
+                self._write_cache(cache_dir, source)
+        self.symbol_to_sector = dict(zip(self.symbols, self.categories[self.codes]))
+
+    def _load_csv(self, csv_file):
         # Load CSV into dict
+        symbol_to_sector = {}
         with open(csv_file, newline='', encoding='utf-8') as f:
             reader = csv.DictReader(f)
             for row in reader:
-                symbol = row.get("Symbol", "").strip().upper()
-                industry = row.get("Industry", "Unknown").strip()
+                symbol = (row.get("Symbol") or "").strip().upper()
+                industry = (row.get("Industry") or UNKNOWN_SECTOR).strip()
                 if symbol:
-                    self.symbol_to_sector[symbol] = industry
+                    symbol_to_sector[symbol] = industry
+        sectors = pd.Categorical(list(symbol_to_sector.values()))
+        if UNKNOWN_SECTOR not in sectors.categories:
+            sectors = sectors.add_categories([UNKNOWN_SECTOR])
+        self.symbols = pd.Index(list(symbol_to_sector), dtype=object)
+        self.categories = pd.Index(sectors.categories, dtype=object)
+        self.codes = sectors.codes.astype(np.int16)
+
+    def _load_cache(self, cache_dir, source):
+        """Reads the cached map if it was built from the same CSV (path, mtime and size)."""
+        try:
+            with open(cache_dir / META_FILE, encoding="utf-8") as f:
+                if json.load(f) != source:
+                    return False
+            symbols = np.load(cache_dir / "symbols.npy", allow_pickle=False)
+            categories = np.load(cache_dir / "categories.npy", allow_pickle=False)
+            codes = np.load(cache_dir / "codes.npy", allow_pickle=False)
+        except (OSError, ValueError):
+            return False
+        self.symbols = pd.Index(symbols.astype(object), dtype=object)
+        self.categories = pd.Index(categories.astype(object), dtype=object)
+        self.codes = codes
+        return True
+
+    def _write_cache(self, cache_dir, source):
+        try:
+            cache_dir.mkdir(parents=True, exist_ok=True)
+            np.save(cache_dir / "symbols.npy", np.array(self.symbols, dtype=np.str_), allow_pickle=False)
+            np.save(cache_dir / "categories.npy", np.array(self.categories, dtype=np.str_), allow_pickle=False)
+            np.save(cache_dir / "codes.npy", self.codes, allow_pickle=False)
+            # meta.json is written last and marks the cache as complete
+            tmp = cache_dir / (META_FILE + ".tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(source, f)
+            tmp.replace(cache_dir / META_FILE)
+        except OSError as e:
+            logging.error(f"[sectors] Could not write sector cache: {e}")
 
     def get_sector(self, symbol: str) -> str:
         """Single symbol lookup"""
@@ -38,21 +100,26 @@ class SectorFetcher:
         if symbol_upper in self.sector_cache:
             return self.sector_cache[symbol_upper]
 
-        sector = self.symbol_to_sector.get(symbol_upper, "Unknown")
+        sector = self.symbol_to_sector.get(symbol_upper, UNKNOWN_SECTOR)
         self.sector_cache[symbol_upper] = sector
         return sector
 
     def get_sector_bulk(self, symbols):
         """
         Bulk lookup for a list or pandas Series of symbols.
-        Returns a pandas Series of sectors, in the same order as input.
+        Returns a pandas Series of sectors, in the same order as input; for a Series
+        the result is categorical (unknown symbols map to UNKNOWN_SECTOR).
         """
         if isinstance(symbols, pd.Series):
-            # Vectorized mapping
-            sectors = symbols.str.upper().map(self.symbol_to_sector).fillna("Unknown")
+            # Vectorized mapping: positions in the symbol index -> category codes
+            positions = self.symbols.get_indexer(symbols.astype(str).str.upper())
+            unknown = self.categories.get_loc(UNKNOWN_SECTOR)
+            codes = np.where(positions >= 0, self.codes[positions] if len(self.codes) else unknown, unknown)
+            sectors = pd.Series(pd.Categorical.from_codes(codes, categories=self.categories),
+                                index=symbols.index, name="Sector")
         else:
             # Convert list/iterable to list
-            sectors = [self.symbol_to_sector.get(s.upper(), "Unknown") for s in symbols]
+            sectors = [self.symbol_to_sector.get(s.upper(), UNKNOWN_SECTOR) for s in symbols]
         return sectors
 
 # Initialize fetcher with CSV in the same folder
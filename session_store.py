@@ -0,0 +1,143 @@
+"""
+session_store.py
+--------------------
+Purpose:
+    Saves the SmartAPI session tokens (JWT, refresh token, feed token) to a local,
+    owner-only file so later runs can skip `generateSession` and the TOTP wait.
+
+Functions:
+    - save_session(session, client_code, path=SESSION_FILE): Stores a `generateSession`-style response.
+    - load_session(client_code, path=SESSION_FILE): Returns the stored response, or None.
+    - clear_session(path=SESSION_FILE): Deletes the stored tokens (e.g. after logout).
+    - refresh_session(smartApi, client_code, session, path=SESSION_FILE): New JWT from the refresh token.
+    - restore_or_login(smartApi, client_code, login_fn, path=SESSION_FILE): Reuses the stored
+      tokens if they still work, refreshes them with the refresh token if not, and only
+      calls `login_fn` for a full TOTP login as a last resort.
+
+Notes:
+    - The file is created with mode 0600. Keep it out of version control (see .gitignore).
+    - Stored sessions older than SESSION_MAX_AGE_HOURS are not reused at all.
+    - "saved_at" is the time of the login or refresh that issued the tokens. Sessions
+      returned by this module carry it as a top-level "saved_at" (epoch seconds), so
+      callers can tell how old a reused token is.
+"""
+import json
+import logging
+import os
+import time
+
+from options_config import SESSION_FILE, SESSION_MAX_AGE_HOURS
+
+TOKEN_FIELDS = ("jwtToken", "refreshToken", "feedToken")
+
+
+def save_session(session, client_code, path=SESSION_FILE):
+    """Writes the session tokens to `path`, readable by the current user only; returns "saved_at"."""
+    data = (session or {}).get("data") or {}
+    record = {field: data.get(field) for field in TOKEN_FIELDS}
+    record.update({"clientcode": client_code, "saved_at": time.time()})
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(record, f)
+    os.replace(tmp, path)
+    return record["saved_at"]
+
+
+def load_session(client_code, path=SESSION_FILE):
+    """
+    Reads stored tokens for `client_code`.
+
+    Returns:
+        dict or None: A `generateSession`-style response ({"status": True, "data": {...}})
+        plus the "saved_at" of the stored tokens, or None if nothing usable is stored.
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            record = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if record.get("clientcode") != client_code or not record.get("jwtToken"):
+        return None
+    if time.time() - record.get("saved_at", 0) > SESSION_MAX_AGE_HOURS * 3600:
+        return None
+    return {"status": True, "data": {field: record.get(field) for field in TOKEN_FIELDS},
+            "saved_at": record["saved_at"]}
+
+
+def clear_session(path=SESSION_FILE):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _apply_tokens(smartApi, client_code, session):
+    data = session["data"]
+    smartApi.setAccessToken(data["jwtToken"])
+    smartApi.setRefreshToken(data["refreshToken"])
+    smartApi.setFeedToken(data["feedToken"])
+    smartApi.setUserId(client_code)
+
+
+def _is_valid(smartApi, session):
+    """Checks the tokens with a cheap authenticated call."""
+    try:
+        profile = smartApi.getProfile(session["data"]["refreshToken"])
+    except Exception as e:
+        logging.error(f"[session_store] Stored session check failed: {e}")
+        return False
+    return bool(profile and profile.get("status"))
+
+
+def refresh_session(smartApi, client_code, session, path=SESSION_FILE):
+    """
+    Exchanges the refresh token for a new JWT/feed token and stores them.
+
+    Returns:
+        dict or None: The refreshed session, or None if the refresh was rejected.
+    """
+    refresh_token = (session or {}).get("data", {}).get("refreshToken")
+    if not refresh_token:
+        return None
+    try:
+        data = smartApi.generateToken(refresh_token)
+    except Exception as e:
+        logging.error(f"[session_store] Token refresh failed: {e}")
+        return None
+    if not data or not data.get("status"):
+        return None
+    refreshed = {"status": True, "data": {**session["data"], **data["data"]}}
+    refreshed["saved_at"] = save_session(refreshed, client_code, path)
+    return refreshed
+
+
+def restore_or_login(smartApi, client_code, login_fn, path=SESSION_FILE):
+    """
+    Returns a working session, logging in with TOTP only when the stored one cannot be used.
+
+    Args:
+        smartApi: The SmartConnect object; stored tokens are applied to it.
+        client_code (str): Angel One client code.
+        login_fn (callable): Performs a full login and returns the `generateSession` response.
+        path (str): Session file.
+
+    Returns:
+        dict: `generateSession`-style response for the active session.
+    """
+    stored = load_session(client_code, path)
+    if stored:
+        _apply_tokens(smartApi, client_code, stored)
+        if _is_valid(smartApi, stored):
+            print("✅ Reusing saved session.")
+            return stored
+        refreshed = refresh_session(smartApi, client_code, stored, path)
+        if refreshed:
+            print("🔄 Saved session refreshed.")
+            return refreshed
+
+    session = login_fn()
+    if session and session.get("status"):
+        session["saved_at"] = save_session(session, client_code, path)
+    return session
@@ -4,6 +4,8 @@ table_theme.py
 Purpose:
     Defines a reusable theme for styling tables using the `rich` library.
 """
+import pandas as pd
+from rich.table import Table
 
 def get_table_headers():
     """
@@ -15,6 +17,7 @@ def get_table_headers():
     return [
         ("Symbol", "bold cyan"),
         ("Stock Name", "bold yellow"),
+        ("Expiry", "white"),
         ("Sector", "bold magenta"),  # Added Sector column
         ("% Change", "green"),
         ("Lot Size", "White"),
@@ -24,5 +27,53 @@ def get_table_headers():
         ("New OTM Strike", "magenta"),
         ("New OTM CE", "bright_blue"),
         ("New OTM PE", "bright_red"),
-        ("CE P/L", "bold yellow")
+        ("CE P/L", "bold yellow"),
+        ("Quote Status", "bold red"),
     ]
+
+def get_live_table_headers():
+    """
+    Columns for the live (`--live`) table: the snapshot columns plus the values
+    recomputed on every tick.
+
+    Returns:
+        list[tuple]: A list of (column_name, style) tuples.
+    """
+    return get_table_headers() + [
+        ("Spot Price", "bold white"),
+        ("Gap", "white"),
+        ("CE IV", "cyan"),
+        ("CE Delta", "cyan"),
+    ]
+
+def format_cell(x):
+    """Formats a table cell: numbers to 2 decimals, missing values as "-"."""
+    if pd.isna(x):
+        return "-"
+    try:
+        return f"{float(x):.2f}"
+    except (TypeError, ValueError):
+        return str(x)
+
+def build_rich_table(df, title, headers_styles=None):
+    """
+    Builds a styled rich Table from a DataFrame.
+
+    Args:
+        df (pd.DataFrame): Rows to show. Columns missing from `df` are shown as "-".
+        title (str): Table title.
+        headers_styles (list[tuple], optional): (column_name, style) pairs. Defaults to `get_table_headers()`.
+
+    Returns:
+        rich.table.Table: The table, ready to print or to pass to `rich.live.Live`.
+    """
+    headers_styles = headers_styles or get_table_headers()
+    table = Table(title=title, show_lines=True)
+    for col, style in headers_styles:
+        table.add_column(col, style=style, justify="right")
+
+    headers = [h[0] for h in headers_styles]
+    for _, r in df.iterrows():
+        row_vals = [format_cell(r[c]) if c in df.columns else "-" for c in headers]
+        table.add_row(*row_vals)
+    return table
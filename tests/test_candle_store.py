@@ -0,0 +1,151 @@
+import json
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import candle_store
+from candle_store import EXCHANGE_TZ, CandleStore, StoreCandleSource
+from local_screener import CANDLE_COLUMNS
+
+
+def ist(text):
+    return datetime.strptime(text, "%Y-%m-%d %H:%M").replace(tzinfo=EXCHANGE_TZ)
+
+
+def session_candles(start, end):
+    """15-minute candles of every weekday session between two "YYYY-MM-DD HH:MM" candle starts."""
+    times = [t for t in pd.date_range(start, end, freq="15min")
+             if t.weekday() < 5 and "09:15" <= t.strftime("%H:%M") <= "15:15"]
+    values = np.arange(len(times), dtype=np.float64) + pd.Timestamp(start).day * 1000
+    return pd.DataFrame({"open": values, "high": values + 2, "low": values - 2, "close": values + 1,
+                         "volume": values * 10}, index=pd.DatetimeIndex(times, name="timestamp"))
+
+
+def stored(df):
+    """`df` as the store returns it: exchange time zone, nanosecond timestamps."""
+    out = df.tz_localize(EXCHANGE_TZ)
+    out.index = out.index.as_unit("ns")
+    return out
+
+
+@pytest.fixture
+def store(tmp_path):
+    return CandleStore(tmp_path)
+
+
+def test_append_skips_stored_and_duplicate_candles(store):
+    first = session_candles("2025-09-18 09:15", "2025-09-18 10:00")
+    assert store.append("abc", first) == 4
+    assert store.last_timestamp("ABC") == ist("2025-09-18 10:00")
+
+    overlap = session_candles("2025-09-18 09:45", "2025-09-18 11:00")
+    shuffled = pd.concat([overlap.iloc[::-1], overlap.iloc[-1:]])
+    assert store.append("ABC", shuffled) == 4  # 10:15 ... 11:00, once each
+
+    df = store.frame("ABC")
+    assert len(df) == 8 and df.index.is_monotonic_increasing
+    assert df.index[0] == pd.Timestamp("2025-09-18 09:15", tz=EXCHANGE_TZ)
+    pd.testing.assert_frame_equal(df.iloc[:4], stored(first), check_freq=False)
+    assert store.append("ABC", first) == 0
+    assert json.loads((store.root / "ABC" / "meta.json").read_text())["rows"] == 8
+
+
+def test_view_is_read_only_and_sliced_by_start(store):
+    store.append("ABC", session_candles("2025-09-18 09:15", "2025-09-18 15:15"))
+    views = store.view("ABC", start=ist("2025-09-18 14:00"))
+    assert len(views["close"]) == 6
+    with pytest.raises(ValueError):
+        views["close"][0] = 0.0
+    assert len(store.view("MISSING")["timestamp"]) == 0
+    assert len(store.frame("ABC", minutes=60)) == 7
+
+
+def test_partial_append_is_ignored_and_truncated(store):
+    store.append("ABC", session_candles("2025-09-18 09:15", "2025-09-18 10:00"))
+    folder = store.root / "ABC"
+    # An append that died after writing some of the column files
+    for name in ("timestamp.i8", "open.f8", "high.f8"):
+        with open(folder / name, "ab") as f:
+            f.write(b"\x07" * 8 * 3)
+
+    assert len(store.frame("ABC")) == 4
+    assert store.append("ABC", session_candles("2025-09-18 10:15", "2025-09-18 10:30")) == 2
+
+    for col in ("timestamp",) + tuple(CANDLE_COLUMNS):
+        assert (folder / candle_store.COLUMN_FILES[col][0]).stat().st_size == 6 * 8
+    expected = pd.concat([session_candles("2025-09-18 09:15", "2025-09-18 10:00"),
+                          session_candles("2025-09-18 10:15", "2025-09-18 10:30")])
+    pd.testing.assert_frame_equal(store.frame("ABC"), stored(expected), check_freq=False)
+
+
+def test_crash_before_meta_is_written(store, monkeypatch):
+    first = session_candles("2025-09-18 09:15", "2025-09-18 10:00")
+    store.append("ABC", first)
+    later = session_candles("2025-09-18 10:15", "2025-09-18 11:00")
+
+    def crash(*args, **kwargs):
+        raise OSError("disk full")
+
+    with monkeypatch.context() as m:
+        m.setattr(candle_store.json, "dump", crash)
+        with pytest.raises(OSError):
+            store.append("ABC", later)
+
+    # The columns hold the new rows, but meta.json still commits only the first four
+    assert (store.root / "ABC" / "close.f8").stat().st_size == 8 * 8
+    assert len(store.frame("ABC")) == 4
+    assert store.last_timestamp("ABC") == ist("2025-09-18 10:00")
+
+    assert store.append("ABC", later) == 4
+    assert (store.root / "ABC" / "close.f8").stat().st_size == 8 * 8
+    pd.testing.assert_frame_equal(store.frame("ABC"), stored(pd.concat([first, later])), check_freq=False)
+
+
+def test_next_candle_skips_the_close_and_weekends(store):
+    assert store.next_candle(ist("2025-09-18 10:00")) == ist("2025-09-18 10:15")
+    assert store.next_candle(ist("2025-09-18 15:15")) == ist("2025-09-19 09:15")
+    assert store.next_candle(ist("2025-09-19 15:15")) == ist("2025-09-22 09:15")  # Friday -> Monday
+
+
+class FakeCandleFetcher:
+    """`getCandleData` stand-in: every session candle in the requested range, the forming one included."""
+    def __init__(self):
+        self.requests = []
+
+    def fetch(self, symbol, from_date, to_date):
+        self.requests.append((symbol, from_date, to_date))
+        return session_candles(from_date, to_date)
+
+
+def test_update_fetches_only_missing_closed_candles(store):
+    fetcher = FakeCandleFetcher()
+    source = StoreCandleSource(store, fetcher, lookback_days=1)
+
+    # Friday 10:40: the 10:30 candle is still forming
+    assert source.update("ABC", now=ist("2025-09-19 10:40")) == 25 + 5
+    assert fetcher.requests == [("ABC", "2025-09-18 09:15", "2025-09-19 10:40")]
+    assert store.last_timestamp("ABC") == ist("2025-09-19 10:15")
+
+    assert source.update("ABC", now=ist("2025-09-19 11:02")) == 2  # 10:30 and 10:45
+    assert fetcher.requests[-1] == ("ABC", "2025-09-19 10:30", "2025-09-19 11:02")
+
+    assert source.update("ABC", now=ist("2025-09-19 11:10")) == 0  # 11:00 closes at 11:15
+    assert len(fetcher.requests) == 2
+
+    # On Monday the fetch resumes at 11:00 on Friday and stops at the forming 09:30 candle
+    assert source.update("ABC", now=ist("2025-09-22 09:31")) == 18 + 1
+    assert fetcher.requests[-1] == ("ABC", "2025-09-19 11:00", "2025-09-22 09:31")
+    assert store.last_timestamp("ABC") == ist("2025-09-22 09:15")
+    times = store.frame("ABC").index
+    assert len(times) == len(set(times)) == 25 + 25 + 1
+
+
+def test_update_stops_when_a_fetch_fails(store):
+    class FailingFetcher:
+        def fetch(self, symbol, from_date, to_date):
+            return None
+
+    assert StoreCandleSource(store, FailingFetcher(), lookback_days=1).update("ABC", now=ist("2025-09-19 10:40")) == 0
+    assert store.last_timestamp("ABC") is None
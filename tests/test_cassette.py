@@ -0,0 +1,81 @@
+import gzip
+import json
+
+import requests
+
+from cassette import Cassette
+
+CLIENT_CODE, PASSWORD, TOTP = "C4242", "s3cret-pin", "918273"
+JWT, REFRESH, FEED = "eyJ.jwt-token", "refresh-token-xyz", "feed-token-abc"
+SCRIP_URL = "https://margincalculator.angelbroking.com/OpenAPI_File/files/OpenAPIScripMaster.json"
+
+
+def fake_request(session, method, url, **kwargs):
+    response = requests.Response()
+    response.status_code = 200
+    response.url = url
+    if "loginByPassword" in url:
+        body = {"status": True, "data": {"jwtToken": JWT, "refreshToken": REFRESH, "feedToken": FEED}}
+    else:
+        body = [{"token": "1", "symbol": "ABC-EQ", "exch_seg": "NSE"}]
+    response._content = json.dumps(body).encode()
+    return response
+
+
+class FakeSmartConnect:
+    """Logs in over HTTP like SmartConnect does."""
+    def generateSession(self, client_code, password, totp):
+        return requests.post("https://apiconnect.angelone.in/rest/auth/angelbroking/user/v1/loginByPassword",
+                             json={"clientcode": client_code, "password": password, "totp": totp},
+                             headers={"X-PrivateKey": "api-key"}).json()
+
+
+def test_recorded_cassette_holds_no_secrets(tmp_path, monkeypatch):
+    monkeypatch.setattr(requests.Session, "request", fake_request)
+    path = tmp_path / "run.jsonl.gz"
+
+    with Cassette(str(path), "record") as cassette:
+        session = cassette.wrap(FakeSmartConnect()).generateSession(CLIENT_CODE, PASSWORD, TOTP)
+        requests.get(SCRIP_URL, timeout=20)
+
+    assert session["data"]["jwtToken"] == JWT  # the caller still gets the real tokens
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        text = f.read()
+    for secret in (CLIENT_CODE, PASSWORD, TOTP, JWT, REFRESH, FEED, "loginByPassword"):
+        assert secret not in text
+    assert SCRIP_URL in text  # other HTTP traffic is still recorded
+
+    with Cassette(str(path), "replay") as cassette:
+        assert cassette.recorded_session()["status"] is True
+        assert requests.get(SCRIP_URL, timeout=20).json()[0]["symbol"] == "ABC-EQ"
+
+
+class FakeMarketApi:
+    def getCandleData(self, historicDataParams):
+        return {"status": True, "data": [[historicDataParams["fromdate"], 1, 2, 0.5, 1.5, 100]]}
+
+    def ltpData(self, exchange, tradingsymbol, symboltoken):
+        return {"status": True, "data": {"exchange": exchange, "tradingsymbol": tradingsymbol,
+                                         "symboltoken": symboltoken, "ltp": 101.5}}
+
+    def setAccessToken(self, token):
+        pass
+
+
+def test_keyword_calls_are_recorded_and_replayed(tmp_path):
+    path = str(tmp_path / "run.jsonl.gz")
+    params = {"exchange": "NSE", "symboltoken": "1", "interval": "FIFTEEN_MINUTE",
+              "fromdate": "2025-09-18 09:15", "todate": "2025-09-18 15:30"}
+
+    with Cassette(path, "record") as cassette:
+        api = cassette.wrap(FakeMarketApi())
+        candles = api.getCandleData(historicDataParams=params)
+        quote = api.ltpData(exchange="NSE", tradingsymbol="ABC-EQ", symboltoken="1")
+
+    with Cassette(path, "replay") as cassette:
+        api = cassette.wrap()
+        api.setAccessToken(token="ignored")
+        assert api.getCandleData(historicDataParams=params) == candles
+        # Quotes are indexed by token, however the call passed its arguments
+        assert api.ltpData(exchange="NSE", tradingsymbol="ABC-EQ", symboltoken="1") == quote
+        assert api.ltpData("NSE", "ABC-EQ", symboltoken="1")["data"]["ltp"] == 101.5
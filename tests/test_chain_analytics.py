@@ -0,0 +1,135 @@
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from chain_analytics import (CHAIN_COLUMNS, INPUT_FIELDS, OUTPUT_FIELDS, ChainAnalytics, fetch_chain_greeks,
+                             pack_chain_inputs, solve_chain_block)
+from instrument_index import InstrumentIndex
+from option_ltp_and_greeks_calculator import (IV_CONVERGED, IV_INVALID_INPUT, black_scholes_vectorized,
+                                              implied_volatility_vectorized)
+from options_config import RISK_FREE_RATE
+
+EXPIRY_DATE = date.today() + timedelta(days=30)
+EXPIRY = EXPIRY_DATE.strftime("%d%b%Y").upper()
+YEARS = 30 / 365.0
+SPOTS = {"ABC": 1000.0, "XYZ": 250.0}
+
+
+def smile(spot, strike):
+    return 0.25 + 0.4 * (strike / spot - 1) ** 2
+
+
+def scrip_master():
+    rows, token = [], 100
+    for symbol, spot in SPOTS.items():
+        token += 1
+        rows.append({"token": str(token), "symbol": f"{symbol}-EQ", "name": symbol, "expiry": "",
+                     "strike": "-1.000000", "lotsize": "1", "instrumenttype": "", "exch_seg": "NSE",
+                     "tick_size": "5.000000"})
+        for strike in np.linspace(spot * 0.8, spot * 1.2, 9):
+            for option_type in ("CE", "PE"):
+                token += 1
+                rows.append({"token": str(token), "symbol": f"{symbol}{EXPIRY}{strike:g}{option_type}",
+                             "name": symbol, "expiry": EXPIRY, "strike": f"{strike * 100:.6f}", "lotsize": "500",
+                             "instrumenttype": "OPTSTK", "exch_seg": "NFO", "tick_size": "5.000000"})
+    return rows
+
+
+class ChainMarketData:
+    """Quotes every spot, and every option at its Black-Scholes price on a volatility smile."""
+    def __init__(self, rows):
+        self.ltps = {}
+        for row in rows:
+            if not row["expiry"]:
+                self.ltps[row["token"]] = SPOTS[row["name"]]
+                continue
+            spot, strike = SPOTS[row["name"]], float(row["strike"]) / 100.0
+            price = black_scholes_vectorized(spot, strike, YEARS, RISK_FREE_RATE, smile(spot, strike),
+                                             row["symbol"][-2:])["price"]
+            self.ltps[row["token"]] = float(price)
+
+    def getMarketData(self, mode, exchange_tokens):
+        fetched = [{"exchange": exch_seg, "symbolToken": token, "ltp": self.ltps[token]}
+                   for exch_seg, tokens in exchange_tokens.items() for token in tokens if self.ltps.get(token)]
+        return {"status": True, "data": {"fetched": fetched, "unfetched": []}}
+
+
+def test_pack_chain_inputs_broadcasts_into_one_block():
+    block = pack_chain_inputs([10.0, 20.0, 30.0], 1000.0, [950.0, 1000.0, 1050.0], YEARS, [True, False, True])
+    assert block.shape == (3, len(INPUT_FIELDS)) and block.dtype == np.float64
+    assert block.flags["C_CONTIGUOUS"]
+    np.testing.assert_array_equal(block[1], [20.0, 1000.0, 1000.0, YEARS, 0.0])
+
+
+def test_solve_chain_block_matches_the_vectorized_functions():
+    ltp = np.array([35.0, 12.5, 0.0, 60.0])
+    strike = np.array([1000.0, 1050.0, 1000.0, 950.0])
+    is_call = np.array([True, True, False, False])
+
+    solved = solve_chain_block(pack_chain_inputs(ltp, 1000.0, strike, YEARS, is_call))
+
+    assert solved.shape == (4, len(OUTPUT_FIELDS))
+    iv, status = implied_volatility_vectorized(ltp, 1000.0, strike, YEARS, RISK_FREE_RATE, is_call)
+    greeks = black_scholes_vectorized(1000.0, strike, YEARS, RISK_FREE_RATE, iv, is_call)
+    expected = np.column_stack([iv, greeks["delta"], greeks["gamma"], greeks["theta"], greeks["vega"], status])
+    np.testing.assert_array_equal(solved, expected)
+    assert solved[2, 5] == IV_INVALID_INPUT and np.isnan(solved[2, :5]).all()
+    assert (solved[[0, 1, 3], 5] == IV_CONVERGED).all()
+    assert solve_chain_block(np.empty((0, len(INPUT_FIELDS)))).shape == (0, len(OUTPUT_FIELDS))
+
+
+def test_small_blocks_are_solved_inline():
+    block = pack_chain_inputs([35.0, 12.5], 1000.0, [1000.0, 1050.0], YEARS, [True, True])
+    with ChainAnalytics(max_workers=2, min_chunk_rows=500) as analytics:
+        future = analytics.submit(block)
+        assert future.done() and analytics._pool is None
+        np.testing.assert_array_equal(future.result(), solve_chain_block(block))
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_solve_keeps_block_order_when_coalescing_and_splitting(workers):
+    rng = np.random.default_rng(5)
+    blocks = [pack_chain_inputs(rng.uniform(5, 50, n), 1000.0, rng.uniform(900, 1100, n), YEARS, rng.random(n) < 0.5)
+              for n in (3, 0, 11, 7)]
+    with ChainAnalytics(max_workers=workers, min_chunk_rows=4) as analytics:
+        solved = analytics.solve(blocks)
+        assert (analytics._pool is not None) == (workers > 1)
+    assert [len(block) for block in solved] == [3, 0, 11, 7]
+    for block, result in zip(blocks, solved):
+        np.testing.assert_array_equal(result, solve_chain_block(block))
+
+
+@pytest.fixture(scope="module")
+def chains():
+    """The same chains solved with ANALYTICS_WORKERS=1 (inline) and 2 (worker processes)."""
+    rows = scrip_master()
+    index = InstrumentIndex(rows)
+    results = {}
+    for workers in (1, 2):
+        with ChainAnalytics(max_workers=workers, min_chunk_rows=1) as analytics:
+            results[workers] = fetch_chain_greeks(ChainMarketData(rows), index, list(SPOTS), analytics=analytics,
+                                                  group_size=1)
+            assert (analytics._pool is not None) == (workers > 1)
+    return results
+
+
+def test_inline_and_process_pool_paths_agree(chains):
+    inline, pooled = chains[1], chains[2]
+    assert list(inline.columns) == CHAIN_COLUMNS
+    assert len(inline) == 2 * 9 * 2
+    pd.testing.assert_frame_equal(inline, pooled)
+
+
+def test_chain_greeks_recover_the_quoted_volatility(chains):
+    chain = chains[1]
+    assert (chain["IV Status"] == "ok").all()
+    expected_iv = [smile(SPOTS[symbol], strike) for symbol, strike in zip(chain["Symbol"], chain["Strike Price"])]
+    np.testing.assert_allclose(chain["IV"], expected_iv, atol=5e-4)  # IV is rounded to 3 places
+    calls = chain[chain["Type"] == "CE"]
+    assert ((calls["Delta"] > 0) & (calls["Delta"] < 1)).all() and (calls["Theta"] < 0).all()
+    assert (chain.loc[chain["Type"] == "PE", "Delta"] < 0).all()
+    assert (chain["Gamma"] >= 0).all() and (chain["Vega"] > 0).all()
+    assert list(chain["Symbol"].unique()) == ["ABC", "XYZ"]
+    assert chain.groupby("Symbol")["Strike Price"].apply(lambda s: s.is_monotonic_increasing).all()
@@ -0,0 +1,172 @@
+import hashlib
+import json
+
+import pytest
+import requests
+
+import chartink_screener
+import resilience as resilience_module
+from chartink_screener import ChartinkClient, scan_clause_key
+from resilience import ScanResilience
+from scan_metrics import metrics
+
+CLAUSE = "( {33489} ( latest close > 100 ) )"
+ROWS = [{"nsecode": "TCS", "name": "Tata Consultancy", "per_chg": "2.5"},
+        {"nsecode": "INFY", "name": "Infosys", "per_chg": "-1.25"}]
+
+
+def response(status_code=200, content=b"", payload=None):
+    resp = requests.Response()
+    resp.status_code = status_code
+    resp._content = json.dumps(payload).encode() if payload is not None else content
+    return resp
+
+
+class FakeChartinkSession:
+    """Issues a new CSRF token per dashboard visit and rejects tokens listed in `expired`."""
+    def __init__(self, expired=(), reject_status=419):
+        self.expired = expired
+        self.reject_status = reject_status
+        self.gets = 0
+        self.posts = []
+        self.timeouts = []
+
+    def get(self, url, timeout=None):
+        self.gets += 1
+        self.timeouts.append(timeout)
+        return response(content=f'<meta name="csrf-token" content="token-{self.gets}">'.encode())
+
+    def post(self, url, data=None, headers=None, timeout=None):
+        self.posts.append(headers["X-CSRF-TOKEN"])
+        self.timeouts.append(timeout)
+        if headers["X-CSRF-TOKEN"] in self.expired:
+            return response(self.reject_status, payload={"message": "CSRF token mismatch."})
+        return response(payload={"data": ROWS})
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture(autouse=True)
+def fresh_resilience(monkeypatch):
+    fresh = ScanResilience()
+    monkeypatch.setattr(chartink_screener, "resilience", fresh)
+    monkeypatch.setattr(ChartinkClient._process.retry, "sleep", lambda seconds: None)
+    metrics.reset()
+    return fresh
+
+
+class AllTokens:
+    def __contains__(self, token):
+        return True
+
+
+@pytest.mark.parametrize("status", [419, 403])
+def test_rejected_csrf_token_is_refreshed_once(status):
+    session = FakeChartinkSession(expired={"token-1"}, reject_status=status)
+    client = ChartinkClient(session, cache_ttl=0)
+
+    df = client.fetch(CLAUSE)
+
+    assert df.to_dict("records") == [{"Symbol": "TCS", "Stock Name": "Tata Consultancy", "% Change": 2.5},
+                                     {"Symbol": "INFY", "Stock Name": "Infosys", "% Change": -1.25}]
+    assert session.posts == ["token-1", "token-2"]
+    assert session.gets == 2
+    # Dashboard visits are counted like the posts
+    assert metrics.to_dict()["endpoints"]["chartink"]["calls"] == 4
+
+    client.fetch(CLAUSE)  # the refreshed token is kept
+    assert session.posts[-1] == "token-2" and session.gets == 2
+
+
+def test_persistent_rejection_gives_up_after_three_attempts():
+    session = FakeChartinkSession(expired=AllTokens())
+    assert ChartinkClient(session, cache_ttl=0).fetch(CLAUSE).empty
+    # Two posts per attempt; every rejected token is replaced before the next post
+    assert session.posts == [f"token-{n}" for n in range(1, 7)]
+    assert metrics.to_dict()["endpoints"]["chartink"]["retries"] == 2
+
+
+def test_dashboard_failures_feed_the_circuit_breaker(fresh_resilience):
+    class DownSession(FakeChartinkSession):
+        def get(self, url, timeout=None):
+            self.gets += 1
+            return response(503)
+
+    session = DownSession()
+    client = ChartinkClient(session, cache_ttl=0)
+    for _ in range(10):
+        client.fetch(CLAUSE)
+    assert fresh_resilience.summary()["circuits"] == {"chartink": "open"}
+    assert metrics.to_dict()["endpoints"]["chartink"]["failures"] == session.gets
+    gets = session.gets
+    client.fetch(CLAUSE)
+    assert session.gets == gets  # failing fast now
+
+
+def test_timeouts_never_run_past_the_deadline(fresh_resilience, monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(resilience_module, "time", clock)
+    session = FakeChartinkSession()
+    client = ChartinkClient(session, timeout=20, cache_ttl=0)
+
+    client.fetch(CLAUSE)
+    assert session.timeouts == [20, 20]
+    with fresh_resilience.scan(deadline=3):
+        client.fetch(CLAUSE)
+        clock.now += 3
+        client.fetch(CLAUSE)  # skipped: the deadline has passed
+    assert session.timeouts == [20, 20, 3]
+
+
+def test_results_are_cached_in_memory_and_on_disk_for_the_ttl(tmp_path, monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(chartink_screener, "time", clock)
+    session = FakeChartinkSession()
+    client = ChartinkClient(session, cache_ttl=60, cache_dir=tmp_path)
+
+    first = client.fetch(CLAUSE)
+    assert len(session.posts) == 1
+    path = tmp_path / f"{scan_clause_key(CLAUSE)}.json"
+    assert json.loads(path.read_text()) == {"fetched_at": clock.now, "data": ROWS}
+
+    # Whitespace does not change the clause's key
+    clock.now += 59
+    again = client.fetch("( {33489}\n  ( latest close > 100 ) )")
+    assert len(session.posts) == 1
+    assert again.equals(first)
+
+    # A new client (next run) reads the disk cache
+    other = FakeChartinkSession()
+    assert ChartinkClient(other, cache_ttl=60, cache_dir=tmp_path).fetch(CLAUSE).equals(first)
+    assert other.posts == []
+
+    clock.now += 2
+    client.fetch(CLAUSE)
+    assert len(session.posts) == 2
+    assert json.loads(path.read_text())["fetched_at"] == clock.now
+
+
+def test_cache_disabled_or_unreadable(tmp_path):
+    session = FakeChartinkSession()
+    ChartinkClient(session, cache_ttl=0, cache_dir=tmp_path).fetch(CLAUSE)
+    ChartinkClient(session, cache_ttl=0, cache_dir=tmp_path).fetch(CLAUSE)
+    assert len(session.posts) == 2
+    assert list(tmp_path.iterdir()) == []
+
+    (tmp_path / f"{scan_clause_key(CLAUSE)}.json").write_text("{not json")
+    ChartinkClient(session, cache_ttl=60, cache_dir=tmp_path).fetch(CLAUSE)
+    assert len(session.posts) == 3
+
+
+def test_scan_clause_key_is_sha256_of_the_normalized_clause():
+    assert scan_clause_key("  a \n b ") == hashlib.sha256(b"a b").hexdigest()
+    assert scan_clause_key("a b") != scan_clause_key("a  c")
@@ -0,0 +1,70 @@
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import export
+
+
+def test_excel_export_keeps_every_cell(tmp_path, monkeypatch):
+    pytest.importorskip("openpyxl")  # the reader, and the writer when xlsxwriter is missing
+    monkeypatch.setattr(export, "EXPORT_DIR", str(tmp_path))
+    df = pd.DataFrame({
+        "Symbol": ["RELIANCE", "TCS", "INFY"],
+        "Spot Price": [2950.5, 3890.0, np.nan],
+        "Lot Size": [250, 175, 400],
+        "Quote Status": ["ok", "partial", "unfetched"],
+    })
+
+    export.save_to_excel(df, "scan.xlsx")
+
+    back = pd.read_excel(tmp_path / "scan.xlsx")
+    pd.testing.assert_frame_equal(back, df, check_dtype=False)
+
+
+def test_xlsxwriter_export_streams_rows(tmp_path, monkeypatch):
+    xlsxwriter = pytest.importorskip("xlsxwriter")
+    pytest.importorskip("openpyxl")
+    monkeypatch.setattr(export, "EXPORT_DIR", str(tmp_path))
+    options = []
+
+    class SpyWorkbook(xlsxwriter.Workbook):
+        def __init__(self, filename, opts=None):
+            options.append(opts)
+            super().__init__(filename, opts)
+
+    monkeypatch.setattr(xlsxwriter, "Workbook", SpyWorkbook)
+    rows = 500
+    df = pd.DataFrame({
+        "Symbol": [f"SYM{i}" for i in range(rows)],
+        "Nearest OTM CE": np.where(np.arange(rows) % 7 == 0, np.nan, np.arange(rows) * 0.05),
+        "Lot Size": np.arange(rows) * 25,
+        "Scanned At": pd.date_range("2026-01-05 09:15", periods=rows, freq="min"),
+    })
+
+    export.save_to_excel(df, "scan.xlsx")
+
+    assert options[0]["constant_memory"] is True
+    back = pd.read_excel(tmp_path / "scan.xlsx")
+    pd.testing.assert_frame_equal(back, df, check_dtype=False)
+
+
+def test_background_export_is_timed_once_for_its_own_scan(tmp_path, monkeypatch):
+    monkeypatch.setattr(export, "EXPORT_DIR", str(tmp_path))
+    monkeypatch.setattr(export, "save_to_excel", lambda df, filename: None)
+    df = pd.DataFrame({"Symbol": ["TCS"]})
+
+    export.metrics.reset()
+    export.save_to_excel_async(df, "first.xlsx")
+    export.wait_for_exports()
+    assert export.metrics.to_dict()["stages"]["export"]["count"] == 1
+
+    # An export still queued when the next scan starts must not land in that scan
+    release = threading.Event()
+    export._export_pool.submit(release.wait)
+    export.save_to_excel_async(df, "second.xlsx")
+    export.metrics.reset()
+    release.set()
+    export.wait_for_exports()
+    assert "export" not in export.metrics.to_dict()["stages"]
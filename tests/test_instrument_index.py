@@ -0,0 +1,238 @@
+import random
+from bisect import bisect_right
+from collections import defaultdict
+from datetime import date
+
+import numpy as np
+import pytest
+
+from instrument_index import InstrumentIndex, option_type_of, parse_expiry
+from instrument_table import SCRIP_MASTER_FIELDS, InstrumentTable, keep_instrument
+
+TODAY = date(2025, 9, 20)
+EXPIRIES = ("25SEP2025", "30OCT2025", "27NOV2025")
+
+
+def inst(token, symbol, name, exch_seg="NSE", expiry="", strike="-1.000000", lotsize="1",
+         instrumenttype="", tick_size="5.000000"):
+    return {"token": token, "symbol": symbol, "name": name, "expiry": expiry, "strike": strike, "lotsize": lotsize,
+            "instrumenttype": instrumenttype, "exch_seg": exch_seg, "tick_size": tick_size}
+
+
+def scrip_master():
+    rows = [
+        inst("2885", "RELIANCE-EQ", "RELIANCE"),
+        inst("11536", "TCS-EQ", "TCS"),
+        inst("500325", "RELIANCE", "RELIANCE", exch_seg="BSE"),          # other exchange
+        inst("99926000", "Nifty 50", "NIFTY"),                           # index, no -EQ
+        inst("1001", "RELIANCE-BE", "RELIANCE"),                         # other series
+        inst("35001", "NIFTY25SEP2525000CE", "NIFTY", "NFO", "25SEP2025", "2500000.000000", "75", "OPTIDX"),
+        inst("35002", "NIFTY25SEPFUT", "NIFTY", "NFO", "25SEP2025", "-1.000000", "75", "FUTIDX"),
+    ]
+    token = 40000
+    for name, lot, strikes in (("RELIANCE", "250", (1360, 1380, 1400, 1420)), ("TCS", "175", (3000, 3100, 3200))):
+        for expiry in EXPIRIES:
+            token += 1
+            rows.append(inst(str(token), f"{name}{expiry[:5]}FUT", name, "NFO", expiry, "-1.000000", lot, "FUTSTK",
+                             "10.000000"))
+            for strike in strikes:
+                for option_type in ("CE", "PE"):
+                    if (name, expiry, strike, option_type) == ("TCS", "30OCT2025", 3100, "PE"):
+                        continue  # a strike listed with only one side
+                    token += 1
+                    rows.append(inst(str(token), f"{name}{expiry[:5]}{strike}{option_type}", name, "NFO", expiry,
+                                     f"{strike * 100:.6f}", lot, "OPTSTK", "5.000000"))
+    random.Random(7).shuffle(rows)
+    return rows
+
+
+class DictIndex:
+    """The dict-based lookups the typed table replaced, over the rows the table keeps."""
+    def __init__(self, rows):
+        self.equity, self.derivatives, self.options = {}, defaultdict(list), defaultdict(dict)
+        strikes, expiries = defaultdict(set), defaultdict(set)
+        for row in filter(keep_instrument, rows):
+            name, expiry = row["name"], row["expiry"]
+            if not expiry:
+                self.equity[(row["exch_seg"], row["symbol"])] = row
+                continue
+            self.derivatives[(name, expiry, row["instrumenttype"])].append(row)
+            if row["instrumenttype"] == "OPTSTK":
+                strike = float(row["strike"]) / 100.0
+                self.options[(name, expiry, strike)][option_type_of(row)] = row
+                strikes[(name, expiry)].add(strike)
+                expiries[name].add(expiry)
+        self.strikes = {key: sorted(values) for key, values in strikes.items()}
+        self.expiries = {name: sorted(values, key=parse_expiry) for name, values in expiries.items()}
+
+    def next_strike_above(self, name, expiry, price, exclude=None):
+        strikes = self.strikes.get((name, expiry), [])
+        i = bisect_right(strikes, price)
+        if i < len(strikes) and exclude is not None and strikes[i] == exclude:
+            i += 1
+        return strikes[i] if i < len(strikes) else None
+
+
+@pytest.fixture(scope="module")
+def rows():
+    return scrip_master()
+
+
+@pytest.fixture(scope="module", params=["records", "columns"])
+def index(request, rows):
+    if request.param == "records":
+        return InstrumentIndex(rows)
+    return InstrumentIndex({field: np.array([row[field] for row in rows]) for field in SCRIP_MASTER_FIELDS})
+
+
+@pytest.fixture(scope="module")
+def reference(rows):
+    return DictIndex(rows)
+
+
+def as_dicts(records):
+    return sorted((dict(record) for record in records), key=lambda row: row["token"])
+
+
+@pytest.mark.parametrize("row, kept", [
+    (inst("1", "SBIN-EQ", "SBIN"), True),
+    (inst("1", "SBIN-BE", "SBIN"), False),
+    (inst("1", "SBIN", "SBIN", exch_seg="BSE"), False),
+    (inst("1", "SBIN-EQ", "SBIN", expiry="25SEP2025"), False),
+    (inst("1", "SBIN25SEP800CE", "SBIN", "NFO", "25SEP2025", instrumenttype="OPTSTK"), True),
+    (inst("1", "SBIN25SEPFUT", "SBIN", "NFO", "25SEP2025", instrumenttype="FUTSTK"), True),
+    (inst("1", "NIFTY25SEPFUT", "NIFTY", "NFO", "25SEP2025", instrumenttype="FUTIDX"), False),
+    (inst("1", "NIFTY25SEP25000CE", "NIFTY", "NFO", "25SEP2025", instrumenttype="OPTIDX"), False),
+    ({}, False),
+])
+def test_keep_instrument(row, kept):
+    assert keep_instrument(row) is kept
+
+
+def test_table_keeps_only_used_rows_in_sorted_order(rows, reference):
+    table = InstrumentTable.from_records(rows)
+    kept = [row for row in rows if keep_instrument(row)]
+    assert len(table) == len(kept)
+    assert sorted(row["token"] for row in kept) == sorted(t.decode() for t in table.token)
+
+    keys = list(zip(table.name_code, table.expiry, table.type_code, table.strike, table.option_type))
+    assert keys == sorted(keys)
+    assert [table.names[c] for c in table.name_code[:2]] == ["RELIANCE", "RELIANCE"]
+    assert list(table.expiry[table.name_code == table.names.index("TCS")][:2]) == [-1, parse_expiry(EXPIRIES[0]).toordinal()]
+
+
+def test_table_from_columns_matches_from_records(rows):
+    by_records = InstrumentTable.from_records(rows)
+    by_columns = InstrumentTable.from_columns({field: np.array([row[field] for row in rows])
+                                               for field in SCRIP_MASTER_FIELDS})
+    assert [dict(by_records.record(i)) for i in range(len(by_records))] == \
+           [dict(by_columns.record(i)) for i in range(len(by_columns))]
+
+
+def test_record_is_a_read_only_scrip_master_mapping(rows):
+    table = InstrumentTable.from_records(rows)
+    originals = {row["token"]: row for row in rows}
+    for i in range(len(table)):
+        record = table.record(i)
+        assert dict(record) == originals[record["token"]]
+        assert list(record) == list(SCRIP_MASTER_FIELDS)
+        assert len(record) == len(SCRIP_MASTER_FIELDS)
+    record = table.record(0)
+    assert record.get("missing") is None and "missing" not in record and "symbol" in record
+    with pytest.raises(KeyError):
+        record["missing"]
+    with pytest.raises(TypeError):
+        record["symbol"] = "X"
+    assert repr(record).startswith("InstrumentRecord({'token': ")
+
+
+def test_empty_table():
+    index = InstrumentIndex([])
+    assert len(index) == 0
+    assert index.get_equity("TCS-EQ") is None
+    assert index.get_strikes("TCS", EXPIRIES[0]) == []
+    assert index.option_underlyings() == []
+
+
+def test_equity_lookups_match_dict_index(index, reference, rows):
+    for (exch_seg, symbol), row in reference.equity.items():
+        assert dict(index.get_equity(symbol, exch_seg)) == row
+    for symbol, exch_seg in (("RELIANCE", "BSE"), ("Nifty 50", "NSE"), ("RELIANCE-BE", "NSE"),
+                             ("TCS-EQ", "BSE"), ("WIPRO-EQ", "NSE"), ("", "NSE"), ("₹-EQ", "NSE"), (None, "NSE")):
+        assert index.get_equity(symbol, exch_seg) is None
+
+
+def test_derivative_and_strike_lookups_match_dict_index(index, reference):
+    for name in ("RELIANCE", "TCS", "NIFTY", "WIPRO"):
+        for expiry in EXPIRIES + ("01JAN2030",):
+            for instrumenttype in ("OPTSTK", "FUTSTK", "OPTIDX"):
+                assert as_dicts(index.get_derivatives(name, expiry, instrumenttype)) == \
+                       as_dicts(reference.derivatives.get((name, expiry, instrumenttype), []))
+            assert index.get_strikes(name, expiry) == reference.strikes.get((name, expiry), [])
+    assert index.option_underlyings() == sorted(reference.expiries) == ["RELIANCE", "TCS"]
+    assert index.get_expiries("RELIANCE", TODAY) == reference.expiries["RELIANCE"] == list(EXPIRIES)
+
+
+@pytest.mark.parametrize("price", [0, 1359.95, 1360, 1370, 1380, 1400.0, 1419.99, 1420, 5000, 3000, 3100, 3150])
+@pytest.mark.parametrize("exclude", [None, 1380, 1400, 3100, 3200])
+def test_next_strike_above_matches_dict_index(index, reference, price, exclude):
+    for name in ("RELIANCE", "TCS"):
+        for expiry in EXPIRIES:
+            assert index.next_strike_above(name, expiry, price, exclude) == \
+                   reference.next_strike_above(name, expiry, price, exclude)
+
+
+def test_next_strike_above_an_exact_strike_is_the_following_one(index):
+    assert index.next_strike_above("RELIANCE", EXPIRIES[0], 1380) == 1400
+    assert index.next_strike_above("RELIANCE", EXPIRIES[0], 1380, exclude=1400) == 1420
+    assert index.next_strike_above("RELIANCE", EXPIRIES[0], 1420) is None
+    assert index.next_strike_above("WIPRO", EXPIRIES[0], 100) is None
+
+
+def test_options_at_strike_match_dict_index(index, reference):
+    for (name, expiry, strike), options in reference.options.items():
+        found = index.get_options_at_strike(name, expiry, strike)
+        assert {side: dict(record) for side, record in found.items()} == options
+    assert set(index.get_options_at_strike("TCS", "30OCT2025", 3100)) == {"CE"}
+    assert dict(index.get_options_at_strike("TCS", EXPIRIES[0], "3000")["PE"]) == \
+           reference.options[("TCS", EXPIRIES[0], 3000.0)]["PE"]
+    for strike in (1390, 0, None, "n/a"):
+        assert index.get_options_at_strike("RELIANCE", EXPIRIES[0], strike) == {}
+    assert index.get_options_at_strike("NIFTY", EXPIRIES[0], 25000) == {}
+
+
+@pytest.fixture(scope="module")
+def weekly_index():
+    """An underlying with several expiries a month, listed out of order."""
+    expiries = ("30OCT2025", "25SEP2025", "07OCT2025", "14OCT2025", "04NOV2025", "27NOV2025")
+    return InstrumentIndex([inst(str(token), f"WEEKLY{expiry[:5]}1000CE", "WEEKLY", "NFO", expiry, "100000.000000",
+                                 "50", "OPTSTK") for token, expiry in enumerate(expiries, 1)])
+
+
+@pytest.mark.parametrize("today, spec, expected", [
+    (date(2025, 9, 20), "nearest", "25SEP2025"),
+    (date(2025, 9, 20), "next", "07OCT2025"),
+    (date(2025, 9, 20), "monthly", "25SEP2025"),
+    (date(2025, 9, 25), "nearest", "25SEP2025"),   # an expiry on today is still tradable
+    (date(2025, 9, 25), "next", "07OCT2025"),
+    (date(2025, 9, 26), "nearest", "07OCT2025"),
+    (date(2025, 9, 26), "monthly", "30OCT2025"),   # none left in September: the nearest expiry's month
+    (date(2025, 10, 8), "monthly", "30OCT2025"),
+    (date(2025, 10, 31), "monthly", "27NOV2025"),
+    (date(2025, 11, 27), "next", None),            # the last expiry has no next one
+    (date(2025, 11, 28), "nearest", None),
+    (date(2025, 9, 20), " Monthly ", "25SEP2025"),
+    (date(2025, 9, 20), "14oct2025", "14OCT2025"),
+    (date(2025, 9, 20), "14OCT2025 ", "14OCT2025"),
+    (date(2025, 9, 20), "21OCT2025", None),        # not a listed expiry
+    (date(2025, 10, 8), "07OCT2025", None),        # listed, but already expired
+    (date(2025, 9, 20), "weekly", None),
+])
+def test_resolve_expiry(weekly_index, today, spec, expected):
+    assert weekly_index.resolve_expiry("WEEKLY", spec, today=today) == expected
+
+
+def test_resolve_expiry_of_an_underlying_without_options(index):
+    assert index.resolve_expiry("NIFTY", "nearest", today=TODAY) is None  # index options are not kept
+    assert index.resolve_expiry("WIPRO", "monthly", today=TODAY) is None
+    assert index.resolve_expiry("TCS", "monthly", today=TODAY) == "25SEP2025"
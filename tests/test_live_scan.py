@@ -0,0 +1,68 @@
+import json
+from datetime import date, timedelta
+
+import pandas as pd
+import pytest
+
+from instrument_index import InstrumentIndex
+from live_scan import LiveOtmTable, ReplayTickSource, run_live
+from option_ltp_and_greeks_calculator import black_scholes_vectorized
+from options_config import RISK_FREE_RATE
+
+EXPIRY_DATE = date.today() + timedelta(days=30)
+EXPIRY = EXPIRY_DATE.strftime("%d%b%Y").upper()
+
+
+def scrip_master():
+    rows = [{"token": "100", "symbol": "ABC-EQ", "name": "ABC", "expiry": "", "strike": "-1.000000",
+             "lotsize": "1", "instrumenttype": "", "exch_seg": "NSE", "tick_size": "5.000000"}]
+    for i, strike in enumerate((980, 1000, 1020, 1040)):
+        for j, option_type in enumerate(("CE", "PE")):
+            rows.append({"token": str(200 + 2 * i + j), "symbol": f"ABC{EXPIRY}{strike}{option_type}", "name": "ABC",
+                         "expiry": EXPIRY, "strike": f"{strike * 100:.6f}", "lotsize": "500",
+                         "instrumenttype": "OPTSTK", "exch_seg": "NFO", "tick_size": "5.000000"})
+    return rows
+
+
+def otm_table():
+    return pd.DataFrame([{"Symbol": "ABC", "Expiry": EXPIRY, "Stock Name": "ABC Ltd", "% Change": 2.0,
+                          "Lot Size": 500, "Nearest OTM Strike": 1000.0, "Nearest OTM CE": 20.0,
+                          "Nearest OTM PE": 15.0, "New OTM Strike": 1040.0, "New OTM CE": 8.0,
+                          "New OTM PE": 40.0, "Gap": 5.0, "CE IV": None, "CE P/L": 6000.0}])
+
+
+@pytest.fixture
+def replay_file(tmp_path):
+    # tokens: 100 spot, 202/203 the 1000 CE/PE, 206 the 1040 CE
+    ticks = [{"t": 0.00, "exch_seg": "NSE", "token": "100", "ltp": 990.0},
+             {"t": 0.01, "exch_seg": "NFO", "token": "202", "ltp": 24.5},
+             {"t": 0.02, "exch_seg": "NFO", "token": "206", "ltp": 9.0},
+             {"t": 0.03, "exch_seg": "NFO", "token": "999", "ltp": 1.0},   # not subscribed
+             {"t": 0.04, "exch_seg": "NFO", "token": "203", "ltp": 18.0}]
+    path = tmp_path / "ticks.jsonl"
+    path.write_text("\n".join(json.dumps(t) for t in ticks) + "\n", encoding="utf-8")
+    return path
+
+
+def test_replay_ticks_update_rows(replay_file):
+    table = LiveOtmTable(otm_table(), InstrumentIndex(scrip_master()))
+    assert set(table.tokens()) == {("NSE", "100"), ("NFO", "202"), ("NFO", "203"), ("NFO", "206"), ("NFO", "207")}
+
+    ReplayTickSource(str(replay_file)).run(table.apply_tick)
+
+    row = table.to_dataframe().iloc[0]
+    assert row["Spot Price"] == 990.0
+    assert row["Nearest OTM CE"] == 24.5 and row["Nearest OTM PE"] == 18.0 and row["New OTM CE"] == 9.0
+    assert row["Gap"] == pytest.approx(10.0)
+    assert row["CE P/L"] == pytest.approx(500 * (24.5 - 9.0))
+    T = (EXPIRY_DATE - date.today()).days / 365.0
+    assert black_scholes_vectorized(990.0, 1000.0, T, RISK_FREE_RATE, row["CE IV"], "CE")["price"] == pytest.approx(24.5, abs=1e-4)
+    assert 0 < row["CE Delta"] < 1
+
+
+def test_run_live_drains_a_replay(replay_file):
+    table = LiveOtmTable(otm_table(), InstrumentIndex(scrip_master()))
+
+    run_live([("Gainers", table)], ReplayTickSource(str(replay_file)), max_fps=100)
+
+    assert table.rows[("ABC", EXPIRY)]["Nearest OTM PE"] == 18.0
@@ -0,0 +1,229 @@
+import math
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from instrument_index import InstrumentIndex
+from local_screener import CANDLE_COLUMNS, CandleFrame, LocalScreener, resample_candles
+from screener_conditions import GAINER_CONDITION, LOCAL_CONDITIONS, LOSER_CONDITION
+
+BARS_PER_DAY = 25  # 09:15 ... 15:15
+
+
+def session_times(day, bars=BARS_PER_DAY, skip=0):
+    start = pd.Timestamp(day) + pd.Timedelta(hours=9, minutes=15)
+    return [start + pd.Timedelta(minutes=15 * i) for i in range(skip, skip + bars)]
+
+
+def candles(times, seed):
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 1, len(times)))
+    open_ = close + rng.normal(0, 0.5, len(times))
+    high = np.maximum(open_, close) + rng.uniform(0, 1, len(times))
+    low = np.minimum(open_, close) - rng.uniform(0, 1, len(times))
+    volume = rng.integers(1_000, 50_000, len(times)).astype(float)
+    return pd.DataFrame({"open": open_, "high": high, "low": low, "close": close, "volume": volume},
+                        index=pd.DatetimeIndex(times, name="timestamp"))
+
+
+# --- plain-loop reference implementations, one symbol at a time ---
+
+def ref_ewm(values, alpha, period):
+    out, prev, seen = [], None, 0
+    for x in values:
+        if not math.isnan(x):
+            prev = x if prev is None else alpha * x + (1 - alpha) * prev
+            seen += 1
+        out.append(prev if seen >= period else math.nan)
+    return out
+
+
+def ref_ema(values, period):
+    return ref_ewm(values, 2 / (period + 1), period)
+
+
+def ref_rsi(close, period):
+    delta = [math.nan] + [b - a for a, b in zip(close, close[1:])]
+    gain = ref_ewm([max(d, 0) if not math.isnan(d) else d for d in delta], 1 / period, period)
+    loss = ref_ewm([max(-d, 0) if not math.isnan(d) else d for d in delta], 1 / period, period)
+    out = []
+    for g, l in zip(gain, loss):
+        if math.isnan(g):
+            out.append(math.nan)
+        else:
+            out.append(100.0 if l == 0 else 100 - 100 / (1 + g / l))
+    return out
+
+
+def ref_wma(values, period):
+    weights = range(1, period + 1)
+    return [math.nan if t < period - 1 else
+            sum(w * x for w, x in zip(weights, values[t - period + 1:t + 1])) / sum(weights)
+            for t in range(len(values))]
+
+
+def ref_cci(high, low, close, period):
+    typical = [(h + l + c) / 3 for h, l, c in zip(high, low, close)]
+    out = []
+    for t in range(len(typical)):
+        if t < period - 1:
+            out.append(math.nan)
+            continue
+        window = typical[t - period + 1:t + 1]
+        mean = sum(window) / period
+        mean_dev = sum(abs(x - mean) for x in window) / period
+        out.append((typical[t] - mean) / (0.015 * mean_dev))
+    return out
+
+
+def ref_obv(close, volume):
+    out, total = [0.0], 0.0
+    for t in range(1, len(close)):
+        total += volume[t] if close[t] > close[t - 1] else -volume[t] if close[t] < close[t - 1] else 0
+        out.append(total)
+    return out
+
+
+def ref_supertrend(high, low, close, period, multiplier):
+    true_range = [high[0] - low[0]] + [max(high[t] - low[t], abs(high[t] - close[t - 1]), abs(low[t] - close[t - 1]))
+                                       for t in range(1, len(close))]
+    atr = ref_ewm(true_range, 1 / period, period)
+    upper = [(h + l) / 2 + multiplier * a for h, l, a in zip(high, low, atr)]
+    lower = [(h + l) / 2 - multiplier * a for h, l, a in zip(high, low, atr)]
+    trend, down = [math.nan], True
+    for t in range(1, len(close)):
+        if upper[t] > upper[t - 1] and close[t - 1] <= upper[t - 1]:
+            upper[t] = upper[t - 1]
+        if lower[t] < lower[t - 1] and close[t - 1] >= lower[t - 1]:
+            lower[t] = lower[t - 1]
+        down = close[t] <= upper[t] if down else close[t] < lower[t]
+        trend.append(upper[t] if down else lower[t])
+    return trend
+
+
+@pytest.fixture(scope="module")
+def universe():
+    """Two symbols of different lengths, so the shorter one is NaN-padded in the frame."""
+    day1, day2 = date(2025, 9, 18), date(2025, 9, 19)
+    return {
+        "AAA": candles(session_times(day1) + session_times(day2, bars=3), seed=1),
+        "BBB": candles(session_times(day1, bars=10, skip=15) + session_times(day2, bars=5), seed=2),
+    }
+
+
+@pytest.fixture(scope="module")
+def frame(universe):
+    return CandleFrame(universe, ["AAA", "BBB", "ZZZ"])
+
+
+def column(frame, series, j, universe, symbol):
+    return np.asarray(series, dtype=np.float64)[-len(universe[symbol]):, j]
+
+
+def assert_matches(actual, expected):
+    np.testing.assert_allclose(actual, np.asarray(expected, dtype=np.float64), rtol=1e-9, atol=1e-9, equal_nan=True)
+
+
+@pytest.mark.parametrize("j, symbol", [(0, "AAA"), (1, "BBB")])
+def test_indicators_match_reference_loops(frame, universe, j, symbol):
+    df = universe[symbol]
+    high, low, close, volume = (df[c].tolist() for c in ("high", "low", "close", "volume"))
+    col = lambda series: column(frame, series, j, universe, symbol)
+
+    assert_matches(col(frame.ema(frame.close, 8)), ref_ema(close, 8))
+    assert_matches(col(frame.sma(frame.close, 5)), pd.Series(close).rolling(5).mean())
+    assert_matches(col(frame.wma(frame.close, 8)), ref_wma(close, 8))
+    assert_matches(col(frame.rsi(8)), ref_rsi(close, 8))
+    assert_matches(col(frame.cci(5)), ref_cci(high, low, close, 5))
+    assert_matches(col(frame.obv()), ref_obv(close, volume))
+    assert_matches(col(frame.supertrend(7, 1.7)), ref_supertrend(high, low, close, 7, 1.7))
+    assert_matches(col(frame.pct_change()), [math.nan] + [(b - a) / a * 100 for a, b in zip(close, close[1:])])
+
+
+def test_padding_and_missing_symbols_stay_nan(frame, universe):
+    padding = len(universe["AAA"]) - len(universe["BBB"])
+    assert np.isnan(frame.close.to_numpy()[:padding, 1]).all()
+    assert np.isnan(frame.obv().to_numpy()[:padding, 1]).all()
+    assert np.isnan(frame.close.to_numpy()[:, 2]).all()
+    assert np.isnan(frame.rsi(8).to_numpy()[:, 2]).all()
+
+
+def test_indicators_on_known_values():
+    rising = CandleFrame({"UP": candles(session_times(date(2025, 9, 19)), seed=0).assign(
+        close=np.arange(1.0, 26.0), volume=10.0)}, ["UP"])
+    assert rising.rsi(8).iloc[-1, 0] == 100.0
+    assert rising.obv().iloc[-1, 0] == 240.0  # 24 up moves of volume 10
+    # WMA(3) of 23, 24, 25 = (23 + 2 * 24 + 3 * 25) / 6
+    assert rising.wma(rising.close, 3).iloc[-1, 0] == pytest.approx(146 / 6)
+    # EMA(3) of 1, 2, 3 with alpha 0.5 seeded at 1: 1 -> 1.5 -> 2.25
+    assert rising.ema(rising.close, 3).iloc[2, 0] == pytest.approx(2.25)
+    assert np.isnan(rising.ema(rising.close, 3).iloc[1, 0])
+
+
+def test_at_numbers_candles_like_chartink(frame, universe):
+    a, b = universe["AAA"]["close"].to_numpy(), universe["BBB"]["close"].to_numpy()
+    assert_matches(frame.at(frame.close, 1), [a[25], b[10], math.nan])    # first candle today
+    assert_matches(frame.at(frame.close, 3), [a[27], b[12], math.nan])
+    assert_matches(frame.at(frame.close, 4), [math.nan, b[13], math.nan])  # AAA has 3 candles today
+    assert_matches(frame.at(frame.close, -1), [a[24], b[9], math.nan])    # last candle yesterday
+    assert_matches(frame.at(frame.close, -10), [a[15], b[0], math.nan])
+    assert_matches(frame.at(frame.close, -11), [a[14], math.nan, math.nan])  # BBB had 10 candles
+    assert_matches(frame.latest(frame.close), [a[-1], b[-1], math.nan])
+    assert frame.session_date == np.datetime64("2025-09-19")
+
+
+def test_hourly_candles_align_to_the_open():
+    m15 = candles(session_times(date(2025, 9, 19)), seed=3)
+    h1 = resample_candles(m15, 60)
+    assert [t.strftime("%H:%M") for t in h1.index] == ["09:15", "10:15", "11:15", "12:15", "13:15", "14:15", "15:15"]
+    first = m15.iloc[:4]
+    assert h1.iloc[0].tolist() == [first["open"].iloc[0], first["high"].max(), first["low"].min(),
+                                   first["close"].iloc[-1], first["volume"].sum()]
+    assert h1.iloc[-1].tolist() == m15.iloc[-1][CANDLE_COLUMNS].tolist()  # the short 15:15 candle
+    assert len(resample_candles(m15, 180)) == 3
+
+
+class FakeCandleSource:
+    def __init__(self, universe):
+        self.universe = universe
+
+    def load(self, symbols):
+        return {s: self.universe[s] for s in symbols if s in self.universe}
+
+
+def screener_index(symbols):
+    expiry = (date.today() + timedelta(days=20)).strftime("%d%b%Y").upper()
+    rows = []
+    for i, symbol in enumerate(symbols):
+        rows.append({"token": str(100 + i), "symbol": f"{symbol}-EQ", "name": symbol, "expiry": "",
+                     "strike": "-1.000000", "lotsize": "1", "instrumenttype": "", "exch_seg": "NSE",
+                     "tick_size": "5.000000"})
+        rows.append({"token": str(200 + i), "symbol": f"{symbol}100CE", "name": symbol, "expiry": expiry,
+                     "strike": "10000.000000", "lotsize": "500", "instrumenttype": "OPTSTK", "exch_seg": "NFO",
+                     "tick_size": "5.000000"})
+    return InstrumentIndex(rows)
+
+
+def test_fetch_returns_the_chartink_columns(universe):
+    screener = LocalScreener(FakeCandleSource(universe), screener_index(["AAA", "BBB", "CCC"]))
+    result = screener.fetch(lambda m15, h1, h3, lot_size: np.array([True, False]))
+
+    assert screener.symbols == ["AAA", "BBB"]  # CCC has no candles
+    assert list(screener.lot_size) == [500.0, 500.0]
+    a = universe["AAA"]["close"].to_numpy()
+    assert result.to_dict("records") == [
+        {"Symbol": "AAA", "Stock Name": "AAA", "% Change": round((a[-1] - a[24]) / a[24] * 100, 2)},
+    ]
+    assert screener.fetch(lambda m15, h1, h3, lot_size: np.zeros(2, dtype=bool)).empty
+
+
+def test_fetch_runs_the_local_translations(universe):
+    screener = LocalScreener(FakeCandleSource(universe), screener_index(["AAA", "BBB"]))
+    assert set(LOCAL_CONDITIONS) == {GAINER_CONDITION, LOSER_CONDITION}
+    for condition in (GAINER_CONDITION, LOSER_CONDITION):
+        result = screener.fetch(condition)
+        assert result.empty or list(result.columns) == ["Symbol", "Stock Name", "% Change"]
+    with pytest.raises(ValueError):
+        screener.fetch("( close > 10 )")
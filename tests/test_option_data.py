@@ -0,0 +1,146 @@
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from option_data import (OPTION_TYPES, OTM_COLUMNS, QUOTE_OK, QUOTE_PARTIAL, QUOTE_UNFETCHED, mark_unfetched,
+                         reshape_otm_table)
+
+EXPIRY = (date.today() + timedelta(days=10)).strftime("%d%b%Y").upper()
+NEXT_EXPIRY = (date.today() + timedelta(days=38)).strftime("%d%b%Y").upper()
+
+STOCKS = pd.DataFrame({"Symbol": ["AAA", "BBB", "CCC", "DDD"],
+                       "Stock Name": ["AAA", "BBB", "CCC", "DDD"],
+                       "% Change": [2.3456, -1.5, 0.25, 3.0]})
+
+
+def long_rows(quotes):
+    """(symbol, expiry, strike, option type, ltp) tuples as `build_otm_dataframe` collects them."""
+    symbols, expiries, strikes, types, ltps = zip(*quotes)
+    return pd.DataFrame({"Symbol": list(symbols), "Expiry": list(expiries),
+                         "Strike Price": np.asarray(strikes, dtype=np.float64),
+                         "Option Type": pd.Categorical(types, categories=OPTION_TYPES),
+                         "LTP": np.asarray(ltps, dtype=np.float64)})
+
+
+def loop_otm_table(df, selections, stock_df):
+    """Reference: the merge + pivot_table + per-group loop the table used to be built with."""
+    df = df.assign(**{"Option Type": df["Option Type"].astype(str)})
+    df["Lot Size"] = [selections[key][1] for key in zip(df["Symbol"], df["Expiry"])]
+    df["Spot Price"] = [selections[key][0] for key in zip(df["Symbol"], df["Expiry"])]
+    df = pd.merge(df, stock_df, on="Symbol", how="left")
+    pivot_df = df.pivot_table(index=["Symbol", "Expiry", "Stock Name", "% Change", "Strike Price", "Lot Size",
+                                     "Spot Price"], columns="Option Type", values="LTP", aggfunc="first").reset_index()
+    for option_type in OPTION_TYPES:
+        if option_type not in pivot_df.columns:
+            pivot_df[option_type] = np.nan
+
+    rows = []
+    for (sym, expiry, name, pct, sp), group in pivot_df.groupby(["Symbol", "Expiry", "Stock Name", "% Change",
+                                                                  "Spot Price"]):
+        group = group.sort_values("Strike Price").reset_index(drop=True)
+        if len(group) >= 2:
+            row = {
+                "Symbol": sym,
+                "Expiry": expiry,
+                "Stock Name": name,
+                "% Change": float(f"{pct:.2f}"),
+                "Lot Size": int(group.loc[0, "Lot Size"]),
+                "Nearest OTM Strike": float(f"{group.loc[0, 'Strike Price']:.2f}"),
+                "Nearest OTM CE": float(f"{(group.loc[0, 'CE'] or 0):.2f}"),
+                "Nearest OTM PE": float(f"{(group.loc[0, 'PE'] or 0):.2f}"),
+                "New OTM Strike": float(f"{group.loc[1, 'Strike Price']:.2f}"),
+                "New OTM CE": float(f"{(group.loc[1, 'CE'] or 0):.2f}"),
+                "New OTM PE": float(f"{(group.loc[1, 'PE'] or 0):.2f}"),
+                "Gap": float(f"{group.loc[0, 'Strike Price'] - sp:.2f}"),
+            }
+            row["CE P/L"] = float(f"{row['Lot Size'] * (row['Nearest OTM CE'] - row['New OTM CE']):.2f}")
+            rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def loop_quote_status(table, unfetched):
+    """Reference: the status of every built row, then one placeholder per stock/expiry left out."""
+    flagged = {(symbol, expiry) for symbol, expiry, _ in unfetched}
+    statuses = {key: QUOTE_PARTIAL if key in flagged else QUOTE_OK for key in zip(table["Symbol"], table["Expiry"])}
+    for symbol, expiry, _ in unfetched:
+        if (symbol, expiry) in statuses or symbol not in set(STOCKS["Symbol"]):
+            continue
+        if expiry is None and any(s == symbol for s, _ in statuses):
+            continue
+        statuses[(symbol, expiry)] = QUOTE_UNFETCHED
+    return statuses
+
+
+def assert_matches_loop(out, df, selections):
+    expected = loop_otm_table(df, selections, STOCKS)
+    actual = out.drop(columns=["CE IV"]).sort_values(["Symbol", "Expiry"]).reset_index(drop=True)
+    pd.testing.assert_frame_equal(actual, expected[actual.columns], check_dtype=False)
+
+
+def test_short_chain_matches_the_loop_table():
+    """Fewer priced strikes than the table is wide: one stock has a single strike, one has three."""
+    selections = {("AAA", EXPIRY): (1000.0, 500, None), ("AAA", NEXT_EXPIRY): (1000.0, 500, None),
+                  ("BBB", EXPIRY): (250.0, 1200, None), ("CCC", EXPIRY): (80.0, 4000, None)}
+    df = long_rows([
+        ("AAA", EXPIRY, 1020.0, "CE", 12.35), ("AAA", EXPIRY, 1020.0, "PE", 30.1),
+        ("AAA", EXPIRY, 1040.0, "CE", 6.2), ("AAA", EXPIRY, 1040.0, "PE", 45.0),
+        ("AAA", EXPIRY, 1060.0, "CE", 2.0),  # a third strike is not part of the table
+        ("AAA", NEXT_EXPIRY, 1040.0, "CE", 20.0), ("AAA", NEXT_EXPIRY, 1060.0, "CE", 14.5),
+        ("BBB", EXPIRY, 255.0, "CE", 3.5), ("BBB", EXPIRY, 255.0, "PE", 7.25),  # only one strike
+        ("CCC", EXPIRY, 82.5, "PE", 1.1), ("CCC", EXPIRY, 85.0, "PE", 0.6),  # puts only
+    ])
+
+    out = reshape_otm_table(df.copy(), selections, STOCKS)
+
+    assert list(out.columns) == OTM_COLUMNS
+    assert set(zip(out["Symbol"], out["Expiry"])) == {("AAA", EXPIRY), ("AAA", NEXT_EXPIRY), ("CCC", EXPIRY)}
+    assert_matches_loop(out, df, selections)
+    aaa = out[(out["Symbol"] == "AAA") & (out["Expiry"] == EXPIRY)].iloc[0]
+    assert (aaa["Nearest OTM Strike"], aaa["New OTM Strike"], aaa["Gap"]) == (1020.0, 1040.0, 20.0)
+    assert aaa["% Change"] == 2.35 and aaa["Lot Size"] == 500
+    assert aaa["CE P/L"] == pytest.approx(500 * (12.35 - 6.2))
+    assert aaa["CE IV"] > 0
+    assert np.isnan(out.loc[out["Symbol"] == "CCC", "CE IV"]).all()  # no call price to solve for
+
+    statuses = mark_unfetched(out, [], STOCKS)["Quote Status"]
+    assert set(statuses) == {QUOTE_OK}
+    assert reshape_otm_table(long_rows([("BBB", EXPIRY, 255.0, "CE", 3.5)]), selections, STOCKS).empty
+
+
+def test_missing_quotes_match_the_loop_table_and_are_marked():
+    """AAA's new OTM put never arrived, DDD had no spot quote and BBB none of its options."""
+    selections = {("AAA", EXPIRY): (1000.0, 500, None), ("BBB", EXPIRY): (250.0, 1200, None),
+                  ("BBB", NEXT_EXPIRY): (250.0, 1200, None)}
+    df = long_rows([
+        ("AAA", EXPIRY, 1020.0, "CE", 12.0), ("AAA", EXPIRY, 1020.0, "PE", 30.0),
+        ("AAA", EXPIRY, 1040.0, "CE", 6.0),
+    ])
+    unfetched = [("DDD", None, np.nan), ("AAA", EXPIRY, 500), ("BBB", EXPIRY, 1200), ("BBB", NEXT_EXPIRY, 1200),
+                 ("ZZZ", None, np.nan)]  # not in the screener frame
+
+    out = reshape_otm_table(df.copy(), selections, STOCKS)
+    assert_matches_loop(out, df, selections)
+    assert np.isnan(out.loc[0, "New OTM PE"])
+
+    marked = mark_unfetched(out, unfetched, STOCKS)
+
+    assert list(marked.columns) == OTM_COLUMNS + ["Quote Status"]
+    expiries = [None if pd.isna(expiry) else expiry for expiry in marked["Expiry"]]
+    statuses = dict(zip(zip(marked["Symbol"], expiries), marked["Quote Status"]))
+    assert statuses == loop_quote_status(out, unfetched)
+    assert statuses == {("AAA", EXPIRY): QUOTE_PARTIAL, ("DDD", None): QUOTE_UNFETCHED,
+                        ("BBB", EXPIRY): QUOTE_UNFETCHED, ("BBB", NEXT_EXPIRY): QUOTE_UNFETCHED}
+    placeholders = marked[marked["Quote Status"] == QUOTE_UNFETCHED]
+    assert placeholders["Nearest OTM Strike"].isna().all() and placeholders["CE P/L"].isna().all()
+    assert placeholders.set_index("Symbol")["% Change"].to_dict() == {"DDD": 3.0, "BBB": -1.5}
+    assert placeholders["Lot Size"].tolist()[1:] == [1200, 1200]
+
+
+def test_only_unfetched_stocks_still_get_rows():
+    marked = mark_unfetched(pd.DataFrame(), [("AAA", None, np.nan), ("CCC", EXPIRY, 4000)], STOCKS)
+    assert marked["Symbol"].tolist() == ["AAA", "CCC"]
+    assert pd.isna(marked.loc[0, "Expiry"]) and marked.loc[1, "Expiry"] == EXPIRY
+    assert set(marked["Quote Status"]) == {QUOTE_UNFETCHED}
+    assert mark_unfetched(pd.DataFrame(), [], STOCKS).empty
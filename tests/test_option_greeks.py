@@ -0,0 +1,123 @@
+import math
+
+import numpy as np
+import pytest
+from scipy.optimize import brentq
+
+from option_ltp_and_greeks_calculator import (IV_CONVERGED, IV_INVALID_INPUT, black_scholes_vectorized,
+                                              calculate_greeks, implied_volatility_vectorized)
+
+R = 0.07
+
+
+def scalar_iv(price, S, K, T, r, option_type):
+    """Reference: root of the scalar Black-Scholes price in sigma."""
+    return brentq(lambda sigma: float(black_scholes_vectorized(S, K, T, r, sigma, option_type)["price"]) - price,
+                  1e-4, 10.0, xtol=1e-10)
+
+
+@pytest.mark.parametrize("option_type", ["CE", "PE"])
+@pytest.mark.parametrize("K", [900.0, 1000.0, 1150.0])
+def test_scalar_inputs_match_scalar_solver(option_type, K):
+    price = float(black_scholes_vectorized(1000.0, K, 30 / 365, R, 0.32, option_type)["price"])
+
+    iv, status = implied_volatility_vectorized(price, 1000.0, K, 30 / 365, R, option_type)
+
+    assert iv.shape == () and status.shape == ()
+    assert status == IV_CONVERGED
+    assert iv == pytest.approx(scalar_iv(price, 1000.0, K, 30 / 365, R, option_type), abs=1e-5)
+    assert iv == pytest.approx(0.32, abs=1e-5)
+
+
+def test_invalid_scalar_is_flagged():
+    iv, status = implied_volatility_vectorized(0.0, 1000.0, 1000.0, 30 / 365, R, "CE")
+    assert np.isnan(iv) and status == IV_INVALID_INPUT
+
+
+def test_result_keeps_the_broadcast_shape():
+    K = np.array([[900.0, 1000.0, 1100.0], [950.0, 1050.0, 1150.0]])
+    types = np.array([["CE", "PE", "CE"], ["PE", "CE", "PE"]])
+    sigma = np.array([[0.2, 0.3, 0.4], [0.25, 0.35, 0.45]])
+    prices = black_scholes_vectorized(1000.0, K, 45 / 365, R, sigma, types)["price"]
+
+    iv, status = implied_volatility_vectorized(prices, 1000.0, K, 45 / 365, R, types)
+
+    assert iv.shape == K.shape and status.shape == K.shape
+    assert (status == IV_CONVERGED).all()
+    np.testing.assert_allclose(iv, sigma, atol=1e-5)
+
+
+def textbook_black_scholes(S, K, T, r, sigma, is_call):
+    """Reference: the closed-form price and Greeks, one option at a time with the math module."""
+    cdf = lambda x: 0.5 * (1 + math.erf(x / math.sqrt(2)))
+    d1 = (math.log(S / K) + (r + sigma ** 2 / 2) * T) / (sigma * math.sqrt(T))
+    d2 = d1 - sigma * math.sqrt(T)
+    pdf_d1 = math.exp(-d1 * d1 / 2) / math.sqrt(2 * math.pi)
+    discounted_K = K * math.exp(-r * T)
+    common = {"gamma": pdf_d1 / (S * sigma * math.sqrt(T)), "vega": S * pdf_d1 * math.sqrt(T)}
+    decay = -S * pdf_d1 * sigma / (2 * math.sqrt(T))
+    if is_call:
+        return {"price": S * cdf(d1) - discounted_K * cdf(d2), "delta": cdf(d1),
+                "theta": decay - r * discounted_K * cdf(d2), "rho": T * discounted_K * cdf(d2), **common}
+    return {"price": discounted_K * cdf(-d2) - S * cdf(-d1), "delta": cdf(d1) - 1,
+            "theta": decay + r * discounted_K * cdf(-d2), "rho": -T * discounted_K * cdf(-d2), **common}
+
+
+CHAIN = [(1000.0, K, T, sigma) for K in (800.0, 950.0, 1000.0, 1100.0, 1400.0)
+         for T in (1 / 365, 30 / 365, 1.0) for sigma in (0.05, 0.3, 1.2)]
+
+
+@pytest.mark.parametrize("option_type, is_call", [("CE", True), ("PE", False)])
+def test_vectorized_chain_matches_textbook_formulas(option_type, is_call):
+    S, K, T, sigma = (np.array(column) for column in zip(*CHAIN))
+
+    result = black_scholes_vectorized(S, K, T, R, sigma, option_type)
+
+    assert result["valid"].all()
+    for greek in ("price", "delta", "gamma", "vega", "theta", "rho"):
+        expected = [textbook_black_scholes(*row[:3], R, row[3], is_call)[greek] for row in CHAIN]
+        np.testing.assert_allclose(result[greek], expected, rtol=1e-9, atol=1e-9, err_msg=greek)
+
+
+def test_put_call_parity_and_option_type_spellings():
+    S, K, T = 1000.0, np.array([900.0, 1000.0, 1150.0]), 45 / 365
+    calls = [black_scholes_vectorized(S, K, T, R, 0.3, flag) for flag in ("call", "CE", "c", True)]
+    puts = [black_scholes_vectorized(S, K, T, R, 0.3, flag) for flag in ("put", "PE", "p", False)]
+    for result in calls[1:]:
+        np.testing.assert_array_equal(result["price"], calls[0]["price"])
+    for result in puts[1:]:
+        np.testing.assert_array_equal(result["price"], puts[0]["price"])
+    np.testing.assert_allclose(calls[0]["price"] - puts[0]["price"], S - K * math.exp(-R * T), atol=1e-9)
+    np.testing.assert_allclose(calls[0]["delta"] - puts[0]["delta"], 1.0)
+
+
+def test_invalid_elements_are_nan_and_masked():
+    S = np.array([1000.0, 1000.0, 0.0, 1000.0, np.nan, 1000.0])
+    T = np.array([0.1, 0.0, 0.1, 0.1, 0.1, -1.0])
+    sigma = np.array([0.3, 0.3, 0.3, 0.0, 0.3, 0.3])
+
+    result = black_scholes_vectorized(S, 1000.0, T, R, sigma, "CE")
+
+    np.testing.assert_array_equal(result["valid"], [True, False, False, False, False, False])
+    for greek in ("price", "delta", "gamma", "vega", "theta", "rho"):
+        assert np.isfinite(result[greek][0]) and np.isnan(result[greek][1:]).all()
+
+
+@pytest.mark.parametrize("option_type, is_call", [("call", True), ("put", False), ("CE", True)])
+def test_calculate_greeks_is_a_scalar_view_of_the_vectorized_engine(option_type, is_call):
+    greeks = calculate_greeks(1000.0, 1050.0, 30 / 365, R, 0.25, option_type)
+    vectorized = black_scholes_vectorized(1000.0, 1050.0, 30 / 365, R, 0.25, option_type)
+    expected = textbook_black_scholes(1000.0, 1050.0, 30 / 365, R, 0.25, is_call)
+
+    assert list(greeks) == ["delta", "gamma", "vega", "theta"]
+    for greek, value in greeks.items():
+        assert type(value) is float
+        assert value == float(vectorized[greek])
+        assert value == pytest.approx(expected[greek], rel=1e-9)
+
+
+@pytest.mark.parametrize("S, T, sigma", [(1000.0, 0.0, 0.25), (1000.0, -0.1, 0.25), (0.0, 0.1, 0.25),
+                                         (1000.0, 0.1, 0.0)])
+def test_calculate_greeks_of_invalid_inputs_are_none(S, T, sigma):
+    assert calculate_greeks(S, 1050.0, T, R, sigma, "call") == {"delta": None, "gamma": None, "vega": None,
+                                                                "theta": None}
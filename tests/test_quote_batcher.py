@@ -0,0 +1,48 @@
+import pytest
+
+from quote_batcher import QuoteBatcher
+
+
+class FakeSmartApi:
+    def getMarketData(self, mode, exchange_tokens):
+        fetched = [{"exchange": exch_seg, "symbolToken": token, "ltp": 100.0 + int(token)}
+                   for exch_seg, tokens in exchange_tokens.items() for token in tokens]
+        return {"status": True, "data": {"fetched": fetched, "unfetched": []}}
+
+
+@pytest.mark.parametrize("max_retries", [0, -1])
+def test_rejects_fewer_than_one_attempt(max_retries):
+    with pytest.raises(ValueError):
+        QuoteBatcher(FakeSmartApi(), max_retries=max_retries)
+
+
+def test_single_attempt_fetches_every_token():
+    batcher = QuoteBatcher(FakeSmartApi(), chunk_size=2, max_retries=1, max_workers=2)
+    for token in ("1", "2", "3"):
+        batcher.add("NFO", token)
+
+    assert batcher.fetch() == {("NFO", "1"): 101.0, ("NFO", "2"): 102.0, ("NFO", "3"): 103.0}
+
+
+class ZeroLtpSmartApi:
+    """Answers token "1" with LTP 0 (no trades yet) and never answers token "2"."""
+    def __init__(self):
+        self.requested = []
+
+    def getMarketData(self, mode, exchange_tokens):
+        self.requested.append(sorted(token for tokens in exchange_tokens.values() for token in tokens))
+        return {"status": True, "data": {"fetched": [{"exchange": "NFO", "symbolToken": "1", "ltp": 0}]
+                                         if "1" in exchange_tokens["NFO"] else [], "unfetched": []}}
+
+
+def test_zero_ltp_tokens_are_not_requested_again(monkeypatch):
+    monkeypatch.setattr("quote_batcher.retry_sleep", lambda seconds: None)
+    api = ZeroLtpSmartApi()
+    batcher = QuoteBatcher(api, max_retries=3, max_workers=1)
+    batcher.add("NFO", "1")
+    batcher.add("NFO", "2")
+
+    assert batcher.fetch() == {}
+    assert api.requested == [["1", "2"], ["2"], ["2"]]
+    assert batcher.get_ltp("NFO", "1") == 0.0
+    assert not batcher.missing("NFO", "1") and batcher.missing("NFO", "2")
@@ -0,0 +1,68 @@
+import threading
+import time
+
+import pytest
+
+from quote_cache import QuoteCache
+
+KEY = ("NFO", "12345")
+
+
+def wait_until(condition, timeout=2.0):
+    end = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < end, "timed out"
+        time.sleep(0.001)
+
+
+def coalesced_call(cache, owner_result):
+    """Owner fetch returns `owner_result` once a second caller is waiting on it; returns the waiter's result."""
+    gate = threading.Event()
+    results = {}
+
+    def owner_fetch(keys):
+        gate.wait(2.0)
+        if isinstance(owner_result, Exception):
+            raise owner_result
+        return owner_result
+
+    def owner():
+        try:
+            results["owner"] = cache.get_many([KEY], owner_fetch)
+        except RuntimeError:
+            results["owner"] = "raised"
+
+    def waiter_fetch(keys):
+        raise AssertionError("a coalesced caller must not fetch")
+
+    owner_thread = threading.Thread(target=owner)
+    owner_thread.start()
+    wait_until(lambda: KEY in cache._inflight)
+    waiter_thread = threading.Thread(target=lambda: results.setdefault("waiter", cache.get_many([KEY], waiter_fetch)))
+    waiter_thread.start()
+    wait_until(lambda: cache.stats()["coalesced"] == 1)
+    gate.set()
+    owner_thread.join()
+    waiter_thread.join()
+    return results
+
+
+@pytest.fixture
+def stale_cache():
+    cache = QuoteCache(ttl=0.05, name="test")
+    assert cache.get_many([KEY], lambda keys: {KEY: 99.0}) == {KEY: 99.0}
+    time.sleep(0.06)  # the 99.0 quote is now expired
+    return cache
+
+
+def test_waiter_gets_the_owners_fresh_quote(stale_cache):
+    results = coalesced_call(stale_cache, {KEY: 101.5})
+    assert results["owner"] == {KEY: 101.5}
+    assert results["waiter"] == {KEY: 101.5}
+
+
+@pytest.mark.parametrize("owner_result", [{}, RuntimeError("broker down")])
+def test_waiter_never_gets_an_expired_quote(stale_cache, owner_result):
+    results = coalesced_call(stale_cache, owner_result)
+    assert results["waiter"] == {}
+    assert stale_cache.get(KEY, lambda: 0.0) == 0.0
@@ -0,0 +1,238 @@
+from datetime import datetime, timedelta
+
+import pytest
+import requests
+
+import chartink_screener
+import quote_batcher
+import resilience as resilience_module
+from chartink_screener import ChartinkClient
+from quote_batcher import QuoteBatcher
+from resilience import CircuitBreaker, CircuitOpenError, DeadlineExceeded, ScanResilience
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(resilience_module, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def resilience(clock, monkeypatch):
+    fresh = ScanResilience()
+    monkeypatch.setattr(quote_batcher, "resilience", fresh)
+    monkeypatch.setattr(chartink_screener, "resilience", fresh)
+    return fresh
+
+
+def test_breaker_stays_closed_until_enough_calls(clock):
+    breaker = CircuitBreaker(window=10, min_calls=4, failure_rate=0.5, cooldown=15)
+    for _ in range(3):
+        assert breaker.record(False) is False
+    assert breaker.state == "closed" and breaker.allow()
+    assert breaker.record(False) is True
+    assert breaker.state == "open" and not breaker.allow()
+
+
+def test_breaker_opens_on_failure_rate_over_the_window(clock):
+    breaker = CircuitBreaker(window=4, min_calls=4, failure_rate=0.5, cooldown=15)
+    for ok in (True, True, True, False, True):
+        breaker.record(ok)
+    assert breaker.state == "closed"  # 1 failure in the last 4
+    assert breaker.record(False) is True  # 2 of the last 4
+    # A call that started before the circuit opened does not count
+    assert breaker.record(False) is False
+    assert breaker.state == "open"
+
+
+def test_breaker_probe_after_cooldown(clock):
+    breaker = CircuitBreaker(window=4, min_calls=2, failure_rate=0.5, cooldown=15)
+    breaker.record(False)
+    breaker.record(False)
+
+    clock.sleep(14.9)
+    assert not breaker.allow()
+    clock.sleep(0.1)
+    assert breaker.allow()  # the single probe
+    assert breaker.state == "half-open"
+    assert not breaker.allow()  # no second call while probing
+
+    breaker.record(False)  # failed probe: open for another cooldown
+    assert breaker.state == "open"
+    clock.sleep(10)
+    assert not breaker.allow()
+    clock.sleep(5)
+    assert breaker.allow()
+    breaker.record(True)  # successful probe closes and forgets the old failures
+    assert breaker.state == "closed"
+    assert breaker.record(False) is False
+    assert breaker.state == "closed"
+
+
+def test_retry_budget_is_counted_per_scan(resilience):
+    with resilience.scan(deadline=None, retry_budget=2):
+        assert resilience.allow_retry("getMarketData")
+        assert resilience.allow_retry("chartink")
+        assert not resilience.allow_retry("getMarketData")
+        summary = resilience.summary()
+        assert (summary["retries_used"], summary["retries_left"]) == (2, 0)
+    # Outside a scan there is no budget
+    assert resilience.allow_retry("getMarketData")
+    with resilience.scan(deadline=None, retry_budget=1):
+        assert resilience.summary()["retries_used"] == 0
+        assert resilience.allow_retry("getMarketData")
+
+
+def test_retry_denied_when_it_would_end_past_the_deadline(resilience, clock):
+    with resilience.scan(deadline=5, retry_budget=None):
+        assert resilience.remaining() == 5
+        assert not resilience.allow_retry("ltpData", wait=5)
+        assert resilience.allow_retry("ltpData", wait=4.9)
+        clock.sleep(4)
+        assert not resilience.allow_retry("ltpData", wait=1)
+    assert resilience.remaining() is None
+
+
+def test_retry_denied_while_circuit_open(resilience):
+    for _ in range(10):
+        resilience.record("ltpData", False)
+    assert not resilience.allow_retry("ltpData")
+    assert resilience.allow_retry("getMarketData")
+    assert resilience.summary()["circuits"] == {"ltpData": "open"}
+
+
+def test_check_raises_at_deadline_and_for_open_circuits(resilience, clock):
+    with resilience.scan(deadline=2):
+        resilience.check("chartink")
+        clock.sleep(2)
+        assert resilience.expired() and resilience.remaining() == 0.0
+        with pytest.raises(DeadlineExceeded):
+            resilience.check("chartink")
+    resilience.check("chartink")  # deadlines end with the scan
+    for _ in range(10):
+        resilience.record("chartink", False)
+    with pytest.raises(CircuitOpenError):
+        resilience.check("chartink")
+
+
+def test_wall_clock_deadline(resilience):
+    with resilience.scan(deadline=datetime.now() + timedelta(seconds=30)):
+        assert 29 < resilience.remaining() <= 30
+    with resilience.scan(deadline=datetime.now() - timedelta(seconds=1)):
+        assert resilience.expired()
+
+
+class PartialMarketData:
+    """Answers only the tokens in `answered`, and fails every other call when `fail` is set."""
+    def __init__(self, answered=(), fail=False):
+        self.answered = set(answered)
+        self.fail = fail
+        self.calls = 0
+
+    def getMarketData(self, mode, exchange_tokens):
+        self.calls += 1
+        if self.fail:
+            raise ConnectionError("broker unavailable")
+        fetched = [{"exchange": exch_seg, "symbolToken": token, "ltp": 10.0}
+                   for exch_seg, tokens in exchange_tokens.items() for token in tokens if token in self.answered]
+        return {"status": True, "data": {"fetched": fetched}}
+
+
+@pytest.fixture
+def no_sleep(clock, monkeypatch):
+    monkeypatch.setattr(quote_batcher, "retry_sleep", clock.sleep)
+
+
+def fetch(api, tokens, **kwargs):
+    batcher = QuoteBatcher(api, max_workers=1, **kwargs)
+    for token in tokens:
+        batcher.add("NFO", token)
+    return batcher, batcher.fetch()
+
+
+def test_batcher_retries_only_missing_tokens(resilience, no_sleep):
+    api = PartialMarketData(answered={"1"})
+    with resilience.scan(deadline=None, retry_budget=10):
+        batcher, ltps = fetch(api, ["1", "2"], max_retries=3)
+        assert resilience.summary()["retries_used"] == 2
+    assert ltps == {("NFO", "1"): 10.0}
+    assert api.calls == 3
+    assert batcher.missing("NFO", "2") and not batcher.missing("NFO", "1")
+
+
+def test_batcher_stops_when_retry_budget_is_spent(resilience, no_sleep):
+    api = PartialMarketData()
+    with resilience.scan(deadline=None, retry_budget=1):
+        fetch(api, ["1"], max_retries=5)
+    assert api.calls == 2
+
+
+def test_batcher_stops_at_the_deadline(resilience, no_sleep, clock):
+    api = PartialMarketData()
+    with resilience.scan(deadline=0.6, retry_budget=None):
+        fetch(api, ["1"], max_retries=5, base_backoff=0.25)
+    # Attempts at t=0 and t=0.25; the next backoff (0.5s) would end past the deadline
+    assert api.calls == 2
+
+
+class FakeChartinkSession:
+    def __init__(self, post_error=None):
+        self.post_error = post_error
+        self.posts = 0
+
+    def get(self, url, timeout=None):
+        response = requests.Response()
+        response.status_code = 200
+        response._content = b'<meta name="csrf-token" content="token-1">'
+        return response
+
+    def post(self, url, data=None, headers=None, timeout=None):
+        self.posts += 1
+        raise self.post_error
+
+
+@pytest.fixture
+def chartink_sleep(clock, monkeypatch):
+    monkeypatch.setattr(ChartinkClient._process.retry, "sleep", clock.sleep)
+
+
+def test_chartink_retries_connection_errors_up_to_three_attempts(resilience, chartink_sleep):
+    session = FakeChartinkSession(requests.ConnectionError("reset"))
+    with resilience.scan(deadline=None, retry_budget=10):
+        assert ChartinkClient(session, cache_ttl=0).fetch("( close > 10 )").empty
+        assert resilience.summary()["retries_used"] == 2
+    assert session.posts == 3
+
+
+def test_chartink_retries_stop_when_budget_is_spent(resilience, chartink_sleep):
+    session = FakeChartinkSession(requests.ConnectionError("reset"))
+    with resilience.scan(deadline=None, retry_budget=1):
+        ChartinkClient(session, cache_ttl=0).fetch("( close > 10 )")
+    assert session.posts == 2
+
+
+def test_chartink_is_skipped_past_the_deadline(resilience, chartink_sleep, clock):
+    session = FakeChartinkSession(requests.ConnectionError("reset"))
+    with resilience.scan(deadline=1):
+        clock.sleep(1)
+        assert ChartinkClient(session, cache_ttl=0).fetch("( close > 10 )").empty
+    assert session.posts == 0
+
+
+def test_chartink_does_not_retry_other_errors(resilience, chartink_sleep):
+    session = FakeChartinkSession(ValueError("bad clause"))
+    with resilience.scan(deadline=None, retry_budget=10):
+        ChartinkClient(session, cache_ttl=0).fetch("( close > 10 )")
+    assert session.posts == 1
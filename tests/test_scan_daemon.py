@@ -0,0 +1,82 @@
+import functools
+import json
+import time
+from datetime import datetime, timedelta
+
+import scan_daemon
+from options_config import JWT_REFRESH_AFTER_HOURS
+from scan_daemon import ScanDaemon
+from session_store import refresh_session, restore_or_login, save_session
+
+
+class FakeSmartConnect:
+    def __init__(self):
+        self.refreshed_with = []
+        self.logins = 0
+
+    def setAccessToken(self, token):
+        self.access_token = token
+
+    def setRefreshToken(self, token):
+        pass
+
+    def setFeedToken(self, token):
+        pass
+
+    def setUserId(self, client_code):
+        pass
+
+    def getProfile(self, refresh_token):
+        # The stored JWT has not expired yet, so the cheap check still passes
+        return {"status": True, "data": {}}
+
+    def generateToken(self, refresh_token):
+        self.refreshed_with.append(refresh_token)
+        return {"status": True, "data": {"jwtToken": "jwt-new", "feedToken": "feed-new"}}
+
+    def full_login(self):
+        self.logins += 1
+        return {"status": True, "data": {"jwtToken": "jwt-login", "refreshToken": "refresh-login", "feedToken": "feed"}}
+
+
+def make_daemon(smart_api, path):
+    return ScanDaemon(smart_api, "C1", scan_fn=None, load_index_fn=None,
+                      login_fn=lambda: restore_or_login(smart_api, "C1", smart_api.full_login, path=path))
+
+
+def store_session(path, age_hours):
+    save_session({"data": {"jwtToken": "jwt-old", "refreshToken": "refresh-old", "feedToken": "feed-old"}}, "C1", path)
+    with open(path, encoding="utf-8") as f:
+        record = json.load(f)
+    record["saved_at"] = time.time() - age_hours * 3600
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(record, f)
+
+
+def test_stale_restored_session_is_refreshed(tmp_path, monkeypatch):
+    path = str(tmp_path / "session.json")
+    monkeypatch.setattr(scan_daemon, "refresh_session", functools.partial(refresh_session, path=path))
+    store_session(path, JWT_REFRESH_AFTER_HOURS + 4)
+    smart_api = FakeSmartConnect()
+    daemon = make_daemon(smart_api, path)
+
+    daemon.ensure_session()
+
+    assert smart_api.refreshed_with == ["refresh-old"]
+    assert smart_api.logins == 0
+    assert daemon.session["data"]["jwtToken"] == "jwt-new"
+    assert datetime.now() - daemon.session_started < timedelta(minutes=1)
+
+
+def test_recent_restored_session_keeps_its_age(tmp_path, monkeypatch):
+    path = str(tmp_path / "session.json")
+    monkeypatch.setattr(scan_daemon, "refresh_session", functools.partial(refresh_session, path=path))
+    store_session(path, 1)
+    smart_api = FakeSmartConnect()
+    daemon = make_daemon(smart_api, path)
+
+    daemon.ensure_session()
+
+    assert smart_api.refreshed_with == []
+    assert daemon.session["data"]["jwtToken"] == "jwt-old"
+    assert abs(datetime.now() - timedelta(hours=1) - daemon.session_started) < timedelta(minutes=1)
@@ -0,0 +1,86 @@
+import json
+import re
+
+import pytest
+
+from scan_metrics import PROMETHEUS_PREFIX, ScanMetrics
+
+SAMPLE = re.compile(r'^(?P<name>[a-zA-Z_:][a-zA-Z0-9_:]*)(\{(?P<labels>[a-z]+="[^"]*"(,[a-z]+="[^"]*")*)\})? '
+                    r'(?P<value>-?[0-9.]+(e[-+]?[0-9]+)?)$')
+
+
+@pytest.fixture
+def scan_metrics():
+    m = ScanMetrics()
+    for latency in (0.1, 0.2, 0.3, 0.4, 1.0):
+        m.record_call("getMarketData", latency)
+    m.record_call("getMarketData", 2.0, ok=False, throttled=True)
+    m.record_call("chartink", 0.5)
+    m.record_retry("getMarketData", 3)
+    m.record_retry("ltpData")  # retried, but no call recorded yet
+    m.record_stage("spot_fetch", 1.25)
+    m.record_stage("spot_fetch", 0.75)
+    m.record_cache("quotes", hits=7, misses=2, coalesced=1)
+    return m
+
+
+def parse(text):
+    """Returns {(name, labels): value} and {family: type}, checking every line's syntax."""
+    samples, types = {}, {}
+    for line in text.splitlines():
+        if line.startswith("# TYPE "):
+            _, _, family, kind = line.split(" ")
+            assert family not in types and kind in ("gauge", "counter", "summary")
+            types[family] = kind
+            continue
+        match = SAMPLE.match(line)
+        assert match, line
+        name = match["name"]
+        family = re.sub(r"_(sum|count)$", "", name) if name not in types else name
+        assert family in types, f"{name} has no TYPE line before it"
+        samples[(name, match["labels"] or "")] = float(match["value"])
+    return samples, types
+
+
+def test_prometheus_text_format(scan_metrics):
+    text = scan_metrics.to_prometheus()
+    assert text.endswith("\n") and not text.endswith("\n\n")
+    samples, types = parse(text)
+    p = PROMETHEUS_PREFIX
+
+    assert types[f"{p}_scan_duration_seconds"] == "gauge"
+    assert types[f"{p}_api_calls_total"] == "counter"
+    assert types[f"{p}_api_latency_seconds"] == "summary"
+    assert samples[(f"{p}_stage_seconds", 'stage="spot_fetch"')] == 2.0
+    assert samples[(f"{p}_api_calls_total", 'endpoint="getMarketData"')] == 6
+    assert samples[(f"{p}_api_failures_total", 'endpoint="getMarketData"')] == 1
+    assert samples[(f"{p}_api_throttled_total", 'endpoint="getMarketData"')] == 1
+    assert samples[(f"{p}_api_retries_total", 'endpoint="getMarketData"')] == 3
+    assert samples[(f"{p}_api_retries_total", 'endpoint="ltpData"')] == 1
+    assert samples[(f"{p}_api_latency_seconds", 'endpoint="getMarketData",quantile="0.5"')] == pytest.approx(0.35)
+    assert samples[(f"{p}_api_latency_seconds", 'endpoint="chartink",quantile="0.99"')] == 0.5
+    assert samples[(f"{p}_api_latency_seconds_sum", 'endpoint="getMarketData"')] == pytest.approx(4.0)
+    assert samples[(f"{p}_api_latency_seconds_count", 'endpoint="getMarketData"')] == 6
+    # No samples, no quantiles; sum and count are still exposed
+    assert not any(name == f"{p}_api_latency_seconds" and 'endpoint="ltpData"' in labels for name, labels in samples)
+    assert samples[(f"{p}_api_latency_seconds_count", 'endpoint="ltpData"')] == 0
+    assert samples[(f"{p}_cache_hits_total", 'cache="quotes"')] == 7
+    assert samples[(f"{p}_cache_coalesced_total", 'cache="quotes"')] == 1
+    assert samples[(f"{p}_scan_started_timestamp_seconds", "")] == pytest.approx(scan_metrics.started_at, abs=1e-3)
+
+
+def test_empty_scan_still_renders(scan_metrics):
+    scan_metrics.reset()
+    samples, types = parse(scan_metrics.to_prometheus())
+    assert set(name for name, _ in samples) == {f"{PROMETHEUS_PREFIX}_scan_duration_seconds",
+                                               f"{PROMETHEUS_PREFIX}_scan_started_timestamp_seconds"}
+
+
+def test_write_picks_the_format_from_the_extension(scan_metrics, tmp_path):
+    scan_metrics.write(str(tmp_path / "out" / "scan.prom"))
+    scan_metrics.write(str(tmp_path / "scan.json"))
+    assert (tmp_path / "out" / "scan.prom").read_text().startswith("# TYPE ")
+    data = json.loads((tmp_path / "scan.json").read_text())
+    assert data["endpoints"]["getMarketData"]["calls"] == 6
+    assert data["stages"]["spot_fetch"] == {"count": 2, "total_s": 2.0, "max_s": 1.25}
+    assert sorted(p.name for p in tmp_path.rglob("*")) == ["out", "scan.json", "scan.prom"]
@@ -0,0 +1,93 @@
+import threading
+
+import pytest
+
+from scan_pipeline import ScanPipeline, ScanStep, StepFailed, StepSkipped
+
+
+def recorder():
+    order, lock = [], threading.Lock()
+
+    def step(name, value=None):
+        def fn(**kwargs):
+            with lock:
+                order.append(name)
+            return value if value is not None else (name, kwargs)
+        return fn
+    return order, step
+
+
+def test_steps_run_after_their_requirements_and_receive_their_results():
+    order, step = recorder()
+    pipeline = ScanPipeline([
+        ScanStep("otm", step("otm"), requires=("login", "screen")),
+        ScanStep("export", step("export"), requires=("otm",)),
+        ScanStep("login", step("login", "session")),
+        ScanStep("screen", step("screen", ["TCS"])),
+    ])
+
+    results = pipeline.run()
+
+    assert set(order[:2]) == {"login", "screen"} and order[2:] == ["otm", "export"]
+    assert results["otm"] == ("otm", {"login": "session", "screen": ["TCS"]})
+    assert results["export"] == ("export", {"otm": results["otm"]})
+    assert pipeline.errors == {}
+    assert set(pipeline.timings) == {"login", "screen", "otm", "export"}
+
+
+def test_independent_steps_overlap():
+    both_started = threading.Barrier(2, timeout=5)
+    pipeline = ScanPipeline([ScanStep("login", both_started.wait), ScanStep("screen", both_started.wait)])
+    pipeline.run()  # would time out if the steps ran one after the other
+    assert pipeline.errors == {}
+
+
+def test_failure_skips_every_dependent_step():
+    order, step = recorder()
+
+    def screen():
+        raise StepFailed("Chartink returned no stocks")
+
+    pipeline = ScanPipeline([
+        ScanStep("login", step("login")),
+        ScanStep("screen", screen),
+        ScanStep("otm", step("otm"), requires=("login", "screen")),
+        ScanStep("export", step("export"), requires=("otm",)),
+        ScanStep("sectors", step("sectors"), requires=("login",)),
+    ])
+
+    results = pipeline.run()
+
+    assert set(results) == {"login", "sectors"}
+    assert sorted(order) == ["login", "sectors"]
+    assert isinstance(pipeline.errors["screen"], StepFailed)
+    assert isinstance(pipeline.errors["otm"], StepSkipped) and "screen" in str(pipeline.errors["otm"])
+    assert isinstance(pipeline.errors["export"], StepSkipped) and "otm" in str(pipeline.errors["export"])
+    assert "otm" not in pipeline.timings and "export" not in pipeline.timings
+
+
+def test_unexpected_exceptions_are_recorded_like_failures():
+    def broken():
+        raise KeyError("token")
+
+    pipeline = ScanPipeline([ScanStep("login", broken), ScanStep("otm", lambda login: login, requires=("login",))])
+    assert pipeline.run() == {}
+    assert isinstance(pipeline.errors["login"], KeyError)
+    assert isinstance(pipeline.errors["otm"], StepSkipped)
+
+
+def test_cycles_are_skipped_and_unknown_requirements_rejected():
+    pipeline = ScanPipeline([ScanStep("a", lambda b: b, requires=("b",)), ScanStep("b", lambda a: a, requires=("a",)),
+                             ScanStep("c", lambda: "ok")])
+    assert pipeline.run() == {"c": "ok"}
+    assert {name: str(e) for name, e in pipeline.errors.items()} == {"a": "dependency cycle", "b": "dependency cycle"}
+
+    with pytest.raises(ValueError, match="unknown step"):
+        ScanPipeline([ScanStep("otm", lambda login: login, requires=("login",))])
+
+
+def test_run_starts_fresh_each_time():
+    calls = []
+    pipeline = ScanPipeline([ScanStep("login", lambda: calls.append(1) or len(calls))])
+    assert pipeline.run() == {"login": 1}
+    assert pipeline.run() == {"login": 2}
@@ -0,0 +1,149 @@
+import json
+from datetime import date
+
+import pytest
+import requests
+
+import scrip_master_cache
+import utils
+from resilience import ScanResilience
+from scrip_master_cache import load_instrument_table, load_scrip_master, load_scrip_master_columns
+
+URL = "https://example.test/OpenAPIScripMaster.json"
+
+
+def row(token, symbol, exch_seg, name=None):
+    return {"token": token, "symbol": symbol, "name": name or symbol.split("-")[0], "expiry": "",
+            "strike": "-1.000000", "lotsize": "1", "instrumenttype": "", "exch_seg": exch_seg,
+            "tick_size": "5.000000"}
+
+
+ROWS = [row("2885", "RELIANCE-EQ", "NSE"), row("500325", "RELIANCE", "BSE"), row("11536", "TCS-EQ", "NSE"),
+        row("99926000", "Nifty 50", "NSE", "NIFTY"), {**row("35001", "RELIANCE25SEPFUT", "NFO", "RELIANCE"), "instrumenttype": "FUTSTK"},
+        row("1", "GOLD", "MCX")]
+KEPT = ["2885", "11536", "99926000", "35001"]  # NSE and NFO only
+
+
+class FakeResponse:
+    def __init__(self, body=b"", headers=None):
+        self.body = body
+        self.headers = headers or {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size):
+        for i in range(0, len(self.body), 7):
+            yield self.body[i:i + 7]
+
+
+class FakeServer:
+    """Serves the scrip master with an ETag and counts HEAD and GET requests."""
+    def __init__(self, rows, etag='"v1"'):
+        self.rows = rows
+        self.etag = etag
+        self.heads = 0
+        self.gets = 0
+
+    def head(self, url, **kwargs):
+        self.heads += 1
+        return FakeResponse(headers={"ETag": self.etag, "Content-Length": str(len(json.dumps(self.rows)))})
+
+    def get(self, url, **kwargs):
+        self.gets += 1
+        return FakeResponse(json.dumps(self.rows).encode())
+
+
+class FakeDate(date):
+    current = date(2025, 9, 18)
+
+    @classmethod
+    def today(cls):
+        return cls.current
+
+
+@pytest.fixture
+def server(monkeypatch):
+    server = FakeServer(ROWS)
+    monkeypatch.setattr(scrip_master_cache.requests, "head", server.head)
+    monkeypatch.setattr(utils.requests, "get", server.get)
+    monkeypatch.setattr(utils, "resilience", ScanResilience())
+    monkeypatch.setattr(utils, "retry_sleep", lambda backoff: None)
+    monkeypatch.setattr(scrip_master_cache, "date", FakeDate)
+    FakeDate.current = date(2025, 9, 18)
+    return server
+
+
+def test_download_keeps_the_configured_segments(server, tmp_path):
+    rows = load_scrip_master(URL, tmp_path)
+    assert [r["token"] for r in rows] == KEPT
+    assert rows[0] == ROWS[0]
+    meta = json.loads((tmp_path / "meta.json").read_text())
+    assert meta["trading_date"] == "2025-09-18" and meta["fingerprint"]["etag"] == '"v1"'
+    assert meta["rows"] == 4
+    assert server.gets == 1
+
+
+def test_same_day_reuses_the_cache_without_a_request(server, tmp_path):
+    load_scrip_master(URL, tmp_path)
+    server.rows = ROWS[:1]  # would show up if it were downloaded again
+
+    columns = load_scrip_master_columns(URL, tmp_path)
+
+    assert (server.gets, server.heads) == (1, 1)
+    assert list(columns["token"]) == KEPT
+    assert columns["token"].flags["WRITEABLE"] is False  # memory-mapped
+
+
+def test_next_day_with_the_same_etag_only_sends_a_head(server, tmp_path):
+    load_scrip_master(URL, tmp_path)
+    FakeDate.current = date(2025, 9, 19)
+
+    assert len(load_scrip_master(URL, tmp_path)) == 4
+    assert (server.gets, server.heads) == (1, 2)
+    assert json.loads((tmp_path / "meta.json").read_text())["trading_date"] == "2025-09-19"
+    load_scrip_master(URL, tmp_path)
+    assert server.heads == 2  # valid for the rest of the day
+
+
+def test_next_day_with_a_new_etag_downloads_again(server, tmp_path):
+    load_scrip_master(URL, tmp_path)
+    FakeDate.current = date(2025, 9, 19)
+    server.rows, server.etag = ROWS[2:], '"v2"'
+
+    rows = load_scrip_master(URL, tmp_path)
+
+    assert server.gets == 2
+    assert [r["token"] for r in rows] == KEPT[1:]
+    assert json.loads((tmp_path / "meta.json").read_text())["fingerprint"]["etag"] == '"v2"'
+
+
+def test_other_url_or_missing_meta_downloads_again(server, tmp_path):
+    load_scrip_master(URL, tmp_path)
+    load_scrip_master(URL + "?v=2", tmp_path)
+    assert server.gets == 2
+    (tmp_path / "meta.json").unlink()
+    load_scrip_master(URL + "?v=2", tmp_path)
+    assert server.gets == 3
+
+
+def test_failed_download_returns_none(server, tmp_path, monkeypatch):
+    def down(url, **kwargs):
+        raise requests.ConnectionError("offline")
+
+    monkeypatch.setattr(utils.requests, "get", down)
+    assert load_scrip_master(URL, tmp_path) is None
+    assert load_instrument_table(URL, tmp_path) is None
+    assert not (tmp_path / "meta.json").exists()
+
+
+def test_instrument_table_comes_from_the_cached_columns(server, tmp_path):
+    table = load_instrument_table(URL, tmp_path)
+    assert sorted(table.token.astype(str)) == ["11536", "2885", "35001"]  # the index row is not a "-EQ" equity
+    assert server.gets == 1
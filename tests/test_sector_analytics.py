@@ -0,0 +1,72 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+from rich.console import Console
+
+import sector_analytics
+from sector_analytics import ROLLUP_COLUMNS, build_breadth_table, sector_rollup
+from sectors import SectorFetcher
+
+
+@pytest.fixture(autouse=True)
+def sector_map(tmp_path, monkeypatch):
+    csv = tmp_path / "sectors.csv"
+    csv.write_text("Company Name,Industry,Symbol\n"
+                   "A,Banks,AAA\nB,Banks,BBB\nC,IT,CCC\nE,IT,EEE\nF,IT,FFF\nG,Auto,GGG\nH,Auto,HHH\nD,Pharma,DDD\n",
+                   encoding="utf-8")
+    monkeypatch.setattr(sector_analytics, "sector_finder", SectorFetcher(str(csv), cache_dir=None))
+
+
+def otm_rows(rows):
+    return pd.DataFrame(rows, columns=["Symbol", "Expiry", "% Change", "CE P/L", "CE IV"])
+
+
+GAINERS = otm_rows([
+    ("AAA", "30SEP2025", 3.0, 100.0, 0.2), ("AAA", "28OCT2025", 3.0, 300.0, 0.4),  # two expiries, one stock
+    ("CCC", "30SEP2025", 1.0, 50.0, 0.3), ("FFF", "30SEP2025", 2.0, 0.0, 0.6),
+    ("GGG", "30SEP2025", 4.0, 5.0, 0.25), ("HHH", "30SEP2025", 6.0, 5.0, 0.35),
+    ("ZZZ", "30SEP2025", 5.0, 10.0, np.nan),  # not in the sector list
+])
+LOSERS = otm_rows([("BBB", "30SEP2025", -2.0, -20.0, 0.5), ("EEE", "30SEP2025", -4.0, 0.0, 0.1)])
+
+
+def test_rollup_counts_breadth_and_medians():
+    rollup = sector_rollup({"gainers": GAINERS, "losers": LOSERS})
+
+    assert list(rollup.columns) == ROLLUP_COLUMNS
+    # Breadth first, then the number of stocks; Pharma had no scanned stock
+    assert rollup["Sector"].tolist() == ["Auto", "Unknown", "IT", "Banks"]
+    rows = rollup.set_index("Sector")
+    assert rows.loc["Banks", ["Gainers", "Losers"]].tolist() == [1, 1]
+    assert rows.loc["IT", ["Gainers", "Losers"]].tolist() == [2, 1]
+    assert rows["Breadth"].to_dict() == pytest.approx({"Auto": 1.0, "Unknown": 1.0, "IT": 1 / 3, "Banks": 0.0})
+    # Each stock once per side for the mean; every expiry row for P/L and IV
+    assert rows["Mean % Change"].to_dict() == pytest.approx({"Auto": 5.0, "Unknown": 5.0, "IT": -1 / 3, "Banks": 0.5})
+    assert rows["Total CE P/L"].to_dict() == pytest.approx({"Auto": 10.0, "Unknown": 10.0, "IT": 50.0, "Banks": 380.0})
+    assert rows.loc["Banks", "Median CE IV"] == pytest.approx(0.4)
+    assert rows.loc["IT", "Median CE IV"] == pytest.approx(0.3)
+    assert math.isnan(rows.loc["Unknown", "Median CE IV"])
+
+
+def test_one_sided_and_missing_tables():
+    rollup = sector_rollup({"gainers": None, "losers": LOSERS})
+    assert rollup.set_index("Sector")["Breadth"].to_dict() == {"Banks": -1.0, "IT": -1.0}
+    assert (rollup["Gainers"] == 0).all()
+
+    without_iv = sector_rollup({"gainers": GAINERS.drop(columns="CE IV"), "losers": pd.DataFrame()})
+    assert without_iv["Median CE IV"].isna().all()
+    assert sector_rollup({"gainers": pd.DataFrame(), "losers": None}).columns.tolist() == ROLLUP_COLUMNS
+
+
+def test_breadth_table_has_a_row_per_sector():
+    rollup = sector_rollup({"gainers": GAINERS, "losers": LOSERS})
+    table = build_breadth_table(rollup)
+    assert table.row_count == len(rollup)
+    console = Console(record=True, width=140)
+    console.print(table)
+    lines = {line.split()[1]: line.split()[2:] for line in console.export_text().splitlines()
+             if line.startswith("│") and line.split()[1] in set(rollup["Sector"])}
+    assert lines["Banks"][:3] == ["│", "1", "│"] and "+0.00" in lines["Banks"]
+    assert lines["Unknown"][-2:] == ["-", "│"]  # no IV for the unknown sector
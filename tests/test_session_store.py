@@ -0,0 +1,131 @@
+import json
+import os
+import stat
+import time
+
+import pytest
+
+from options_config import SESSION_MAX_AGE_HOURS
+from session_store import clear_session, load_session, restore_or_login, save_session
+
+SESSION = {"status": True, "data": {"jwtToken": "jwt-1", "refreshToken": "refresh-1", "feedToken": "feed-1",
+                                    "name": "not stored"}}
+
+
+class FakeSmartConnect:
+    def __init__(self, valid_jwts=(), refresh_ok=True):
+        self.valid_jwts = set(valid_jwts)
+        self.refresh_ok = refresh_ok
+        self.access_token = None
+        self.refreshed_with = []
+        self.logins = 0
+
+    def setAccessToken(self, token):
+        self.access_token = token
+
+    def setRefreshToken(self, token):
+        self.refresh_token = token
+
+    def setFeedToken(self, token):
+        self.feed_token = token
+
+    def setUserId(self, client_code):
+        self.user_id = client_code
+
+    def getProfile(self, refresh_token):
+        if self.access_token not in self.valid_jwts:
+            raise RuntimeError("Invalid Token")
+        return {"status": True, "data": {"clientcode": self.user_id}}
+
+    def generateToken(self, refresh_token):
+        self.refreshed_with.append(refresh_token)
+        if not self.refresh_ok:
+            return {"status": False, "message": "Invalid refresh token"}
+        return {"status": True, "data": {"jwtToken": "jwt-2", "feedToken": "feed-2"}}
+
+    def full_login(self):
+        self.logins += 1
+        return {"status": True, "data": {"jwtToken": "jwt-login", "refreshToken": "refresh-login",
+                                         "feedToken": "feed-login"}}
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "session" / "smartapi_session.json")
+
+
+@pytest.mark.skipif(os.name != "posix", reason="file modes are POSIX only")
+def test_session_file_is_owner_only(path):
+    save_session(SESSION, "C1", path)
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+    assert not os.path.exists(path + ".tmp")
+
+
+def test_only_tokens_are_stored_and_loaded(path):
+    save_session(SESSION, "C1", path)
+    with open(path, encoding="utf-8") as f:
+        assert set(json.load(f)) == {"jwtToken", "refreshToken", "feedToken", "clientcode", "saved_at"}
+
+    loaded = load_session("C1", path)
+    assert loaded["status"] is True
+    assert loaded["data"] == {"jwtToken": "jwt-1", "refreshToken": "refresh-1", "feedToken": "feed-1"}
+    assert load_session("OTHER", path) is None
+    clear_session(path)
+    assert load_session("C1", path) is None
+    clear_session(path)  # already gone
+
+
+def test_old_or_broken_files_are_not_reused(path):
+    save_session(SESSION, "C1", path)
+    with open(path, encoding="utf-8") as f:
+        record = json.load(f)
+    record["saved_at"] = time.time() - SESSION_MAX_AGE_HOURS * 3600 - 1
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(record, f)
+    assert load_session("C1", path) is None
+
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("{broken")
+    assert load_session("C1", path) is None
+
+
+def test_valid_stored_session_is_reused(path):
+    save_session(SESSION, "C1", path)
+    api = FakeSmartConnect(valid_jwts={"jwt-1"})
+
+    session = restore_or_login(api, "C1", api.full_login, path)
+
+    assert session["data"]["jwtToken"] == "jwt-1"
+    assert (api.access_token, api.refresh_token, api.feed_token, api.user_id) == ("jwt-1", "refresh-1", "feed-1", "C1")
+    assert api.refreshed_with == [] and api.logins == 0
+
+
+def test_invalid_stored_token_is_refreshed_through_generate_token(path):
+    save_session(SESSION, "C1", path)
+    api = FakeSmartConnect(valid_jwts=set())
+
+    session = restore_or_login(api, "C1", api.full_login, path)
+
+    assert api.refreshed_with == ["refresh-1"]
+    assert api.logins == 0
+    assert session["data"] == {"jwtToken": "jwt-2", "refreshToken": "refresh-1", "feedToken": "feed-2"}
+    assert load_session("C1", path)["data"] == session["data"]
+
+
+def test_rejected_refresh_falls_back_to_a_full_login(path):
+    save_session(SESSION, "C1", path)
+    api = FakeSmartConnect(valid_jwts=set(), refresh_ok=False)
+
+    session = restore_or_login(api, "C1", api.full_login, path)
+
+    assert api.refreshed_with == ["refresh-1"]
+    assert api.logins == 1
+    assert session["data"]["jwtToken"] == "jwt-login"
+    assert load_session("C1", path)["data"]["jwtToken"] == "jwt-login"
+
+
+def test_failed_login_is_not_stored(path):
+    api = FakeSmartConnect()
+    session = restore_or_login(api, "C1", lambda: {"status": False, "message": "Invalid totp"}, path)
+    assert session["status"] is False
+    assert not os.path.exists(path)
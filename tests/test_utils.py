@@ -0,0 +1,119 @@
+import json
+
+import pytest
+
+import utils
+from resilience import ScanResilience
+from utils import iter_json_array, stream_json_array_with_retry
+
+# Strings with escapes and multi-byte characters, numbers of every shape, literals and nesting
+DOCUMENT = ('[{"token": "3045", "symbol": "SBIN-EQ", "name": "Caf\\u00e9 \\"Q\\" \\\\ \\/ \\n",'
+            ' "strike": "-1.000000", "lotsize": 750},'
+            ' 12345, -0.5, 6.02e23, 1E-7, 0,'
+            ' true, false, null, "₹ ऑप्शन", [], {}, [1, [2, {"a": [true]}]],\r\n\t"end"]').encode("utf-8")
+EXPECTED = json.loads(DOCUMENT)
+
+
+def parse(*chunks):
+    return list(iter_json_array(iter(chunks)))
+
+
+def test_single_chunk():
+    assert parse(DOCUMENT) == EXPECTED
+
+
+@pytest.mark.parametrize("split", range(len(DOCUMENT) + 1))
+def test_split_at_every_byte(split):
+    assert parse(DOCUMENT[:split], DOCUMENT[split:]) == EXPECTED
+
+
+def test_one_byte_chunks():
+    assert parse(*(DOCUMENT[i:i + 1] for i in range(len(DOCUMENT)))) == EXPECTED
+
+
+def test_every_pair_of_splits_in_numbers_and_literals():
+    doc = b"[12345,-6.5e-3, true ,false,null,7]"
+    for i in range(len(doc) + 1):
+        for j in range(i, len(doc) + 1):
+            assert parse(doc[:i], doc[i:j], doc[j:]) == json.loads(doc)
+
+
+def test_empty_chunks_and_byte_order_mark():
+    assert parse(b"", b"\xef\xbb", b"\xbf[1,", b"", b"2]", b"") == [1, 2]
+
+
+@pytest.mark.parametrize("doc", [b"[]", b"  [ ]  ", b"[\n]"])
+def test_empty_array(doc):
+    assert parse(doc) == []
+
+
+@pytest.mark.parametrize("doc", [
+    b'{"a": 1}', b"[1 2]", b"[1,,2]", b"[,1]", b"[1]x", b"[1] [2]", b'["a" "b"]', b"[tru]", b"[1,]", b"",
+])
+def test_malformed_input_raises(doc):
+    with pytest.raises(ValueError):
+        parse(doc)
+
+
+@pytest.mark.parametrize("cut", range(len(DOCUMENT)))
+def test_truncated_input_raises(cut):
+    with pytest.raises(ValueError):
+        parse(DOCUMENT[:cut])
+
+
+class FakeResponse:
+    def __init__(self, chunks, fail_after=None):
+        self.chunks = chunks
+        self.fail_after = fail_after
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size):
+        for i, chunk in enumerate(self.chunks):
+            if i == self.fail_after:
+                raise ConnectionError("connection reset")
+            yield chunk
+
+
+def test_retry_restarts_the_parse_after_a_failure_partway(monkeypatch):
+    chunks = [DOCUMENT[i:i + 16] for i in range(0, len(DOCUMENT), 16)]
+    responses = [FakeResponse(chunks, fail_after=len(chunks) - 2), FakeResponse(chunks)]
+    monkeypatch.setattr(utils.requests, "get", lambda url, **kwargs: responses.pop(0))
+    monkeypatch.setattr(utils, "retry_sleep", lambda backoff: None)
+    monkeypatch.setattr(utils, "resilience", ScanResilience())
+    seen = []
+
+    def consume(rows):
+        seen.append([])
+        for row in rows:
+            seen[-1].append(row)
+        return seen[-1]
+
+    result = stream_json_array_with_retry("https://example.test/scrip.json", consume,
+                                          keep=lambda row: not isinstance(row, bool))
+
+    assert len(seen) == 2
+    assert 0 < len(seen[0]) < len(seen[1])
+    assert result == [row for row in EXPECTED if not isinstance(row, bool)]
+
+
+def test_gives_up_after_max_retries(monkeypatch):
+    calls = []
+
+    def get(url, **kwargs):
+        calls.append(url)
+        return FakeResponse([b"[1, 2"])
+
+    monkeypatch.setattr(utils.requests, "get", get)
+    monkeypatch.setattr(utils, "retry_sleep", lambda backoff: None)
+    monkeypatch.setattr(utils, "resilience", ScanResilience())
+
+    assert stream_json_array_with_retry("https://example.test/scrip.json", list, max_retries=3) is None
+    assert len(calls) == 3
@@ -7,12 +7,26 @@ Purpose:
 Functions:
     - retry_sleep(backoff_sec): Sleeps for a given duration with a small random jitter.
     - fetch_json_with_retry(url, ...): Fetches JSON data from a URL with retry logic.
-    - safe_ltp(smartApi, ...): Safely fetches the Last Traded Price (LTP) with retries.
+    - iter_json_array(chunks): Yields the elements of a JSON array while its bytes arrive.
+    - stream_json_array_with_retry(url, consume, keep=None, ...): Streams a JSON array from a URL
+      into `consume`, dropping rows `keep` rejects as they are parsed, with retry logic.
+    - safe_ltp(smartApi, ..., cache=None): Safely fetches the Last Traded Price (LTP) with retries,
+      through a `quote_cache.QuoteCache` if given.
+
+Notes:
+    - Retries draw on the scan's retry budget and stop at its deadline or when the endpoint's
+      circuit is open (see `resilience.py`).
 """
 import time
 import random
 import logging
+import codecs
+import itertools
+import json
+import re
 import requests
+from scan_metrics import metrics
+from resilience import resilience, ResilienceError
 
 def retry_sleep(backoff_sec):
     """Sleeps for a given duration with a small random jitter."""
@@ -21,17 +35,125 @@ def retry_sleep(backoff_sec):
 def fetch_json_with_retry(url, max_retries=4, base_backoff=0.8):
     """Fetches JSON data from a URL with exponential backoff and retries."""
     for attempt in range(1, max_retries + 1):
+        try:
+            resilience.check("scrip_master")
+        except ResilienceError as e:
+            logging.error(f"[fetch_json_with_retry] {e}")
+            return None
+        start = time.monotonic()
         try:
             resp = requests.get(url, timeout=20)
             resp.raise_for_status()
-            return resp.json()
+            data = resp.json()
+            metrics.record_call("scrip_master", time.monotonic() - start)
+            resilience.record("scrip_master", True)
+            return data
         except Exception as e:
+            metrics.record_call("scrip_master", time.monotonic() - start, ok=False)
+            resilience.record("scrip_master", False)
             logging.error(f"[fetch_json_with_retry] Attempt {attempt} failed: {e}")
-            if attempt == max_retries:
+            backoff = base_backoff * attempt
+            if attempt == max_retries or not resilience.allow_retry("scrip_master", backoff):
+                return None
+            metrics.record_retry("scrip_master")
+            retry_sleep(backoff)
+
+_JSON_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_JSON_NUMBER_CHARS = "0123456789+-.eE"
+
+def iter_json_array(chunks):
+    """
+    Yields the elements of a JSON array as its bytes arrive, without holding the whole body.
+
+    Args:
+        chunks (iterable of bytes): The body in pieces (e.g. `resp.iter_content(...)`).
+
+    Yields:
+        Each decoded element, in order.
+
+    Raises:
+        ValueError: If the body is not a complete JSON array.
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8-sig")()
+    buf, pos, state = "", 0, "start"  # start -> first/item -> separator -> ... -> end
+    for chunk in itertools.chain(chunks, [None]):
+        eof = chunk is None
+        buf = buf[pos:] + utf8.decode(chunk or b"", final=eof)
+        pos = 0
+        while True:
+            pos = _JSON_WHITESPACE.match(buf, pos).end()
+            if pos == len(buf):
+                break
+            char = buf[pos]
+            if state == "start":
+                if char != "[":
+                    raise ValueError("Expected a JSON array")
+                state, pos = "first", pos + 1
+            elif state == "separator" or (state == "first" and char == "]"):
+                if char not in ",]":
+                    raise ValueError(f"Expected ',' or ']' at offset {pos}")
+                state, pos = ("item" if char == "," else "end"), pos + 1
+            elif state in ("first", "item"):
+                try:
+                    item, end = decoder.raw_decode(buf, pos)
+                except ValueError:
+                    if eof:
+                        raise
+                    break  # the element continues in the next chunk
+                if not eof and isinstance(item, (int, float)) and not isinstance(item, bool):
+                    after = _JSON_WHITESPACE.match(buf, end).end()
+                    if after == len(buf) or buf[after] in _JSON_NUMBER_CHARS:
+                        break  # a bare number may continue in the next chunk
+                yield item
+                state, pos = "separator", end
+            else:
+                raise ValueError("Unexpected data after the JSON array")
+    if state != "end":
+        raise ValueError("Incomplete JSON array")
+
+def stream_json_array_with_retry(url, consume, keep=None, max_retries=4, base_backoff=0.8, chunk_size=1 << 16):
+    """
+    Downloads a JSON array and parses it while it arrives, with exponential backoff and retries.
+
+    Args:
+        url (str): URL of a JSON array (e.g. the scrip master).
+        consume (callable): Called with an iterator over the array's elements; whatever it
+            returns is returned. A failed attempt discards its result and calls it again.
+        keep (callable, optional): Row predicate; rejected rows are dropped as they are parsed.
+        max_retries (int): Maximum number of attempts.
+        base_backoff (float): Base backoff time in seconds.
+        chunk_size (int): Bytes read from the socket per parse step.
+
+    Returns:
+        The result of `consume`, or None if every attempt failed.
+    """
+    for attempt in range(1, max_retries + 1):
+        try:
+            resilience.check("scrip_master")
+        except ResilienceError as e:
+            logging.error(f"[stream_json_array_with_retry] {e}")
+            return None
+        start = time.monotonic()
+        try:
+            with requests.get(url, timeout=20, stream=True) as resp:
+                resp.raise_for_status()
+                rows = iter_json_array(resp.iter_content(chunk_size))
+                result = consume(rows if keep is None else filter(keep, rows))
+            metrics.record_call("scrip_master", time.monotonic() - start)
+            resilience.record("scrip_master", True)
+            return result
+        except Exception as e:
+            metrics.record_call("scrip_master", time.monotonic() - start, ok=False)
+            resilience.record("scrip_master", False)
+            logging.error(f"[stream_json_array_with_retry] Attempt {attempt} failed: {e}")
+            backoff = base_backoff * attempt
+            if attempt == max_retries or not resilience.allow_retry("scrip_master", backoff):
                 return None
-            retry_sleep(base_backoff * attempt)
+            metrics.record_retry("scrip_master")
+            retry_sleep(backoff)
 
-def safe_ltp(smartApi, exch_seg, symbol, token, max_retries=3, base_backoff=0.25):
+def safe_ltp(smartApi, exch_seg, symbol, token, max_retries=3, base_backoff=0.25, cache=None):
     """
     Safely retrieves the Last Traded Price (LTP) for a given instrument with retries.
     
@@ -42,17 +164,26 @@ def safe_ltp(smartApi, exch_seg, symbol, token, max_retries=3, base_backoff=0.25
         token (str): Instrument token.
         max_retries (int): Maximum number of retries.
         base_backoff (float): Base backoff time in seconds.
+        cache (QuoteCache, optional): Returns a fresh cached LTP instead of calling the API.
 
     Returns:
         float: The LTP, or 0.0 if not found after retries.
     """
+    if cache is not None:
+        return cache.get((exch_seg, token), lambda: safe_ltp(smartApi, exch_seg, symbol, token, max_retries, base_backoff))
     for attempt in range(1, max_retries + 1):
         try:
             data = smartApi.ltpData(exch_seg, symbol, token)
             ltp = data.get("data", {}).get("ltp", 0)
             if ltp:
                 return float(ltp)
+        except ResilienceError:
+            break
         except Exception as e:
             logging.error(f"[safe_ltp] {symbol} attempt {attempt} failed: {e}")
-        retry_sleep(base_backoff * attempt)
+        backoff = base_backoff * attempt
+        if attempt == max_retries or not resilience.allow_retry("ltpData", backoff):
+            break
+        metrics.record_retry("ltpData")
+        retry_sleep(backoff)
     return 0.0
\ No newline at end of file